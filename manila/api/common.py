@@ -38,6 +38,14 @@ api_common_opts = [
     cfg.StrOpt(
         'osapi_share_base_URL',
         help='Base URL to be presented to users in links to the Share API'),
+    cfg.BoolOpt(
+        'osapi_share_request_db_cache',
+        default=True,
+        help='Whether shares, share instances, snapshots, share networks, '
+             'share servers and share types read from the database while '
+             'serving an API request are cached for the rest of the '
+             'request. The cache is emptied whenever one of them is updated '
+             'while serving the request.'),
 ]
 
 CONF = cfg.CONF
@@ -111,6 +119,34 @@ def limited(items, request, max_limit=CONF.osapi_max_limit):
                     will cause exc.HTTPBadRequest() exceptions to be raised.
     :kwarg max_limit: The maximum number of items to return from 'items'
     """
+    limit, offset = _get_limit_and_offset(request, max_limit)
+    range_end = offset + limit
+    return items[offset:range_end]
+
+
+def get_limited_params(request, max_limit=CONF.osapi_max_limit,
+                       allow_marker=False):
+    """Return params to retrieve the page of items :func:`limited` returns.
+
+    This allows lists to be paginated when they are retrieved, rather than
+    loading every item and then slicing them.
+
+    :param request: ``wsgi.Request`` possibly containing 'offset', 'limit'
+                    and 'marker' GET variables, see :func:`limited`.
+    :kwarg max_limit: The maximum number of items to return
+    :kwarg allow_marker: Whether 'marker', the ID of the last item of the
+                         previous page, is to be returned as well
+    :returns: dict with 'limit', 'offset' and possibly 'marker' keys
+    """
+    limit, offset = _get_limit_and_offset(request, max_limit)
+    params = {'limit': limit, 'offset': offset}
+    if allow_marker and 'marker' in request.GET:
+        params['marker'] = _get_marker_param(request)
+    return params
+
+
+def _get_limit_and_offset(request, max_limit):
+    """Extract limit and offset from request or fail."""
     try:
         offset = int(request.GET.get('offset', 0))
     except ValueError:
@@ -132,8 +168,7 @@ def limited(items, request, max_limit=CONF.osapi_max_limit):
         raise webob.exc.HTTPBadRequest(explanation=msg)
 
     limit = min(max_limit, limit or max_limit)
-    range_end = offset + limit
-    return items[offset:range_end]
+    return limit, offset
 
 
 def remove_version_from_href(href):
@@ -181,6 +216,8 @@ class ViewBuilder(object):
 
     _collection_name = None
     _detail_version_modifiers = []
+    # Modifiers applicable to each API version, by view builder class.
+    _version_modifier_plans = {}
 
     def _get_links(self, request, identifier):
         return [{"rel": "self",
@@ -248,11 +285,30 @@ class ViewBuilder(object):
         This method calls every method, that is applicable to the request
         version, in _detail_version_modifiers.
         """
-        for method_name in self._detail_version_modifiers:
-            method = getattr(self, method_name)
-            if request.api_version_request.matches_versioned_method(method):
-                request_context = request.environ['manila.context']
-                method.func(self, request_context, resource_dict, resource)
+        modifiers = self._get_version_modifiers(request.api_version_request)
+        if modifiers:
+            request_context = request.environ['manila.context']
+            for modifier in modifiers:
+                modifier(self, request_context, resource_dict, resource)
+
+    def _get_version_modifiers(self, api_version_request):
+        """Returns the modifiers applicable to the given request version.
+
+        The modifiers are looked up once per view builder class and request
+        version, so that views of many resources do not match every method
+        in _detail_version_modifiers against the request version again.
+        """
+        key = (type(self), api_version_request.get_string(),
+               api_version_request.experimental)
+        modifiers = self._version_modifier_plans.get(key)
+        if modifiers is None:
+            modifiers = tuple(
+                method.func for method in (
+                    getattr(self, method_name)
+                    for method_name in self._detail_version_modifiers)
+                if api_version_request.matches_versioned_method(method))
+            self._version_modifier_plans[key] = modifiers
+        return modifiers
 
     @classmethod
     def versioned_method(cls, min_ver, max_ver=None, experimental=False):
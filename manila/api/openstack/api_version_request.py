@@ -115,13 +115,16 @@ REST_API_VERSION_HISTORY = """
     * 2.42 - Added ``with_count`` in share list API to get total count info.
     * 2.43 - Added filter search by extra spec for share type list.
     * 2.44 - Added 'ou' field to 'security_service' object.
+    * 2.45 - Added 'marker' parameter to share, share snapshot, share group
+             and message list APIs to retrieve the page of items following
+             the given item.
 """
 
 # The minimum and maximum versions of the API supported
 # The default api version request is defined to be the
 # minimum version of the API supported.
 _MIN_API_VERSION = "2.0"
-_MAX_API_VERSION = "2.44"
+_MAX_API_VERSION = "2.45"
 DEFAULT_API_VERSION = _MIN_API_VERSION
 
 
@@ -18,6 +18,7 @@ import inspect
 import math
 import time
 
+from oslo_config import cfg
 from oslo_log import log
 from oslo_serialization import jsonutils
 from oslo_utils import strutils
@@ -29,12 +30,15 @@ import webob.exc
 from manila.api.openstack import api_version_request as api_version
 from manila.api.openstack import versioned_method
 from manila.common import constants
+from manila import context as manila_context
 from manila import exception
 from manila.i18n import _
 from manila import policy
 from manila import utils
 from manila.wsgi import common as wsgi
 
+CONF = cfg.CONF
+CONF.import_opt('osapi_share_request_db_cache', 'manila.api.common')
 LOG = log.getLogger(__name__)
 
 SUPPORTED_CONTENT_TYPES = (
@@ -811,6 +815,10 @@ class Resource(wsgi.Application):
             msg = _("Malformed request url")
             return Fault(webob.exc.HTTPBadRequest(explanation=msg))
 
+        db_cache = None
+        if context is not None and CONF.osapi_share_request_db_cache:
+            db_cache = context.db_cache = manila_context.RequestCache()
+
         # Run pre-processing extensions
         response, post = self.pre_process_extensions(extensions,
                                                      request, action_args)
@@ -860,6 +868,13 @@ class Resource(wsgi.Application):
 
         LOG.info(msg)
 
+        if db_cache is not None:
+            context.db_cache = None
+            LOG.debug("%(url)s read %(misses)d objects from the database, "
+                      "%(hits)d reads were served from the request cache.",
+                      {'url': request.url, 'misses': db_cache.misses,
+                       'hits': db_cache.hits})
+
         if hasattr(response, 'headers'):
             for hdr, val in response.headers.items():
                 val = utils.convert_str(val)
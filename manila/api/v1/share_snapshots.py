@@ -76,6 +76,7 @@ class ShareSnapshotMixin(object):
         req.GET.pop('name~', None)
         req.GET.pop('description~', None)
         req.GET.pop('description', None)
+        req.GET.pop('marker', None)
         return self._get_snapshots(req, is_detail=False)
 
     def detail(self, req):
@@ -83,6 +84,7 @@ class ShareSnapshotMixin(object):
         req.GET.pop('name~', None)
         req.GET.pop('description~', None)
         req.GET.pop('description', None)
+        req.GET.pop('marker', None)
         return self._get_snapshots(req, is_detail=True)
 
     def _get_snapshots(self, req, is_detail):
@@ -95,6 +97,7 @@ class ShareSnapshotMixin(object):
         # Remove keys that are not related to share attrs
         search_opts.pop('limit', None)
         search_opts.pop('offset', None)
+        search_opts.pop('marker', None)
         sort_key = search_opts.pop('sort_key', 'created_at')
         sort_dir = search_opts.pop('sort_dir', 'desc')
 
@@ -121,17 +124,13 @@ class ShareSnapshotMixin(object):
             search_opts=search_opts,
             sort_key=sort_key,
             sort_dir=sort_dir,
+            **common.get_limited_params(req, allow_marker=True)
         )
 
-        # Snapshots with no instances are filtered out.
-        snapshots = list(filter(lambda x: x.get('status') is not None,
-                                snapshots))
-
-        limited_list = common.limited(snapshots, req)
         if is_detail:
-            snapshots = self._view_builder.detail_list(req, limited_list)
+            snapshots = self._view_builder.detail_list(req, snapshots)
         else:
-            snapshots = self._view_builder.summary_list(req, limited_list)
+            snapshots = self._view_builder.summary_list(req, snapshots)
         return snapshots
 
     def _get_snapshots_search_options(self):
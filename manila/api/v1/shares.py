@@ -108,6 +108,7 @@ class ShareMixin(object):
         req.GET.pop('description~', None)
         req.GET.pop('description', None)
         req.GET.pop('with_count', None)
+        req.GET.pop('marker', None)
         return self._get_shares(req, is_detail=False)
 
     def detail(self, req):
@@ -118,6 +119,7 @@ class ShareMixin(object):
         req.GET.pop('description~', None)
         req.GET.pop('description', None)
         req.GET.pop('with_count', None)
+        req.GET.pop('marker', None)
         return self._get_shares(req, is_detail=True)
 
     def _get_shares(self, req, is_detail):
@@ -130,6 +132,7 @@ class ShareMixin(object):
         # Remove keys that are not related to share attrs
         search_opts.pop('limit', None)
         search_opts.pop('offset', None)
+        search_opts.pop('marker', None)
         sort_key = search_opts.pop('sort_key', 'created_at')
         sort_dir = search_opts.pop('sort_dir', 'desc')
 
@@ -167,14 +170,19 @@ class ShareMixin(object):
         common.remove_invalid_options(
             context, search_opts, self._get_share_search_options())
 
-        shares = self.share_api.get_all(
-            context, search_opts=search_opts, sort_key=sort_key,
-            sort_dir=sort_dir)
         total_count = None
         if show_count:
+            shares = self.share_api.get_all(
+                context, search_opts=search_opts, sort_key=sort_key,
+                sort_dir=sort_dir)
             total_count = len(shares)
-
-        limited_list = common.limited(shares, req)
+            limited_list = common.limited(shares, req)
+        else:
+            # NOTE: Only the requested page of shares is retrieved.
+            limited_list = self.share_api.get_all(
+                context, search_opts=search_opts, sort_key=sort_key,
+                sort_dir=sort_dir,
+                **common.get_limited_params(req, allow_marker=True))
 
         if is_detail:
             shares = self._view_builder.detail_list(req, limited_list,
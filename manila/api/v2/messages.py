@@ -23,6 +23,7 @@ import webob
 from webob import exc
 
 from manila.api import common
+from manila.api.openstack import api_version_request as api_version
 from manila.api.openstack import wsgi
 from manila.api.views import messages as messages_view
 from manila import exception
@@ -80,14 +81,17 @@ class MessagesController(wsgi.Controller):
 
         # Remove keys that are not related to message attrs
         search_opts.pop('limit', None)
+        search_opts.pop('offset', None)
         search_opts.pop('marker', None)
         sort_key = search_opts.pop('sort_key', 'created_at')
         sort_dir = search_opts.pop('sort_dir', 'desc')
 
-        messages = self.message_api.get_all(
+        allow_marker = (
+            req.api_version_request >= api_version.APIVersionRequest("2.45"))
+        limited_list = self.message_api.get_all(
             context, search_opts=search_opts, sort_dir=sort_dir,
-            sort_key=sort_key)
-        limited_list = common.limited(messages, req)
+            sort_key=sort_key,
+            **common.get_limited_params(req, allow_marker=allow_marker))
 
         return self._view_builder.index(req, limited_list)
 
@@ -96,8 +96,11 @@ class ShareGroupController(wsgi.Controller, wsgi.AdminActionsMixin):
         # Remove keys that are not related to share group attrs
         search_opts.pop('limit', None)
         search_opts.pop('offset', None)
+        search_opts.pop('marker', None)
         sort_key = search_opts.pop('sort_key', 'created_at')
         sort_dir = search_opts.pop('sort_dir', 'desc')
+        allow_marker = (
+            req.api_version_request >= api_version.APIVersionRequest("2.45"))
         if req.api_version_request < api_version.APIVersionRequest("2.36"):
             search_opts.pop('name~', None)
             search_opts.pop('description~', None)
@@ -105,13 +108,12 @@ class ShareGroupController(wsgi.Controller, wsgi.AdminActionsMixin):
             search_opts['share_group_type_id'] = search_opts.pop(
                 'group_type_id')
 
-        share_groups = self.share_group_api.get_all(
+        limited_list = self.share_group_api.get_all(
             context, detailed=is_detail, search_opts=search_opts,
             sort_dir=sort_dir, sort_key=sort_key,
+            **common.get_limited_params(req, allow_marker=allow_marker)
         )
 
-        limited_list = common.limited(share_groups, req)
-
         if is_detail:
             share_groups = self._view_builder.detail_list(req, limited_list)
         else:
@@ -113,18 +113,26 @@ class ShareNetworkController(wsgi.Controller):
         search_opts = {}
         search_opts.update(req.GET)
 
+        # NOTE: The requested page of share networks is retrieved from the
+        # database unless they have to be filtered after being retrieved.
+        pagination = {}
+        if not set(search_opts) - {'all_tenants', 'project_id', 'limit',
+                                   'offset'}:
+            pagination = common.get_limited_params(req)
+
         if 'security_service_id' in search_opts:
             networks = db_api.share_network_get_all_by_security_service(
                 context, search_opts['security_service_id'])
         elif context.is_admin and 'project_id' in search_opts:
             networks = db_api.share_network_get_all_by_project(
-                context, search_opts['project_id'])
+                context, search_opts['project_id'], **pagination)
         elif context.is_admin and 'all_tenants' in search_opts:
-            networks = db_api.share_network_get_all(context)
+            networks = db_api.share_network_get_all(context, **pagination)
         else:
             networks = db_api.share_network_get_all_by_project(
                 context,
-                context.project_id)
+                context.project_id,
+                **pagination)
 
         date_parsing_error_msg = '''%s is not in yyyy-mm-dd format.'''
         if 'created_since' in search_opts:
@@ -173,7 +181,9 @@ class ShareNetworkController(wsgi.Controller):
                     networks = [network for network in networks
                                 if network.get(key) == value]
 
-        limited_list = common.limited(networks, req)
+        limited_list = networks
+        if not pagination:
+            limited_list = common.limited(networks, req)
         return self._view_builder.build_share_networks(
             req, limited_list, is_detail)
 
@@ -299,6 +299,8 @@ class ShareSnapshotsController(share_snapshots.ShareSnapshotMixin,
             req.GET.pop('name~', None)
             req.GET.pop('description~', None)
             req.GET.pop('description', None)
+        if req.api_version_request < api_version.APIVersionRequest("2.45"):
+            req.GET.pop('marker', None)
         return self._get_snapshots(req, is_detail=False)
 
     @wsgi.Controller.api_version("2.0")
@@ -308,6 +310,8 @@ class ShareSnapshotsController(share_snapshots.ShareSnapshotMixin,
             req.GET.pop('name~', None)
             req.GET.pop('description~', None)
             req.GET.pop('description', None)
+        if req.api_version_request < api_version.APIVersionRequest("2.45"):
+            req.GET.pop('marker', None)
         return self._get_snapshots(req, is_detail=True)
 
 
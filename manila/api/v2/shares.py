@@ -433,6 +433,9 @@ class ShareController(shares.ShareMixin,
         if req.api_version_request < api_version.APIVersionRequest("2.42"):
             req.GET.pop('with_count', None)
 
+        if req.api_version_request < api_version.APIVersionRequest("2.45"):
+            req.GET.pop('marker', None)
+
         return self._get_shares(req, is_detail=False)
 
     @wsgi.Controller.api_version("2.0")
@@ -447,6 +450,9 @@ class ShareController(shares.ShareMixin,
             req.GET.pop('description~', None)
             req.GET.pop('description', None)
 
+        if req.api_version_request < api_version.APIVersionRequest("2.45"):
+            req.GET.pop('marker', None)
+
         return self._get_shares(req, is_detail=True)
 
 
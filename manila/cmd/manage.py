@@ -57,6 +57,7 @@ from __future__ import print_function
 
 import os
 import sys
+import time
 
 from manila import i18n
 i18n.enable_lazy()
@@ -244,14 +245,44 @@ class DbCommands(object):
           help='A non-negative integer, denoting the age of soft-deleted '
                'records in number of days. 0 can be specified to purge all '
                'soft-deleted rows, default is %(default)d.')
-    def purge(self, age_in_days):
+    @args('--batch_size', type=int, default=1000,
+          help='Maximum number of rows deleted per transaction, default is '
+               '%(default)d.')
+    @args('--sleep_interval', type=float, default=0,
+          help='Number of seconds to sleep between batches of deleted rows, '
+               'default is %(default)s.')
+    @args('--dry_run', action='store_true', default=False,
+          help='Only report the number of rows that would be purged.')
+    def purge(self, age_in_days, batch_size=1000, sleep_interval=0,
+              dry_run=False):
         """Purge soft-deleted records older than a given age."""
         age_in_days = int(age_in_days)
         if age_in_days < 0:
             print(_("Must supply a non-negative value for age."))
             exit(1)
+        if batch_size < 1:
+            print(_("Must supply a positive value for batch size."))
+            exit(1)
         ctxt = context.get_admin_context()
-        db.purge_deleted_records(ctxt, age_in_days)
+        start = time.time()
+        purged = db.purge_deleted_records(
+            ctxt, age_in_days, batch_size=batch_size,
+            sleep_interval=sleep_interval, dry_run=dry_run)
+        elapsed = time.time() - start
+
+        print_format = "%-48s %-10s"
+        print(print_format % (_('Table'), _('Rows')))
+        for table, count in sorted(purged.items()):
+            if count:
+                print(print_format % (table, count))
+        total = sum(purged.values())
+        if dry_run:
+            print(_("%d rows would be purged.") % total)
+        else:
+            print(_("Purged %(total)d rows in %(elapsed).2f seconds "
+                    "(%(rate).1f rows/s).") % {
+                'total': total, 'elapsed': elapsed,
+                'rate': total / max(elapsed, 0.001)})
 
 
 class VersionCommands(object):
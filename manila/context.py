@@ -27,6 +27,34 @@ from manila.i18n import _
 from manila import policy
 
 
+class RequestCache(object):
+    """Cache of the DB objects read while serving a single API request."""
+
+    def __init__(self):
+        self._items = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __deepcopy__(self, memo):
+        # NOTE: Contexts elevated while serving a request share its cache,
+        # reads done with them are told apart by the cache keys.
+        return self
+
+    def get_or_load(self, key, load):
+        """Returns the cached object for key, loading it if not cached."""
+        try:
+            value = self._items[key]
+        except KeyError:
+            self.misses += 1
+            value = self._items[key] = load()
+        else:
+            self.hits += 1
+        return value
+
+    def clear(self):
+        self._items.clear()
+
+
 class RequestContext(context.RequestContext):
     """Security context and request information.
 
@@ -89,6 +117,8 @@ class RequestContext(context.RequestContext):
             self.service_catalog = []
 
         self.quota_class = quota_class
+        # NOTE: Set by the API while serving a request, see RequestCache.
+        self.db_cache = None
 
     def _get_read_deleted(self):
         return self._read_deleted
@@ -16,8 +16,10 @@
 Data Service
 """
 
+import errno
 import os
 
+import eventlet
 from oslo_config import cfg
 from oslo_log import log
 import six
@@ -45,6 +47,46 @@ data_opts = [
         default=False,
         help="Chooses whether hash of each file should be checked on data "
              "copying."),
+    cfg.IntOpt(
+        'data_copy_workers',
+        default=1,
+        min=1,
+        help="Number of files copied concurrently by each data copy."),
+    cfg.BoolOpt(
+        'data_copy_in_process',
+        default=False,
+        help="Chooses whether files are copied by the data service process "
+             "itself, within the kernel where possible, instead of running "
+             "a 'cp' command for each file. Requires the data service to "
+             "be able to read and write the mounted shares and to change "
+             "the ownership of files."),
+    cfg.BoolOpt(
+        'data_copy_compare_blocks',
+        default=False,
+        help="Chooses whether incremental data copies rewrite only the "
+             "blocks of changed files that differ from their source, "
+             "instead of whole files. Only applies to files copied by the "
+             "data service process itself."),
+    cfg.IntOpt(
+        'data_copy_checkpoint_interval',
+        default=60,
+        min=0,
+        help="Interval, in seconds, at which data copies record how far "
+             "they went, so that copies interrupted by a restart of the "
+             "data service resume instead of failing. 0 disables "
+             "checkpoints."),
+    cfg.StrOpt(
+        'data_copy_checkpoint_dir',
+        default='$state_path/data_copy_checkpoints',
+        help="Directory where the checkpoints of data copies are kept. "
+             "Also holds the lists of files of ongoing data copies."),
+    cfg.StrOpt(
+        'data_copy_hash_algorithm',
+        default='sha256',
+        choices=sorted(data_utils.HASH_COMMANDS),
+        help="Hash algorithm used to validate copied files when "
+             "'check_hash' is enabled. md5, sha1 and blake2b are faster "
+             "than sha256, blake2b requires Python 3.6 or later."),
 
 ]
 
@@ -55,7 +97,7 @@ CONF.register_opts(data_opts)
 class DataManager(manager.Manager):
     """Receives requests to handle data and sends responses."""
 
-    RPC_API_VERSION = '1.0'
+    RPC_API_VERSION = '1.1'
 
     def __init__(self, service_name=None, *args, **kwargs):
         super(DataManager, self).__init__(*args, **kwargs)
@@ -63,16 +105,59 @@ class DataManager(manager.Manager):
 
     def init_host(self):
         ctxt = context.get_admin_context()
-        shares = self.db.share_get_all(ctxt)
+        shares = self.db.share_get_all(
+            ctxt,
+            filters={'task_state': list(constants.BUSY_COPYING_STATES)})
         for share in shares:
-            if share['task_state'] in constants.BUSY_COPYING_STATES:
+            checkpoint_path = self._get_checkpoint_path(share['id'])
+            checkpoint = (checkpoint_path and
+                          data_utils.load_checkpoint(checkpoint_path))
+            if checkpoint:
+                LOG.info("Resuming interrupted data copy of share %s.",
+                         share['id'])
+                eventlet.spawn_n(self._resume_data_copy, ctxt, share,
+                                 checkpoint['job'])
+            else:
                 self.db.share_update(
                     ctxt, share['id'],
                     {'task_state': constants.TASK_STATE_DATA_COPYING_ERROR})
 
+    def _resume_data_copy(self, context, share, job):
+        data_helper = helper.DataServiceHelper(context, self.db, share)
+        mount_path = CONF.mount_tmp_location
+        # NOTE: Shares mounted for the interrupted copy are still mounted.
+        for instance_id, connection_info in (
+                (job['share_instance_id'], job['connection_info_src']),
+                (job['dest_share_instance_id'],
+                 job['connection_info_dest'])):
+            if os.path.ismount(os.path.join(mount_path, instance_id)):
+                data_helper.cleanup_unmount_temp_folder(
+                    connection_info['unmount'], mount_path, instance_id)
+        try:
+            self.migration_start(
+                context, job['ignore_list'], share['id'],
+                job['share_instance_id'], job['dest_share_instance_id'],
+                job['connection_info_src'], job['connection_info_dest'],
+                precopy=job['precopy'], incremental=job['incremental'])
+        except exception.ShareDataCopyFailed:
+            # Already logged, and the share set to the error state.
+            pass
+
+    def _get_checkpoint_path(self, share_id):
+        if not CONF.data_copy_checkpoint_interval:
+            return None
+        checkpoint_dir = CONF.data_copy_checkpoint_dir
+        try:
+            os.makedirs(checkpoint_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        return os.path.join(checkpoint_dir, '%s.json' % share_id)
+
     def migration_start(self, context, ignore_list, share_id,
                         share_instance_id, dest_share_instance_id,
-                        connection_info_src, connection_info_dest):
+                        connection_info_src, connection_info_dest,
+                        precopy=False, incremental=False):
 
         LOG.debug(
             "Received request to migrate share content from share instance "
@@ -92,12 +177,28 @@ class DataManager(manager.Manager):
             copy = data_utils.Copy(
                 os.path.join(mount_path, share_instance_id),
                 os.path.join(mount_path, dest_share_instance_id),
-                ignore_list, CONF.check_hash)
+                ignore_list, CONF.check_hash,
+                workers=CONF.data_copy_workers,
+                in_process=CONF.data_copy_in_process,
+                incremental=incremental,
+                compare_blocks=CONF.data_copy_compare_blocks,
+                hash_algorithm=CONF.data_copy_hash_algorithm,
+                checkpoint_path=self._get_checkpoint_path(share_id),
+                checkpoint_interval=CONF.data_copy_checkpoint_interval,
+                checkpoint_data={
+                    'ignore_list': ignore_list,
+                    'share_instance_id': share_instance_id,
+                    'dest_share_instance_id': dest_share_instance_id,
+                    'connection_info_src': connection_info_src,
+                    'connection_info_dest': connection_info_dest,
+                    'precopy': precopy,
+                    'incremental': incremental,
+                })
 
             self._copy_share_data(
                 context, copy, share_ref, share_instance_id,
                 dest_share_instance_id, connection_info_src,
-                connection_info_dest)
+                connection_info_dest, precopy=precopy)
         except exception.ShareDataCopyCancelled:
             share_rpcapi.migration_complete(
                 context, share_instance_ref, dest_share_instance_id)
@@ -116,6 +217,17 @@ class DataManager(manager.Manager):
         finally:
             self.busy_tasks_shares.pop(share_id, None)
 
+        if precopy:
+            LOG.info(
+                "Completed copy of share content from share instance "
+                "%(instance_id)s to instance %(dest_instance_id)s while the "
+                "share is writable.",
+                {'instance_id': share_instance_id,
+                 'dest_instance_id': dest_share_instance_id})
+            share_rpcapi.migration_precopy_completed(
+                context, share_instance_ref, dest_share_instance_id)
+            return
+
         LOG.info(
             "Completed copy operation of migrating share content from share "
             "instance %(instance_id)s to instance %(dest_instance_id)s.",
@@ -153,7 +265,8 @@ class DataManager(manager.Manager):
 
     def _copy_share_data(
             self, context, copy, src_share, share_instance_id,
-            dest_share_instance_id, connection_info_src, connection_info_dest):
+            dest_share_instance_id, connection_info_src, connection_info_dest,
+            precopy=False):
 
         copied = False
         mount_path = CONF.mount_tmp_location
@@ -286,9 +399,12 @@ class DataManager(manager.Manager):
                  'dest_instance_id': dest_share_instance_id})
             raise exception.ShareDataCopyFailed(reason=msg)
 
-        self.db.share_update(
-            context, src_share['id'],
-            {'task_state': constants.TASK_STATE_DATA_COPYING_COMPLETED})
+        # NOTE: The share is not done copying until the final incremental
+        # copy that follows a copy made while it is writable.
+        if not precopy:
+            self.db.share_update(
+                context, src_share['id'],
+                {'task_state': constants.TASK_STATE_DATA_COPYING_COMPLETED})
 
         LOG.debug("Copy of data from share instance %(src_instance)s to "
                   "share instance %(dest_instance)s was successful.",
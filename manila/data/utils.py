@@ -12,9 +12,25 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import array
+import collections
+import errno
+import hashlib
 import os
+import re
+import shutil
+import stat
+import sys
+import tempfile
+import time
 
+import eventlet
+from eventlet import tpool
 from oslo_log import log
+from oslo_serialization import jsonutils
+from oslo_utils import encodeutils
+from oslo_utils import excutils
+import six
 
 from manila import exception
 from manila.i18n import _
@@ -22,10 +38,149 @@ from manila import utils
 
 LOG = log.getLogger(__name__)
 
+# Number of bytes handed to a single copy system call.
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+# Number of directories created by a single 'mkdir' command.
+MKDIR_BATCH_SIZE = 100
+# Commands hashing files copied by 'cp', for each supported hash algorithm.
+HASH_COMMANDS = {
+    'md5': 'md5sum',
+    'sha1': 'sha1sum',
+    'sha256': 'sha256sum',
+    'sha512': 'sha512sum',
+    'blake2b': 'b2sum',
+}
+
+ManifestEntry = collections.namedtuple(
+    'ManifestEntry',
+    ['type', 'size', 'mode', 'uid', 'gid', 'atime', 'mtime', 'path'])
+
+
+class Manifest(object):
+    """Entries of a tree, recorded in a file rather than kept in memory.
+
+    Entries are NUL terminated records as printed by 'find' with FORMAT,
+    with paths relative to the root of the tree and directories listed
+    before their contents, or sorted by path. Only the offsets of the
+    directory records are kept in memory, so that directories can also be
+    visited bottom up.
+    """
+
+    FORMAT = '%y %s %m %U %G %A@ %T@ %P\\0'
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self.total_size = 0
+        self.file_count = 0
+        self._dir_offsets = array.array('L')
+        self._file = None
+
+    @staticmethod
+    def write(manifest_file, item_stat, rel_path):
+        """Writes the record of an entry as 'find' would print it."""
+        fmt = stat.S_IFMT(item_stat.st_mode)
+        if fmt == stat.S_IFDIR:
+            item_type = 'd'
+        elif fmt == stat.S_IFREG:
+            item_type = 'f'
+        elif fmt == stat.S_IFLNK:
+            item_type = 'l'
+        else:
+            item_type = 'o'
+        Manifest.write_entry(manifest_file, ManifestEntry(
+            type=item_type, size=item_stat.st_size,
+            mode=stat.S_IMODE(item_stat.st_mode), uid=item_stat.st_uid,
+            gid=item_stat.st_gid, atime=item_stat.st_atime,
+            mtime=item_stat.st_mtime, path=rel_path))
+
+    @staticmethod
+    def write_entry(manifest_file, entry):
+        record = '%s %d %o %d %d %f %f ' % entry[:7]
+        manifest_file.write(encodeutils.safe_encode(record) +
+                            encodeutils.safe_encode(entry.path) + b'\0')
+
+    def sort(self):
+        """Sorts the entries by path, which must happen before loading."""
+        utils.execute("sort", "-z", "-t", " ", "-k", "8", "-o", self.path,
+                      self.path, env_variables={'LC_ALL': 'C'})
+
+    def load(self):
+        """Indexes the manifest and sums the sizes of its files."""
+        self._file = open(self.path, 'rb')
+        for offset, entry in self._read():
+            if entry.type == 'd':
+                self._dir_offsets.append(offset)
+            else:
+                self.total_size += entry.size
+                self.file_count += 1
+
+    def close(self, remove=True):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if remove:
+            _remove_file(self.path)
+
+    def entries(self):
+        for offset, entry in self._read():
+            yield entry
+
+    def files(self):
+        for offset, entry in self._read():
+            if entry.type != 'd':
+                yield entry
+
+    def directories(self):
+        for offset, entry in self._read():
+            if entry.type == 'd':
+                yield entry
+
+    def directories_bottom_up(self):
+        for offset in reversed(self._dir_offsets):
+            self._file.seek(offset)
+            record = b''
+            while b'\0' not in record:
+                chunk = self._file.read(4096)
+                if not chunk:
+                    break
+                record += chunk
+            yield self._parse(record.split(b'\0', 1)[0])
+
+    def _read(self):
+        self._file.seek(0)
+        offset = 0
+        pending = b''
+        while True:
+            chunk = self._file.read(self.READ_SIZE)
+            if not chunk:
+                break
+            records = (pending + chunk).split(b'\0')
+            pending = records.pop()
+            for record in records:
+                yield offset, self._parse(record)
+                offset += len(record) + 1
+
+    @staticmethod
+    def _parse(record):
+        fields = record.split(b' ', 7)
+        return ManifestEntry(
+            type=encodeutils.safe_decode(fields[0]),
+            size=int(fields[1]),
+            mode=int(fields[2], 8),
+            uid=int(fields[3]),
+            gid=int(fields[4]),
+            atime=float(fields[5]),
+            mtime=float(fields[6]),
+            path=encodeutils.safe_decode(fields[7]))
+
 
 class Copy(object):
 
-    def __init__(self, src, dest, ignore_list, check_hash=False):
+    def __init__(self, src, dest, ignore_list, check_hash=False, workers=1,
+                 in_process=False, incremental=False, compare_blocks=False,
+                 checkpoint_path=None, checkpoint_interval=60,
+                 checkpoint_data=None, hash_algorithm='sha256'):
         self.src = src
         self.dest = dest
         self.total_size = 0
@@ -38,6 +193,25 @@ class Copy(object):
         self.initialized = False
         self.completed = False
         self.check_hash = check_hash
+        self.hash_algorithm = hash_algorithm
+        self.workers = max(1, workers)
+        self.in_process = in_process
+        self.incremental = incremental
+        self.compare_blocks = compare_blocks
+        self.files_copied = 0
+        self.start_time = None
+        self._pool = None
+        self._copy_error = None
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_data = checkpoint_data or {}
+        self._checkpoint_time = 0
+        self._manifest_paths = None
+        # Files are copied in the order of the manifest, and all files
+        # before the 'files_done' watermark are known to be copied.
+        self._files_done = 0
+        self._bytes_done = 0
+        self._files_pending = {}
 
     def get_progress(self):
 
@@ -49,11 +223,8 @@ class Copy(object):
             return {'total_progress': 0}
 
         try:
-            size, err = utils.execute("stat", "-c", "%s",
-                                      self.current_copy['file_path'],
-                                      run_as_root=True)
-            size = int(size)
-        except utils.processutils.ProcessExecutionError:
+            size = self._get_size(self.current_copy['file_path'])
+        except (utils.processutils.ProcessExecutionError, OSError):
             size = 0
 
         current_file_progress = 0
@@ -71,106 +242,368 @@ class Copy(object):
         progress = {
             'total_progress': total_progress,
             'current_file_path': current_file_path,
-            'current_file_progress': current_file_progress
+            'current_file_progress': current_file_progress,
+            'files_copied': self.files_copied,
+            'bytes_per_second': self._get_throughput(),
+            'workers': self.workers,
         }
 
         return progress
 
+    def _get_throughput(self):
+        if self.start_time is None:
+            return 0
+        elapsed = time.time() - self.start_time
+        if elapsed <= 0:
+            return 0
+        return int(self.current_size / elapsed)
+
+    def _get_size(self, path):
+        if self.in_process:
+            return os.lstat(path).st_size
+        size, err = utils.execute("stat", "-c", "%s", path, run_as_root=True)
+        return int(size)
+
     def cancel(self):
 
         self.cancelled = True
 
     def run(self):
 
-        self.get_total_size(self.src)
-        self.initialized = True
-        self.copy_data(self.src)
-        self.copy_stats(self.src)
+        self.start_time = time.time()
+        manifest, files_manifest = self._open_manifests()
+        discard = True
+        try:
+            self._save_checkpoint()
+            self.total_size = files_manifest.total_size
+            self.initialized = True
+            self.copy_dirs(manifest)
+            self.copy_data(files_manifest, start=self._files_done)
+            self.copy_stats(manifest)
+        except BaseException as e:
+            # NOTE: A copy interrupted by the data service stopping, rather
+            # than failing, keeps its manifests and checkpoint so that it
+            # can be resumed.
+            discard = isinstance(e, Exception) or not self.checkpoint_path
+            raise
+        finally:
+            if files_manifest is not manifest:
+                files_manifest.close(remove=discard)
+            manifest.close(remove=discard)
+            if discard and self.checkpoint_path:
+                _remove_file(self.checkpoint_path)
         self.completed = True
 
         LOG.info(self.get_progress())
 
-    def get_total_size(self, path):
-        if self.cancelled:
+    def _open_manifests(self):
+        """Returns the manifests of the tree and of the files to copy.
+
+        They are loaded from the checkpoint of an interrupted copy of the
+        same trees when there is one, in which case the copy resumes from
+        the files that were not known to be copied.
+        """
+        checkpoint = self._load_checkpoint()
+        if checkpoint is not None:
+            self._manifest_paths = (checkpoint['manifest'],
+                                    checkpoint['files_manifest'])
+            manifest = Manifest(checkpoint['manifest'])
+            files_manifest = manifest
+            try:
+                manifest.load()
+                if checkpoint['files_manifest'] != checkpoint['manifest']:
+                    files_manifest = Manifest(checkpoint['files_manifest'])
+                    files_manifest.load()
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    manifest.close(remove=False)
+            self._files_done = checkpoint['files_done']
+            self._bytes_done = checkpoint['bytes_done']
+            self.files_copied = self._files_done
+            self.current_size = self._bytes_done
+            LOG.info("Resuming copy from %(src)s to %(dest)s after "
+                     "%(files)d files copied.",
+                     {'src': self.src, 'dest': self.dest,
+                      'files': self._files_done})
+            return manifest, files_manifest
+
+        manifest = self.build_manifest(sort=self.incremental)
+        files_manifest = manifest
+        if self.incremental:
+            try:
+                files_manifest = self.build_delta(manifest)
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    manifest.close()
+        self._manifest_paths = (manifest.path, files_manifest.path)
+        return manifest, files_manifest
+
+    def _load_checkpoint(self):
+        if not self.checkpoint_path:
+            return None
+        checkpoint = load_checkpoint(self.checkpoint_path)
+        if checkpoint is None:
+            return None
+        if (checkpoint.get('src') == self.src and
+                checkpoint.get('dest') == self.dest and
+                os.path.exists(checkpoint.get('manifest') or '') and
+                os.path.exists(checkpoint.get('files_manifest') or '')):
+            return checkpoint
+        LOG.warning("Discarding checkpoint %s, which does not match the "
+                    "copy.", self.checkpoint_path)
+        for path in (checkpoint.get('manifest'),
+                     checkpoint.get('files_manifest'), self.checkpoint_path):
+            if path:
+                _remove_file(path)
+        return None
+
+    def _save_checkpoint(self):
+        """Atomically records how far the copy went."""
+        if not self.checkpoint_path:
             return
-        out, err = utils.execute(
-            "ls", "-pA1", "--group-directories-first", path,
-            run_as_root=True)
-        for line in out.split('\n'):
-            if self.cancelled:
-                return
-            if len(line) == 0:
-                continue
-            src_item = os.path.join(path, line)
-            if line[-1] == '/':
-                if line[0:-1] in self.ignore_list:
-                    continue
-                self.get_total_size(src_item)
+        self._checkpoint_time = time.time()
+        checkpoint = {
+            'src': self.src,
+            'dest': self.dest,
+            'manifest': self._manifest_paths[0],
+            'files_manifest': self._manifest_paths[1],
+            'files_done': self._files_done,
+            'bytes_done': self._bytes_done,
+            'job': self.checkpoint_data,
+        }
+        path = self.checkpoint_path + '.tmp'
+        with open(path, 'w') as checkpoint_file:
+            checkpoint_file.write(jsonutils.dumps(checkpoint))
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.rename(path, self.checkpoint_path)
+
+    def _file_done(self, index, size):
+        self._files_pending[index] = size
+        while self._files_done in self._files_pending:
+            self._bytes_done += self._files_pending.pop(self._files_done)
+            self._files_done += 1
+        if (self.checkpoint_path and
+                time.time() - self._checkpoint_time >=
+                self.checkpoint_interval):
+            self._save_checkpoint()
+
+    @property
+    def _work_dir(self):
+        # Manifests of a resumable copy are kept next to its checkpoint.
+        if self.checkpoint_path:
+            return os.path.dirname(self.checkpoint_path)
+        return None
+
+    def build_manifest(self, root=None, sort=False):
+        """Walks a tree once, recording its entries in a manifest."""
+        root = root or self.src
+        fd, path = tempfile.mkstemp(prefix='manila-copy-manifest-',
+                                    dir=self._work_dir)
+        os.close(fd)
+        manifest = Manifest(path)
+        try:
+            if self.in_process:
+                with open(path, 'wb') as manifest_file:
+                    self._walk(root, '', manifest_file)
             else:
-                if line in self.ignore_list:
-                    continue
-                size, err = utils.execute("stat", "-c", "%s", src_item,
-                                          run_as_root=True)
-                self.total_size += int(size)
+                # NOTE: The root is followed if it is a symbolic link, as
+                # it is when walked in process.
+                cmd = ['find', '-H', root, '-mindepth', '1']
+                if self.ignore_list:
+                    cmd.append('(')
+                    for name in self.ignore_list:
+                        cmd.extend(['-name', _escape_find_pattern(name),
+                                    '-o'])
+                    cmd[-1] = ')'
+                    cmd.extend(['-prune', '-o'])
+                cmd.extend(['-fprintf', path, Manifest.FORMAT])
+                utils.execute(*cmd, run_as_root=True)
+            if sort:
+                manifest.sort()
+            manifest.load()
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                manifest.close()
+        return manifest
+
+    def build_delta(self, manifest):
+        """Compares a sorted manifest of the source with the destination.
+
+        Entries found only at the destination, or whose type changed, are
+        removed from it. Returns a manifest of the files that are missing
+        at the destination or differ in size or modification time. Times
+        are compared at full precision, as a file rewritten in place may
+        keep its size and second. Files of destinations that keep coarser
+        times are copied again.
+        """
+        dest_manifest = self.build_manifest(self.dest, sort=True)
+        fd, path = tempfile.mkstemp(prefix='manila-copy-delta-',
+                                    dir=self._work_dir)
+        delta = Manifest(path)
+        removed_dir = None
+        try:
+            with os.fdopen(fd, 'wb') as delta_file:
+                for entry, dest_entry in _merge_manifests(manifest,
+                                                          dest_manifest):
+                    if self.cancelled:
+                        break
+                    if dest_entry is not None and (
+                            entry is None or entry.type != dest_entry.type):
+                        # Contents of a removed directory are mostly listed
+                        # right after it.
+                        if removed_dir is None or not (
+                                dest_entry.path.startswith(removed_dir)):
+                            self._remove(dest_entry)
+                            if dest_entry.type == 'd':
+                                removed_dir = dest_entry.path + os.sep
+                        dest_entry = None
+                    if entry is None or entry.type == 'd':
+                        continue
+                    if (dest_entry is None or
+                            entry.size != dest_entry.size or
+                            entry.mtime != dest_entry.mtime):
+                        Manifest.write_entry(delta_file, entry)
+            delta.load()
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                delta.close()
+        finally:
+            dest_manifest.close()
+        return delta
 
-    def copy_data(self, path):
-        if self.cancelled:
+    def _remove(self, dest_entry):
+        dest_item = os.path.join(self.dest, dest_entry.path)
+        if not self.in_process:
+            utils.execute("rm", "-rf", dest_item, run_as_root=True)
             return
-        out, err = utils.execute(
-            "ls", "-pA1", "--group-directories-first", path,
-            run_as_root=True)
-        for line in out.split('\n'):
+        try:
+            if dest_entry.type == 'd':
+                shutil.rmtree(dest_item)
+            else:
+                os.unlink(dest_item)
+        except OSError as e:
+            # Entries of removed directories are listed after them.
+            if e.errno != errno.ENOENT:
+                raise
+
+    def _walk(self, path, rel_path, manifest_file):
+        for name, item_stat in _list_dir(path):
             if self.cancelled:
                 return
-            if len(line) == 0:
+            if name in self.ignore_list:
                 continue
-            src_item = os.path.join(path, line)
-            dest_item = src_item.replace(self.src, self.dest)
-            if line[-1] == '/':
-                if line[0:-1] in self.ignore_list:
-                    continue
-                utils.execute("mkdir", "-p", dest_item, run_as_root=True)
-                self.copy_data(src_item)
+            item_rel_path = os.path.join(rel_path, name)
+            Manifest.write(manifest_file, item_stat, item_rel_path)
+            if stat.S_ISDIR(item_stat.st_mode):
+                self._walk(os.path.join(path, name), item_rel_path,
+                           manifest_file)
+
+    def copy_dirs(self, manifest):
+        """Creates all directories of the manifest before copying files."""
+        batch = []
+        for entry in manifest.directories():
+            if self.cancelled:
+                return
+            dest_item = os.path.join(self.dest, entry.path)
+            if self.in_process:
+                try:
+                    os.mkdir(dest_item)
+                except OSError as e:
+                    if e.errno != errno.EEXIST:
+                        raise
             else:
-                if line in self.ignore_list:
+                batch.append(dest_item)
+                if len(batch) == MKDIR_BATCH_SIZE:
+                    utils.execute("mkdir", "-p", *batch, run_as_root=True)
+                    batch = []
+        if batch:
+            utils.execute("mkdir", "-p", *batch, run_as_root=True)
+
+    def copy_data(self, manifest, start=0):
+        """Copies the files of the manifest, up to 'workers' at a time.
+
+        The first 'start' files are skipped, as they were copied before.
+        """
+        if self.workers > 1:
+            self._pool = eventlet.GreenPool(self.workers)
+        try:
+            for index, entry in enumerate(manifest.files()):
+                if self.cancelled or self._copy_error is not None:
+                    break
+                if index < start:
                     continue
-                size, err = utils.execute("stat", "-c", "%s", src_item,
-                                          run_as_root=True)
+                src_item = os.path.join(self.src, entry.path)
+                dest_item = os.path.join(self.dest, entry.path)
+                if self._pool is not None:
+                    # Blocks while all workers are busy, which bounds the
+                    # number of files queued for copying.
+                    self._pool.spawn_n(self._copy_file, src_item,
+                                       dest_item, entry.size, index)
+                else:
+                    self._copy_file(src_item, dest_item, entry.size, index)
+        finally:
+            if self._pool is not None:
+                self._pool.waitall()
+                self._pool = None
 
-                self.current_copy = {'file_path': dest_item,
-                                     'size': int(size)}
+        if self._copy_error is not None:
+            exc_info, self._copy_error = self._copy_error, None
+            six.reraise(*exc_info)
 
-                self._copy_and_validate(src_item, dest_item)
+    def _copy_file(self, src_item, dest_item, size, index=None):
+        if self.cancelled or self._copy_error is not None:
+            return
 
-                self.current_size += int(size)
-                LOG.info(self.get_progress())
+        self.current_copy = {'file_path': dest_item, 'size': size}
+
+        try:
+            self._copy_and_validate(src_item, dest_item)
+        except Exception:
+            # NOTE: Workers cannot raise to the tree walk, so the first
+            # failure stops the copy and is raised by copy_data.
+            if self._copy_error is None:
+                self._copy_error = sys.exc_info()
+            return
+
+        self.current_size += size
+        self.files_copied += 1
+        if index is not None:
+            self._file_done(index, size)
+        LOG.info(self.get_progress())
 
     @utils.retry(exception.ShareDataCopyFailed, retries=2)
     def _copy_and_validate(self, src_item, dest_item):
-        utils.execute("cp", "-P", "--preserve=all", src_item,
-                      dest_item, run_as_root=True)
+        if self.in_process:
+            hash_algorithm = self.hash_algorithm if self.check_hash else None
+            # Run in a native thread so that copies of concurrent workers
+            # do not block each other. The source is hashed as it is read,
+            # so only the destination is read again to be validated.
+            digest = tpool.execute(
+                _update_item if self.compare_blocks else _copy_item,
+                src_item, dest_item, hash_algorithm)
+            if digest is not None:
+                tpool.execute(_validate_dest_item, dest_item, digest,
+                              hash_algorithm)
+        else:
+            utils.execute("cp", "-P", "--preserve=all", src_item,
+                          dest_item, run_as_root=True)
 
-        if self.check_hash:
-            _validate_item(src_item, dest_item)
+            if self.check_hash:
+                _validate_item(src_item, dest_item, self.hash_algorithm)
 
-    def copy_stats(self, path):
-        if self.cancelled:
-            return
-        out, err = utils.execute(
-            "ls", "-pA1", "--group-directories-first", path,
-            run_as_root=True)
-        for line in out.split('\n'):
+    def copy_stats(self, manifest):
+        """Re-applies the attributes of directories, deepest first."""
+        for entry in manifest.directories_bottom_up():
             if self.cancelled:
                 return
-            if len(line) == 0:
-                continue
-            src_item = os.path.join(path, line)
-            dest_item = src_item.replace(self.src, self.dest)
-            # NOTE(ganso): Should re-apply attributes for folders.
-            if line[-1] == '/':
-                if line[0:-1] in self.ignore_list:
-                    continue
-                self.copy_stats(src_item)
+            src_item = os.path.join(self.src, entry.path)
+            dest_item = os.path.join(self.dest, entry.path)
+            if self.in_process:
+                os.chown(dest_item, entry.uid, entry.gid)
+                os.chmod(dest_item, entry.mode)
+                os.utime(dest_item, (entry.atime, entry.mtime))
+            else:
                 utils.execute("chmod", "--reference=%s" % src_item, dest_item,
                               run_as_root=True)
                 utils.execute("touch", "--reference=%s" % src_item, dest_item,
@@ -179,11 +612,227 @@ class Copy(object):
                               run_as_root=True)
 
 
-def _validate_item(src_item, dest_item):
-    src_sum, err = utils.execute(
-        "sha256sum", "%s" % src_item, run_as_root=True)
-    dest_sum, err = utils.execute(
-        "sha256sum", "%s" % dest_item, run_as_root=True)
-    if src_sum.split()[0] != dest_sum.split()[0]:
+def load_checkpoint(path):
+    """Returns the checkpoint of an interrupted copy, if there is one."""
+    try:
+        with open(path) as checkpoint_file:
+            return jsonutils.loads(checkpoint_file.read())
+    except (IOError, OSError) as e:
+        if e.errno != errno.ENOENT:
+            raise
+    except ValueError:
+        LOG.warning("Ignoring corrupted checkpoint %s.", path)
+    return None
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+def _list_dir(path):
+    """Yields the names and lstat results of the entries of a directory."""
+    if hasattr(os, 'scandir'):
+        for entry in os.scandir(path):
+            yield entry.name, entry.stat(follow_symlinks=False)
+    else:
+        for name in os.listdir(path):
+            yield name, os.lstat(os.path.join(path, name))
+
+
+def _merge_manifests(manifest, other):
+    """Pairs up the entries of two sorted manifests by path."""
+    entries = manifest.entries()
+    other_entries = other.entries()
+    entry = next(entries, None)
+    other_entry = next(other_entries, None)
+    while entry is not None or other_entry is not None:
+        if other_entry is None or (
+                entry is not None and entry.path < other_entry.path):
+            yield entry, None
+            entry = next(entries, None)
+        elif entry is None or other_entry.path < entry.path:
+            yield None, other_entry
+            other_entry = next(other_entries, None)
+        else:
+            yield entry, other_entry
+            entry = next(entries, None)
+            other_entry = next(other_entries, None)
+
+
+def _escape_find_pattern(name):
+    return re.sub(r'([\\*?\[\]])', r'\\\1', name)
+
+
+def _copy_item(src_item, dest_item, hash_algorithm=None):
+    """Copies a file or symlink along with its ownership and attributes.
+
+    When a hash algorithm is given, returns the hex digest of the contents
+    of a regular file as they were read from the source.
+    """
+    src_stat = os.lstat(src_item)
+    if stat.S_ISLNK(src_stat.st_mode):
+        if os.path.lexists(dest_item):
+            os.unlink(dest_item)
+        os.symlink(os.readlink(src_item), dest_item)
+        os.lchown(dest_item, src_stat.st_uid, src_stat.st_gid)
+        return None
+    if not stat.S_ISREG(src_stat.st_mode):
+        utils.execute("cp", "-P", "--preserve=all", src_item,
+                      dest_item, run_as_root=True)
+        return None
+
+    digest = None
+    with open(src_item, 'rb') as src_file:
+        with open(dest_item, 'wb') as dest_file:
+            if hash_algorithm:
+                digest = _copy_file_contents_hashed(
+                    src_file.fileno(), dest_file.fileno(),
+                    hashlib.new(hash_algorithm))
+            else:
+                _copy_file_contents(src_file.fileno(), dest_file.fileno())
+    # NOTE: Ownership goes first, as changing it clears setuid bits.
+    os.chown(dest_item, src_stat.st_uid, src_stat.st_gid)
+    _copy_stat(src_item, dest_item, src_stat)
+    return digest
+
+
+def _update_item(src_item, dest_item, hash_algorithm=None):
+    """Rewrites only the blocks of a file that differ from its source."""
+    src_stat = os.lstat(src_item)
+    try:
+        dest_stat = os.lstat(dest_item)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        dest_stat = None
+    if (dest_stat is None or not stat.S_ISREG(src_stat.st_mode) or
+            not stat.S_ISREG(dest_stat.st_mode)):
+        return _copy_item(src_item, dest_item, hash_algorithm)
+
+    hasher = hashlib.new(hash_algorithm) if hash_algorithm else None
+    with open(src_item, 'rb') as src_file:
+        with open(dest_item, 'r+b') as dest_file:
+            offset = 0
+            while True:
+                block = src_file.read(COPY_CHUNK_SIZE)
+                if not block:
+                    break
+                if hasher is not None:
+                    hasher.update(block)
+                if dest_file.read(len(block)) != block:
+                    dest_file.seek(offset)
+                    dest_file.write(block)
+                offset += len(block)
+            dest_file.truncate(offset)
+    os.chown(dest_item, src_stat.st_uid, src_stat.st_gid)
+    _copy_stat(src_item, dest_item, src_stat)
+    return hasher.hexdigest() if hasher is not None else None
+
+
+def _copy_stat(src_item, dest_item, src_stat):
+    """Copies the attributes of a file, with times from before its copy.
+
+    A source written to while it is copied gets a later modification time
+    than its copy, so that the next incremental copy does not skip it.
+    """
+    shutil.copystat(src_item, dest_item)
+    if hasattr(src_stat, 'st_mtime_ns'):
+        os.utime(dest_item,
+                 ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+    else:
+        os.utime(dest_item, (src_stat.st_atime, src_stat.st_mtime))
+
+
+def _copy_file_range(src_fd, dest_fd, offset):
+    return os.copy_file_range(src_fd, dest_fd, COPY_CHUNK_SIZE,
+                              offset, offset)
+
+
+def _sendfile(src_fd, dest_fd, offset):
+    return os.sendfile(dest_fd, src_fd, offset, COPY_CHUNK_SIZE)
+
+
+def _read_write(src_fd, dest_fd, offset):
+    data = os.read(src_fd, COPY_CHUNK_SIZE)
+    _write_all(dest_fd, data)
+    return len(data)
+
+
+def _write_all(fd, data):
+    # NOTE: os.write may write only part of the buffer.
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _copy_file_contents(src_fd, dest_fd):
+    """Copies a file within the kernel where the platform allows it."""
+    methods = [_read_write]
+    if hasattr(os, 'sendfile'):
+        methods.insert(0, _sendfile)
+    if hasattr(os, 'copy_file_range'):
+        methods.insert(0, _copy_file_range)
+
+    offset = 0
+    while True:
+        try:
+            copied = methods[0](src_fd, dest_fd, offset)
+        except OSError as e:
+            # Not every file system supports copies within the kernel,
+            # fall back to the next method if nothing was copied yet.
+            if offset or len(methods) == 1 or e.errno not in (
+                    errno.EXDEV, errno.ENOSYS, errno.EINVAL,
+                    errno.EOPNOTSUPP):
+                raise
+            methods.pop(0)
+            continue
+        if not copied:
+            return
+        offset += copied
+
+
+def _copy_file_contents_hashed(src_fd, dest_fd, hasher):
+    """Copies a file through a buffer that is hashed on its way.
+
+    Copies within the kernel never expose the data, so they cannot be used
+    when the contents must be hashed.
+    """
+    while True:
+        data = os.read(src_fd, COPY_CHUNK_SIZE)
+        if not data:
+            return hasher.hexdigest()
+        hasher.update(data)
+        _write_all(dest_fd, data)
+
+
+def _validate_dest_item(dest_item, digest, hash_algorithm):
+    """Checks what was written against the digest of the source."""
+    hasher = hashlib.new(hash_algorithm)
+    with open(dest_item, 'rb') as dest_file:
+        if hasattr(os, 'posix_fadvise'):
+            # Read the file back from the storage rather than from the
+            # page cache, which still holds the data that was written.
+            os.fsync(dest_file.fileno())
+            os.posix_fadvise(dest_file.fileno(), 0, 0,
+                             os.POSIX_FADV_DONTNEED)
+        while True:
+            data = dest_file.read(COPY_CHUNK_SIZE)
+            if not data:
+                break
+            hasher.update(data)
+    if hasher.hexdigest() != digest:
+        msg = _("Data corrupted while copying. Aborting data copy.")
+        raise exception.ShareDataCopyFailed(reason=msg)
+
+
+def _validate_item(src_item, dest_item, hash_algorithm='sha256'):
+    sums, err = utils.execute(
+        HASH_COMMANDS[hash_algorithm], src_item, dest_item, run_as_root=True)
+    src_sum, dest_sum = [line.split()[0] for line in sums.splitlines()[:2]]
+    if src_sum != dest_sum:
         msg = _("Data corrupted while copying. Aborting data copy.")
         raise exception.ShareDataCopyFailed(reason=msg)
@@ -336,10 +336,17 @@ def share_instances_get_all_by_share_server(context, share_server_id):
                                                         share_server_id)
 
 
-def share_instances_get_all_by_host(context, host, with_share_data=False):
+def share_instances_get_all_by_host(context, host, with_share_data=False,
+                                    limit=None, marker=None):
     """Returns all share instances with given host."""
     return IMPL.share_instances_get_all_by_host(
-        context, host, with_share_data=with_share_data)
+        context, host, with_share_data=with_share_data, limit=limit,
+        marker=marker)
+
+
+def share_instance_sizes_sum_by_host(context, host=None):
+    """Returns a dict of summed share sizes keyed by share instance host."""
+    return IMPL.share_instance_sizes_sum_by_host(context, host=host)
 
 
 def share_instances_get_all_by_share_network(context, share_network_id):
@@ -377,19 +384,23 @@ def share_get(context, share_id):
     return IMPL.share_get(context, share_id)
 
 
-def share_get_all(context, filters=None, sort_key=None, sort_dir=None):
+def share_get_all(context, filters=None, sort_key=None, sort_dir=None,
+                  limit=None, offset=None, marker=None):
     """Get all shares."""
     return IMPL.share_get_all(
         context, filters=filters, sort_key=sort_key, sort_dir=sort_dir,
+        limit=limit, offset=offset, marker=marker,
     )
 
 
 def share_get_all_by_project(context, project_id, filters=None,
-                             is_public=False, sort_key=None, sort_dir=None):
+                             is_public=False, sort_key=None, sort_dir=None,
+                             limit=None, offset=None, marker=None):
     """Returns all shares with given project ID."""
     return IMPL.share_get_all_by_project(
         context, project_id, filters=filters, is_public=is_public,
-        sort_key=sort_key, sort_dir=sort_dir,
+        sort_key=sort_key, sort_dir=sort_dir, limit=limit, offset=offset,
+        marker=marker,
     )
 
 
@@ -403,11 +414,12 @@ def share_get_all_by_share_group_id(context, share_group_id,
 
 
 def share_get_all_by_share_server(context, share_server_id, filters=None,
-                                  sort_key=None, sort_dir=None):
+                                  sort_key=None, sort_dir=None, limit=None,
+                                  offset=None, marker=None):
     """Returns all shares with given share server ID."""
     return IMPL.share_get_all_by_share_server(
         context, share_server_id, filters=filters, sort_key=sort_key,
-        sort_dir=sort_dir,
+        sort_dir=sort_dir, limit=limit, offset=offset, marker=marker,
     )
 
 
@@ -485,6 +497,14 @@ def share_instance_access_update(context, access_id, instance_id, updates):
         context, access_id, instance_id, updates)
 
 
+def share_instance_access_update_all(context, instance_id, access_ids,
+                                     updates=None, conditionally_change=None):
+    """Update the access mapping rows of a share instance in bulk."""
+    return IMPL.share_instance_access_update_all(
+        context, instance_id, access_ids, updates=updates,
+        conditionally_change=conditionally_change)
+
+
 def share_instance_access_delete(context, mapping_id):
     """Deny access to share instance."""
     return IMPL.share_instance_access_delete(context, mapping_id)
@@ -538,19 +558,22 @@ def share_snapshot_get(context, snapshot_id):
 
 
 def share_snapshot_get_all(context, filters=None, sort_key=None,
-                           sort_dir=None):
+                           sort_dir=None, limit=None, offset=None,
+                           marker=None):
     """Get all snapshots."""
     return IMPL.share_snapshot_get_all(
         context, filters=filters, sort_key=sort_key, sort_dir=sort_dir,
+        limit=limit, offset=offset, marker=marker,
     )
 
 
 def share_snapshot_get_all_by_project(context, project_id, filters=None,
-                                      sort_key=None, sort_dir=None):
+                                      sort_key=None, sort_dir=None,
+                                      limit=None, offset=None, marker=None):
     """Get all snapshots belonging to a project."""
     return IMPL.share_snapshot_get_all_by_project(
         context, project_id, filters=filters, sort_key=sort_key,
-        sort_dir=sort_dir,
+        sort_dir=sort_dir, limit=limit, offset=offset, marker=marker,
     )
 
 
@@ -594,6 +617,13 @@ def share_snapshot_access_get_all_for_snapshot_instance(
         context, snapshot_instance_id, session)
 
 
+def share_snapshot_access_get_all_for_snapshot_instances(
+        context, snapshot_instance_ids, filters=None):
+    """Get the access rule mappings of many snapshot instances."""
+    return IMPL.share_snapshot_access_get_all_for_snapshot_instances(
+        context, snapshot_instance_ids, filters=filters)
+
+
 def share_snapshot_access_get_all_for_share_snapshot(context,
                                                      share_snapshot_id,
                                                      filters):
@@ -789,14 +819,17 @@ def share_network_get(context, id):
     return IMPL.share_network_get(context, id)
 
 
-def share_network_get_all(context):
+def share_network_get_all(context, limit=None, offset=None, marker=None):
     """Get all share network DB records."""
-    return IMPL.share_network_get_all(context)
+    return IMPL.share_network_get_all(
+        context, limit=limit, offset=offset, marker=marker)
 
 
-def share_network_get_all_by_project(context, project_id):
+def share_network_get_all_by_project(context, project_id, limit=None,
+                                     offset=None, marker=None):
     """Get all share network DB records for the given project."""
-    return IMPL.share_network_get_all_by_project(context, project_id)
+    return IMPL.share_network_get_all_by_project(
+        context, project_id, limit=limit, offset=offset, marker=marker)
 
 
 def share_network_get_all_by_security_service(context, security_service_id):
@@ -1037,11 +1070,11 @@ def share_group_get(context, share_group_id):
 
 
 def share_group_get_all(context, detailed=True, filters=None, sort_key=None,
-                        sort_dir=None):
+                        sort_dir=None, limit=None, offset=None, marker=None):
     """Get all share groups."""
     return IMPL.share_group_get_all(
         context, detailed=detailed, filters=filters, sort_key=sort_key,
-        sort_dir=sort_dir)
+        sort_dir=sort_dir, limit=limit, offset=offset, marker=marker)
 
 
 def share_group_get_all_by_host(context, host, detailed=True, filters=None,
@@ -1068,11 +1101,13 @@ def share_group_get_all_by_share_server(context, share_server_id,
 
 def share_group_get_all_by_project(context, project_id, detailed=True,
                                    filters=None, sort_key=None,
-                                   sort_dir=None):
+                                   sort_dir=None, limit=None, offset=None,
+                                   marker=None):
     """Get all share groups belonging to a project."""
     return IMPL.share_group_get_all_by_project(
         context, project_id, detailed=detailed, filters=filters,
-        sort_key=sort_key, sort_dir=sort_dir)
+        sort_key=sort_key, sort_dir=sort_dir, limit=limit, offset=offset,
+        marker=marker)
 
 
 def share_group_update(context, share_group_id, values):
@@ -1222,12 +1257,17 @@ def share_replica_delete(context, share_replica_id):
     return IMPL.share_replica_delete(context, share_replica_id)
 
 
-def purge_deleted_records(context, age_in_days):
+def purge_deleted_records(context, age_in_days, batch_size=1000,
+                          sleep_interval=0, dry_run=False):
     """Purge deleted rows older than given age from all tables
 
-    :raises: InvalidParameterValue if age_in_days is incorrect.
+    :returns: dict with the number of purged rows per table name.
+    :raises: InvalidParameterValue if age_in_days or batch_size is incorrect.
     """
-    return IMPL.purge_deleted_records(context, age_in_days=age_in_days)
+    return IMPL.purge_deleted_records(context, age_in_days=age_in_days,
+                                      batch_size=batch_size,
+                                      sleep_interval=sleep_interval,
+                                      dry_run=dry_run)
 
 
 ####################
@@ -1323,10 +1363,12 @@ def message_get(context, message_id):
     return IMPL.message_get(context, message_id)
 
 
-def message_get_all(context, filters=None, sort_key=None, sort_dir=None):
+def message_get_all(context, filters=None, sort_key=None, sort_dir=None,
+                    limit=None, offset=None, marker=None):
     """Returns all messages with the project of the specified context."""
     return IMPL.message_get_all(context, filters=filters, sort_key=sort_key,
-                                sort_dir=sort_dir)
+                                sort_dir=sort_dir, limit=limit, offset=offset,
+                                marker=marker)
 
 
 def message_create(context, values):
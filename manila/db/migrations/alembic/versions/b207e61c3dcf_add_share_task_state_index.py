@@ -0,0 +1,36 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""add_share_task_state_index
+
+Revision ID: b207e61c3dcf
+Revises: cb94f965a893
+Create Date: 2018-06-11 09:27:51.640215
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'b207e61c3dcf'
+down_revision = 'cb94f965a893'
+
+from alembic import op
+
+
+INDEX_NAME = 'shares_deleted_task_state_idx'
+
+
+def upgrade():
+    op.create_index(INDEX_NAME, 'shares', ['deleted', 'task_state'])
+
+
+def downgrade():
+    op.drop_index(INDEX_NAME, 'shares')
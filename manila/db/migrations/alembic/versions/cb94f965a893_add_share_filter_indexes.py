@@ -0,0 +1,46 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""add_share_filter_indexes
+
+Revision ID: cb94f965a893
+Revises: 0274d20c560f
+Create Date: 2018-06-04 11:42:09.518236
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'cb94f965a893'
+down_revision = '0274d20c560f'
+
+from alembic import op
+
+
+INDEXES = (
+    ('shares_deleted_display_name_idx', 'shares',
+     ['deleted', 'display_name']),
+    ('shares_snapshot_id_idx', 'shares', ['snapshot_id']),
+    ('share_instances_deleted_status_idx', 'share_instances',
+     ['deleted', 'status']),
+    ('share_instances_deleted_host_idx', 'share_instances',
+     ['deleted', 'host']),
+)
+
+
+def upgrade():
+    for index_name, table_name, columns in INDEXES:
+        op.create_index(index_name, table_name, columns)
+
+
+def downgrade():
+    for index_name, table_name, columns in INDEXES:
+        op.drop_index(index_name, table_name)
@@ -22,7 +22,9 @@ import copy
 import datetime
 from functools import wraps
 import ipaddress
+import operator
 import sys
+import time
 import warnings
 
 # NOTE(uglide): Required to override default oslo_db Query class
@@ -40,9 +42,13 @@ from oslo_utils import excutils
 from oslo_utils import timeutils
 from oslo_utils import uuidutils
 import six
-from sqlalchemy import MetaData
+from sqlalchemy import and_
 from sqlalchemy import or_
+from sqlalchemy import sql
+from sqlalchemy.orm import aliased
 from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import lazyload
+from sqlalchemy.orm import session as orm_session
 from sqlalchemy.sql.expression import true
 from sqlalchemy.sql import func
 
@@ -60,6 +66,10 @@ QUOTAS = quota.QUOTAS
 _DEFAULT_QUOTA_NAME = 'default'
 PER_PROJECT_QUOTAS = []
 
+# NOTE: Maximum number of values bound to a single 'IN' clause, to stay
+# within the limits of the database backends.
+_IN_FILTER_CHUNK_SIZE = 500
+
 _FACADE = None
 
 _DEFAULT_SQL_CONNECTION = 'sqlite://'
@@ -169,6 +179,42 @@ def require_context(f):
     return wrapper
 
 
+def request_cached(f):
+    """Decorator caching DB reads for the API request of the context.
+
+    The result is cached in the 'db_cache' of the context, if the context has
+    one, by the arguments of the call. Calls bound to a DB session are not
+    cached.
+    """
+    @wraps(f)
+    def wrapper(context, *args, **kwargs):
+        cache = getattr(context, 'db_cache', None)
+        if (cache is None or kwargs.get('session') is not None or
+                any(isinstance(arg, orm_session.Session) for arg in args)):
+            return f(context, *args, **kwargs)
+        key = (f.__name__, context.project_id, context.is_admin,
+               context.read_deleted, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return f(context, *args, **kwargs)
+        return cache.get_or_load(key, lambda: f(context, *args, **kwargs))
+    return wrapper
+
+
+def invalidates_request_cache(f):
+    """Decorator emptying the DB read cache of the context after a write."""
+    @wraps(f)
+    def wrapper(context, *args, **kwargs):
+        try:
+            return f(context, *args, **kwargs)
+        finally:
+            cache = getattr(context, 'db_cache', None)
+            if cache is not None:
+                cache.clear()
+    return wrapper
+
+
 def require_share_exists(f):
     """Decorator to require the specified share to exist.
 
@@ -209,6 +255,71 @@ def apply_sorting(model, query, sort_key, sort_dir):
     return query.order_by(sort_method())
 
 
+def paginate_query(query, sort_attr, id_attr, sort_dir, limit=None,
+                   offset=None, marker_values=None):
+    """Sorts a query and applies pagination to it.
+
+    Rows are sorted by ``sort_attr``, with the rows where it is not set
+    placed last, and then by ``id_attr`` so that the order is deterministic
+    across pages.
+
+    :param query: query to sort and paginate
+    :param sort_attr: model attribute to sort rows by
+    :param id_attr: unique model attribute used to break ties
+    :param sort_dir: desired direction of sorting, can be 'asc' and 'desc'
+    :param limit: maximum number of rows to return
+    :param offset: number of rows to skip
+    :param marker_values: tuple with the values of ``sort_attr`` and
+        ``id_attr`` of the last row of the previous page. If present, only
+        the rows following that row are selected, using a condition on
+        ``(sort_attr, id_attr)`` rather than skipping rows.
+    :returns: query -- sorted and paginated query
+    :raises: exception.InvalidInput
+    """
+    if sort_dir.lower() not in ('desc', 'asc'):
+        msg = _("Wrong sorting direction provided - '%s'.") % sort_dir
+        raise exception.InvalidInput(reason=msg)
+    sort_dir = sort_dir.lower()
+
+    sort_attr_is_null = sort_attr.is_(None)
+    query = query.order_by(sort_attr_is_null,
+                           getattr(sort_attr, sort_dir)(),
+                           getattr(id_attr, sort_dir)())
+
+    if marker_values is not None:
+        sort_value, id_value = marker_values
+        follows = operator.lt if sort_dir == 'desc' else operator.gt
+        if sort_value is None:
+            query = query.filter(
+                and_(sort_attr_is_null, follows(id_attr, id_value)))
+        else:
+            query = query.filter(
+                or_(sort_attr_is_null,
+                    follows(sort_attr, sort_value),
+                    and_(sort_attr == sort_value,
+                         follows(id_attr, id_value))))
+
+    if offset:
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def _get_sort_attr(sort_key, *models_to_sort):
+    """Returns attribute of the first model that can be sorted by key."""
+    for model in models_to_sort:
+        sort_attr = getattr(model, sort_key, None)
+        if hasattr(sort_attr, 'desc'):
+            return sort_attr
+    msg = _("Wrong sorting key provided - '%s'.") % sort_key
+    raise exception.InvalidInput(reason=msg)
+
+
+def _is_paginated(limit=None, offset=None, marker=None):
+    return limit is not None or bool(offset) or marker is not None
+
+
 def model_query(context, model, *args, **kwargs):
     """Query helper that accounts for context's `read_deleted` field.
 
@@ -842,38 +953,48 @@ def _reservation_create(context, uuid, usage, project_id, user_id, resource,
 # cause under or over counting of resources. To avoid deadlocks, this
 # code always acquires the lock on quota_usages before acquiring the lock
 # on reservations.
+# NOTE: Only the usages of the reserved resources are locked, in the order
+# of their IDs, so that concurrent reservations of a project lock the rows
+# they share in the same order.
+
+def _lock_quota_usages(query, resources):
+    if resources is not None:
+        query = query.filter(models.QuotaUsage.resource.in_(resources))
+    return query.order_by(models.QuotaUsage.id).with_lockmode('update').all()
 
-def _get_share_type_quota_usages(context, session, project_id, share_type_id):
-    rows = model_query(
+
+def _get_share_type_quota_usages(context, session, project_id, share_type_id,
+                                 resources=None):
+    query = model_query(
         context, models.QuotaUsage, read_deleted="no", session=session,
     ).filter(
         models.QuotaUsage.project_id == project_id,
         models.QuotaUsage.share_type_id == share_type_id,
-    ).with_lockmode('update').all()
+    )
+    rows = _lock_quota_usages(query, resources)
     return {row.resource: row for row in rows}
 
 
-def _get_user_quota_usages(context, session, project_id, user_id):
+def _get_user_quota_usages(context, session, project_id, user_id,
+                           resources=None):
     # Broken out for testability
-    rows = (model_query(context, models.QuotaUsage,
-                        read_deleted="no",
-                        session=session).
-            filter_by(project_id=project_id).
-            filter(or_(models.QuotaUsage.user_id == user_id,
-                       models.QuotaUsage.user_id is None)).
-            with_lockmode('update').
-            all())
+    query = (model_query(context, models.QuotaUsage,
+                         read_deleted="no",
+                         session=session).
+             filter_by(project_id=project_id).
+             filter(or_(models.QuotaUsage.user_id == user_id,
+                        models.QuotaUsage.user_id is None)))
+    rows = _lock_quota_usages(query, resources)
     return {row.resource: row for row in rows}
 
 
-def _get_project_quota_usages(context, session, project_id):
-    rows = (model_query(context, models.QuotaUsage,
-                        read_deleted="no",
-                        session=session).
-            filter_by(project_id=project_id).
-            filter(models.QuotaUsage.share_type_id is None).
-            with_lockmode('update').
-            all())
+def _get_project_quota_usages(context, session, project_id, resources=None):
+    query = (model_query(context, models.QuotaUsage,
+                         read_deleted="no",
+                         session=session).
+             filter_by(project_id=project_id).
+             filter(models.QuotaUsage.share_type_id is None))
+    rows = _lock_quota_usages(query, resources)
     result = dict()
     # Get the total count of in_use,reserved
     for row in rows:
@@ -921,17 +1042,20 @@ def _quota_reserve(context, resources, project_quotas, user_or_st_quotas,
 
         if project_id is None:
             project_id = context.project_id
+        reserved_resources = sorted(deltas)
         if share_type_id:
             user_or_st_usages = _get_share_type_quota_usages(
-                context, session, project_id, share_type_id)
+                context, session, project_id, share_type_id,
+                resources=reserved_resources)
         else:
             user_id = user_id if user_id else context.user_id
             user_or_st_usages = _get_user_quota_usages(
-                context, session, project_id, user_id)
+                context, session, project_id, user_id,
+                resources=reserved_resources)
 
         # Get the current usages
         project_usages = _get_project_quota_usages(
-            context, session, project_id)
+            context, session, project_id, resources=reserved_resources)
 
         # Handle usage refresh
         work = set(deltas.keys())
@@ -985,6 +1109,11 @@ def _quota_reserve(context, resources, project_quotas, user_or_st_quotas,
                     elevated, project_id, user_id,
                     share_type_id=share_type_id, session=session)
                 for res, in_use in updates.items():
+                    # NOTE: The usages of resources that are not reserved
+                    # are not locked, they are refreshed when reserved.
+                    if res not in deltas:
+                        continue
+
                     # Make sure we have a destination for the usage!
                     if ((res not in PER_PROJECT_QUOTAS) and
                             (res not in user_or_st_usages)):
@@ -1340,6 +1469,7 @@ def _share_instance_create(context, share_id, values, session):
 
 
 @require_context
+@invalidates_request_cache
 def share_instance_update(context, share_instance_id, values,
                           with_share_data=False):
     session = get_session()
@@ -1364,6 +1494,7 @@ def _share_instance_update(context, share_instance_id, values, session):
 
 
 @require_context
+@request_cached
 def share_instance_get(context, share_instance_id, session=None,
                        with_share_data=False):
     if session is None:
@@ -1419,6 +1550,7 @@ def share_instances_get_all(context, filters=None):
 
 
 @require_context
+@invalidates_request_cache
 def share_instance_delete(context, instance_id, session=None,
                           need_to_update_usages=False):
     if session is None:
@@ -1466,12 +1598,13 @@ def _set_instances_share_data(context, instances, session):
     if instances and not isinstance(instances, list):
         instances = [instances]
 
+    parent_shares = _share_get_all_by_ids(
+        context, [instance['share_id'] for instance in instances], session)
+
     instances_with_share_data = []
     for instance in instances:
-        try:
-            parent_share = share_get(context, instance['share_id'],
-                                     session=session)
-        except exception.NotFound:
+        parent_share = parent_shares.get(instance['share_id'])
+        if parent_share is None:
             continue
         instance.set_share_data(parent_share)
         instances_with_share_data.append(instance)
@@ -1480,23 +1613,65 @@ def _set_instances_share_data(context, instances, session):
 
 @require_admin_context
 def share_instances_get_all_by_host(context, host, with_share_data=False,
-                                    session=None):
-    """Retrieves all share instances hosted on a host."""
+                                    session=None, limit=None, marker=None):
+    """Retrieves all share instances hosted on a host.
+
+    :param limit: if present, at most this many share instances are
+        returned, sorted by ID.
+    :param marker: if present, only share instances with an ID greater
+        than this one are returned.
+    """
     session = session or get_session()
-    instances = (
-        model_query(context, models.ShareInstance).filter(
-            or_(
-                models.ShareInstance.host == host,
-                models.ShareInstance.host.like("{0}#%".format(host))
-            )
-        ).all()
+    query = model_query(
+        context, models.ShareInstance, session=session).filter(
+        or_(
+            models.ShareInstance.host == host,
+            models.ShareInstance.host.like("{0}#%".format(host))
+        )
+    ).options(
+        joinedload('export_locations'),
+        joinedload('share_type'),
     )
+    if marker is not None:
+        query = query.filter(models.ShareInstance.id > marker)
+    if limit is not None:
+        query = query.order_by(models.ShareInstance.id).limit(limit)
+    instances = query.all()
 
     if with_share_data:
         instances = _set_instances_share_data(context, instances, session)
     return instances
 
 
+@require_admin_context
+def share_instance_sizes_sum_by_host(context, host=None, session=None):
+    """Sums sizes of the shares hosted on each share instance host.
+
+    :param host: if present, only instances hosted on this host (or on any
+        of its pools) are accounted for.
+    :returns: dict -- {<share instance host>: <total size in GB>}
+    """
+    session = session or get_session()
+    query = model_query(
+        context, models.ShareInstance, models.ShareInstance.host,
+        func.sum(models.Share.size), session=session, read_deleted="no",
+    ).join(
+        models.Share, models.Share.id == models.ShareInstance.share_id,
+    ).filter(
+        models.Share.deleted == 'False',
+    )
+    if host:
+        query = query.filter(
+            or_(
+                models.ShareInstance.host == host,
+                models.ShareInstance.host.like("{0}#%".format(host))
+            )
+        )
+    query = query.group_by(models.ShareInstance.host)
+
+    return {row[0]: int(row[1] or 0) for row in query.all()}
+
+
 @require_context
 def share_instances_get_all_by_share_network(context, share_network_id):
     """Returns list of share instances that belong to given share network."""
@@ -1574,6 +1749,11 @@ def _share_replica_get_with_filters(context, share_id=None, replica_id=None,
     if with_share_server:
         query = query.options(joinedload('share_server'))
 
+    query = query.options(
+        joinedload('export_locations'),
+        joinedload('share_type'),
+    )
+
     return query
 
 
@@ -1581,8 +1761,13 @@ def _set_replica_share_data(context, replicas, session):
     if replicas and not isinstance(replicas, list):
         replicas = [replicas]
 
+    parent_shares = _share_get_all_by_ids(
+        context, [replica['share_id'] for replica in replicas], session)
+
     for replica in replicas:
-        parent_share = share_get(context, replica['share_id'], session=session)
+        parent_share = parent_shares.get(replica['share_id'])
+        if parent_share is None:
+            raise exception.NotFound()
         replica.set_share_data(parent_share)
 
     return replicas
@@ -1660,6 +1845,7 @@ def share_replica_get(context, replica_id, with_share_data=False,
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
+@invalidates_request_cache
 def share_replica_update(context, share_replica_id, values,
                          with_share_data=False, session=None):
     """Updates a share replica with specified values."""
@@ -1679,6 +1865,7 @@ def share_replica_update(context, share_replica_id, values,
 
 
 @require_context
+@invalidates_request_cache
 def share_replica_delete(context, share_replica_id, session=None):
     """Deletes a share replica."""
     session = session or get_session()
@@ -1753,6 +1940,7 @@ def share_data_get_for_project(context, project_id, user_id,
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
+@invalidates_request_cache
 def share_update(context, share_id, update_values):
     session = get_session()
     values = copy.deepcopy(update_values)
@@ -1774,6 +1962,7 @@ def share_update(context, share_id, update_values):
 
 
 @require_context
+@request_cached
 def share_get(context, share_id, session=None):
     result = _share_get_query(context, session).filter_by(id=share_id).first()
 
@@ -1783,10 +1972,154 @@ def share_get(context, share_id, session=None):
     return result
 
 
+def _share_get_all_by_ids(context, share_ids, session=None):
+    """Loads shares with given IDs using a bounded number of queries.
+
+    Share instances of the loaded shares are not eagerly loaded, as these
+    shares are only used to provide parent share data to share instances.
+
+    :returns: dict -- {<share id>: models.Share}
+    """
+    session = session or get_session()
+    share_ids = list(set(share_ids))
+    shares = {}
+    for i in range(0, len(share_ids), _IN_FILTER_CHUNK_SIZE):
+        query = _share_get_query(context, session).options(
+            lazyload('instances'),
+        ).filter(
+            models.Share.id.in_(share_ids[i:i + _IN_FILTER_CHUNK_SIZE]),
+        )
+        shares.update((share['id'], share) for share in query.all())
+    return shares
+
+
+# Share search options that are applied as exact matches on share columns.
+_SHARE_EXACT_FILTERS = {
+    'display_name': models.Share.display_name,
+    'display_description': models.Share.display_description,
+    'snapshot_id': models.Share.snapshot_id,
+    'share_group_id': models.Share.share_group_id,
+    'project_id': models.Share.project_id,
+    'user_id': models.Share.user_id,
+    'share_proto': models.Share.share_proto,
+    'task_state': models.Share.task_state,
+    'source_share_group_snapshot_member_id':
+        models.Share.source_share_group_snapshot_member_id,
+}
+
+# Share search options that are applied as exact matches on columns of the
+# primary instance of shares, which shares read these properties from.
+_SHARE_PRIMARY_INSTANCE_FILTERS = (
+    'status', 'host', 'share_type_id', 'share_network_id',
+)
+
+# Share search options, ending with '~', that are applied as inexact matches
+# on share columns.
+_SHARE_INEXACT_FILTERS = {
+    'display_name~': models.Share.display_name,
+    'display_description~': models.Share.display_description,
+}
+
+
+def _escape_like(value):
+    return (value.replace('\\', '\\\\').replace('%', '\\%')
+            .replace('_', '\\_'))
+
+
+def _status_rank(status):
+    group, index = models.INSTANCE_STATUS_RANKS.get(status, (1, 0))
+    return group * 100 + index
+
+
+def _share_instance_rank(instance):
+    """Returns the rank of the status of a share instance, as SQL.
+
+    Lower ranks are preferred when the primary instance of a share is
+    selected, as in models.Share.instance. Statuses that are not ranked
+    there rank equally, between the preferred and transitional ones.
+    """
+    whens = [(instance.status == status, _status_rank(status))
+             for status in models.INSTANCE_STATUS_RANKS]
+    return sql.case(whens, else_=_status_rank(None))
+
+
+def _share_primary_instance_filter(instance):
+    """Returns a SQL condition met by the primary instance of its share.
+
+    Same as models.Share.instance, the primary instance is the instance
+    with the best ranked status, unless that status is not
+    'replication_change' and the share has 'active' replicas, in which case
+    it is the 'active' replica with the best ranked status. Instances with
+    equally ranked statuses are told apart by their IDs.
+    """
+    other = aliased(models.ShareInstance)
+    rank = _share_instance_rank(instance)
+    other_rank = _share_instance_rank(other)
+
+    def _other_instances(*criteria):
+        return sql.exists().where(and_(
+            other.share_id == instance.share_id,
+            other.deleted == 'False',
+            *criteria))
+
+    better = or_(other_rank < rank,
+                 and_(other_rank == rank, other.id < instance.id))
+    active = other.replica_state == constants.REPLICA_STATE_ACTIVE
+    replication_change_first = and_(
+        _other_instances(
+            other.status == constants.STATUS_REPLICATION_CHANGE),
+        ~_other_instances(
+            other_rank < _status_rank(constants.STATUS_REPLICATION_CHANGE)))
+    return or_(
+        and_(~_other_instances(better),
+             or_(replication_change_first, ~_other_instances(active))),
+        and_(instance.replica_state == constants.REPLICA_STATE_ACTIVE,
+             ~_other_instances(active, better),
+             ~replication_change_first))
+
+
+def _share_access_rules_status_filter(access_rules_status):
+    """Returns a SQL condition on the access rules status of shares.
+
+    Same as models.Share.access_rules_status, the access rules status of a
+    share is the one of highest priority among its available instances, or
+    'active' if none of them has another one.
+    """
+    priorities = models.ShareInstance.ACCESS_STATUS_PRIORITIES
+    if access_rules_status not in priorities:
+        return sql.false()
+    instance = aliased(models.ShareInstance)
+
+    def _available_instances(statuses):
+        return sql.exists().where(and_(
+            instance.share_id == models.Share.id,
+            instance.deleted == 'False',
+            instance.status == constants.STATUS_AVAILABLE,
+            instance.access_rules_status.in_(statuses)))
+
+    higher_statuses = [
+        status for status, priority in priorities.items()
+        if priority > priorities[access_rules_status]]
+    condition = true()
+    if higher_statuses:
+        condition = ~_available_instances(higher_statuses)
+    if access_rules_status != constants.STATUS_ACTIVE:
+        condition = and_(_available_instances([access_rules_status]),
+                         condition)
+    return condition
+
+
+def _match(column, value):
+    if isinstance(value, (list, tuple, set)):
+        return column.in_(value)
+    return column == value
+
+
 def _share_get_all_with_filters(context, project_id=None, share_server_id=None,
                                 share_group_id=None, filters=None,
                                 is_public=False, sort_key=None,
-                                sort_dir=None):
+                                sort_dir=None, limit=None, offset=None,
+                                marker=None):
     """Returns sorted list of shares that satisfies filters.
 
     :param context: context to query under
@@ -1797,6 +2130,9 @@ def _share_get_all_with_filters(context, project_id=None, share_server_id=None,
                       to result if True
     :param sort_key: key of models.Share to be used for sorting
     :param sort_dir: desired direction of sorting, can be 'asc' and 'desc'
+    :param limit: maximum number of shares to return
+    :param offset: number of shares to skip
+    :param marker: ID of the last share of the previous page
     :returns: list -- models.Share
     :raises: exception.InvalidInput
     """
@@ -1805,9 +2141,10 @@ def _share_get_all_with_filters(context, project_id=None, share_server_id=None,
     if not sort_dir:
         sort_dir = 'desc'
     query = (
-        _share_get_query(context).join(
+        model_query(context, models.Share).join(
             models.ShareInstance,
-            models.ShareInstance.share_id == models.Share.id
+            and_(models.ShareInstance.share_id == models.Share.id,
+                 models.ShareInstance.deleted == 'False')
         )
     )
 
@@ -1845,6 +2182,39 @@ def _share_get_all_with_filters(context, project_id=None, share_server_id=None,
                 models.ShareInstanceExportLocations.uuid ==
                 export_location_id)
 
+    for key, column in _SHARE_EXACT_FILTERS.items():
+        if key in filters:
+            query = query.filter(_match(column, filters[key]))
+    for key, column in _SHARE_INEXACT_FILTERS.items():
+        if key in filters:
+            query = query.filter(column.like(
+                '%%%s%%' % _escape_like(filters[key]), escape='\\'))
+    primary_filters = [key for key in _SHARE_PRIMARY_INSTANCE_FILTERS
+                       if key in filters]
+    if primary_filters or 'availability_zone' in filters:
+        # NOTE: Shares show the status, host, etc. of their primary
+        # instance, so they are matched against that instance only.
+        primary_instance = aliased(models.ShareInstance)
+        query = query.join(
+            primary_instance,
+            and_(primary_instance.share_id == models.Share.id,
+                 primary_instance.deleted == 'False')
+        ).filter(_share_primary_instance_filter(primary_instance))
+        for key in primary_filters:
+            query = query.filter(
+                _match(getattr(primary_instance, key), filters[key]))
+        if 'availability_zone' in filters:
+            query = query.filter(
+                primary_instance._availability_zone.has(
+                    name=filters['availability_zone']))
+    if 'access_rules_status' in filters:
+        statuses = filters['access_rules_status']
+        if not isinstance(statuses, (list, tuple, set)):
+            statuses = [statuses]
+        query = query.filter(or_(
+            *[_share_access_rules_status_filter(status)
+              for status in statuses]))
+
     if 'metadata' in filters:
         for k, v in filters['metadata'].items():
             query = query.filter(
@@ -1859,35 +2229,89 @@ def _share_get_all_with_filters(context, project_id=None, share_server_id=None,
             query = query.filter(or_(models.ShareTypeExtraSpecs.key == k,
                                      models.ShareTypeExtraSpecs.value == v))
 
-    try:
-        query = apply_sorting(models.Share, query, sort_key, sort_dir)
-    except AttributeError:
+    if _is_paginated(limit, offset, marker):
+        sort_attr = _get_sort_attr(
+            sort_key, models.Share, models.ShareInstance)
+        marker_values = None
+        if marker is not None:
+            marker_values = _share_get_marker_values(
+                context, marker, sort_attr, sort_key, sort_dir)
+        # NOTE: Shares are joined with their instances to be filtered, and
+        # a share with several instances may match more than once. Only
+        # the matching share IDs are kept from that join, so that shares
+        # are counted once towards the limit.
+        share_ids = query.with_entities(models.Share.id).subquery()
+        query = _share_get_query(context).filter(
+            models.Share.id.in_(sql.select([share_ids.c.id])))
+        if sort_attr.class_ is models.ShareInstance:
+            # Shares are sorted by the lowest value of their instances, or
+            # the highest one in descending order.
+            aggregate = func.max if sort_dir.lower() == 'desc' else func.min
+            sort_values = sql.select([
+                models.ShareInstance.share_id,
+                aggregate(sort_attr).label('sort_value'),
+            ]).where(
+                models.ShareInstance.deleted == 'False'
+            ).group_by(models.ShareInstance.share_id).alias()
+            query = query.join(
+                sort_values, sort_values.c.share_id == models.Share.id)
+            sort_attr = sort_values.c.sort_value
+        query = paginate_query(
+            query, sort_attr, models.Share.id, sort_dir,
+            limit=limit, offset=offset, marker_values=marker_values)
+    else:
+        query = query.options(joinedload('share_metadata'))
         try:
-            query = apply_sorting(
-                models.ShareInstance, query, sort_key, sort_dir)
+            query = apply_sorting(models.Share, query, sort_key, sort_dir)
         except AttributeError:
-            msg = _("Wrong sorting key provided - '%s'.") % sort_key
-            raise exception.InvalidInput(reason=msg)
+            try:
+                query = apply_sorting(
+                    models.ShareInstance, query, sort_key, sort_dir)
+            except AttributeError:
+                msg = _("Wrong sorting key provided - '%s'.") % sort_key
+                raise exception.InvalidInput(reason=msg)
 
     # Returns list of shares that satisfy filters.
     query = query.all()
     return query
 
 
+def _share_get_marker_values(context, marker, sort_attr, sort_key,
+                             sort_dir):
+    try:
+        marker_share = share_get(context, marker)
+    except exception.NotFound:
+        msg = _("Marker share '%s' could not be found.") % marker
+        raise exception.InvalidInput(reason=msg)
+    if sort_attr.class_ is not models.ShareInstance:
+        return getattr(marker_share, sort_key), marker_share['id']
+    values = [getattr(instance, sort_key)
+              for instance in marker_share.instances
+              if getattr(instance, sort_key) is not None]
+    if not values:
+        return None, marker_share['id']
+    aggregate = max if sort_dir.lower() == 'desc' else min
+    return aggregate(values), marker_share['id']
+
+
 @require_admin_context
-def share_get_all(context, filters=None, sort_key=None, sort_dir=None):
+def share_get_all(context, filters=None, sort_key=None, sort_dir=None,
+                  limit=None, offset=None, marker=None):
     query = _share_get_all_with_filters(
-        context, filters=filters, sort_key=sort_key, sort_dir=sort_dir)
+        context, filters=filters, sort_key=sort_key, sort_dir=sort_dir,
+        limit=limit, offset=offset, marker=marker)
     return query
 
 
 @require_context
 def share_get_all_by_project(context, project_id, filters=None,
-                             is_public=False, sort_key=None, sort_dir=None):
+                             is_public=False, sort_key=None, sort_dir=None,
+                             limit=None, offset=None, marker=None):
     """Returns list of shares with given project ID."""
     query = _share_get_all_with_filters(
         context, project_id=project_id, filters=filters, is_public=is_public,
-        sort_key=sort_key, sort_dir=sort_dir,
+        sort_key=sort_key, sort_dir=sort_dir, limit=limit, offset=offset,
+        marker=marker,
     )
     return query
 
@@ -1906,16 +2330,19 @@ def share_get_all_by_share_group_id(context, share_group_id,
 
 @require_context
 def share_get_all_by_share_server(context, share_server_id, filters=None,
-                                  sort_key=None, sort_dir=None):
+                                  sort_key=None, sort_dir=None, limit=None,
+                                  offset=None, marker=None):
     """Returns list of shares with given share server."""
     query = _share_get_all_with_filters(
         context, share_server_id=share_server_id, filters=filters,
-        sort_key=sort_key, sort_dir=sort_dir,
+        sort_key=sort_key, sort_dir=sort_dir, limit=limit, offset=offset,
+        marker=marker,
     )
     return query
 
 
 @require_context
+@invalidates_request_cache
 def share_delete(context, share_id):
     session = get_session()
 
@@ -2098,9 +2525,20 @@ def _set_instances_share_access_data(context, instance_accesses, session):
     if instance_accesses and not isinstance(instance_accesses, list):
         instance_accesses = [instance_accesses]
 
+    access_ids = list(set(a['access_id'] for a in instance_accesses))
+    share_accesses = {}
+    for i in range(0, len(access_ids), _IN_FILTER_CHUNK_SIZE):
+        query = model_query(
+            context, models.ShareAccessMapping, session=session).filter(
+            models.ShareAccessMapping.id.in_(
+                access_ids[i:i + _IN_FILTER_CHUNK_SIZE]))
+        share_accesses.update((a['id'], a) for a in query.all())
+
     for instance_access in instance_accesses:
-        share_access = share_access_get(
-            context, instance_access['access_id'], session=session)
+        try:
+            share_access = share_accesses[instance_access['access_id']]
+        except KeyError:
+            raise exception.NotFound()
         instance_access.set_share_access_data(share_access)
 
     return instance_accesses
@@ -2224,6 +2662,70 @@ def share_instance_access_update(context, access_id, instance_id, updates):
 
         return access
 
+
+@require_context
+def share_instance_access_update_all(context, instance_id, access_ids,
+                                     updates=None, conditionally_change=None):
+    """Update the access mapping rows of a share instance in bulk.
+
+    Access IDs are processed in chunks: each chunk is updated with a
+    single UPDATE statement per table and then read back. The state
+    transitions in conditionally_change (expected state: new state) are
+    applied with a CASE expression on the state of each rule, and take
+    precedence over a 'state' in updates.
+
+    :returns: list of the share instance access mappings of the given
+        access IDs, as read after the update.
+    """
+    access_ids = list(access_ids)
+    if not access_ids:
+        return []
+
+    session = get_session()
+    updates = updates or {}
+    conditionally_change = conditionally_change or {}
+    share_access_fields = ('access_type', 'access_to', 'access_key',
+                           'access_level')
+
+    share_access_map_updates, share_instance_access_map_updates = (
+        _extract_subdict_by_fields(updates, share_access_fields)
+    )
+    # NOTE: Rules without a matching transition keep their state, or get
+    # the 'state' in updates if there is one.
+    only_transitions = False
+    if conditionally_change:
+        only_transitions = not share_instance_access_map_updates
+        state = models.ShareInstanceAccessMapping.state
+        share_instance_access_map_updates['state'] = sql.case(
+            conditionally_change, value=state,
+            else_=share_instance_access_map_updates.get('state', state))
+
+    rules = []
+    with session.begin():
+        for i in range(0, len(access_ids), _IN_FILTER_CHUNK_SIZE):
+            chunk = access_ids[i:i + _IN_FILTER_CHUNK_SIZE]
+            if share_access_map_updates:
+                _share_access_get_query(context, session, {}).filter(
+                    models.ShareAccessMapping.id.in_(chunk)).update(
+                    share_access_map_updates, synchronize_session=False)
+
+            if share_instance_access_map_updates:
+                query = _share_instance_access_query(
+                    context, session, instance_id=instance_id).filter(
+                    models.ShareInstanceAccessMapping.access_id.in_(chunk))
+                if only_transitions:
+                    query = query.filter(
+                        models.ShareInstanceAccessMapping.state.in_(
+                            list(conditionally_change)))
+                query.update(share_instance_access_map_updates,
+                             synchronize_session=False)
+
+            rules.extend(share_access_get_all_for_instance(
+                context, instance_id, filters={'access_id': tuple(chunk)},
+                session=session))
+
+        return rules
+
 ###################
 
 
@@ -2245,6 +2747,7 @@ def share_snapshot_instance_create(context, snapshot_id, values, session=None):
 
 
 @require_context
+@invalidates_request_cache
 def share_snapshot_instance_update(context, instance_id, values):
     session = get_session()
     instance_ref = share_snapshot_instance_get(context, instance_id,
@@ -2261,6 +2764,7 @@ def share_snapshot_instance_update(context, instance_id, values):
 
 
 @require_context
+@invalidates_request_cache
 def share_snapshot_instance_delete(context, snapshot_instance_id,
                                    session=None):
     session = session or get_session()
@@ -2433,6 +2937,7 @@ def snapshot_data_get_for_project(context, project_id, user_id,
 
 
 @require_context
+@request_cached
 def share_snapshot_get(context, snapshot_id, session=None):
     result = (model_query(context, models.ShareSnapshot, session=session,
                           project_only=True).
@@ -2449,7 +2954,9 @@ def share_snapshot_get(context, snapshot_id, session=None):
 
 def _share_snapshot_get_all_with_filters(context, project_id=None,
                                          share_id=None, filters=None,
-                                         sort_key=None, sort_dir=None):
+                                         sort_key=None, sort_dir=None,
+                                         limit=None, offset=None,
+                                         marker=None):
     # Init data
     sort_key = sort_key or 'share_id'
     sort_dir = sort_dir or 'desc'
@@ -2464,6 +2971,8 @@ def _share_snapshot_get_all_with_filters(context, project_id=None,
     query = query.options(joinedload('instances'))
 
     # Apply filters
+    if filters.get('has_instances'):
+        query = query.filter(models.ShareSnapshot.instances.any())
     if 'usage' in filters:
         usage_filter_keys = ['any', 'used', 'unused']
         if filters['usage'] == 'any':
@@ -2487,7 +2996,20 @@ def _share_snapshot_get_all_with_filters(context, project_id=None,
     except AttributeError:
         msg = _("Wrong sorting key provided - '%s'.") % sort_key
         raise exception.InvalidInput(reason=msg)
-    if sort_dir.lower() == 'desc':
+    if _is_paginated(limit, offset, marker):
+        marker_values = None
+        if marker is not None:
+            try:
+                marker_ref = share_snapshot_get(context, marker)
+            except exception.ShareSnapshotNotFound:
+                msg = _("Marker snapshot '%s' could not be found.") % marker
+                raise exception.InvalidInput(reason=msg)
+            marker_values = (marker_ref[sort_key], marker_ref['id'])
+        sort_attr = _get_sort_attr(sort_key, models.ShareSnapshot)
+        query = paginate_query(
+            query, sort_attr, models.ShareSnapshot.id, sort_dir, limit=limit,
+            offset=offset, marker_values=marker_values)
+    elif sort_dir.lower() == 'desc':
         query = query.order_by(attr.desc())
     elif sort_dir.lower() == 'asc':
         query = query.order_by(attr.asc())
@@ -2503,19 +3025,23 @@ def _share_snapshot_get_all_with_filters(context, project_id=None,
 
 @require_admin_context
 def share_snapshot_get_all(context, filters=None, sort_key=None,
-                           sort_dir=None):
+                           sort_dir=None, limit=None, offset=None,
+                           marker=None):
     return _share_snapshot_get_all_with_filters(
         context, filters=filters, sort_key=sort_key, sort_dir=sort_dir,
+        limit=limit, offset=offset, marker=marker,
     )
 
 
 @require_context
 def share_snapshot_get_all_by_project(context, project_id, filters=None,
-                                      sort_key=None, sort_dir=None):
+                                      sort_key=None, sort_dir=None,
+                                      limit=None, offset=None, marker=None):
     authorize_project_context(context, project_id)
     return _share_snapshot_get_all_with_filters(
         context, project_id=project_id,
         filters=filters, sort_key=sort_key, sort_dir=sort_dir,
+        limit=limit, offset=offset, marker=marker,
     )
 
 
@@ -2538,6 +3064,7 @@ def share_snapshot_get_latest_for_share(context, share_id):
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
+@invalidates_request_cache
 def share_snapshot_update(context, snapshot_id, values):
     session = get_session()
     with session.begin():
@@ -2681,6 +3208,28 @@ def share_snapshot_access_get_all_for_snapshot_instance(
     return instance_accesses
 
 
+@require_context
+def share_snapshot_access_get_all_for_snapshot_instances(
+        context, snapshot_instance_ids, filters=None):
+    """Get the access rule mappings of many snapshot instances."""
+    session = get_session()
+    snapshot_instance_ids = list(snapshot_instance_ids)
+    legal_filter_keys = ('id', 'access_id', 'state')
+    instance_accesses = []
+    for i in range(0, len(snapshot_instance_ids), _IN_FILTER_CHUNK_SIZE):
+        query = _share_snapshot_instance_access_get_query(
+            context, session).filter(
+            models.ShareSnapshotInstanceAccessMapping.
+            share_snapshot_instance_id.in_(
+                snapshot_instance_ids[i:i + _IN_FILTER_CHUNK_SIZE]))
+        query = exact_filter(
+            query, models.ShareSnapshotInstanceAccessMapping,
+            copy.deepcopy(filters) if filters else {}, legal_filter_keys)
+        instance_accesses.extend(query.all())
+
+    return instance_accesses
+
+
 @require_context
 def share_snapshot_instance_access_update(
         context, access_id, instance_id, updates):
@@ -2840,6 +3389,7 @@ def share_metadata_get(context, share_id):
 
 @require_context
 @require_share_exists
+@invalidates_request_cache
 def share_metadata_delete(context, share_id, key):
     (_share_metadata_get_query(context, share_id).
         filter_by(key=key).soft_delete())
@@ -2847,6 +3397,7 @@ def share_metadata_delete(context, share_id, key):
 
 @require_context
 @require_share_exists
+@invalidates_request_cache
 def share_metadata_update(context, share_id, metadata, delete):
     return _share_metadata_update(context, share_id, metadata, delete)
 
@@ -3011,6 +3562,7 @@ def share_export_location_get_by_uuid(context, export_location_uuid,
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
+@invalidates_request_cache
 def share_export_locations_update(context, share_instance_id, export_locations,
                                   delete):
     # NOTE(u_glide):
@@ -3282,6 +3834,7 @@ def share_network_create(context, values):
 
 
 @require_context
+@invalidates_request_cache
 def share_network_delete(context, id):
     session = get_session()
     with session.begin():
@@ -3290,6 +3843,7 @@ def share_network_delete(context, id):
 
 
 @require_context
+@invalidates_request_cache
 def share_network_update(context, id, values):
     session = get_session()
     with session.begin():
@@ -3300,6 +3854,7 @@ def share_network_update(context, id, values):
 
 
 @require_context
+@request_cached
 def share_network_get(context, id, session=None):
     result = _network_get_query(context, session).filter_by(id=id).first()
     if result is None:
@@ -3307,14 +3862,38 @@ def share_network_get(context, id, session=None):
     return result
 
 
+def _share_network_paginate_query(context, query, limit=None, offset=None,
+                                  marker=None):
+    if not _is_paginated(limit, offset, marker):
+        return query
+    marker_values = None
+    if marker is not None:
+        try:
+            marker_ref = share_network_get(context, marker)
+        except exception.ShareNetworkNotFound:
+            msg = _("Marker share network '%s' could not be found.") % marker
+            raise exception.InvalidInput(reason=msg)
+        marker_values = (marker_ref['created_at'], marker_ref['id'])
+    return paginate_query(
+        query, models.ShareNetwork.created_at, models.ShareNetwork.id,
+        'desc', limit=limit, offset=offset, marker_values=marker_values)
+
+
 @require_context
-def share_network_get_all(context):
-    return _network_get_query(context).all()
+def share_network_get_all(context, limit=None, offset=None, marker=None):
+    query = _share_network_paginate_query(
+        context, _network_get_query(context), limit=limit, offset=offset,
+        marker=marker)
+    return query.all()
 
 
 @require_context
-def share_network_get_all_by_project(context, project_id):
-    return _network_get_query(context).filter_by(project_id=project_id).all()
+def share_network_get_all_by_project(context, project_id, limit=None,
+                                     offset=None, marker=None):
+    query = _network_get_query(context).filter_by(project_id=project_id)
+    query = _share_network_paginate_query(
+        context, query, limit=limit, offset=offset, marker=marker)
+    return query.all()
 
 
 @require_context
@@ -3329,6 +3908,7 @@ def share_network_get_all_by_security_service(context, security_service_id):
 
 
 @require_context
+@invalidates_request_cache
 def share_network_add_security_service(context, id, security_service_id):
     session = get_session()
 
@@ -3359,6 +3939,7 @@ def share_network_add_security_service(context, id, security_service_id):
 
 
 @require_context
+@invalidates_request_cache
 def share_network_remove_security_service(context, id, security_service_id):
     session = get_session()
 
@@ -3427,6 +4008,7 @@ def share_server_create(context, values):
 
 
 @require_context
+@invalidates_request_cache
 def share_server_delete(context, id):
     session = get_session()
     with session.begin():
@@ -3436,6 +4018,7 @@ def share_server_delete(context, id):
 
 
 @require_context
+@invalidates_request_cache
 def share_server_update(context, id, values):
     session = get_session()
     with session.begin():
@@ -3446,6 +4029,7 @@ def share_server_update(context, id, values):
 
 
 @require_context
+@request_cached
 def share_server_get(context, server_id, session=None):
     result = (_server_get_query(context, session).filter_by(id=server_id)
               .first())
@@ -3504,6 +4088,7 @@ def share_server_get_all_unused_deletable(context, host, updated_before):
 
 
 @require_context
+@invalidates_request_cache
 def share_server_backend_details_set(context, share_server_id, server_details):
     share_server_get(context, share_server_id)
 
@@ -3849,6 +4434,7 @@ def _share_type_get(context, id, session=None, inactive=False,
 
 
 @require_context
+@request_cached
 def share_type_get(context, id, inactive=False, expected_fields=None):
     """Return a dict describing specific share_type."""
     return _share_type_get(context, id,
@@ -3891,6 +4477,7 @@ def share_type_get_by_name_or_id(context, name_or_id):
 
 
 @require_admin_context
+@invalidates_request_cache
 def share_type_destroy(context, id):
     session = get_session()
     with session.begin():
@@ -3927,6 +4514,7 @@ def share_type_access_get_all(context, type_id):
 
 
 @require_admin_context
+@invalidates_request_cache
 def share_type_access_add(context, type_id, project_id):
     """Add given tenant to the share type access list."""
     share_type_id = _share_type_get_id_from_share_type(context, type_id)
@@ -3946,6 +4534,7 @@ def share_type_access_add(context, type_id, project_id):
 
 
 @require_admin_context
+@invalidates_request_cache
 def share_type_access_remove(context, type_id, project_id):
     """Remove given tenant from the share type access list."""
     share_type_id = _share_type_get_id_from_share_type(context, type_id)
@@ -3981,6 +4570,7 @@ def share_type_extra_specs_get(context, share_type_id):
 
 
 @require_context
+@invalidates_request_cache
 def share_type_extra_specs_delete(context, share_type_id, key):
     session = get_session()
     with session.begin():
@@ -4005,6 +4595,7 @@ def _share_type_extra_specs_get_item(context, share_type_id, key,
 
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
+@invalidates_request_cache
 def share_type_extra_specs_update_or_create(context, share_type_id, specs):
     session = get_session()
     with session.begin():
@@ -4096,53 +4687,118 @@ def availability_zone_get_all(context):
     ).all()
 
 
+def _purge_records(table, id_column, record_ids):
+    """Deletes the given records, skipping those that are still referenced.
+
+    :returns: number of deleted records
+    """
+    session = get_session()
+    try:
+        with session.begin():
+            return session.execute(
+                table.delete().where(id_column.in_(record_ids))).rowcount
+    except db_exc.DBError:
+        # NOTE: Some of the records are still referenced by other records,
+        # fall back to deleting them one by one to skip those.
+        pass
+
+    deleted_count = 0
+    for record_id in record_ids:
+        try:
+            with session.begin():
+                deleted_count += session.execute(
+                    table.delete().where(id_column == record_id)).rowcount
+        except db_exc.DBError:
+            LOG.warning("Deleting soft-deleted record %(id)s from table "
+                        "%(table)s failed, skipping.",
+                        {'id': record_id, 'table': table})
+    return deleted_count
+
+
+def _purge_table(table, deleted_age, batch_size, sleep_interval, dry_run):
+    """Purges soft-deleted records of a table in batches.
+
+    Records are selected in the order of their IDs, every batch is deleted
+    in a transaction of its own, so that locks are held only briefly.
+
+    :returns: number of purged records
+    """
+    id_column = table.c.id
+    is_purgeable = table.c.deleted_at <= deleted_age
+
+    if dry_run:
+        return get_session().execute(
+            sql.select([func.count()]).select_from(table).where(
+                is_purgeable)).scalar()
+
+    purged_count = 0
+    last_id = None
+    while True:
+        query = sql.select([id_column]).where(is_purgeable)
+        if last_id is not None:
+            query = query.where(id_column > last_id)
+        query = query.order_by(id_column).limit(batch_size)
+        record_ids = [row[0] for row in get_session().execute(query)]
+        if not record_ids:
+            break
+        last_id = record_ids[-1]
+
+        purged_count += _purge_records(table, id_column, record_ids)
+
+        if len(record_ids) < batch_size:
+            break
+        if sleep_interval:
+            time.sleep(sleep_interval)
+    return purged_count
+
+
 @require_admin_context
-def purge_deleted_records(context, age_in_days):
-    """Purge soft-deleted records older than(and equal) age from tables."""
+def purge_deleted_records(context, age_in_days, batch_size=1000,
+                          sleep_interval=0, dry_run=False):
+    """Purge soft-deleted records older than(and equal) age from tables.
+
+    Tables are purged in the order of their dependencies, so that records
+    are purged before the records they reference.
+
+    :param age_in_days: age of soft-deleted records to purge in days
+    :param batch_size: maximum number of records deleted per transaction
+    :param sleep_interval: seconds to sleep between batches
+    :param dry_run: only count the records that would be purged
+    :returns: dict with the number of purged records per table name
+    """
 
     if age_in_days < 0:
         msg = _('Must supply a non-negative value for "age_in_days".')
         LOG.error(msg)
         raise exception.InvalidParameterValue(msg)
+    if batch_size < 1:
+        msg = _('Must supply a positive value for "batch_size".')
+        LOG.error(msg)
+        raise exception.InvalidParameterValue(msg)
 
-    metadata = MetaData()
-    metadata.reflect(get_engine())
-    session = get_session()
-    session.begin()
     deleted_age = timeutils.utcnow() - datetime.timedelta(days=age_in_days)
+    purged = {}
 
-    for table in reversed(metadata.sorted_tables):
-        if 'deleted' in table.columns.keys():
-            try:
-                mds = [m for m in models.__dict__.values() if
-                       (hasattr(m, '__tablename__') and
-                        m.__tablename__ == six.text_type(table))]
-                if len(mds) > 0:
-                    # collect all soft-deleted records
-                    with session.begin_nested():
-                        model = mds[0]
-                        s_deleted_records = session.query(model).filter(
-                            model.deleted_at <= deleted_age)
-                    deleted_count = 0
-                    # delete records one by one,
-                    # skip the records which has FK constraints
-                    for record in s_deleted_records:
-                        try:
-                            with session.begin_nested():
-                                session.delete(record)
-                                deleted_count += 1
-                        except db_exc.DBError:
-                            LOG.warning(
-                                ("Deleting soft-deleted resource %s "
-                                 "failed, skipping."), record)
-                    if deleted_count != 0:
-                        LOG.info("Deleted %(count)s records in "
-                                 "table %(table)s.",
-                                 {'count': deleted_count, 'table': table})
-            except db_exc.DBError:
-                LOG.warning("Querying table %s's soft-deleted records "
-                            "failed, skipping.", table)
-    session.commit()
+    for table in reversed(models.BASE.metadata.sorted_tables):
+        if not {'id', 'deleted', 'deleted_at'}.issubset(table.columns.keys()):
+            continue
+        start = time.time()
+        try:
+            purged_count = _purge_table(
+                table, deleted_age, batch_size, sleep_interval, dry_run)
+        except db_exc.DBError:
+            LOG.warning("Querying table %s's soft-deleted records "
+                        "failed, skipping.", table)
+            continue
+        purged[table.name] = purged_count
+        if purged_count and not dry_run:
+            elapsed = time.time() - start
+            LOG.info("Deleted %(count)s records in table %(table)s in "
+                     "%(elapsed).2f seconds (%(rate).1f records/s).",
+                     {'count': purged_count, 'table': table,
+                      'elapsed': elapsed,
+                      'rate': purged_count / max(elapsed, 0.001)})
+    return purged
 
 
 ####################
@@ -4171,7 +4827,8 @@ def share_group_get(context, share_group_id, session=None):
 
 def _share_group_get_all(context, project_id=None, share_server_id=None,
                          host=None, detailed=True, filters=None,
-                         sort_key=None, sort_dir=None, session=None):
+                         sort_key=None, sort_dir=None, limit=None,
+                         offset=None, marker=None, session=None):
     session = session or get_session()
     sort_key = sort_key or 'created_at'
     sort_dir = sort_dir or 'desc'
@@ -4206,11 +4863,27 @@ def _share_group_get_all(context, project_id=None, share_server_id=None,
         query = query.filter(
             models.ShareGroup.share_server_id == share_server_id)
 
-    try:
-        query = apply_sorting(models.ShareGroup, query, sort_key, sort_dir)
-    except AttributeError:
-        msg = _("Wrong sorting key provided - '%s'.") % sort_key
-        raise exception.InvalidInput(reason=msg)
+    if _is_paginated(limit, offset, marker):
+        sort_attr = _get_sort_attr(sort_key, models.ShareGroup)
+        marker_values = None
+        if marker is not None:
+            try:
+                marker_ref = share_group_get(context, marker, session=session)
+            except exception.ShareGroupNotFound:
+                msg = _("Marker share group '%s' could not be found.") % (
+                    marker)
+                raise exception.InvalidInput(reason=msg)
+            marker_values = (marker_ref[sort_key], marker_ref['id'])
+        query = paginate_query(
+            query, sort_attr, models.ShareGroup.id, sort_dir, limit=limit,
+            offset=offset, marker_values=marker_values)
+    else:
+        try:
+            query = apply_sorting(
+                models.ShareGroup, query, sort_key, sort_dir)
+        except AttributeError:
+            msg = _("Wrong sorting key provided - '%s'.") % sort_key
+            raise exception.InvalidInput(reason=msg)
 
     if detailed:
         return query.options(joinedload('share_types')).all()
@@ -4225,10 +4898,11 @@ def _share_group_get_all(context, project_id=None, share_server_id=None,
 
 @require_admin_context
 def share_group_get_all(context, detailed=True, filters=None, sort_key=None,
-                        sort_dir=None):
+                        sort_dir=None, limit=None, offset=None, marker=None):
     return _share_group_get_all(
         context, detailed=detailed, filters=filters,
-        sort_key=sort_key, sort_dir=sort_dir)
+        sort_key=sort_key, sort_dir=sort_dir, limit=limit, offset=offset,
+        marker=marker)
 
 
 @require_admin_context
@@ -4238,11 +4912,13 @@ def share_group_get_all_by_host(context, host, detailed=True):
 
 @require_context
 def share_group_get_all_by_project(context, project_id, detailed=True,
-                                   filters=None, sort_key=None, sort_dir=None):
+                                   filters=None, sort_key=None, sort_dir=None,
+                                   limit=None, offset=None, marker=None):
     authorize_project_context(context, project_id)
     return _share_group_get_all(
         context, project_id=project_id, detailed=detailed, filters=filters,
-        sort_key=sort_key, sort_dir=sort_dir)
+        sort_key=sort_key, sort_dir=sort_dir, limit=limit, offset=offset,
+        marker=marker)
 
 
 @require_context
@@ -4904,7 +5580,7 @@ def message_get(context, message_id):
 
 @require_context
 def message_get_all(context, filters=None, sort_key='created_at',
-                    sort_dir='asc'):
+                    sort_dir='asc', limit=None, offset=None, marker=None):
     messages = models.Message
     query = model_query(context,
                         messages,
@@ -4918,11 +5594,25 @@ def message_get_all(context, filters=None, sort_key='created_at',
         filters = {}
 
     query = exact_filter(query, messages, filters, legal_filter_keys)
-    try:
-        query = apply_sorting(messages, query, sort_key, sort_dir)
-    except AttributeError:
-        msg = _("Wrong sorting key provided - '%s'.") % sort_key
-        raise exception.InvalidInput(reason=msg)
+    if _is_paginated(limit, offset, marker):
+        sort_attr = _get_sort_attr(sort_key, messages)
+        marker_values = None
+        if marker is not None:
+            try:
+                marker_ref = message_get(context, marker)
+            except exception.MessageNotFound:
+                msg = _("Marker message '%s' could not be found.") % marker
+                raise exception.InvalidInput(reason=msg)
+            marker_values = (marker_ref[sort_key], marker_ref['id'])
+        query = paginate_query(
+            query, sort_attr, messages.id, sort_dir, limit=limit,
+            offset=offset, marker_values=marker_values)
+    else:
+        try:
+            query = apply_sorting(messages, query, sort_key, sort_dir)
+        except AttributeError:
+            msg = _("Wrong sorting key provided - '%s'.") % sort_key
+            raise exception.InvalidInput(reason=msg)
 
     return query.all()
 
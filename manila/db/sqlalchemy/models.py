@@ -22,6 +22,7 @@ SQLAlchemy models for Manila data.
 from oslo_config import cfg
 from oslo_db.sqlalchemy import models
 from sqlalchemy import Column, Integer, String, schema
+from sqlalchemy import event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import orm
 from sqlalchemy import ForeignKey, DateTime, Boolean, Enum
@@ -191,6 +192,62 @@ class Reservation(BASE, ManilaBase):
     expire = Column(DateTime, nullable=False)
 
 
+def _build_instance_status_ranks():
+    preferred = (constants.STATUS_REVERTING,
+                 constants.STATUS_REPLICATION_CHANGE,
+                 constants.STATUS_MIGRATING, constants.STATUS_AVAILABLE,
+                 constants.STATUS_ERROR)
+    ranks = {}
+    for index, status in enumerate(preferred):
+        ranks.setdefault(status, (0, index))
+    for index, status in enumerate(constants.TRANSITIONAL_STATUSES):
+        ranks.setdefault(status, (2, index))
+    return ranks
+
+
+# Ranks of share instance statuses used to select the primary instance of a
+# share: preferred statuses first, then any other status in order of first
+# appearance, then transitional statuses.
+INSTANCE_STATUS_RANKS = _build_instance_status_ranks()
+
+
+# Bumped whenever share instances are reloaded or their status or replica
+# state changes, so that Share.instance knows its cached selection is stale.
+_instance_states_version = 0
+
+
+def _invalidate_instance_selection(*args, **kwargs):
+    global _instance_states_version
+    _instance_states_version += 1
+
+
+def _select_primary_instance(instances):
+    if len(instances) == 0:
+        return None
+
+    other_statuses = {}
+    for x in instances:
+        if x['status'] not in INSTANCE_STATUS_RANKS:
+            other_statuses.setdefault(x['status'], len(other_statuses))
+
+    def _rank(x):
+        status = x['status']
+        if status in other_statuses:
+            return (1, other_statuses[status])
+        return INSTANCE_STATUS_RANKS[status]
+
+    # NOTE: min() returns the first of equally ranked instances,
+    # same as the first element of a stable sort would be.
+    result = min(instances, key=_rank)
+    if result['status'] != constants.STATUS_REPLICATION_CHANGE:
+        active_instances = [
+            x for x in instances
+            if x['replica_state'] == constants.REPLICA_STATE_ACTIVE]
+        if active_instances:
+            result = min(active_instances, key=_rank)
+    return result
+
+
 class Share(BASE, ManilaBase):
     """Represents an NFS and CIFS shares."""
     __tablename__ = 'shares'
@@ -263,31 +320,19 @@ class Share(BASE, ManilaBase):
         # followed  by 'available' and 'error'. If replicated share and
         # not undergoing a 'replication_change', only 'active' instances are
         # preferred.
-        result = None
-        if len(self.instances) > 0:
-            order = (constants.STATUS_REVERTING,
-                     constants.STATUS_REPLICATION_CHANGE,
-                     constants.STATUS_MIGRATING, constants.STATUS_AVAILABLE,
-                     constants.STATUS_ERROR)
-            other_statuses = (
-                [x['status'] for x in self.instances if
-                 x['status'] not in order and
-                 x['status'] not in constants.TRANSITIONAL_STATUSES]
-            )
-            order = (order + tuple(other_statuses) +
-                     constants.TRANSITIONAL_STATUSES)
-            sorted_instances = sorted(
-                self.instances, key=lambda x: order.index(x['status']))
-
-            select_instances = sorted_instances
-            if (select_instances[0]['status'] !=
-                    constants.STATUS_REPLICATION_CHANGE):
-                select_instances = (
-                    list(filter(lambda x: x['replica_state'] ==
-                                constants.REPLICA_STATE_ACTIVE,
-                                sorted_instances)) or sorted_instances
-                )
-            result = select_instances[0]
+        # NOTE: The selected instance is cached on the object until the
+        # instances collection is reloaded, or any instance status or
+        # replica state changes, since every proxified property (status,
+        # host, share_type, ...) goes through it.
+        instances = self.instances
+        cached = self.__dict__.get('_instance_cache')
+        if (cached is not None and cached[0] is instances and
+                cached[1] == _instance_states_version):
+            return cached[2]
+
+        result = _select_primary_instance(instances)
+        self.__dict__['_instance_cache'] = (
+            instances, _instance_states_version, result)
         return result
 
     @property
@@ -339,7 +384,7 @@ class ShareInstance(BASE, ManilaBase):
                              'snapshot_id', 'share_proto', 'is_public',
                              'share_group_id', 'replication_type',
                              'source_share_group_snapshot_member_id',
-                             'mount_snapshot_support')
+                             'mount_snapshot_support', 'task_state')
 
     def set_share_data(self, share):
         for share_property in self._proxified_properties:
@@ -421,6 +466,14 @@ class ShareInstance(BASE, ManilaBase):
                     'ShareTypes.deleted == "False")')
 
 
+event.listen(ShareInstance.status, 'set', _invalidate_instance_selection)
+event.listen(ShareInstance.replica_state, 'set',
+             _invalidate_instance_selection)
+event.listen(ShareInstance, 'refresh', _invalidate_instance_selection)
+event.listen(Share.instances, 'append', _invalidate_instance_selection)
+event.listen(Share.instances, 'remove', _invalidate_instance_selection)
+
+
 class ShareInstanceExportLocations(BASE, ManilaBase):
     """Represents export locations of share instances."""
     __tablename__ = 'share_instance_export_locations'
@@ -51,12 +51,15 @@ This module provides Manager, a base class for managers.
 
 """
 
+import copy
+
 from oslo_config import cfg
 from oslo_log import log
 from oslo_service import periodic_task
 
 from manila.db import base
 from manila.scheduler import rpcapi as scheduler_rpcapi
+from manila.scheduler import utils as scheduler_utils
 from manila import version
 
 CONF = cfg.CONF
@@ -123,10 +126,16 @@ class SchedulerDependentManager(Manager):
     manager.Manager directly. Updates are only sent after
     update_service_capabilities is called with non-None values.
 
+    Each update carries a generation number. Once the full capabilities
+    have been sent, only what changed since the previous update is sent,
+    until the schedulers ask for the full capabilities again.
+
     """
 
     def __init__(self, host=None, db_driver=None, service_name='undefined'):
         self.last_capabilities = None
+        self.published_capabilities = None
+        self.capabilities_generation = 0
         self.service_name = service_name
         self.scheduler_rpcapi = scheduler_rpcapi.SchedulerAPI()
         super(SchedulerDependentManager, self).__init__(host, db_driver)
@@ -139,9 +148,28 @@ class SchedulerDependentManager(Manager):
     def _publish_service_capabilities(self, context):
         """Pass data back to the scheduler at a periodic interval."""
         if self.last_capabilities:
-            LOG.debug('Notifying Schedulers of capabilities ...')
-            self.scheduler_rpcapi.update_service_capabilities(
-                context,
-                self.service_name,
-                self.host,
+            delta = None
+            if self.published_capabilities is not None:
+                delta = scheduler_utils.get_capabilities_delta(
+                    self.published_capabilities, self.last_capabilities)
+            self.capabilities_generation += 1
+
+            if delta is None:
+                LOG.debug('Notifying Schedulers of capabilities ...')
+                self.scheduler_rpcapi.update_service_capabilities(
+                    context,
+                    self.service_name,
+                    self.host,
+                    self.last_capabilities,
+                    generation=self.capabilities_generation)
+            else:
+                LOG.debug('Notifying Schedulers of capability changes ...')
+                self.scheduler_rpcapi.update_service_capabilities(
+                    context,
+                    self.service_name,
+                    self.host,
+                    delta,
+                    generation=self.capabilities_generation,
+                    delta=True)
+            self.published_capabilities = copy.deepcopy(
                 self.last_capabilities)
@@ -73,13 +73,15 @@ class API(base.Base):
         """Return message with the specified message id."""
         return self.db.message_get(context, id)
 
-    def get_all(self, context, search_opts={}, sort_key=None, sort_dir=None):
+    def get_all(self, context, search_opts={}, sort_key=None, sort_dir=None,
+                limit=None, offset=None, marker=None):
         """Return messages for the given context."""
         LOG.debug("Searching for messages by: %s",
                   six.text_type(search_opts))
 
         messages = self.db.message_get_all(
-            context, filters=search_opts, sort_key=sort_key, sort_dir=sort_dir)
+            context, filters=search_opts, sort_key=sort_key, sort_dir=sort_dir,
+            limit=limit, offset=offset, marker=marker)
 
         return messages
 
@@ -64,7 +64,16 @@ quota_opts = [
                help='Number of seconds between subsequent usage refreshes.'),
     cfg.StrOpt('quota_driver',
                default='manila.quota.DbQuotaDriver',
-               help='Default driver to use for quota checks.'), ]
+               help='Default driver to use for quota checks.'),
+    cfg.IntOpt('quota_limits_cache_ttl',
+               default=0,
+               min=0,
+               help='Number of seconds for which the quota limits of '
+                    'projects, users, share types and quota classes read '
+                    'from the database are cached by each service, instead '
+                    'of being read for every reservation. Changes of quota '
+                    'limits may take this long to be enforced. Set to 0 to '
+                    'disable the cache.'), ]
 
 CONF = cfg.CONF
 CONF.register_opts(quota_opts)
@@ -78,6 +87,38 @@ class DbQuotaDriver(object):
     database.
     """
 
+    def __init__(self):
+        self._limits_cache = {}
+
+    def _get_limits(self, context, key, load, project_id=None,
+                    quota_class=None):
+        """Returns quota limits, cached for 'quota_limits_cache_ttl'.
+
+        Limits of a project or a quota class are only cached for admin
+        contexts and contexts of that project or quota class, so that other
+        contexts are still authorized by the database.
+        """
+        ttl = CONF.quota_limits_cache_ttl
+        if not ttl:
+            return load()
+        if not getattr(context, 'is_admin', False) and (
+                (project_id is not None and
+                 project_id != context.project_id) or
+                (quota_class is not None and
+                 quota_class != context.quota_class)):
+            return load()
+
+        now = timeutils.utcnow_ts(microsecond=True)
+        cached = self._limits_cache.get(key)
+        if cached is None or cached[0] <= now:
+            cached = (now + ttl, load())
+            self._limits_cache[key] = cached
+        # Callers update the limits they get, hand out copies.
+        return dict(cached[1])
+
+    def clear_limits_cache(self):
+        self._limits_cache.clear()
+
     def get_by_class(self, context, quota_class, resource):
         """Get a specific quota by quota class."""
 
@@ -91,7 +132,9 @@ class DbQuotaDriver(object):
         """
 
         quotas = {}
-        default_quotas = db.quota_class_get_default(context)
+        default_quotas = self._get_limits(
+            context, ('defaults', ),
+            lambda: db.quota_class_get_default(context))
         for resource in resources.values():
             quotas[resource.name] = default_quotas.get(resource.name,
                                                        resource.default)
@@ -114,7 +157,7 @@ class DbQuotaDriver(object):
         """
 
         quotas = {}
-        class_quotas = db.quota_class_get_all_by_name(context, quota_class)
+        class_quotas = self._get_class_limits(context, quota_class)
         for resource in resources.values():
             if defaults or resource.name in class_quotas:
                 quotas[resource.name] = class_quotas.get(resource.name,
@@ -122,6 +165,18 @@ class DbQuotaDriver(object):
 
         return quotas
 
+    def _get_class_limits(self, context, quota_class):
+        return self._get_limits(
+            context, ('class', quota_class),
+            lambda: db.quota_class_get_all_by_name(context, quota_class),
+            quota_class=quota_class)
+
+    def _get_project_limits(self, context, project_id):
+        return self._get_limits(
+            context, ('project', project_id),
+            lambda: db.quota_get_all_by_project(context, project_id),
+            project_id=project_id)
+
     def _process_quotas(self, context, resources, project_id, quotas,
                         quota_class=None, defaults=True, usages=None,
                         remains=False):
@@ -133,7 +188,7 @@ class DbQuotaDriver(object):
         if project_id == context.project_id:
             quota_class = context.quota_class
         if quota_class:
-            class_quotas = db.quota_class_get_all_by_name(context, quota_class)
+            class_quotas = self._get_class_limits(context, quota_class)
         else:
             class_quotas = {}
 
@@ -196,7 +251,7 @@ class DbQuotaDriver(object):
         :param remains: If True, the current remains of the project will
                         will be returned.
         """
-        project_quotas = db.quota_get_all_by_project(context, project_id)
+        project_quotas = self._get_project_limits(context, project_id)
         project_usages = None
         if usages:
             project_usages = db.quota_usage_get_all_by_project(context,
@@ -229,10 +284,13 @@ class DbQuotaDriver(object):
         :param usages: If True, the current in_use and reserved counts
                        will also be returned.
         """
-        user_quotas = db.quota_get_all_by_project_and_user(
-            context, project_id, user_id)
+        user_quotas = self._get_limits(
+            context, ('user', project_id, user_id),
+            lambda: db.quota_get_all_by_project_and_user(
+                context, project_id, user_id),
+            project_id=project_id)
         # Use the project quota for default user quota.
-        proj_quotas = db.quota_get_all_by_project(context, project_id)
+        proj_quotas = self._get_project_limits(context, project_id)
         for key, value in proj_quotas.items():
             if key not in user_quotas.keys():
                 user_quotas[key] = value
@@ -268,10 +326,13 @@ class DbQuotaDriver(object):
         :param usages: If True, the current in_use and reserved counts
                        will also be returned.
         """
-        st_quotas = db.quota_get_all_by_project_and_share_type(
-            context, project_id, share_type_id)
+        st_quotas = self._get_limits(
+            context, ('share_type', project_id, share_type_id),
+            lambda: db.quota_get_all_by_project_and_share_type(
+                context, project_id, share_type_id),
+            project_id=project_id)
         # Use the project quota for default share_type quota.
-        project_quotas = db.quota_get_all_by_project(context, project_id)
+        project_quotas = self._get_project_limits(context, project_id)
         for key, value in project_quotas.items():
             if key not in st_quotas.keys():
                 st_quotas[key] = value
@@ -555,6 +616,7 @@ class DbQuotaDriver(object):
         """
 
         db.quota_destroy_all_by_project(context, project_id)
+        self.clear_limits_cache()
 
     def destroy_all_by_project_and_user(self, context, project_id, user_id):
         """Destroy metadata associated with a project and user.
@@ -568,6 +630,7 @@ class DbQuotaDriver(object):
         """
 
         db.quota_destroy_all_by_project_and_user(context, project_id, user_id)
+        self.clear_limits_cache()
 
     def destroy_all_by_project_and_share_type(self, context, project_id,
                                               share_type_id):
@@ -583,6 +646,7 @@ class DbQuotaDriver(object):
 
         db.quota_destroy_all_by_project_and_share_type(
             context, project_id, share_type_id)
+        self.clear_limits_cache()
 
     def expire(self, context):
         """Expire reservations.
@@ -1028,6 +1092,14 @@ class QuotaEngine(object):
 
         self._driver.destroy_all_by_project(context, project_id)
 
+    def clear_limits_cache(self):
+        """Forgets the quota limits cached by the quota driver."""
+
+        # NOTE: Custom quota drivers may not cache the quota limits.
+        clear_limits_cache = getattr(self._driver, 'clear_limits_cache', None)
+        if clear_limits_cache is not None:
+            clear_limits_cache()
+
     def expire(self, context):
         """Expire reservations.
 
@@ -0,0 +1,375 @@
+# Copyright (c) 2018 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Offline benchmark for the share scheduler.
+
+Builds a synthetic fleet of share backends and pools, replays a stream of
+share creation requests through the FilterScheduler with the configured
+filters and weighers, and reports the scheduling throughput, the time spent
+in each filter and weigher and how the shares were spread over the pools.
+Nothing is read from or written to the database and no RPC is sent, so it
+can be used to compare scheduler changes and weigher multipliers such as
+'capacity_weight_multiplier' and 'pool_weight_multiplier' without a cloud:
+
+    python -m manila.scheduler.benchmark --hosts 100 --pools 10 \
+        --requests 5000 --config-file benchmark.conf
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import timeit
+import uuid
+
+from oslo_config import cfg
+from oslo_utils import timeutils
+
+from manila.common import config  # Need to register global_opts  # noqa
+from manila import context
+from manila import exception
+from manila.scheduler.drivers import filter
+from manila.scheduler import host_manager
+from manila.scheduler import scheduler_options
+
+CONF = cfg.CONF
+
+benchmark_opts = [
+    cfg.IntOpt('hosts',
+               default=10,
+               min=1,
+               help='Number of share backends in the synthetic fleet.'),
+    cfg.IntOpt('pools',
+               default=4,
+               min=1,
+               help='Number of pools of each share backend.'),
+    cfg.IntOpt('availability-zones',
+               default=1,
+               min=1,
+               help='Number of availability zones the share backends are '
+                    'spread over.'),
+    cfg.IntOpt('requests',
+               default=1000,
+               min=1,
+               help='Number of share creation requests to replay.'),
+    cfg.IntOpt('min-share-size',
+               default=1,
+               min=1,
+               help='Minimum size, in GB, of the requested shares.'),
+    cfg.IntOpt('max-share-size',
+               default=100,
+               min=1,
+               help='Maximum size, in GB, of the requested shares.'),
+    cfg.IntOpt('seed',
+               help='Seed of the random fleet and requests, to replay the '
+                    'same benchmark.'),
+]
+
+
+def generate_fleet(num_hosts, num_pools, num_zones=1, rand=None):
+    """Returns share services and capabilities of a synthetic fleet.
+
+    Every backend reports 'num_pools' pools with random capacities and
+    thin provisioning support, and backends are spread round robin over
+    'num_zones' availability zones.
+    """
+    rand = rand or random.Random()
+    services = []
+    capabilities = {}
+    for i in range(num_hosts):
+        host = 'host%(i)d@backend%(i)d' % {'i': i}
+        services.append({
+            'id': i + 1,
+            'host': host,
+            'topic': CONF.share_topic,
+            'disabled': False,
+            'availability_zone_id': 'zone%d' % (i % num_zones),
+            'updated_at': timeutils.utcnow(),
+        })
+
+        pools = []
+        for j in range(num_pools):
+            total_capacity_gb = rand.choice((1024, 2048, 4096, 8192))
+            provisioned_capacity_gb = rand.randint(0, total_capacity_gb)
+            thin_provisioning = rand.choice((True, False))
+            pools.append({
+                'pool_name': 'pool%d' % j,
+                'total_capacity_gb': total_capacity_gb,
+                'free_capacity_gb': (
+                    total_capacity_gb - provisioned_capacity_gb),
+                'allocated_capacity_gb': provisioned_capacity_gb,
+                'provisioned_capacity_gb': provisioned_capacity_gb,
+                'max_over_subscription_ratio': (
+                    rand.choice((1.5, 2.0, 4.0))
+                    if thin_provisioning else 1.0),
+                'thin_provisioning': thin_provisioning,
+                'reserved_percentage': rand.choice((0, 5, 10)),
+                'dedupe': False,
+                'compression': False,
+                'snapshot_support': True,
+                'create_share_from_snapshot_support': True,
+                'revert_to_snapshot_support': False,
+                'mount_snapshot_support': False,
+                'replication_type': None,
+                'replication_domain': None,
+            })
+        capabilities[host] = {
+            'share_backend_name': 'backend%d' % i,
+            'vendor_name': 'Benchmark',
+            'driver_version': '1.0',
+            'storage_protocol': 'NFS_CIFS',
+            'driver_handles_share_servers': False,
+            'pools': pools,
+        }
+    return services, capabilities
+
+
+def generate_request_specs(count, min_size=1, max_size=100, num_zones=None,
+                           rand=None):
+    """Returns share creation request specs for the synthetic fleet.
+
+    If 'num_zones' is given, each share requests one of these availability
+    zones, otherwise shares may be placed in any of them.
+    """
+    rand = rand or random.Random()
+    request_specs = []
+    for i in range(count):
+        share_id = uuid.uuid4().hex
+        availability_zone_id = (
+            'zone%d' % rand.randrange(num_zones) if num_zones else None)
+        request_specs.append({
+            'share_id': share_id,
+            'snapshot_id': None,
+            'share_properties': {
+                'id': share_id,
+                'size': rand.randint(min_size, max_size),
+                'share_proto': 'NFS',
+                'project_id': 'benchmark',
+                'user_id': 'benchmark',
+                'metadata': {},
+            },
+            'share_instance_properties': {
+                'availability_zone_id': availability_zone_id,
+            },
+            'share_type': {
+                'name': 'benchmark',
+                'extra_specs': {'driver_handles_share_servers': 'False'},
+            },
+        })
+    return request_specs
+
+
+class SimulatedHostManager(host_manager.HostManager):
+    """HostManager of a synthetic fleet that does not use the database."""
+
+    def __init__(self, services, capabilities):
+        super(SimulatedHostManager, self).__init__()
+        self.simulated_services = {
+            service['host']: service for service in services}
+        for host, host_capabilities in capabilities.items():
+            self.update_service_capabilities(
+                'share', host, host_capabilities)
+
+    def _get_share_services(self, context):
+        return self.simulated_services, not self.host_state_map
+
+    def _sync_provisioned_capacity(self, context):
+        # NOTE: Shares of the simulated fleet are never created, so the
+        # estimated provisioned capacity of its pools is not synced with
+        # the database.
+        pass
+
+
+class SimulatedFilterScheduler(filter.FilterScheduler):
+    """FilterScheduler that only chooses hosts of a simulated fleet.
+
+    Shares are never created, so no RPC client is set up.
+    """
+
+    def __init__(self, host_manager):
+        self.host_manager = host_manager
+        self.cost_function_cache = None
+        self.options = scheduler_options.SchedulerOptions()
+        self.max_attempts = self._max_attempts()
+
+
+def _percentile(samples, percent):
+    """Returns the nearest-rank percentile of the samples."""
+    if not samples:
+        return None
+    samples = sorted(samples)
+    rank = int(round(percent / 100.0 * len(samples) + 0.5)) - 1
+    return samples[min(max(rank, 0), len(samples) - 1)]
+
+
+def _get_timings_summary(samples):
+    return {
+        'calls': len(samples),
+        'p50': _percentile(samples, 50),
+        'p99': _percentile(samples, 99),
+    }
+
+
+def _timed_filter(filter_cls, samples):
+    """Returns a subclass of the filter that records its run times."""
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        start = timeit.default_timer()
+        objs = filter_cls.filter_all(self, filter_obj_list, filter_properties)
+        if objs is not None:
+            objs = list(objs)
+        samples.append(timeit.default_timer() - start)
+        return objs
+
+    return type(filter_cls.__name__, (filter_cls,),
+                {'filter_all': filter_all})
+
+
+def _timed_weigher(weigher_cls, samples):
+    """Returns a subclass of the weigher that records its run times."""
+
+    def weigh_objects(self, weighed_obj_list, weight_properties):
+        start = timeit.default_timer()
+        weights = weigher_cls.weigh_objects(
+            self, weighed_obj_list, weight_properties)
+        samples.append(timeit.default_timer() - start)
+        return weights
+
+    return type(weigher_cls.__name__, (weigher_cls,),
+                {'weigh_objects': weigh_objects})
+
+
+def run_benchmark(scheduler, request_specs):
+    """Schedules the requests and returns the benchmark results.
+
+    The filters and weighers of the scheduler's host manager are replaced
+    by subclasses that time them. Shares are placed the way the scheduler
+    does it, by consuming from the chosen pools, but are not created.
+    """
+    manager = scheduler.host_manager
+    filter_samples = {cls.__name__: [] for cls in manager.filter_classes}
+    manager.filter_classes = [
+        _timed_filter(cls, filter_samples[cls.__name__])
+        for cls in manager.filter_classes]
+    weigher_samples = {cls.__name__: [] for cls in manager.weight_classes}
+    manager.weight_classes = [
+        _timed_weigher(cls, weigher_samples[cls.__name__])
+        for cls in manager.weight_classes]
+
+    ctxt = context.get_admin_context()
+    hosts = list(manager.get_all_host_states_share(ctxt))
+
+    latencies = []
+    placements = {}
+    failed = 0
+    start = timeit.default_timer()
+    for request_spec in request_specs:
+        request_start = timeit.default_timer()
+        try:
+            weighed_host = scheduler._schedule_share(
+                ctxt, request_spec, {}, hosts=hosts)
+        except exception.NoValidHost:
+            failed += 1
+        else:
+            pool = weighed_host.obj.host
+            placements[pool] = placements.get(pool, 0) + 1
+        latencies.append(timeit.default_timer() - request_start)
+    elapsed = timeit.default_timer() - start
+
+    capacity = {}
+    for pool in hosts:
+        capacity[pool.host] = {
+            'shares': placements.get(pool.host, 0),
+            'total_capacity_gb': pool.total_capacity_gb,
+            'free_capacity_gb': pool.free_capacity_gb,
+            'provisioned_capacity_gb': pool.provisioned_capacity_gb,
+        }
+
+    return {
+        'requests': len(request_specs),
+        'failed': failed,
+        'elapsed': elapsed,
+        'requests_per_second': (
+            len(request_specs) / elapsed if elapsed else None),
+        'latency': _get_timings_summary(latencies),
+        'filters': {name: _get_timings_summary(samples)
+                    for name, samples in filter_samples.items() if samples},
+        'weighers': {name: _get_timings_summary(samples)
+                     for name, samples in weigher_samples.items()
+                     if samples},
+        'capacity': capacity,
+    }
+
+
+def _ms(seconds):
+    return seconds * 1000.0 if seconds is not None else 0.0
+
+
+def format_results(results):
+    """Returns the benchmark results as lines of text."""
+    lines = [
+        'Requests: %(requests)d, failed: %(failed)d, elapsed: '
+        '%(elapsed).3f s, requests/s: %(rate).1f' % {
+            'requests': results['requests'],
+            'failed': results['failed'],
+            'elapsed': results['elapsed'],
+            'rate': results['requests_per_second'] or 0.0},
+        'Latency p50: %.3f ms, p99: %.3f ms' % (
+            _ms(results['latency']['p50']), _ms(results['latency']['p99'])),
+    ]
+    for kind in ('filters', 'weighers'):
+        lines.append('%s:' % kind.capitalize())
+        for name, summary in sorted(results[kind].items()):
+            lines.append(
+                '  %(name)-32s calls: %(calls)6d  p50: %(p50).3f ms  '
+                'p99: %(p99).3f ms' % {
+                    'name': name, 'calls': summary['calls'],
+                    'p50': _ms(summary['p50']), 'p99': _ms(summary['p99'])})
+
+    lines.append('Capacity:')
+    for pool, usage in sorted(results['capacity'].items()):
+        lines.append(
+            '  %(pool)-40s shares: %(shares)6d  provisioned: '
+            '%(provisioned)s/%(total)s GB  free: %(free)s GB' % {
+                'pool': pool, 'shares': usage['shares'],
+                'provisioned': usage['provisioned_capacity_gb'],
+                'total': usage['total_capacity_gb'],
+                'free': usage['free_capacity_gb']})
+    return lines
+
+
+def main():
+    CONF.register_cli_opts(benchmark_opts)
+    CONF(sys.argv[1:], project='manila')
+
+    rand = random.Random(CONF.seed)
+    services, capabilities = generate_fleet(
+        CONF.hosts, CONF.pools, num_zones=CONF.availability_zones, rand=rand)
+    request_specs = generate_request_specs(
+        CONF.requests, min_size=CONF.min_share_size,
+        max_size=CONF.max_share_size,
+        num_zones=(CONF.availability_zones
+                   if CONF.availability_zones > 1 else None),
+        rand=rand)
+
+    scheduler = SimulatedFilterScheduler(
+        SimulatedHostManager(services, capabilities))
+    for line in format_results(run_benchmark(scheduler, request_specs)):
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
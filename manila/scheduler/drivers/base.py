@@ -19,6 +19,8 @@
 Scheduler base class that all Schedulers should inherit from
 """
 
+import copy
+
 from oslo_config import cfg
 from oslo_utils import importutils
 from oslo_utils import timeutils
@@ -87,11 +89,14 @@ class Scheduler(object):
         """Get the normalized set of capabilities for the services."""
         return self.host_manager.get_service_capabilities()
 
-    def update_service_capabilities(self, service_name, host, capabilities):
+    def update_service_capabilities(self, service_name, host, capabilities,
+                                    generation=None, delta=False):
         """Process a capability update from a service node."""
         self.host_manager.update_service_capabilities(service_name,
                                                       host,
-                                                      capabilities)
+                                                      capabilities,
+                                                      generation=generation,
+                                                      delta=delta)
 
     def hosts_up(self, context, topic):
         """Return the list of hosts that have a running service for topic."""
@@ -109,6 +114,25 @@ class Scheduler(object):
         """Must override schedule method for scheduler to work."""
         raise NotImplementedError(_("Must implement schedule_create_share"))
 
+    def schedule_create_shares(self, context, request_specs,
+                               filter_properties):
+        """Schedules a batch of shares.
+
+        Shares are scheduled one after another unless a driver knows
+        better.
+
+        :returns: a list of (request_spec, exception) tuples for the shares
+                  that could not be scheduled.
+        """
+        failures = []
+        for request_spec in request_specs:
+            try:
+                self.schedule_create_share(
+                    context, request_spec, copy.deepcopy(filter_properties))
+            except Exception as ex:
+                failures.append((request_spec, ex))
+        return failures
+
     def schedule_create_share_group(self, context, share_group_id,
                                     request_spec,
                                     filter_properties):
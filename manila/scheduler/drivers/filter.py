@@ -20,6 +20,8 @@ You can customize this scheduler by specifying your own share/share group
 filters and weighing functions.
 """
 
+import copy
+
 from oslo_config import cfg
 from oslo_log import log
 
@@ -78,10 +80,12 @@ class FilterScheduler(base.Scheduler):
             raise exception.InvalidParameterValue(err=msg)
         return max_attempts
 
-    def schedule_create_share(self, context, request_spec, filter_properties):
+    def schedule_create_share(self, context, request_spec, filter_properties,
+                              hosts=None):
         weighed_host = self._schedule_share(context,
                                             request_spec,
-                                            filter_properties)
+                                            filter_properties,
+                                            hosts=hosts)
 
         host = weighed_host.obj.host
         share_id = request_spec['share_id']
@@ -101,6 +105,27 @@ class FilterScheduler(base.Scheduler):
             snapshot_id=snapshot_id
         )
 
+    def schedule_create_shares(self, context, request_specs,
+                               filter_properties):
+        """Schedules a batch of shares from a single view of the hosts.
+
+        The host states are fetched once for the whole batch and every
+        share placed consumes from them, so that the following shares in
+        the batch are spread accordingly.
+        """
+        elevated = context.elevated()
+        hosts = list(self.host_manager.get_all_host_states_share(elevated))
+
+        failures = []
+        for request_spec in request_specs:
+            try:
+                self.schedule_create_share(
+                    context, request_spec,
+                    copy.deepcopy(filter_properties) or {}, hosts=hosts)
+            except Exception as ex:
+                failures.append((request_spec, ex))
+        return failures
+
     def schedule_create_replica(self, context, request_spec,
                                 filter_properties):
         share_replica_id = request_spec['share_instance_properties'].get('id')
@@ -191,10 +216,13 @@ class FilterScheduler(base.Scheduler):
 
         return filter_properties, share_properties
 
-    def _schedule_share(self, context, request_spec, filter_properties=None):
+    def _schedule_share(self, context, request_spec, filter_properties=None,
+                        hosts=None):
         """Returns a list of hosts that meet the required specs.
 
-        The list is ordered by their fitness.
+        The list is ordered by their fitness. If 'hosts' is given, the
+        hosts are chosen from these host states rather than from the
+        current ones.
         """
         elevated = context.elevated()
 
@@ -207,7 +235,8 @@ class FilterScheduler(base.Scheduler):
 
         # Note: remember, we are using an iterator here. So only
         # traverse this list once.
-        hosts = self.host_manager.get_all_host_states_share(elevated)
+        if hosts is None:
+            hosts = self.host_manager.get_all_host_states_share(elevated)
 
         # Filter local hosts based on requirements ...
         hosts, last_filter = self.host_manager.get_filtered_hosts(
@@ -35,33 +35,52 @@ def _operatorOperands(tokenList):
 
 
 class EvalConstant(object):
+    # NOTE: Whether the constant is a number or a variable reference does
+    # not depend on the variables, it is found out when parsing rather than
+    # every time the expression is evaluated.
+    _variable_re = re.compile(r"^[a-zA-Z_]+\.[a-zA-Z_]+$")
+
     def __init__(self, toks):
         self.value = toks[0]
-
-    def eval(self):
-        result = self.value
-        if (isinstance(result, six.string_types) and
-                re.match("^[a-zA-Z_]+\.[a-zA-Z_]+$", result)):
-            (which_dict, entry) = result.split('.')
+        self.variable = None
+        self.number = None
+        if (isinstance(self.value, six.string_types) and
+                self._variable_re.match(self.value)):
+            self.variable = tuple(self.value.split('.'))
+        else:
             try:
-                result = _vars[which_dict][entry]
-            except KeyError as e:
-                msg = _("KeyError: %s") % six.text_type(e)
-                raise exception.EvaluatorParseException(reason=msg)
-            except TypeError as e:
-                msg = _("TypeError: %s") % six.text_type(e)
-                raise exception.EvaluatorParseException(reason=msg)
+                self.number = self._to_number(self.value)
+            except exception.EvaluatorParseException:
+                pass
 
+    @staticmethod
+    def _to_number(value):
         try:
-            result = int(result)
+            return int(value)
         except ValueError:
             try:
-                result = float(result)
+                return float(value)
             except ValueError as e:
                 msg = _("ValueError: %s") % six.text_type(e)
                 raise exception.EvaluatorParseException(reason=msg)
 
-        return result
+    def eval(self, variables):
+        if self.number is not None:
+            return self.number
+        if self.variable is None:
+            return self._to_number(self.value)
+
+        (which_dict, entry) = self.variable
+        try:
+            result = variables[which_dict][entry]
+        except KeyError as e:
+            msg = _("KeyError: %s") % six.text_type(e)
+            raise exception.EvaluatorParseException(reason=msg)
+        except TypeError as e:
+            msg = _("TypeError: %s") % six.text_type(e)
+            raise exception.EvaluatorParseException(reason=msg)
+
+        return self._to_number(result)
 
 
 class EvalSignOp(object):
@@ -73,21 +92,21 @@ class EvalSignOp(object):
     def __init__(self, toks):
         self.sign, self.value = toks[0]
 
-    def eval(self):
-        return self.operations[self.sign] * self.value.eval()
+    def eval(self, variables):
+        return self.operations[self.sign] * self.value.eval(variables)
 
 
 class EvalAddOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        sum = self.value[0].eval()
+    def eval(self, variables):
+        sum = self.value[0].eval(variables)
         for op, val in _operatorOperands(self.value[1:]):
             if op == '+':
-                sum += val.eval()
+                sum += val.eval(variables)
             elif op == '-':
-                sum -= val.eval()
+                sum -= val.eval(variables)
         return sum
 
 
@@ -95,14 +114,14 @@ class EvalMultOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        prod = self.value[0].eval()
+    def eval(self, variables):
+        prod = self.value[0].eval(variables)
         for op, val in _operatorOperands(self.value[1:]):
             try:
                 if op == '*':
-                    prod *= val.eval()
+                    prod *= val.eval(variables)
                 elif op == '/':
-                    prod /= float(val.eval())
+                    prod /= float(val.eval(variables))
             except ZeroDivisionError as e:
                 msg = _("ZeroDivisionError: %s") % six.text_type(e)
                 raise exception.EvaluatorParseException(reason=msg)
@@ -113,10 +132,10 @@ class EvalPowerOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        prod = self.value[0].eval()
+    def eval(self, variables):
+        prod = self.value[0].eval(variables)
         for op, val in _operatorOperands(self.value[1:]):
-            prod = pow(prod, val.eval())
+            prod = pow(prod, val.eval(variables))
         return prod
 
 
@@ -124,8 +143,8 @@ class EvalNegateOp(object):
     def __init__(self, toks):
         self.negation, self.value = toks[0]
 
-    def eval(self):
-        return not self.value.eval()
+    def eval(self, variables):
+        return not self.value.eval(variables)
 
 
 class EvalComparisonOp(object):
@@ -142,11 +161,11 @@ class EvalComparisonOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        val1 = self.value[0].eval()
+    def eval(self, variables):
+        val1 = self.value[0].eval(variables)
         for op, val in _operatorOperands(self.value[1:]):
             fn = self.operations[op]
-            val2 = val.eval()
+            val2 = val.eval(variables)
             if not fn(val1, val2):
                 break
             val1 = val2
@@ -159,12 +178,12 @@ class EvalTernaryOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        condition = self.value[0].eval()
+    def eval(self, variables):
+        condition = self.value[0].eval(variables)
         if condition:
-            return self.value[2].eval()
+            return self.value[2].eval(variables)
         else:
-            return self.value[4].eval()
+            return self.value[4].eval(variables)
 
 
 class EvalFunction(object):
@@ -177,8 +196,8 @@ class EvalFunction(object):
     def __init__(self, toks):
         self.func, self.value = toks[0]
 
-    def eval(self):
-        args = self.value.eval()
+    def eval(self, variables):
+        args = self.value.eval(variables)
         if type(args) is list:
             return self.functions[self.func](*args)
         else:
@@ -189,9 +208,9 @@ class EvalCommaSeperator(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        val1 = self.value[0].eval()
-        val2 = self.value[2].eval()
+    def eval(self, variables):
+        val1 = self.value[0].eval(variables)
+        val2 = self.value[2].eval(variables)
         if type(val2) is list:
             val_list = []
             val_list.append(val1)
@@ -206,9 +225,9 @@ class EvalBoolAndOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        left = self.value[0].eval()
-        right = self.value[2].eval()
+    def eval(self, variables):
+        left = self.value[0].eval(variables)
+        right = self.value[2].eval(variables)
         return left and right
 
 
@@ -216,13 +235,18 @@ class EvalBoolOrOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        left = self.value[0].eval()
-        right = self.value[2].eval()
+    def eval(self, variables):
+        left = self.value[0].eval(variables)
+        right = self.value[2].eval(variables)
         return left or right
 
+
 _parser = None
-_vars = {}
+# NOTE: Parsed expressions do not depend on the variables they are
+# evaluated with, they are cached so that expressions are parsed once
+# rather than for every evaluation.
+_parsed_expressions = {}
+_MAX_PARSED_EXPRESSIONS = 256
 
 
 def _def_parser():
@@ -272,21 +296,15 @@ def _def_parser():
     return expr
 
 
-def evaluate(expression, **kwargs):
-    """Evaluates an expression.
-
-    Provides the facility to evaluate mathematical expressions, and to
-    substitute variables from dictionaries into those expressions.
-
-    Supports both integer and floating point values, and automatic
-    promotion where necessary.
-    """
+def _parse(expression):
     global _parser
     if _parser is None:
         _parser = _def_parser()
 
-    global _vars
-    _vars = kwargs
+    try:
+        return _parsed_expressions[expression]
+    except KeyError:
+        pass
 
     try:
         result = _parser.parseString(expression, parseAll=True)[0]
@@ -294,4 +312,19 @@ def evaluate(expression, **kwargs):
         msg = _("ParseException: %s") % six.text_type(e)
         raise exception.EvaluatorParseException(reason=msg)
 
-    return result.eval()
+    if len(_parsed_expressions) >= _MAX_PARSED_EXPRESSIONS:
+        _parsed_expressions.clear()
+    _parsed_expressions[expression] = result
+    return result
+
+
+def evaluate(expression, **kwargs):
+    """Evaluates an expression.
+
+    Provides the facility to evaluate mathematical expressions, and to
+    substitute variables from dictionaries into those expressions.
+
+    Supports both integer and floating point values, and automatic
+    promotion where necessary.
+    """
+    return _parse(expression).eval(kwargs)
@@ -20,6 +20,8 @@
 Manage hosts in the current zone.
 """
 
+import functools
+import operator
 import re
 try:
     from UserDict import IterableUserDict  # noqa
@@ -31,11 +33,15 @@ from oslo_log import log
 from oslo_utils import timeutils
 import six
 
+from manila.common import constants
+from manila import context as manila_context
 from manila import db
 from manila import exception
 from manila.scheduler.filters import base_host as base_host_filter
+from manila.scheduler.filters import extra_specs_ops
 from manila.scheduler import utils as scheduler_utils
 from manila.scheduler.weighers import base_host as base_host_weigher
+from manila.share import rpcapi as share_rpcapi
 from manila.share import utils as share_utils
 from manila import utils
 
@@ -65,6 +71,26 @@ host_manager_opts = [
         ],
         help='Which filter class names to use for filtering hosts '
              'creating share group when not specified in the request.'),
+    cfg.IntOpt(
+        'scheduler_provisioned_capacity_sync_interval',
+        default=300,
+        min=0,
+        help='Interval, in seconds, between checks of the provisioned '
+             'capacity estimated by the scheduler against the sizes of '
+             'the shares recorded in the database. The estimate is only '
+             'used for pools that do not report provisioned_capacity_gb '
+             'and is kept up to date by the scheduler as shares are '
+             'placed in between checks.'),
+    cfg.IntOpt(
+        'scheduler_service_cache_ttl',
+        default=10,
+        min=0,
+        help='Time, in seconds, for which the scheduler reuses the list of '
+             'share services that are up, rather than looking them up in '
+             'the database for every request. Host states are only '
+             'updated when a share service reports new capabilities or '
+             'when this list is refreshed. Set to 0 to look the share '
+             'services up for every request.'),
 ]
 
 CONF = cfg.CONF
@@ -74,6 +100,25 @@ CONF.import_opt('max_over_subscription_ratio', 'manila.share.driver')
 LOG = log.getLogger(__name__)
 
 
+# NOTE: Pool capabilities that the HostManager keeps inverted indexes of, so
+# that pools which cannot satisfy the share type are dropped by set lookups
+# before the filters run. See HostManager._prefilter_hosts.
+INDEXED_CAPABILITIES = constants.ExtraSpecs.TENANT_VISIBLE + (
+    'share_backend_name',
+)
+
+# Placeholder for capability values that cannot be indexed, pools reporting
+# them are always left to the filters.
+_UNINDEXED = object()
+
+
+def _capability_matches(value, req):
+    if value is None:
+        return False
+    values = value if isinstance(value, tuple) else (value,)
+    return any(extra_specs_ops.match(v, req) for v in values)
+
+
 class ReadOnlyDict(IterableUserDict):
     """A read-only dict."""
 
@@ -164,7 +209,7 @@ class HostState(object):
         self.service = ReadOnlyDict(service)
 
     def update_from_share_capability(
-            self, capability, service=None, context=None):
+            self, capability, service=None, context=None, changed_pools=None):
         """Update information about a host from its share_node info.
 
         'capability' is the status info reported by share backend, a typical
@@ -209,6 +254,10 @@ class HostState(object):
                      'super_hero_2': 'Hulk',
                   }]
             }
+
+        'changed_pools' is the set of names of pools whose capabilities
+        changed since the last update, or None if all pools are to be
+        updated.
         """
         self.update_capabilities(capability, service)
 
@@ -220,9 +269,11 @@ class HostState(object):
             self.update_backend(capability)
 
             # Update pool level info
-            self.update_pools(capability, service, context=context)
+            self.update_pools(capability, service, context=context,
+                              changed_pools=changed_pools)
 
-    def update_pools(self, capability, service, context=None):
+    def update_pools(self, capability, service, context=None,
+                     changed_pools=None):
         """Update storage pools information from backend reported info."""
         if not capability:
             return
@@ -234,8 +285,20 @@ class HostState(object):
             # of pools in share capacity
             for pool_cap in pools:
                 pool_name = pool_cap['pool_name']
-                self._append_backend_info(pool_cap)
                 cur_pool = self.pools.get(pool_name, None)
+                if (cur_pool and changed_pools is not None and
+                        pool_name not in changed_pools and
+                        cur_pool.updated ==
+                        cur_pool.capabilities.get('timestamp')):
+                    # Neither reported differently nor consumed from since
+                    # the pool was last updated.
+                    active_pools.add(pool_name)
+                    continue
+
+                # The reported capabilities are kept by the HostManager
+                # and may be shared with later reports, don't modify them.
+                pool_cap = dict(pool_cap)
+                self._append_backend_info(pool_cap)
                 if not cur_pool:
                     # Add new pool
                     cur_pool = PoolState(self.host, pool_cap, pool_name)
@@ -376,6 +439,7 @@ class HostState(object):
 
         if self.free_capacity_gb != 'unknown':
             self.free_capacity_gb -= share['size']
+        self.provisioned_capacity_gb += share['size'] or 0
         self.updated = timeutils.utcnow()
 
     def __repr__(self):
@@ -394,18 +458,16 @@ class PoolState(HostState):
         self.pool_name = pool_name
         # No pools in pool
         self.pools = None
+        # NOTE: Pools that do not report 'provisioned_capacity_gb' have it
+        # estimated by the HostManager from share sizes in the database.
+        # The estimate is kept incrementally between periodic syncs.
+        self.provisioned_capacity_estimated = False
+        self.provisioned_capacity_synced = False
 
-    def _estimate_provisioned_capacity(self, host_name, context=None):
-        """Estimate provisioned capacity from share sizes on backend."""
-        provisioned_capacity = 0
-
-        instances = db.share_instances_get_all_by_host(
-            context, host_name, with_share_data=True)
-
-        for instance in instances:
-            # Size of share instance that's still being created, will be None.
-            provisioned_capacity += instance['size'] or 0
-        return provisioned_capacity
+    def sync_provisioned_capacity(self, provisioned_capacity_gb):
+        """Reset the estimated provisioned capacity to a known value."""
+        self.provisioned_capacity_gb = provisioned_capacity_gb
+        self.provisioned_capacity_synced = True
 
     def update_from_share_capability(
             self, capability, service=None, context=None):
@@ -430,10 +492,15 @@ class PoolState(HostState):
             # NOTE(nidhimittalhada): If 'provisioned_capacity_gb' is not set,
             # then calculating 'provisioned_capacity_gb' from share sizes
             # on host, as per information available in manila database.
-            self.provisioned_capacity_gb = capability.get(
-                'provisioned_capacity_gb') or (
-                self._estimate_provisioned_capacity(self.host,
-                                                    context=context))
+            # The HostManager computes that estimate for all pools at once,
+            # see HostManager._sync_provisioned_capacity.
+            if capability.get('provisioned_capacity_gb') is not None:
+                self.provisioned_capacity_gb = capability[
+                    'provisioned_capacity_gb']
+                self.provisioned_capacity_estimated = False
+                self.provisioned_capacity_synced = False
+            else:
+                self.provisioned_capacity_estimated = True
 
             self.max_over_subscription_ratio = capability.get(
                 'max_over_subscription_ratio',
@@ -463,7 +530,24 @@ class HostManager(object):
 
     def __init__(self):
         self.service_states = {}  # { <host>: {<service>: {cap k : v}}}
+        # Generation of the last capabilities received from each host.
+        self.service_generations = {}
+        # Pools of each host that changed since the host state was updated,
+        # None if all of them did.
+        self.service_changed_pools = {}
+        # Share services that are up, {<host>: <service>}, as of the last
+        # lookup, and the hosts of all the share services known then.
+        self.share_services = None
+        self.share_service_hosts = set()
+        self.share_services_updated_at = None
+        self.host_state_cache_hits = 0
+        self.host_state_cache_misses = 0
         self.host_state_map = {}
+        self.provisioned_capacity_synced_at = None
+        # {<capability>: {<value>: set(<pool host>)}}
+        self.pool_index = {}
+        # {<pool host>: {<capability>: <value>}}
+        self.pool_index_entries = {}
         self.filter_handler = base_host_filter.HostFilterHandler(
             'manila.scheduler.filters')
         self.filter_classes = self.filter_handler.get_all_classes()
@@ -532,10 +616,89 @@ class HostManager(object):
                            filter_class_names=None):
         """Filter hosts and return only ones passing all filters."""
         filter_classes = self._choose_host_filters(filter_class_names)
+        hosts, last_filter = self._prefilter_hosts(
+            hosts, filter_classes, filter_properties)
+        if last_filter:
+            return hosts, last_filter
         return self.filter_handler.get_filtered_objects(filter_classes,
                                                         hosts,
                                                         filter_properties)
 
+    def _get_index_requirements(self, filter_name, filter_properties):
+        """Returns the indexed capabilities a filter requires of pools.
+
+        The requirements are returned as (capability, matcher) pairs, where
+        matcher is called with an indexed value of the capability. They
+        mirror the checks done by the filter itself, so the filter still
+        has the final word on the pools that remain.
+        """
+        requirements = []
+        if filter_name == 'AvailabilityZoneFilter':
+            spec = filter_properties.get('request_spec') or {}
+            props = spec.get('resource_properties') or {}
+            availability_zone_id = props.get(
+                'availability_zone_id', spec.get('availability_zone_id'))
+            if availability_zone_id:
+                requirements.append((
+                    'availability_zone_id',
+                    functools.partial(operator.eq, availability_zone_id)))
+        elif filter_name == 'CapabilitiesFilter':
+            resource_type = filter_properties.get('resource_type') or {}
+            extra_specs = resource_type.get('extra_specs') or {}
+            for capability in INDEXED_CAPABILITIES:
+                for key in (capability, 'capabilities:' + capability):
+                    req = extra_specs.get(key)
+                    if isinstance(req, six.string_types):
+                        requirements.append((
+                            capability,
+                            functools.partial(_capability_matches, req=req)))
+        return requirements
+
+    def _get_indexed_pools(self, capability, matcher):
+        pools = set()
+        for value, hosts in self.pool_index.get(capability, {}).items():
+            if value is _UNINDEXED:
+                pools |= hosts
+                continue
+            try:
+                matches = matcher(value)
+            except Exception:
+                # Leave it to the filter to deal with the requirement.
+                matches = True
+            if matches:
+                pools |= hosts
+        return pools
+
+    def _prefilter_hosts(self, hosts, filter_classes, filter_properties):
+        """Drops the pools that indexed capabilities rule out.
+
+        Returns the remaining hosts and, if none remain, the name of the
+        filter that would have rejected all of them. Hosts that are not
+        indexed are always kept.
+        """
+        hosts = list(hosts)
+        for filter_cls in filter_classes:
+            requirements = self._get_index_requirements(
+                filter_cls.__name__, filter_properties)
+            if not requirements:
+                continue
+
+            candidates = None
+            for capability, matcher in requirements:
+                pools = self._get_indexed_pools(capability, matcher)
+                candidates = (pools if candidates is None
+                              else candidates & pools)
+
+            hosts = [host_state for host_state in hosts
+                     if host_state.host in candidates or
+                     host_state.host not in self.pool_index_entries]
+            if not hosts:
+                LOG.info("Filter %s returned 0 host(s) from the capability "
+                         "index.", filter_cls.__name__)
+                return hosts, filter_cls.__name__
+
+        return hosts, None
+
     def get_weighed_hosts(self, hosts, weight_properties,
                           weigher_class_names=None):
         """Weigh the hosts."""
@@ -548,52 +711,138 @@ class HostManager(object):
                                                        hosts,
                                                        weight_properties)
 
-    def update_service_capabilities(self, service_name, host, capabilities):
-        """Update the per-service capabilities based on this notification."""
+    def update_service_capabilities(self, service_name, host, capabilities,
+                                    generation=None, delta=False):
+        """Update the per-service capabilities based on this notification.
+
+        With 'delta' set, 'capabilities' only holds what changed since the
+        update of the previous generation, see
+        manila.scheduler.utils.get_capabilities_delta. If that update was
+        missed, the full capabilities are requested from the host.
+        """
         if service_name not in ('share',):
             LOG.debug('Ignoring %(service_name)s service update '
                       'from %(host)s',
                       {'service_name': service_name, 'host': host})
             return
 
-        # Copy the capabilities, so we don't modify the original dict
-        capability_copy = dict(capabilities)
+        if delta:
+            last_generation = self.service_generations.get(host)
+            if (host not in self.service_states or last_generation is None
+                    or generation != last_generation + 1):
+                LOG.info("Received capability changes of generation "
+                         "%(generation)s from %(host)s, while the last "
+                         "known generation is %(last)s. Requesting the "
+                         "full capabilities.",
+                         {'generation': generation, 'host': host,
+                          'last': last_generation})
+                self.service_generations.pop(host, None)
+                share_rpcapi.ShareAPI().publish_service_capabilities(
+                    manila_context.get_admin_context(), host=host)
+                return
+
+            capability_copy, changed_pools = (
+                scheduler_utils.apply_capabilities_delta(
+                    self.service_states[host], capabilities))
+            pending_pools = self.service_changed_pools.get(host, set())
+            if changed_pools is None or pending_pools is None:
+                self.service_changed_pools[host] = None
+            else:
+                self.service_changed_pools[host] = (
+                    pending_pools | changed_pools)
+        else:
+            # Copy the capabilities, so we don't modify the original dict
+            capability_copy = dict(capabilities)
+            self.service_changed_pools[host] = None
+
         capability_copy["timestamp"] = timeutils.utcnow()  # Reported time
         self.service_states[host] = capability_copy
+        self.service_generations[host] = generation
+
+        if host not in self.share_service_hosts:
+            # A new share service, look the share services up again.
+            self.share_services_updated_at = None
 
         LOG.debug("Received %(service_name)s service update from "
                   "%(host)s: %(cap)s",
                   {'service_name': service_name, 'host': host,
                    'cap': capabilities})
 
-    def _update_host_state_map(self, context):
+    def get_host_state_cache_stats(self):
+        """Returns how often the cached share services could be used."""
+        return {
+            'hits': self.host_state_cache_hits,
+            'misses': self.host_state_cache_misses,
+        }
 
-        # Get resource usage across the available share nodes:
-        topic = CONF.share_topic
-        share_services = db.service_get_all_by_topic(context, topic)
+    def _get_share_services(self, context):
+        """Returns the share services that are up.
 
-        active_hosts = set()
+        The share services are looked up in the database at most once per
+        'scheduler_service_cache_ttl' seconds. Also returns whether they
+        were looked up.
+        """
+        ttl = CONF.scheduler_service_cache_ttl
+        if (ttl and self.share_services is not None and
+                self.share_services_updated_at is not None and
+                not timeutils.is_older_than(self.share_services_updated_at,
+                                            ttl)):
+            self.host_state_cache_hits += 1
+            return self.share_services, False
+
+        self.host_state_cache_misses += 1
+        share_services = db.service_get_all_by_topic(
+            context, CONF.share_topic)
+
+        self.share_services = {}
+        self.share_service_hosts = set()
         for service in share_services:
             host = service['host']
+            self.share_service_hosts.add(host)
 
-            # Warn about down services and remove them from host_state_map
+            # Warn about down services, they are removed from host_state_map
             if not utils.service_is_up(service) or service['disabled']:
                 LOG.warning("Share service is down. (host: %s).", host)
                 continue
+            self.share_services[host] = dict(service.items())
+        self.share_services_updated_at = timeutils.utcnow()
+
+        LOG.debug("Looked up %(count)d share services, host state cache "
+                  "hits: %(hits)d, misses: %(misses)d.",
+                  {'count': len(share_services),
+                   'hits': self.host_state_cache_hits,
+                   'misses': self.host_state_cache_misses})
+        return self.share_services, True
+
+    def _update_host_state_map(self, context):
+
+        # Get resource usage across the available share nodes:
+        share_services, refreshed = self._get_share_services(context)
+
+        active_hosts = set()
+        for host, service in share_services.items():
+            host_state = self.host_state_map.get(host)
+            if (host_state and not refreshed and
+                    host not in self.service_changed_pools):
+                # Neither the service nor its capabilities changed.
+                active_hosts.add(host)
+                continue
 
             # Create and register host_state if not in host_state_map
             capabilities = self.service_states.get(host, None)
-            host_state = self.host_state_map.get(host)
+            changed_pools = self.service_changed_pools.pop(host, set())
             if not host_state:
                 host_state = self.host_state_cls(
                     host,
                     capabilities=capabilities,
-                    service=dict(service.items()))
+                    service=service)
                 self.host_state_map[host] = host_state
+                changed_pools = None
 
             # Update capabilities and attributes in host_state
             host_state.update_from_share_capability(
-                capabilities, service=dict(service.items()), context=context)
+                capabilities, service=service, context=context,
+                changed_pools=changed_pools)
             active_hosts.add(host)
 
         # remove non-active hosts from host_state_map
@@ -603,6 +852,43 @@ class HostManager(object):
                      "scheduler cache.", {'host': host})
             self.host_state_map.pop(host, None)
 
+        self._sync_provisioned_capacity(context)
+
+    def _sync_provisioned_capacity(self, context):
+        """Check estimated provisioned capacity of pools against the DB.
+
+        Pools that do not report 'provisioned_capacity_gb' have it tracked
+        incrementally by the scheduler as shares are placed on them. Since
+        deleted and resized shares are not seen by the scheduler, the
+        estimates are periodically replaced with share sizes summed in a
+        single database query for all pools. Pools that have never been
+        synced, e.g. newly reported ones, trigger a sync as well.
+        """
+        estimated_pools = [
+            pool for host_state in self.host_state_map.values()
+            for pool in host_state.pools.values()
+            if pool.provisioned_capacity_estimated]
+        if not estimated_pools:
+            return
+
+        interval = CONF.scheduler_provisioned_capacity_sync_interval
+        sync_due = (
+            self.provisioned_capacity_synced_at is None or
+            timeutils.is_older_than(self.provisioned_capacity_synced_at,
+                                    interval) or
+            not all(pool.provisioned_capacity_synced
+                    for pool in estimated_pools))
+        if not sync_due:
+            return
+
+        sizes = db.share_instance_sizes_sum_by_host(context)
+        for pool in estimated_pools:
+            pool.sync_provisioned_capacity(sizes.get(pool.host, 0))
+        self.provisioned_capacity_synced_at = timeutils.utcnow()
+
+        LOG.debug("Synced estimated provisioned capacity of %d pools "
+                  "from the database.", len(estimated_pools))
+
     def get_all_host_states_share(self, context):
         """Returns a dict of all the hosts the HostManager knows about.
 
@@ -624,8 +910,55 @@ class HostManager(object):
                 pool_key = '.'.join([host, pool.pool_name])
                 all_pools[pool_key] = pool
 
+        self._update_pool_index(all_pools.values())
+
         return all_pools.values()
 
+    def _get_pool_index_entries(self, pool):
+        entries = {
+            'availability_zone_id': pool.service.get('availability_zone_id'),
+        }
+        for capability in INDEXED_CAPABILITIES:
+            value = pool.capabilities.get(capability)
+            if isinstance(value, list):
+                value = tuple(value)
+            try:
+                hash(value)
+            except TypeError:
+                value = _UNINDEXED
+            entries[capability] = value
+        return entries
+
+    def _remove_from_pool_index(self, pool_host):
+        entries = self.pool_index_entries.pop(pool_host, {})
+        for capability, value in entries.items():
+            pool_hosts = self.pool_index[capability][value]
+            pool_hosts.discard(pool_host)
+            if not pool_hosts:
+                del self.pool_index[capability][value]
+
+    def _update_pool_index(self, pools):
+        """Keeps the capability index in line with the reported pools.
+
+        Only pools whose indexed capabilities changed since the previous
+        update are re-indexed, and pools no longer reported are removed.
+        """
+        active_pools = set()
+        for pool in pools:
+            active_pools.add(pool.host)
+            entries = self._get_pool_index_entries(pool)
+            if self.pool_index_entries.get(pool.host) == entries:
+                continue
+
+            self._remove_from_pool_index(pool.host)
+            for capability, value in entries.items():
+                self.pool_index.setdefault(capability, {}).setdefault(
+                    value, set()).add(pool.host)
+            self.pool_index_entries[pool.host] = entries
+
+        for pool_host in set(self.pool_index_entries) - active_pools:
+            self._remove_from_pool_index(pool_host)
+
     def get_pools(self, context, filters=None):
         """Returns a dict of all pools on all hosts HostManager knows about."""
         self._update_host_state_map(context)
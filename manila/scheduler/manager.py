@@ -62,7 +62,7 @@ MAPPING = {
 class SchedulerManager(manager.Manager):
     """Chooses a host to create shares."""
 
-    RPC_API_VERSION = '1.8'
+    RPC_API_VERSION = '1.10'
 
     def __init__(self, scheduler_driver=None, service_name=None,
                  *args, **kwargs):
@@ -96,13 +96,16 @@ class SchedulerManager(manager.Manager):
         return self.driver.get_service_capabilities()
 
     def update_service_capabilities(self, context, service_name=None,
-                                    host=None, capabilities=None, **kwargs):
+                                    host=None, capabilities=None,
+                                    generation=None, delta=False, **kwargs):
         """Process a capability update from a service node."""
         if capabilities is None:
             capabilities = {}
         self.driver.update_service_capabilities(service_name,
                                                 host,
-                                                capabilities)
+                                                capabilities,
+                                                generation=generation,
+                                                delta=delta)
 
     def create_share_instance(self, context, request_spec=None,
                               filter_properties=None):
@@ -120,6 +123,23 @@ class SchedulerManager(manager.Manager):
                     'create_share', {'status': constants.STATUS_ERROR},
                     context, ex, request_spec)
 
+    def create_share_instances(self, context, request_specs=None,
+                               filter_properties=None):
+        """Schedules a batch of shares.
+
+        Shares that cannot be scheduled are set to error, without keeping
+        the rest of the batch from being scheduled.
+        """
+        failures = self.driver.schedule_create_shares(
+            context, request_specs or [], filter_properties)
+        for request_spec, ex in failures:
+            action = None
+            if isinstance(ex, exception.NoValidHost):
+                action = message_field.Action.ALLOCATE_HOST
+            self._set_share_state_and_notify(
+                'create_share', {'status': constants.STATUS_ERROR},
+                context, ex, request_spec, action)
+
     def get_pools(self, context, filters=None):
         """Get active pools from the scheduler's cache."""
         return self.driver.get_pools(context, filters)
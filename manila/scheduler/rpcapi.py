@@ -40,9 +40,11 @@ class SchedulerAPI(object):
         1.6 - Add manage_share
         1.7 - Updated migrate_share_to_host method with new parameters
         1.8 - Rename create_consistency_group -> create_share_group method
+        1.9 - Add generation and delta to update_service_capabilities
+        1.10 - Add create_share_instances method
     """
 
-    RPC_API_VERSION = '1.8'
+    RPC_API_VERSION = '1.10'
 
     def __init__(self):
         super(SchedulerAPI, self).__init__()
@@ -59,15 +61,36 @@ class SchedulerAPI(object):
                                  request_spec=request_spec_p,
                                  filter_properties=filter_properties)
 
+    def create_share_instances(self, context, request_specs,
+                               filter_properties=None):
+        request_specs_p = jsonutils.to_primitive(request_specs)
+        call_context = self.client.prepare(version='1.10')
+        return call_context.cast(context,
+                                 'create_share_instances',
+                                 request_specs=request_specs_p,
+                                 filter_properties=filter_properties)
+
     def update_service_capabilities(self, context,
                                     service_name, host,
-                                    capabilities):
-        call_context = self.client.prepare(fanout=True, version='1.0')
+                                    capabilities, generation=None,
+                                    delta=False):
+        if generation is None:
+            call_context = self.client.prepare(fanout=True, version='1.0')
+            call_context.cast(context,
+                              'update_service_capabilities',
+                              service_name=service_name,
+                              host=host,
+                              capabilities=capabilities)
+            return
+
+        call_context = self.client.prepare(fanout=True, version='1.9')
         call_context.cast(context,
                           'update_service_capabilities',
                           service_name=service_name,
                           host=host,
-                          capabilities=capabilities)
+                          capabilities=capabilities,
+                          generation=generation,
+                          delta=delta)
 
     def get_pools(self, context, filters=None):
         call_context = self.client.prepare(version='1.1')
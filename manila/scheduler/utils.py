@@ -167,3 +167,119 @@ def capabilities_satisfied(capabilities, extra_specs):
                       {'key': key, 'req': req, 'cap': cap})
             return False
     return True
+
+
+def _get_pools_by_name(capabilities):
+    pools = capabilities.get('pools')
+    if not isinstance(pools, list):
+        return None
+    try:
+        return {pool['pool_name']: pool for pool in pools}
+    except (KeyError, TypeError):
+        return None
+
+
+def _get_dict_delta(old, new):
+    updated = {key: value for key, value in new.items()
+               if key not in old or old[key] != value}
+    removed = [key for key in old if key not in new]
+    return updated, removed
+
+
+def get_capabilities_delta(old_capabilities, new_capabilities):
+    """Returns what changed between two capability reports of a service.
+
+    The delta looks like this::
+
+        delta = {
+            'updated': {<key>: <value>},      # backend level keys
+            'removed': [<key>],               # that changed or went away
+            'pools': {
+                'updated': {<pool_name>: {<key>: <value>}},
+                'removed': {<pool_name>: [<key>]},
+                'deleted': [<pool_name>],
+            },
+        }
+
+    Pools new in the report are part of 'updated' with all their keys.
+    Returns None if the reports cannot be compared, e.g. if either is not
+    a dict, in which case the full report has to be sent instead.
+    """
+    if not (isinstance(old_capabilities, dict) and
+            isinstance(new_capabilities, dict)):
+        return None
+
+    old_pools = _get_pools_by_name(old_capabilities)
+    new_pools = _get_pools_by_name(new_capabilities)
+    if old_pools is None or new_pools is None:
+        # Legacy drivers that do not report pools, compare the reports as
+        # a whole.
+        old_pools = new_pools = {}
+    else:
+        old_capabilities = dict(old_capabilities)
+        new_capabilities = dict(new_capabilities)
+        del old_capabilities['pools']
+        del new_capabilities['pools']
+
+    updated, removed = _get_dict_delta(old_capabilities, new_capabilities)
+    delta = {
+        'updated': updated,
+        'removed': removed,
+        'pools': {'updated': {}, 'removed': {}, 'deleted': []},
+    }
+    for pool_name, pool in new_pools.items():
+        updated, removed = _get_dict_delta(old_pools.get(pool_name, {}), pool)
+        if updated:
+            delta['pools']['updated'][pool_name] = updated
+        if removed:
+            delta['pools']['removed'][pool_name] = removed
+    delta['pools']['deleted'] = [
+        pool_name for pool_name in old_pools if pool_name not in new_pools]
+    return delta
+
+
+def apply_capabilities_delta(capabilities, delta):
+    """Applies a delta from get_capabilities_delta to a capability report.
+
+    The given report is not modified, pools that did not change are shared
+    between the given and the returned report.
+
+    :returns: a tuple of the updated report and the set of names of pools
+              that changed, or None if the backend level capabilities, that
+              all pools inherit, changed.
+    """
+    capabilities = dict(capabilities)
+    for key in delta.get('removed', []):
+        capabilities.pop(key, None)
+    capabilities.update(delta.get('updated', {}))
+    changed_pools = None
+    if not (delta.get('updated') or delta.get('removed')):
+        changed_pools = set()
+
+    pools_delta = delta.get('pools') or {}
+    updated = pools_delta.get('updated') or {}
+    removed = pools_delta.get('removed') or {}
+    deleted = set(pools_delta.get('deleted') or [])
+    if not (updated or removed or deleted):
+        return capabilities, changed_pools
+
+    pools = []
+    for pool in capabilities.get('pools') or []:
+        pool_name = pool['pool_name']
+        if pool_name in deleted:
+            continue
+        if pool_name in updated or pool_name in removed:
+            pool = dict(pool)
+            for key in removed.get(pool_name, []):
+                pool.pop(key, None)
+            pool.update(updated.get(pool_name, {}))
+        pools.append(pool)
+    known_pools = set(pool['pool_name'] for pool in pools)
+    for pool_name, pool in updated.items():
+        if pool_name not in known_pools:
+            pools.append(dict(pool, pool_name=pool_name))
+    capabilities['pools'] = pools
+
+    if changed_pools is not None:
+        changed_pools.update(updated, removed)
+    return capabilities, changed_pools
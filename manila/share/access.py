@@ -13,7 +13,6 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import copy
 import ipaddress
 
 from oslo_log import log
@@ -135,28 +134,10 @@ class ShareInstanceAccessDatabaseMixin(object):
             context, share_instance_id, filters=filters)
 
         if instance_rules and (updates or conditionally_change):
-            if not updates:
-                updates = {}
-            if not conditionally_change:
-                conditionally_change = {}
-            for rule in instance_rules:
-                mapping_state = rule['state']
-                rule_updates = copy.deepcopy(updates)
-                try:
-                    rule_updates['state'] = conditionally_change[mapping_state]
-                except KeyError:
-                    pass
-                if rule_updates:
-                    self.db.share_instance_access_update(
-                        context, rule['access_id'], share_instance_id,
-                        rule_updates)
-
-            # Refresh the rules after the updates
-            rules_to_get = {
-                'access_id': tuple([i['access_id'] for i in instance_rules]),
-            }
-            instance_rules = self.db.share_access_get_all_for_instance(
-                context, share_instance_id, filters=rules_to_get)
+            instance_rules = self.db.share_instance_access_update_all(
+                context, share_instance_id,
+                [rule['access_id'] for rule in instance_rules],
+                updates=updates, conditionally_change=conditionally_change)
 
         return instance_rules
 
@@ -211,12 +192,8 @@ class ShareInstanceAccessDatabaseMixin(object):
                 }
                 LOG.debug(msg, msg_payload)
         if updates:
-            self.db.share_instance_access_update(
-                context, rule_id, share_instance_id, updates)
-
-            # Refresh the rule after update
-            instance_rule_mapping = self.db.share_instance_access_get(
-                context, rule_id, share_instance_id)
+            instance_rule_mapping = self.db.share_instance_access_update_all(
+                context, share_instance_id, [rule_id], updates=updates)[0]
 
         return instance_rule_mapping
 
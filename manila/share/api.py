@@ -56,6 +56,17 @@ LOG = log.getLogger(__name__)
 GB = 1048576 * 1024
 QUOTAS = quota.QUOTAS
 
+# Search options for shares that are applied by the database, in addition to
+# export locations, metadata and extra specs.
+SHARE_DB_SEARCH_OPTS = (
+    'display_name', 'display_description', 'display_name~',
+    'display_description~', 'snapshot_id', 'share_group_id', 'project_id',
+    'user_id', 'share_proto', 'task_state',
+    'source_share_group_snapshot_member_id', 'status', 'host',
+    'share_type_id', 'share_network_id', 'access_rules_status',
+    'availability_zone',
+)
+
 
 class API(base.Base):
     """API for interacting with the share manager."""
@@ -1467,7 +1478,12 @@ class API(base.Base):
         return rv
 
     def get_all(self, context, search_opts=None, sort_key='created_at',
-                sort_dir='desc'):
+                sort_dir='desc', limit=None, offset=None, marker=None):
+        """Returns a sorted page of shares that satisfy search options.
+
+        Pagination is done by the database when all search options can be
+        applied there, otherwise shares are filtered and paginated here.
+        """
         policy.check_policy(context, 'share', 'get_all')
 
         if search_opts is None:
@@ -1509,22 +1525,42 @@ class API(base.Base):
         is_public = search_opts.pop('is_public', False)
         is_public = strutils.bool_from_string(is_public, strict=True)
 
-        # Get filtered list of shares
         if 'host' in search_opts:
             policy.check_policy(context, 'share', 'list_by_host')
+        for key in SHARE_DB_SEARCH_OPTS:
+            if isinstance(search_opts.get(key), six.string_types):
+                filters[key] = search_opts.pop(key)
+
+        # NOTE: options left in search_opts once those applied by the
+        # database are popped have to be filtered here, which requires
+        # shares to be limited here as well. The marker is still applied by
+        # the database, which finds the marker share even if it does not
+        # match the search options anymore.
+        pagination = {k: v for k, v in (('limit', limit), ('offset', offset),
+                                        ('marker', marker)) if v is not None}
+        python_filters = set(search_opts) - {'share_server_id',
+                                             'all_tenants'}
+        db_pagination = pagination
+        if python_filters:
+            db_pagination = {k: v for k, v in pagination.items()
+                             if k == 'marker'}
+
+        # Get filtered list of shares
         if 'share_server_id' in search_opts:
             # NOTE(vponomaryov): this is project_id independent
             policy.check_policy(context, 'share', 'list_by_share_server_id')
             shares = self.db.share_get_all_by_share_server(
                 context, search_opts.pop('share_server_id'), filters=filters,
-                sort_key=sort_key, sort_dir=sort_dir)
+                sort_key=sort_key, sort_dir=sort_dir, **db_pagination)
         elif (context.is_admin and 'all_tenants' in search_opts):
             shares = self.db.share_get_all(
-                context, filters=filters, sort_key=sort_key, sort_dir=sort_dir)
+                context, filters=filters, sort_key=sort_key, sort_dir=sort_dir,
+                **db_pagination)
         else:
             shares = self.db.share_get_all_by_project(
                 context, project_id=context.project_id, filters=filters,
-                is_public=is_public, sort_key=sort_key, sort_dir=sort_dir)
+                is_public=is_public, sort_key=sort_key, sort_dir=sort_dir,
+                **db_pagination)
 
         # NOTE(vponomaryov): we do not need 'all_tenants' opt anymore
         search_opts.pop('all_tenants', None)
@@ -1537,7 +1573,7 @@ class API(base.Base):
                         if k.endswith('~') and s.get(k.rstrip('~')) else ()))
                         for k, v in search_opts.items())):
                     results.append(s)
-            shares = results
+            shares = utils.paginate_list(results, limit=limit, offset=offset)
         return shares
 
     def get_snapshot(self, context, snapshot_id):
@@ -1545,7 +1581,13 @@ class API(base.Base):
         return self.db.share_snapshot_get(context, snapshot_id)
 
     def get_all_snapshots(self, context, search_opts=None,
-                          sort_key='share_id', sort_dir='desc'):
+                          sort_key='share_id', sort_dir='desc', limit=None,
+                          offset=None, marker=None):
+        """Returns a sorted page of snapshots that satisfy search options.
+
+        Pagination is done by the database when all search options can be
+        applied there, otherwise snapshots are filtered and paginated here.
+        """
         policy.check_policy(context, 'share_snapshot', 'get_all_snapshots')
 
         search_opts = search_opts or {}
@@ -1562,14 +1604,28 @@ class API(base.Base):
                         "'%(v)s'.") % {'k': k, 'v': string_args[k]}
                 raise exception.InvalidInput(reason=msg)
 
+        # NOTE: only the 'usage' search option is applied by the database,
+        # snapshots have to be limited here if any other is present. The
+        # marker is still applied by the database, which finds the marker
+        # snapshot even if it does not match the search options anymore.
+        pagination = {k: v for k, v in (('limit', limit), ('offset', offset),
+                                        ('marker', marker)) if v is not None}
+        db_pagination = pagination
+        if set(search_opts) - {'usage'}:
+            db_pagination = {k: v for k, v in pagination.items()
+                             if k == 'marker'}
+
+        # NOTE: Snapshots without instances are not listed, they are left
+        # out by the database so that pages are not short.
+        filters = dict(search_opts, has_instances=True)
         if (context.is_admin and all_tenants):
             snapshots = self.db.share_snapshot_get_all(
-                context, filters=search_opts,
-                sort_key=sort_key, sort_dir=sort_dir)
+                context, filters=filters,
+                sort_key=sort_key, sort_dir=sort_dir, **db_pagination)
         else:
             snapshots = self.db.share_snapshot_get_all_by_project(
-                context, context.project_id, filters=search_opts,
-                sort_key=sort_key, sort_dir=sort_dir)
+                context, context.project_id, filters=filters,
+                sort_key=sort_key, sort_dir=sort_dir, **db_pagination)
 
         # Remove key 'usage' if provided
         search_opts.pop('usage', None)
@@ -1584,7 +1640,8 @@ class API(base.Base):
                         snapshot.get(k.rstrip('~')) else ())
                         for k, v in search_opts.items())):
                     results.append(snapshot)
-            snapshots = results
+            snapshots = utils.paginate_list(
+                results, limit=limit, offset=offset)
         return snapshots
 
     def get_latest_snapshot_for_share(self, context, share_id):
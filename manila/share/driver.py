@@ -76,6 +76,13 @@ share_opts = [
         default=['lost+found'],
         help="List of files and folders to be ignored when migrating shares. "
              "Items should be names (not including any path)."),
+    cfg.BoolOpt(
+        'migration_host_assisted_precopy',
+        default=False,
+        help="Chooses whether host-assisted migrations copy the share data "
+             "while the share is still writable, and only cast its access "
+             "rules to read-only for a final copy of what changed since. "
+             "This shortens the time the share is read-only."),
     cfg.StrOpt(
         'share_mount_template',
         default='mount -vt %(proto)s %(options)s %(export)s %(path)s',
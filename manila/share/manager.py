@@ -23,7 +23,11 @@ import copy
 import datetime
 import functools
 import hashlib
+import os
+import random
+import time
 
+import eventlet
 from oslo_config import cfg
 from oslo_log import log
 from oslo_serialization import jsonutils
@@ -122,6 +126,70 @@ share_manager_opts = [
                      'configured, this option must be set to False. '
                      'If set to False - gathering share usage size will be'
                      ' disabled.'),
+    cfg.IntOpt('share_usage_size_chunk_size',
+               default=500,
+               min=1,
+               help='Number of share instances handed to the driver at once '
+                    'when gathering share usage sizes.'),
+    cfg.BoolOpt('share_usage_size_spread_chunks',
+                default=False,
+                help='If set to True, the chunks of share instances whose '
+                     'usage size is gathered are spread over '
+                     '"share_usage_size_update_interval", based on the number '
+                     'of chunks the last time, instead of being handed to '
+                     'the driver one after another. Other periodic tasks of '
+                     'the share manager wait while the chunks are spread, '
+                     'unless "update_share_usage_size" is listed in '
+                     '"periodic_task_offload".'),
+    cfg.IntOpt('ensure_shares_max_workers',
+               default=8,
+               min=1,
+               help='Maximum number of share instances the share manager '
+                    'ensures at the same time on startup, when reapplying '
+                    'their access rules or when the driver ensures one share '
+                    'at a time.'),
+    cfg.FloatOpt('access_update_coalesce_window',
+                 default=0,
+                 min=0,
+                 help='Time, in seconds, for which the share manager waits '
+                      'before updating the access rules of a share instance, '
+                      'so that the access rule changes requested in the '
+                      'meantime for the same share instance are applied with '
+                      'a single call to the driver. By default (0), the '
+                      'access rules are updated as soon as each change is '
+                      'requested. Set to a positive value, such as 0.5, to '
+                      'coalesce the changes that arrive in bursts.'),
+    cfg.IntOpt('access_update_max_workers',
+               default=8,
+               min=1,
+               help='Maximum number of share instances whose access rules '
+                    'the share manager updates at the same time, when '
+                    '"access_update_coalesce_window" is set.'),
+    cfg.ListOpt('periodic_task_offload',
+                default=[],
+                help='Names of the periodic tasks of the share manager, such '
+                     'as "update_share_usage_size", that run on a pool of '
+                     'workers instead of on the green thread running all the '
+                     'periodic tasks, so that they do not delay the other '
+                     'periodic tasks. A run of an offloaded task is skipped '
+                     'while its previous run is still in progress.'),
+    cfg.IntOpt('periodic_task_workers',
+               default=4,
+               min=1,
+               help='Maximum number of offloaded periodic tasks of the share '
+                    'manager running at the same time.'),
+    cfg.IntOpt('periodic_task_jitter',
+               default=0,
+               min=0,
+               help='Maximum random delay, in seconds, before each run of an '
+                    'offloaded periodic task, so that the periodic tasks of '
+                    'many backends do not hit the database and the storage '
+                    'at the same time. Set to 0 to disable.'),
+    cfg.StrOpt('periodic_task_stats_file',
+               help='Path of a file to which the share manager writes, as '
+                    'JSON, the statistics of its periodic tasks after each '
+                    'of their runs. Unset by default, in which case the '
+                    'statistics are only logged.'),
 ]
 
 CONF = cfg.CONF
@@ -129,6 +197,10 @@ CONF.register_opts(share_manager_opts)
 CONF.import_opt('periodic_hooks_interval', 'manila.share.hook')
 CONF.import_opt('periodic_interval', 'manila.service')
 
+# Number of share instances whose snapshots are looked up at once when the
+# share instances are ensured on startup.
+ENSURE_SHARES_CHUNK_SIZE = 500
+
 # Drivers that need to change module paths or class names can add their
 # old/new path here to maintain backward compatibility.
 MAPPING = {
@@ -207,10 +279,24 @@ def add_hooks(f):
     return wrapped
 
 
+def track_periodic_task(f):
+    """Periodic task decorator recording the statistics of its runs
+
+    Also runs the periodic task on the pool of workers of the share manager
+    if it is listed in the "periodic_task_offload" option. A periodic task
+    may return the number of items it handled, which is recorded as well.
+    """
+    @functools.wraps(f)
+    def wrapped(self, context):
+        return self._run_periodic_task(f, context)
+
+    return wrapped
+
+
 class ShareManager(manager.SchedulerDependentManager):
     """Manages NAS storages."""
 
-    RPC_API_VERSION = '1.18'
+    RPC_API_VERSION = '1.20'
 
     def __init__(self, share_driver=None, service_name=None, *args, **kwargs):
         """Load the driver from args, or from flags."""
@@ -245,6 +331,23 @@ class ShareManager(manager.SchedulerDependentManager):
         self.migration_wait_access_rules_timeout = (
             CONF.migration_wait_access_rules_timeout)
 
+        # Access rule updates waiting for the coalescing window to end,
+        # {<share instance id>: <number of requests>}.
+        self._pending_access_updates = {}
+        self._access_update_pool = eventlet.GreenPool(
+            self.configuration.safe_get('access_update_max_workers'))
+        self._access_update_requests = 0
+        self._access_update_batches = 0
+        self._access_update_batched_requests = 0
+        self._access_update_max_batch_size = 0
+        # Number of chunks of share instances that were handed to the
+        # driver the last time share usage sizes were gathered.
+        self._share_usage_size_chunks = 0
+        self._periodic_task_pool = eventlet.GreenPool(
+            self.configuration.safe_get('periodic_task_workers'))
+        self._periodic_task_stats = {}
+        self._running_periodic_tasks = set()
+
         self.message_api = message_api.API()
         self.hooks = []
         self._init_hook_drivers()
@@ -317,6 +420,11 @@ class ShareManager(manager.SchedulerDependentManager):
             (self.driver.service_instance_manager.network_helper.
              setup_connectivity_with_service_instances())
 
+        # NOTE: Publish the capabilities before ensuring the shares, which
+        # can take long on backends with many shares, so that new shares
+        # can be scheduled to this backend meanwhile.
+        self.publish_service_capabilities(ctxt)
+
         self.ensure_driver_resources(ctxt)
 
         self.publish_service_capabilities(ctxt)
@@ -356,19 +464,18 @@ class ShareManager(manager.SchedulerDependentManager):
                 {'host': self.host})
             return
 
+        stopwatch = timeutils.StopWatch().start()
         share_instances = self.db.share_instances_get_all_by_host(
-            ctxt, self.host)
+            ctxt, self.host, with_share_data=True)
         LOG.debug("Re-exporting %s shares", len(share_instances))
 
         for share_instance in share_instances:
-            share_ref = self.db.share_get(ctxt, share_instance['share_id'])
-
-            if share_ref.is_busy:
+            if share_instance['task_state'] in constants.BUSY_TASK_STATES:
                 LOG.info(
                     "Share instance %(id)s: skipping export, "
                     "because it is busy with an active task: %(task)s.",
                     {'id': share_instance['id'],
-                     'task': share_ref['task_state']},
+                     'task': share_instance['task_state']},
                 )
                 continue
 
@@ -381,11 +488,16 @@ class ShareManager(manager.SchedulerDependentManager):
                 )
                 continue
 
-            self._ensure_share_instance_has_pool(ctxt, share_instance)
-            share_instance = self.db.share_instance_get(
-                ctxt, share_instance['id'], with_share_data=True)
+            pool = share_utils.extract_host(share_instance['host'], 'pool')
+            if pool is None and self._ensure_share_instance_has_pool(
+                    ctxt, share_instance):
+                # The host of the share instance was updated with the pool.
+                share_instance = self.db.share_instance_get(
+                    ctxt, share_instance['id'], with_share_data=True)
             update_share_instances.append(share_instance)
+        timings = {'load': stopwatch.elapsed()}
 
+        stopwatch.restart()
         try:
             update_share_instances = self.driver.ensure_shares(
                 ctxt, update_share_instances)
@@ -395,90 +507,144 @@ class ShareManager(manager.SchedulerDependentManager):
                               "share instances.")
             else:
                 self._ensure_share(ctxt, update_share_instances)
+        timings['driver'] = stopwatch.elapsed()
 
         if new_backend_info:
             self.db.backend_info_update(
                 ctxt, self.host, new_backend_info_hash)
 
-        for share_instance in share_instances:
-            if share_instance['id'] not in update_share_instances:
-                continue
-            if update_share_instances[share_instance['id']].get('status'):
+        stopwatch.restart()
+        share_instances = [
+            share_instance for share_instance in share_instances
+            if share_instance['id'] in update_share_instances]
+        workers = eventlet.GreenPool(
+            self.configuration.safe_get('ensure_shares_max_workers'))
+        for i in range(0, len(share_instances), ENSURE_SHARES_CHUNK_SIZE):
+            chunk = share_instances[i:i + ENSURE_SHARES_CHUNK_SIZE]
+            snapshot_instances_to_update = (
+                self._get_snapshot_instances_with_pending_rules(ctxt, chunk))
+            for share_instance in chunk:
+                workers.spawn_n(
+                    self._ensure_share_instance_access, ctxt, share_instance,
+                    update_share_instances[share_instance['id']],
+                    snapshot_instances_to_update.get(share_instance['id'],
+                                                     []))
+            workers.waitall()
+            LOG.info("Ensured %(count)d of %(total)d share instances of "
+                     "host %(host)s.",
+                     {'count': i + len(chunk), 'total': len(share_instances),
+                      'host': self.host})
+        timings['access'] = stopwatch.elapsed()
+
+        LOG.info("Ensured share instances of host %(host)s: loading took "
+                 "%(load).2fs, the driver took %(driver).2fs and the access "
+                 "rules took %(access).2fs.",
+                 dict(timings, host=self.host))
+
+    def _get_snapshot_instances_with_pending_rules(self, ctxt,
+                                                   share_instances):
+        """Returns the snapshot instances whose access rules need updates.
+
+        :returns: dict -- {<share instance id>: [<snapshot instance id>]}
+        """
+        snapshot_instances = (
+            self.db.share_snapshot_instance_get_all_with_filters(
+                ctxt, {'share_instance_ids': [
+                    share_instance['id']
+                    for share_instance in share_instances]}))
+        if not snapshot_instances:
+            return {}
+
+        # NOTE(ganso): We don't invoke update_access for snapshots if
+        # we don't have invalid rules or pending updates
+        pending_rules = (
+            self.db.share_snapshot_access_get_all_for_snapshot_instances(
+                ctxt, [snap_instance['id']
+                       for snap_instance in snapshot_instances],
+                filters={'state': (constants.ACCESS_STATE_DENYING,
+                                   constants.ACCESS_STATE_QUEUED_TO_DENY,
+                                   constants.ACCESS_STATE_APPLYING,
+                                   constants.ACCESS_STATE_QUEUED_TO_APPLY)}))
+        pending_snapshot_instance_ids = set(
+            rule['share_snapshot_instance_id'] for rule in pending_rules)
+
+        snapshot_instances_to_update = {}
+        for snap_instance in snapshot_instances:
+            if snap_instance['id'] in pending_snapshot_instance_ids:
+                snapshot_instances_to_update.setdefault(
+                    snap_instance['share_instance_id'], []).append(
+                    snap_instance['id'])
+        return snapshot_instances_to_update
+
+    def _ensure_share_instance_access(self, ctxt, share_instance,
+                                      share_instance_update,
+                                      snapshot_instance_ids):
+        try:
+            if share_instance_update.get('status'):
                 self.db.share_instance_update(
                     ctxt, share_instance['id'],
-                    {'status': (
-                        update_share_instances[share_instance['id']].
-                        get('status')),
+                    {'status': share_instance_update.get('status'),
                      'host': share_instance['host']}
                 )
 
-            update_export_location = (
-                update_share_instances[share_instance['id']]
-                .get('export_locations'))
+            update_export_location = share_instance_update.get(
+                'export_locations')
             if update_export_location:
                 self.db.share_export_locations_update(
                     ctxt, share_instance['id'], update_export_location)
 
             share_server = self._get_share_server(ctxt, share_instance)
+        except Exception:
+            LOG.exception("Unexpected error occurred while ensuring share "
+                          "instance %s.", share_instance['id'])
+            return
 
-            if share_instance['access_rules_status'] != (
-                    constants.STATUS_ACTIVE):
-                try:
-                    # Cast any existing 'applying' rules to 'new'
-                    self.access_helper.reset_applying_rules(
-                        ctxt, share_instance['id'])
-                    self.access_helper.update_access_rules(
-                        ctxt, share_instance['id'], share_server=share_server)
-                except Exception:
-                    LOG.exception(
-                        ("Unexpected error occurred while updating access "
-                         "rules for share instance %(s_id)s."),
-                        {'s_id': share_instance['id']},
-                    )
+        if share_instance['access_rules_status'] != (
+                constants.STATUS_ACTIVE):
+            try:
+                # Cast any existing 'applying' rules to 'new'
+                self.access_helper.reset_applying_rules(
+                    ctxt, share_instance['id'])
+                self.access_helper.update_access_rules(
+                    ctxt, share_instance['id'], share_server=share_server)
+            except Exception:
+                LOG.exception(
+                    ("Unexpected error occurred while updating access "
+                     "rules for share instance %(s_id)s."),
+                    {'s_id': share_instance['id']},
+                )
 
-            snapshot_instances = (
-                self.db.share_snapshot_instance_get_all_with_filters(
-                    ctxt, {'share_instance_ids': share_instance['id']},
-                    with_share_data=True))
-
-            for snap_instance in snapshot_instances:
-
-                rules = (
-                    self.db.
-                    share_snapshot_access_get_all_for_snapshot_instance(
-                        ctxt, snap_instance['id']))
-
-                # NOTE(ganso): We don't invoke update_access for snapshots if
-                # we don't have invalid rules or pending updates
-                if any(r['state'] in (constants.ACCESS_STATE_DENYING,
-                                      constants.ACCESS_STATE_QUEUED_TO_DENY,
-                                      constants.ACCESS_STATE_APPLYING,
-                                      constants.ACCESS_STATE_QUEUED_TO_APPLY)
-                       for r in rules):
-                    try:
-                        self.snapshot_access_helper.update_access_rules(
-                            ctxt, snap_instance['id'], share_server)
-                    except Exception:
-                        LOG.exception(
-                            "Unexpected error occurred while updating "
-                            "access rules for snapshot instance %s.",
-                            snap_instance['id'])
+        for snap_instance_id in snapshot_instance_ids:
+            try:
+                self.snapshot_access_helper.update_access_rules(
+                    ctxt, snap_instance_id, share_server)
+            except Exception:
+                LOG.exception(
+                    "Unexpected error occurred while updating "
+                    "access rules for snapshot instance %s.",
+                    snap_instance_id)
 
     def _ensure_share(self, ctxt, share_instances):
+        workers = eventlet.GreenPool(
+            self.configuration.safe_get('ensure_shares_max_workers'))
         for share_instance in share_instances:
-            try:
-                share_server = self._get_share_server(
-                    ctxt, share_instance)
-                export_locations = self.driver.ensure_share(
-                    ctxt, share_instance, share_server=share_server)
-            except Exception:
-                LOG.exception("Caught exception trying ensure "
-                              "share '%(s_id)s'.",
-                              {'s_id': share_instance['id']})
-                continue
-            if export_locations:
-                self.db.share_export_locations_update(
-                    ctxt, share_instance['id'], export_locations)
+            workers.spawn_n(self._ensure_share_instance, ctxt, share_instance)
+        workers.waitall()
+
+    def _ensure_share_instance(self, ctxt, share_instance):
+        try:
+            share_server = self._get_share_server(
+                ctxt, share_instance)
+            export_locations = self.driver.ensure_share(
+                ctxt, share_instance, share_server=share_server)
+        except Exception:
+            LOG.exception("Caught exception trying ensure "
+                          "share '%(s_id)s'.",
+                          {'s_id': share_instance['id']})
+            return
+        if export_locations:
+            self.db.share_export_locations_update(
+                ctxt, share_instance['id'], export_locations)
 
     def _provide_share_server_for_share(self, context, share_network_id,
                                         share_instance, snapshot=None,
@@ -1013,6 +1179,7 @@ class ShareManager(manager.SchedulerDependentManager):
     @periodic_task.periodic_task(
         spacing=CONF.migration_driver_continue_update_interval)
     @utils.require_driver_initialized
+    @track_periodic_task
     def migration_driver_continue(self, context):
         """Invokes driver to continue migration of shares."""
 
@@ -1226,16 +1393,18 @@ class ShareManager(manager.SchedulerDependentManager):
             self, context, share, src_share_instance, dest_host,
             new_share_network_id, new_az_id, new_share_type_id):
 
-        rpcapi = share_rpcapi.ShareAPI()
-
         helper = migration.ShareMigrationHelper(
             context, self.db, share, self.access_helper)
 
         share_server = self._get_share_server(context.elevated(),
                                               src_share_instance)
 
-        self._cast_access_rules_to_readonly(
-            context, src_share_instance, share_server)
+        precopy = self.driver.configuration.safe_get(
+            'migration_host_assisted_precopy')
+
+        if not precopy:
+            self._cast_access_rules_to_readonly(
+                context, src_share_instance, share_server)
 
         try:
             dest_share_instance = helper.create_instance_and_wait(
@@ -1252,32 +1421,89 @@ class ShareManager(manager.SchedulerDependentManager):
             LOG.exception(msg)
             raise exception.ShareMigrationFailed(reason=msg)
 
+        try:
+            self._migration_start_data_copy(
+                context, share, src_share_instance, dest_share_instance,
+                share_server, precopy=precopy)
+
+        except Exception:
+            msg = _("Failed to obtain migration info from backends or"
+                    " invoking Data Service for migration of "
+                    "share %s.") % share['id']
+            LOG.exception(msg)
+            helper.cleanup_new_instance(dest_share_instance)
+            raise exception.ShareMigrationFailed(reason=msg)
+
+    def _migration_start_data_copy(self, context, share, src_share_instance,
+                                   dest_share_instance, share_server,
+                                   precopy=False, incremental=False):
+
+        rpcapi = share_rpcapi.ShareAPI()
+
         ignore_list = self.driver.configuration.safe_get(
             'migration_ignore_files')
 
         data_rpc = data_rpcapi.DataAPI()
 
-        try:
-            src_connection_info = self.driver.connection_get_info(
-                context, src_share_instance, share_server)
+        src_connection_info = self.driver.connection_get_info(
+            context, src_share_instance, share_server)
+
+        dest_connection_info = rpcapi.connection_get_info(
+            context, dest_share_instance)
 
-            dest_connection_info = rpcapi.connection_get_info(
-                context, dest_share_instance)
+        LOG.debug("Time to start copying in migration"
+                  " for share %s.", share['id'])
 
-            LOG.debug("Time to start copying in migration"
-                      " for share %s.", share['id'])
+        data_rpc.migration_start(
+            context, share['id'], ignore_list, src_share_instance['id'],
+            dest_share_instance['id'], src_connection_info,
+            dest_connection_info, precopy=precopy, incremental=incremental)
 
-            data_rpc.migration_start(
-                context, share['id'], ignore_list, src_share_instance['id'],
-                dest_share_instance['id'], src_connection_info,
-                dest_connection_info)
+    @utils.require_driver_initialized
+    def migration_precopy_completed(self, context, src_instance_id,
+                                    dest_instance_id):
+        """Starts the final copy of a host-assisted migration.
+
+        Called by the data service once share data was copied while the
+        share was writable. Casts the access rules of the share to
+        read-only and copies what changed since.
+        """
+        src_share_instance = self.db.share_instance_get(
+            context, src_instance_id, with_share_data=True)
+        dest_share_instance = self.db.share_instance_get(
+            context, dest_instance_id, with_share_data=True)
+
+        share_ref = self.db.share_get(context, src_share_instance['share_id'])
+
+        LOG.info("Starting final data copy of Share Migration for "
+                 "share %s.", share_ref['id'])
+
+        share_server = self._get_share_server(context.elevated(),
+                                              src_share_instance)
+
+        try:
+            self._cast_access_rules_to_readonly(
+                context, src_share_instance, share_server)
+
+            self._migration_start_data_copy(
+                context, share_ref, src_share_instance, dest_share_instance,
+                share_server, incremental=True)
 
         except Exception:
-            msg = _("Failed to obtain migration info from backends or"
-                    " invoking Data Service for migration of "
-                    "share %s.") % share['id']
+            msg = _("Failed to start final data copy of host-assisted "
+                    "migration of share %s.") % share_ref['id']
             LOG.exception(msg)
+            helper = migration.ShareMigrationHelper(
+                context, self.db, share_ref, self.access_helper)
             helper.cleanup_new_instance(dest_share_instance)
+            self.db.share_update(
+                context, share_ref['id'],
+                {'task_state': constants.TASK_STATE_MIGRATION_ERROR})
+            self._reset_read_only_access_rules(
+                context, share_ref, src_instance_id)
+            self.db.share_instance_update(
+                context, src_instance_id,
+                {'status': constants.STATUS_AVAILABLE})
             raise exception.ShareMigrationFailed(reason=msg)
 
     def _migration_complete_driver(
@@ -2237,6 +2463,7 @@ class ShareManager(manager.SchedulerDependentManager):
 
     @periodic_task.periodic_task(spacing=CONF.replica_state_update_interval)
     @utils.require_driver_initialized
+    @track_periodic_task
     def periodic_share_replica_update(self, context):
         LOG.debug("Updating status of share replica instances.")
         replicas = self.db.share_replicas_get_all(context,
@@ -2251,6 +2478,7 @@ class ShareManager(manager.SchedulerDependentManager):
         for replica in replicas:
             self._share_replica_update(
                 context, replica, share_id=replica['share_id'])
+        return len(replicas)
 
     @add_hooks
     @utils.require_driver_initialized
@@ -2855,6 +3083,7 @@ class ShareManager(manager.SchedulerDependentManager):
 
     @periodic_task.periodic_task(spacing=600)
     @utils.require_driver_initialized
+    @track_periodic_task
     def delete_free_share_servers(self, ctxt):
         if not (self.driver.driver_handles_share_servers and
                 self.configuration.automatic_share_server_cleanup):
@@ -2867,6 +3096,7 @@ class ShareManager(manager.SchedulerDependentManager):
                                                                 updated_before)
         for server in servers:
             self.delete_share_server(ctxt, server)
+        return len(servers)
 
     @add_hooks
     @utils.require_driver_initialized
@@ -3214,6 +3444,7 @@ class ShareManager(manager.SchedulerDependentManager):
 
     @periodic_task.periodic_task(spacing=CONF.replica_state_update_interval)
     @utils.require_driver_initialized
+    @track_periodic_task
     def periodic_share_replica_snapshot_update(self, context):
         LOG.debug("Updating status of share replica snapshots.")
         transitional_statuses = (constants.STATUS_CREATING,
@@ -3254,6 +3485,7 @@ class ShareManager(manager.SchedulerDependentManager):
             self._update_replica_snapshot(
                 context, replica_snapshot,
                 replica_snapshots=replica_snapshots, share_id=share_id)
+        return len(transitional_replica_snapshots)
 
     @locked_share_replica_operation
     def _update_replica_snapshot(self, context, replica_snapshot,
@@ -3341,19 +3573,163 @@ class ShareManager(manager.SchedulerDependentManager):
     @utils.require_driver_initialized
     def update_access(self, context, share_instance_id):
         """Allow/Deny access to some share."""
-        share_instance = self._get_share_instance(context, share_instance_id)
-        share_server = self._get_share_server(context, share_instance)
-
         LOG.debug("Received request to update access for share instance"
                   " %s.", share_instance_id)
 
+        window = self.configuration.safe_get('access_update_coalesce_window')
+        if not window:
+            self._update_access(context, share_instance_id)
+            return
+
+        self._access_update_requests += 1
+        if share_instance_id in self._pending_access_updates:
+            # An update of this share instance is already waiting for the
+            # window to end, it will apply this change as well.
+            self._pending_access_updates[share_instance_id] += 1
+            return
+
+        self._pending_access_updates[share_instance_id] = 1
+        self._access_update_pool.spawn_n(
+            self._coalesced_update_access, context, share_instance_id,
+            window)
+
+    def _coalesced_update_access(self, context, share_instance_id, window):
+        eventlet.sleep(window)
+        batch_size = self._pending_access_updates.pop(share_instance_id)
+
+        self._access_update_batches += 1
+        self._access_update_batched_requests += batch_size
+        self._access_update_max_batch_size = max(
+            self._access_update_max_batch_size, batch_size)
+        LOG.debug("Coalesced %(count)d access update requests for share "
+                  "instance %(si)s, access update stats: %(stats)s.",
+                  {'count': batch_size, 'si': share_instance_id,
+                   'stats': self.get_access_update_stats()})
+
+        try:
+            self._update_access(context, share_instance_id)
+        except Exception:
+            LOG.exception("Failed to update access rules of share instance "
+                          "%s.", share_instance_id)
+
+    def _update_access(self, context, share_instance_id):
+        share_instance = self._get_share_instance(context, share_instance_id)
+        share_server = self._get_share_server(context, share_instance)
+
         self.access_helper.update_access_rules(
             context,
             share_instance_id,
             share_server=share_server)
 
+    def get_access_update_stats(self):
+        """Returns how many access update requests were coalesced."""
+        batches = self._access_update_batches
+        return {
+            'requests': self._access_update_requests,
+            'batches': batches,
+            'pending': len(self._pending_access_updates),
+            'max_batch_size': self._access_update_max_batch_size,
+            'average_batch_size': (
+                float(self._access_update_batched_requests) / batches
+                if batches else 0.0),
+        }
+
+    def _run_periodic_task(self, f, context):
+        name = f.__name__
+        offload = self.configuration.safe_get('periodic_task_offload') or []
+        if name not in offload:
+            return self._call_periodic_task(f, context)
+
+        if name in self._running_periodic_tasks:
+            # NOTE: The previous run is still in progress, do not let the
+            # runs of a slow task pile up on the pool.
+            LOG.warning("Skipping periodic task %s, its previous run is "
+                        "still in progress.", name)
+            self._periodic_task_stats_for(name)['skipped'] += 1
+            self._write_periodic_task_stats()
+            return
+        self._running_periodic_tasks.add(name)
+        self._periodic_task_pool.spawn_n(
+            self._run_offloaded_periodic_task, f, context)
+
+    def _run_offloaded_periodic_task(self, f, context):
+        try:
+            jitter = self.configuration.safe_get('periodic_task_jitter')
+            if jitter:
+                eventlet.sleep(random.uniform(0, jitter))
+            self._call_periodic_task(f, context)
+        except Exception:
+            LOG.exception("Periodic task %s failed.", f.__name__)
+        finally:
+            self._running_periodic_tasks.discard(f.__name__)
+
+    def _call_periodic_task(self, f, context):
+        name = f.__name__
+        stats = self._periodic_task_stats_for(name)
+        watch = timeutils.StopWatch()
+        watch.start()
+        try:
+            result = f(self, context)
+        except Exception:
+            stats['failures'] += 1
+            raise
+        else:
+            if (isinstance(result, six.integer_types) and
+                    not isinstance(result, bool)):
+                stats['last_items'] = result
+                stats['items'] += result
+            return result
+        finally:
+            duration = watch.elapsed()
+            stats['runs'] += 1
+            stats['last_duration'] = duration
+            stats['max_duration'] = max(stats['max_duration'], duration)
+            stats['total_duration'] += duration
+            # NOTE: Periodic tasks use timeutils.utcnow() themselves, the
+            # stats do not call it so that it is only called by the task.
+            stats['last_run_at'] = datetime.datetime.utcfromtimestamp(
+                time.time()).isoformat()
+            self._write_periodic_task_stats()
+
+    def _periodic_task_stats_for(self, name):
+        return self._periodic_task_stats.setdefault(name, {
+            'runs': 0,
+            'failures': 0,
+            'skipped': 0,
+            'items': 0,
+            'last_items': None,
+            'last_duration': None,
+            'max_duration': 0.0,
+            'total_duration': 0.0,
+            'last_run_at': None,
+        })
+
+    def _write_periodic_task_stats(self):
+        path = self.configuration.safe_get('periodic_task_stats_file')
+        if not path:
+            return
+        data = {'host': self.host, 'tasks': self.get_periodic_task_stats()}
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as stats_file:
+                stats_file.write(jsonutils.dumps(data))
+            # Replace the file at once, so that it is never read half
+            # written.
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            LOG.exception("Failed to write the statistics of the periodic "
+                          "tasks to %s.", path)
+
+    def get_periodic_task_stats(self):
+        """Returns the statistics of the runs of the periodic tasks."""
+        return {
+            name: dict(stats, running=name in self._running_periodic_tasks)
+            for name, stats in self._periodic_task_stats.items()
+        }
+
     @periodic_task.periodic_task(spacing=CONF.periodic_interval)
     @utils.require_driver_initialized
+    @track_periodic_task
     def _report_driver_status(self, context):
         LOG.info('Updating share status')
         share_stats = self.driver.get_share_stats(refresh=True)
@@ -3369,6 +3745,7 @@ class ShareManager(manager.SchedulerDependentManager):
 
     @periodic_task.periodic_task(spacing=CONF.periodic_hooks_interval)
     @utils.require_driver_initialized
+    @track_periodic_task
     def _execute_periodic_hook(self, context):
         """Executes periodic-based hooks."""
         # TODO(vponomaryov): add also access rules and share servers
@@ -3391,7 +3768,12 @@ class ShareManager(manager.SchedulerDependentManager):
     @add_hooks
     @utils.require_driver_initialized
     def publish_service_capabilities(self, context):
-        """Collect driver status and then publish it."""
+        """Collect driver status and then publish it.
+
+        Schedulers ask for the capabilities when they start, or when they
+        missed an update, so the full capabilities are sent.
+        """
+        self.published_capabilities = None
         self._report_driver_status(context)
         self._publish_service_capabilities(context)
 
@@ -4130,22 +4512,65 @@ class ShareManager(manager.SchedulerDependentManager):
         spacing=CONF.share_usage_size_update_interval,
         enabled=CONF.enable_gathering_share_usage_size)
     @utils.require_driver_initialized
+    @track_periodic_task
     def update_share_usage_size(self, context):
-        """Invokes driver to gather usage size of shares."""
-        updated_share_instances = []
-        share_instances = self.db.share_instances_get_all_by_host(
-            context, host=self.host, with_share_data=True)
+        """Invokes driver to gather usage size of shares.
 
-        if share_instances:
-            try:
-                updated_share_instances = self.driver.update_share_usage_size(
-                    context, share_instances)
-            except Exception:
-                LOG.exception("Gather share usage size failure.")
+        Share instances are handed to the driver in chunks of
+        'share_usage_size_chunk_size', and the usage notifications of a
+        chunk are sent once the driver gathered its usage sizes.
+        """
+        chunk_size = self.configuration.safe_get(
+            'share_usage_size_chunk_size')
+        delay = 0
+        if (self.configuration.safe_get('share_usage_size_spread_chunks') and
+                self._share_usage_size_chunks):
+            # Spread as many chunks as there were last time over the
+            # interval.
+            delay = (float(CONF.share_usage_size_update_interval) /
+                     self._share_usage_size_chunks)
+
+        chunks = 0
+        count = 0
+        marker = None
+        while True:
+            share_instances = self.db.share_instances_get_all_by_host(
+                context, host=self.host, with_share_data=True,
+                limit=chunk_size, marker=marker)
+            if not share_instances:
+                break
+            if delay and 0 < chunks < self._share_usage_size_chunks:
+                eventlet.sleep(delay)
+            chunks += 1
+            count += len(share_instances)
+            marker = share_instances[-1]['id']
+
+            self._update_share_usage_size_chunk(context, share_instances)
+
+        self._share_usage_size_chunks = chunks
+        return count
+
+    def _update_share_usage_size_chunk(self, context, share_instances):
+        try:
+            updated_share_instances = self.driver.update_share_usage_size(
+                context, share_instances)
+        except Exception:
+            LOG.exception("Gather share usage size failure.")
+            return
 
-        for si in updated_share_instances:
-            share_instance = self._get_share_instance(context, si['id'])
-            share = self.db.share_get(context, share_instance['share_id'])
+        share_instances = {si['id']: si for si in share_instances}
+        for si in updated_share_instances or []:
+            share_instance = share_instances.get(si['id'])
+            if share_instance is None:
+                continue
+            # NOTE: The share data was loaded along with the share instance.
+            share = {'id': share_instance['share_id']}
+            share.update(
+                (share_property, share_instance[share_property])
+                for share_property in ('user_id', 'project_id', 'snapshot_id',
+                                       'share_group_id', 'size',
+                                       'display_name', 'display_description',
+                                       'share_proto', 'is_public'))
             self._notify_about_share_usage(
                 context, share, share_instance, "consumed.size",
                 extra_usage_info={'used_size': si['used_size'],
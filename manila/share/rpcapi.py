@@ -75,6 +75,8 @@ class ShareAPI(object):
                 create_share_group_snapshot, and delete_share_group_snapshot
         1.17 - Add snapshot_update_access()
         1.18 - Remove unused "share_id" parameter from revert_to_snapshot()
+        1.19 - Add "host" parameter to publish_service_capabilities()
+        1.20 - Add migration_precopy_completed()
     """
 
     BASE_RPC_API_VERSION = '1.0'
@@ -83,7 +85,7 @@ class ShareAPI(object):
         super(ShareAPI, self).__init__()
         target = messaging.Target(topic=CONF.share_topic,
                                   version=self.BASE_RPC_API_VERSION)
-        self.client = rpc.get_client(target, version_cap='1.18')
+        self.client = rpc.get_client(target, version_cap='1.20')
 
     def create_share_instance(self, context, share_instance, host,
                               request_spec, filter_properties,
@@ -216,8 +218,11 @@ class ShareAPI(object):
         call_context.cast(context, 'update_access',
                           share_instance_id=share_instance['id'])
 
-    def publish_service_capabilities(self, context):
-        call_context = self.client.prepare(fanout=True, version='1.0')
+    def publish_service_capabilities(self, context, host=None):
+        if host:
+            call_context = self.client.prepare(server=host, version='1.19')
+        else:
+            call_context = self.client.prepare(fanout=True, version='1.0')
         call_context.cast(context, 'publish_service_capabilities')
 
     def extend_share(self, context, share, new_size, reservations):
@@ -317,6 +322,15 @@ class ShareAPI(object):
                           src_instance_id=src_share_instance['id'],
                           dest_instance_id=dest_instance_id)
 
+    def migration_precopy_completed(self, context, src_share_instance,
+                                    dest_instance_id):
+        new_host = utils.extract_host(src_share_instance['host'])
+        call_context = self.client.prepare(server=new_host, version='1.20')
+        call_context.cast(context,
+                          'migration_precopy_completed',
+                          src_instance_id=src_share_instance['id'],
+                          dest_instance_id=dest_instance_id)
+
     def migration_get_progress(self, context, src_share_instance,
                                dest_instance_id):
         new_host = utils.extract_host(src_share_instance['host'])
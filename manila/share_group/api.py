@@ -286,7 +286,7 @@ class API(base.Base):
         return self.db.share_group_get(context, share_group_id)
 
     def get_all(self, context, detailed=True, search_opts=None, sort_key=None,
-                sort_dir=None):
+                sort_dir=None, limit=None, offset=None, marker=None):
 
         if search_opts is None:
             search_opts = {}
@@ -298,11 +298,13 @@ class API(base.Base):
         if search_opts.pop('all_tenants', 0) and context.is_admin:
             share_groups = self.db.share_group_get_all(
                 context, detailed=detailed, filters=search_opts,
-                sort_key=sort_key, sort_dir=sort_dir)
+                sort_key=sort_key, sort_dir=sort_dir, limit=limit,
+                offset=offset, marker=marker)
         else:
             share_groups = self.db.share_group_get_all_by_project(
                 context, context.project_id, detailed=detailed,
-                filters=search_opts, sort_key=sort_key, sort_dir=sort_dir)
+                filters=search_opts, sort_key=sort_key, sort_dir=sort_dir,
+                limit=limit, offset=offset, marker=marker)
 
         return share_groups
 
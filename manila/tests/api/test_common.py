@@ -18,6 +18,7 @@ Test suites for 'common' code used throughout the OpenStack HTTP API.
 """
 
 import ddt
+import mock
 import webob
 import webob.exc
 
@@ -190,6 +191,35 @@ class PaginationParamsTest(test.TestCase):
                          common.get_pagination_params(req))
 
 
+class LimitedParamsTest(test.TestCase):
+    """Unit tests for the `manila.api.common.get_limited_params` method."""
+
+    def test_no_params(self):
+        req = webob.Request.blank('/')
+        self.assertEqual({'limit': 1000, 'offset': 0},
+                         common.get_limited_params(req))
+
+    def test_limit_and_offset(self):
+        req = webob.Request.blank('/?offset=3&limit=1500&marker=fake')
+        self.assertEqual({'limit': 1000, 'offset': 3},
+                         common.get_limited_params(req))
+
+    def test_custom_max_limit(self):
+        req = webob.Request.blank('/?limit=0')
+        self.assertEqual({'limit': 2000, 'offset': 0},
+                         common.get_limited_params(req, max_limit=2000))
+
+    def test_marker(self):
+        req = webob.Request.blank('/?limit=20&marker=fake')
+        self.assertEqual({'limit': 20, 'offset': 0, 'marker': 'fake'},
+                         common.get_limited_params(req, allow_marker=True))
+
+    def test_invalid_offset(self):
+        req = webob.Request.blank('/?offset=-30')
+        self.assertRaises(
+            webob.exc.HTTPBadRequest, common.get_limited_params, req)
+
+
 @ddt.ddt
 class MiscFunctionsTest(test.TestCase):
 
@@ -336,3 +366,23 @@ class ViewBuilderTest(test.TestCase):
         actual_resource = self.view_builder.view(req, self.fake_resource)
 
         self.assertEqual(expected_keys, set(actual_resource.keys()))
+
+    def test_versioned_method_modifiers_cached(self):
+        plans_patcher = mock.patch.dict(
+            common.ViewBuilder._version_modifier_plans, clear=True)
+        plans_patcher.start()
+        self.addCleanup(plans_patcher.stop)
+        req = fakes.HTTPRequest.blank(
+            '/my_resource', version='3.14', use_admin_context=True)
+        matches = self.mock_object(
+            req.api_version_request, 'matches_versioned_method',
+            mock.Mock(wraps=req.api_version_request.matches_versioned_method))
+
+        for i in range(5):
+            actual_resource = self.view_builder.view(req, self.fake_resource)
+            self.assertEqual({'id', 'fred', 'xyzzy', 'alice', 'spoon'},
+                             set(actual_resource.keys()))
+
+        self.assertEqual(3, matches.call_count)
+        self.assertEqual(
+            1, len(common.ViewBuilder._version_modifier_plans))
@@ -531,7 +531,7 @@ class ShareAPITest(test.TestCase):
             {'id': 'id3', 'display_name': 'n3'},
         ]
         self.mock_object(share_api.API, 'get_all',
-                         mock.Mock(return_value=shares))
+                         mock.Mock(return_value=[shares[1]]))
 
         result = self.controller.index(req)
 
@@ -554,6 +554,8 @@ class ShareAPITest(test.TestCase):
             sort_key=search_opts['sort_key'],
             sort_dir=search_opts['sort_dir'],
             search_opts=search_opts_expected,
+            limit=1,
+            offset=1,
         )
         self.assertEqual(1, len(result['shares']))
         self.assertEqual(shares[1]['id'], result['shares'][0]['id'])
@@ -629,7 +631,7 @@ class ShareAPITest(test.TestCase):
             {'id': 'id3', 'display_name': 'n3'},
         ]
         self.mock_object(share_api.API, 'get_all',
-                         mock.Mock(return_value=shares))
+                         mock.Mock(return_value=[shares[1]]))
 
         result = self.controller.detail(req)
 
@@ -652,6 +654,8 @@ class ShareAPITest(test.TestCase):
             sort_key=search_opts['sort_key'],
             sort_dir=search_opts['sort_dir'],
             search_opts=search_opts_expected,
+            limit=1,
+            offset=1,
         )
         self.assertEqual(1, len(result['shares']))
         self.assertEqual(shares[1]['id'], result['shares'][0]['id'])
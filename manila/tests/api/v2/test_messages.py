@@ -10,6 +10,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import ddt
 import mock
 from oslo_config import cfg
 import webob
@@ -27,6 +28,7 @@ from manila.tests.api.v2 import stubs
 CONF = cfg.CONF
 
 
+@ddt.ddt
 class MessageApiTest(test.TestCase):
     def setUp(self):
         super(MessageApiTest, self).setUp()
@@ -170,10 +172,9 @@ class MessageApiTest(test.TestCase):
         self.assertDictMatch(expected, res_dict)
 
     def test_index_with_limit_and_offset(self):
-        msg1 = stubs.stub_message(fakes.get_fake_uuid())
         msg2 = stubs.stub_message(fakes.get_fake_uuid())
         self.mock_object(message_api.API, 'get_all', mock.Mock(
-                         return_value=[msg1, msg2]))
+                         return_value=[msg2]))
         req = fakes.HTTPRequest.blank(
             '/messages?limit=1&offset=1',
             version=messages.MESSAGES_BASE_MICRO_VERSION,
@@ -184,3 +185,25 @@ class MessageApiTest(test.TestCase):
 
         ex2 = self._expected_message_from_controller(msg2['id'])['message']
         self.assertEqual([ex2], res_dict['messages'])
+        message_api.API.get_all.assert_called_once_with(
+            self.ctxt, search_opts={}, sort_dir='desc',
+            sort_key='created_at', limit=1, offset=1)
+
+    @ddt.data(('2.44', {}), ('2.45', {'marker': 'fake_marker'}))
+    @ddt.unpack
+    def test_index_with_marker(self, version, marker):
+        msg = stubs.stub_message(fakes.get_fake_uuid())
+        self.mock_object(message_api.API, 'get_all', mock.Mock(
+                         return_value=[msg]))
+        req = fakes.HTTPRequest.blank(
+            '/messages?limit=1&marker=fake_marker', version=version,
+            base_url='http://localhost/v2')
+        req.environ['manila.context'] = self.ctxt
+
+        res_dict = self.controller.index(req)
+
+        ex = self._expected_message_from_controller(msg['id'])['message']
+        self.assertEqual([ex], res_dict['messages'])
+        message_api.API.get_all.assert_called_once_with(
+            self.ctxt, search_opts={}, sort_dir='desc',
+            sort_key='created_at', limit=1, offset=0, **marker)
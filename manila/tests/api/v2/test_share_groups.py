@@ -718,7 +718,7 @@ class ShareGroupAPITest(test.TestCase):
         fake2, expected2 = self._get_fake_simple_share_group(id="fake_id2")
         self.mock_object(
             share_group_api.API, 'get_all',
-            mock.Mock(return_value=[fake, fake2]))
+            mock.Mock(return_value=[fake]))
         req = fakes.HTTPRequest.blank(
             '/share-groups?limit=1', version=self.api_version,
             experimental=True)
@@ -728,6 +728,9 @@ class ShareGroupAPITest(test.TestCase):
 
         self.assertEqual(1, len(res_dict['share_groups']))
         self.assertEqual([expected], res_dict['share_groups'])
+        share_group_api.API.get_all.assert_called_once_with(
+            req_context, detailed=False, search_opts={},
+            sort_dir='desc', sort_key='created_at', limit=1, offset=0)
         self.mock_policy_check.assert_called_once_with(
             req_context, self.resource_name, 'get_all')
 
@@ -736,7 +739,7 @@ class ShareGroupAPITest(test.TestCase):
         fake2, expected2 = self._get_fake_simple_share_group(
             id="fake_id2")
         self.mock_object(share_group_api.API, 'get_all',
-                         mock.Mock(return_value=[fake, fake2]))
+                         mock.Mock(return_value=[fake2]))
         req = fakes.HTTPRequest.blank(
             '/share-groups?limit=1&offset=1', version=self.api_version,
             experimental=True)
@@ -746,6 +749,9 @@ class ShareGroupAPITest(test.TestCase):
 
         self.assertEqual(1, len(res_dict['share_groups']))
         self.assertEqual([expected2], res_dict['share_groups'])
+        share_group_api.API.get_all.assert_called_once_with(
+            req_context, detailed=False, search_opts={},
+            sort_dir='desc', sort_key='created_at', limit=1, offset=1)
         self.mock_policy_check.assert_called_once_with(
             req_context, self.resource_name, 'get_all')
 
@@ -802,12 +808,15 @@ class ShareGroupAPITest(test.TestCase):
         fake_group2, expected_group2 = self._get_fake_share_group(
             ctxt=req_context, id="fake_id2")
         self.mock_object(share_group_api.API, 'get_all',
-                         mock.Mock(return_value=[fake_group, fake_group2]))
+                         mock.Mock(return_value=[fake_group]))
 
         res_dict = self.controller.detail(req)
 
         self.assertEqual(1, len(res_dict['share_groups']))
         self.assertEqual([expected_group], res_dict['share_groups'])
+        share_group_api.API.get_all.assert_called_once_with(
+            req_context, detailed=True, search_opts={},
+            sort_dir='desc', sort_key='created_at', limit=1, offset=0)
         self.mock_policy_check.assert_called_once_with(
             req_context, self.resource_name, 'get_all')
 
@@ -821,15 +830,37 @@ class ShareGroupAPITest(test.TestCase):
         fake_group2, expected_group2 = self._get_fake_share_group(
             id="fake_id2", ctxt=req_context)
         self.mock_object(share_group_api.API, 'get_all',
-                         mock.Mock(return_value=[fake_group, fake_group2]))
+                         mock.Mock(return_value=[fake_group2]))
 
         res_dict = self.controller.detail(req)
 
         self.assertEqual(1, len(res_dict['share_groups']))
         self.assertEqual([expected_group2], res_dict['share_groups'])
+        share_group_api.API.get_all.assert_called_once_with(
+            req_context, detailed=True, search_opts={},
+            sort_dir='desc', sort_key='created_at', limit=1, offset=1)
         self.mock_policy_check.assert_called_once_with(
             req_context, self.resource_name, 'get_all')
 
+    @ddt.data(('2.44', {}), ('2.45', {'marker': 'fake_id'}))
+    @ddt.unpack
+    def test_share_group_list_index_with_marker(self, version, marker):
+        fake, expected = self._get_fake_simple_share_group(id="fake_id2")
+        self.mock_object(share_group_api.API, 'get_all',
+                         mock.Mock(return_value=[fake]))
+        req = fakes.HTTPRequest.blank(
+            '/share-groups?limit=1&marker=fake_id', version=version,
+            experimental=True)
+        req_context = req.environ['manila.context']
+
+        res_dict = self.controller.index(req)
+
+        self.assertEqual([expected], res_dict['share_groups'])
+        share_group_api.API.get_all.assert_called_once_with(
+            req_context, detailed=False, search_opts={},
+            sort_dir='desc', sort_key='created_at', limit=1, offset=0,
+            **marker)
+
     def test_share_group_delete(self):
         fake_group, expected_group = self._get_fake_share_group()
         self.mock_object(share_group_api.API, 'get',
@@ -15,6 +15,7 @@
 
 import ddt
 import mock
+from oslo_config import cfg
 from oslo_db import exception as db_exception
 from oslo_utils import timeutils
 from six.moves.urllib import parse
@@ -28,6 +29,8 @@ from manila import quota
 from manila import test
 from manila.tests.api import fakes
 
+CONF = cfg.CONF
+
 
 fake_share_network = {
     'id': 'fake network id',
@@ -344,7 +347,9 @@ class ShareNetworkAPITest(test.TestCase):
 
             db_api.share_network_get_all_by_project.assert_called_once_with(
                 self.context,
-                self.context.project_id)
+                self.context.project_id,
+                limit=CONF.osapi_max_limit,
+                offset=0)
 
             self.assertEqual(1, len(result[share_networks.RESOURCES_NAME]))
             self._check_share_network_view_shortened(
@@ -361,7 +366,9 @@ class ShareNetworkAPITest(test.TestCase):
 
             db_api.share_network_get_all_by_project.assert_called_once_with(
                 self.context,
-                self.context.project_id)
+                self.context.project_id,
+                limit=CONF.osapi_max_limit,
+                offset=0)
 
             self.assertEqual(1, len(result[share_networks.RESOURCES_NAME]))
             self._check_share_network_view(
@@ -392,7 +399,8 @@ class ShareNetworkAPITest(test.TestCase):
         db_api.share_network_get_all_by_project.return_value = []
         self.controller.index(req)
         db_api.share_network_get_all_by_project.assert_called_with(
-            fake_context, fake_context.project_id)
+            fake_context, fake_context.project_id,
+            limit=CONF.osapi_max_limit, offset=0)
 
     @mock.patch.object(db_api, 'share_network_get_all', mock.Mock())
     def test_index_all_tenants_admin_context(self):
@@ -402,7 +410,8 @@ class ShareNetworkAPITest(test.TestCase):
             use_admin_context=True)
         result = self.controller.index(req)
         db_api.share_network_get_all.assert_called_once_with(
-            req.environ['manila.context'])
+            req.environ['manila.context'], limit=CONF.osapi_max_limit,
+            offset=0)
         self.assertEqual(1, len(result[share_networks.RESOURCES_NAME]))
         self._check_share_network_view_shortened(
             result[share_networks.RESOURCES_NAME][0],
@@ -416,7 +425,8 @@ class ShareNetworkAPITest(test.TestCase):
         db_api.share_network_get_all_by_project.return_value = []
         self.controller.index(req)
         db_api.share_network_get_all_by_project.assert_called_with(
-            fake_context, fake_context.project_id)
+            fake_context, fake_context.project_id,
+            limit=CONF.osapi_max_limit, offset=0)
 
     @mock.patch.object(db_api, 'share_network_get_all_by_project', mock.Mock())
     def test_index_filter_by_project_id_admin_context(self):
@@ -428,7 +438,8 @@ class ShareNetworkAPITest(test.TestCase):
             use_admin_context=True)
         result = self.controller.index(req)
         db_api.share_network_get_all_by_project.assert_called_once_with(
-            req.environ['manila.context'], 'fake')
+            req.environ['manila.context'], 'fake',
+            limit=CONF.osapi_max_limit, offset=0)
         self.assertEqual(1, len(result[share_networks.RESOURCES_NAME]))
         self._check_share_network_view_shortened(
             result[share_networks.RESOURCES_NAME][0],
@@ -204,7 +204,7 @@ class ShareSnapshotAPITest(test.TestCase):
             {'id': 'id3', 'display_name': 'n3', 'status': 'fake_status', },
         ]
         self.mock_object(share_api.API, 'get_all_snapshots',
-                         mock.Mock(return_value=snapshots))
+                         mock.Mock(return_value=[snapshots[1]]))
 
         result = self.controller.index(req)
 
@@ -224,6 +224,8 @@ class ShareSnapshotAPITest(test.TestCase):
             sort_key=search_opts['sort_key'],
             sort_dir=search_opts['sort_dir'],
             search_opts=search_opts_expected,
+            limit=1,
+            offset=1,
         )
         self.assertEqual(1, len(result['snapshots']))
         self.assertEqual(snapshots[1]['id'], result['snapshots'][0]['id'])
@@ -271,7 +273,7 @@ class ShareSnapshotAPITest(test.TestCase):
         ]
 
         self.mock_object(share_api.API, 'get_all_snapshots',
-                         mock.Mock(return_value=snapshots))
+                         mock.Mock(return_value=[snapshots[1]]))
 
         result = self.controller.detail(req)
 
@@ -287,6 +289,8 @@ class ShareSnapshotAPITest(test.TestCase):
             sort_key=search_opts['sort_key'],
             sort_dir=search_opts['sort_dir'],
             search_opts=search_opts_expected,
+            limit=1,
+            offset=1,
         )
         self.assertEqual(1, len(result['snapshots']))
         self.assertEqual(snapshots[1]['id'], result['snapshots'][0]['id'])
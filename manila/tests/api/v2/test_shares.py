@@ -1536,8 +1536,9 @@ class ShareAPITest(test.TestCase):
             search_opts.update(
                 {'display_name~': 'fake',
                  'display_description~': 'fake'})
-        if (api_version.APIVersionRequest(version) >=
-                api_version.APIVersionRequest('2.42')):
+        show_count = (api_version.APIVersionRequest(version) >=
+                      api_version.APIVersionRequest('2.42'))
+        if show_count:
             search_opts.update({'with_count': 'true'})
         if use_admin_context:
             search_opts['host'] = 'fake_host'
@@ -1554,7 +1555,8 @@ class ShareAPITest(test.TestCase):
             {'id': 'id3', 'display_name': 'n3'},
         ]
         self.mock_object(share_api.API, 'get_all',
-                         mock.Mock(return_value=shares))
+                         mock.Mock(return_value=shares if show_count
+                                   else [shares[1]]))
 
         result = self.controller.index(req)
 
@@ -1584,11 +1586,14 @@ class ShareAPITest(test.TestCase):
         if use_admin_context:
             search_opts_expected.update({'fake_key': 'fake_value'})
             search_opts_expected['host'] = search_opts['host']
+        # NOTE: All shares are retrieved when they have to be counted.
+        pagination = {} if show_count else {'limit': 1, 'offset': 1}
         share_api.API.get_all.assert_called_once_with(
             req.environ['manila.context'],
             sort_key=search_opts['sort_key'],
             sort_dir=search_opts['sort_dir'],
             search_opts=search_opts_expected,
+            **pagination
         )
         self.assertEqual(1, len(result['shares']))
         self.assertEqual(shares[1]['id'], result['shares'][0]['id'])
@@ -1598,6 +1603,23 @@ class ShareAPITest(test.TestCase):
                 api_version.APIVersionRequest('2.42')):
             self.assertEqual(3, result['count'])
 
+    @ddt.data(('2.44', {}), ('2.45', {'marker': 'fake_marker'}))
+    @ddt.unpack
+    def test_share_list_with_marker(self, version, marker):
+        req = fakes.HTTPRequest.blank(
+            '/shares?limit=1&marker=fake_marker', version=version)
+        shares = [{'id': 'id2', 'display_name': 'n2'}]
+        self.mock_object(share_api.API, 'get_all',
+                         mock.Mock(return_value=shares))
+
+        result = self.controller.index(req)
+
+        share_api.API.get_all.assert_called_once_with(
+            req.environ['manila.context'], sort_key='created_at',
+            sort_dir='desc', search_opts={}, limit=1, offset=0, **marker)
+        self.assertEqual(1, len(result['shares']))
+        self.assertEqual(shares[0]['id'], result['shares'][0]['id'])
+
     def test_share_list_summary(self):
         self.mock_object(share_api.API, 'get_all',
                          stubs.stub_share_get_all_by_project)
@@ -1649,8 +1671,9 @@ class ShareAPITest(test.TestCase):
             'export_location_id': 'fake_export_location_id',
             'export_location_path': 'fake_export_location_path',
         }
-        if (api_version.APIVersionRequest(version) >=
-                api_version.APIVersionRequest('2.42')):
+        show_count = (api_version.APIVersionRequest(version) >=
+                      api_version.APIVersionRequest('2.42'))
+        if show_count:
             search_opts.update({'with_count': 'true'})
         if use_admin_context:
             search_opts['host'] = 'fake_host'
@@ -1679,7 +1702,8 @@ class ShareAPITest(test.TestCase):
         ]
 
         self.mock_object(share_api.API, 'get_all',
-                         mock.Mock(return_value=shares))
+                         mock.Mock(return_value=shares if show_count
+                                   else [shares[1]]))
 
         result = self.controller.detail(req)
 
@@ -1704,11 +1728,14 @@ class ShareAPITest(test.TestCase):
         if use_admin_context:
             search_opts_expected.update({'fake_key': 'fake_value'})
             search_opts_expected['host'] = search_opts['host']
+        # NOTE: All shares are retrieved when they have to be counted.
+        pagination = {} if show_count else {'limit': 1, 'offset': 1}
         share_api.API.get_all.assert_called_once_with(
             req.environ['manila.context'],
             sort_key=search_opts['sort_key'],
             sort_dir=search_opts['sort_dir'],
             search_opts=search_opts_expected,
+            **pagination
         )
         self.assertEqual(1, len(result['shares']))
         self.assertEqual(shares[1]['id'], result['shares'][0]['id'])
@@ -14,11 +14,16 @@
 #    under the License.
 
 import ddt
+import mock
 
+from manila.api.openstack import api_version_request as api_version
 from manila.api.views import shares
+from manila.common import constants
+from manila.db.sqlalchemy import models
 from manila import test
 from manila.tests.api.contrib import stubs
 from manila.tests.api import fakes
+from manila.tests import db_utils
 
 
 @ddt.ddt
@@ -87,3 +92,27 @@ class ViewBuilderTestCase(test.TestCase):
             expected['revert_to_snapshot_support'] = True
 
         self.assertSubDictMatch(expected, result['share'])
+
+    def test_detail_selects_primary_instance_once(self):
+        instance_list = [
+            db_utils.create_share_instance(
+                status=constants.STATUS_AVAILABLE, share_id='fake_id',
+                replica_state=constants.REPLICA_STATE_IN_SYNC),
+            db_utils.create_share_instance(
+                status=constants.STATUS_AVAILABLE, share_id='fake_id',
+                replica_state=constants.REPLICA_STATE_ACTIVE),
+            db_utils.create_share_instance(
+                status=constants.STATUS_ERROR, share_id='fake_id'),
+        ]
+        share = db_utils.create_share(instances=instance_list)
+        req = fakes.HTTPRequest.blank('/shares', use_admin_context=True,
+                                      version=api_version._MAX_API_VERSION)
+        select = self.mock_object(
+            models, '_select_primary_instance',
+            mock.Mock(side_effect=models._select_primary_instance))
+
+        result = self.builder.detail(req, share)
+
+        self.assertEqual(1, select.call_count)
+        self.assertEqual(constants.STATUS_AVAILABLE, result['share']['status'])
+        self.assertEqual(share.instances[1]['host'], result['share']['host'])
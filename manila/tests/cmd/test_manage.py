@@ -232,6 +232,40 @@ class ManilaCmdManageTestCase(test.TestCase):
         self.db_commands.stamp(version='123')
         migration.stamp.assert_called_once_with('123')
 
+    def test_purge(self):
+        self.mock_object(db, 'purge_deleted_records',
+                         mock.Mock(return_value={'shares': 2,
+                                                 'share_networks': 0}))
+
+        with mock.patch('sys.stdout', new=six.StringIO()) as fake_out:
+            self.db_commands.purge(10, batch_size=100, sleep_interval=1)
+
+        db.purge_deleted_records.assert_called_once_with(
+            mock.ANY, 10, batch_size=100, sleep_interval=1, dry_run=False)
+        self.assertIn('shares', fake_out.getvalue())
+        self.assertNotIn('share_networks', fake_out.getvalue())
+        self.assertIn('Purged 2 rows', fake_out.getvalue())
+
+    def test_purge_dry_run(self):
+        self.mock_object(db, 'purge_deleted_records',
+                         mock.Mock(return_value={'shares': 2}))
+
+        with mock.patch('sys.stdout', new=six.StringIO()) as fake_out:
+            self.db_commands.purge(0, dry_run=True)
+
+        db.purge_deleted_records.assert_called_once_with(
+            mock.ANY, 0, batch_size=1000, sleep_interval=0, dry_run=True)
+        self.assertIn('2 rows would be purged', fake_out.getvalue())
+
+    @ddt.data({'age_in_days': -1}, {'age_in_days': 0, 'batch_size': 0})
+    def test_purge_invalid_args(self, kwargs):
+        self.mock_object(db, 'purge_deleted_records')
+
+        with mock.patch('sys.stdout', new=six.StringIO()):
+            self.assertRaises(SystemExit, self.db_commands.purge, **kwargs)
+
+        self.assertFalse(db.purge_deleted_records.called)
+
     def test_version_commands_list(self):
         self.mock_object(version, 'version_string',
                          mock.Mock(return_value='123'))
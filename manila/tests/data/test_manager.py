@@ -15,7 +15,10 @@
 """
 Tests For Data Manager
 """
+import os
+
 import ddt
+import fixtures
 import mock
 
 from manila.common import constants
@@ -42,6 +45,8 @@ class DataManagerTestCase(test.TestCase):
         self.topic = 'fake_topic'
         self.share = db_utils.create_share()
         manager.CONF.set_default('mount_tmp_location', '/tmp/')
+        self.checkpoint_dir = self.useFixture(fixtures.TempDir()).path
+        self.flags(data_copy_checkpoint_dir=self.checkpoint_dir)
 
     def test_init(self):
         manager = self.manager
@@ -65,12 +70,76 @@ class DataManagerTestCase(test.TestCase):
 
         # asserts
         db.share_get_all.assert_called_once_with(
-            utils.IsAMatcher(context.RequestContext))
+            utils.IsAMatcher(context.RequestContext),
+            filters={'task_state': list(constants.BUSY_COPYING_STATES)})
 
         db.share_update.assert_called_with(
             utils.IsAMatcher(context.RequestContext), share['id'],
             {'task_state': constants.TASK_STATE_DATA_COPYING_ERROR})
 
+    def test_init_host_resume(self):
+
+        share = db_utils.create_share(
+            task_state=constants.TASK_STATE_DATA_COPYING_IN_PROGRESS)
+        checkpoint = {'job': {'share_instance_id': 'ins1_id'}}
+
+        # mocks
+        self.mock_object(db, 'share_get_all', mock.Mock(
+            return_value=[share]))
+        self.mock_object(db, 'share_update')
+        self.mock_object(data_utils, 'load_checkpoint',
+                         mock.Mock(return_value=checkpoint))
+        self.mock_object(manager.eventlet, 'spawn_n')
+
+        # run
+        self.manager.init_host()
+
+        # asserts
+        data_utils.load_checkpoint.assert_called_once_with(
+            os.path.join(self.checkpoint_dir, '%s.json' % share['id']))
+        manager.eventlet.spawn_n.assert_called_once_with(
+            self.manager._resume_data_copy,
+            utils.IsAMatcher(context.RequestContext), share,
+            checkpoint['job'])
+        self.assertFalse(db.share_update.called)
+
+    @ddt.data(None, exception.ShareDataCopyFailed(reason='fake'))
+    def test__resume_data_copy(self, exc):
+
+        job = {
+            'ignore_list': ['item'],
+            'share_instance_id': 'ins1_id',
+            'dest_share_instance_id': 'ins2_id',
+            'connection_info_src': {'unmount': 'unmount_cmd_src'},
+            'connection_info_dest': {'unmount': 'unmount_cmd_dest'},
+            'precopy': False,
+            'incremental': True,
+        }
+
+        # mocks
+        self.mock_object(os.path, 'ismount',
+                         mock.Mock(side_effect=[True, False]))
+        self.mock_object(helper.DataServiceHelper,
+                         'cleanup_unmount_temp_folder')
+        self.mock_object(self.manager, 'migration_start',
+                         mock.Mock(side_effect=exc))
+
+        # run
+        self.manager._resume_data_copy(self.context, self.share, job)
+
+        # asserts
+        (helper.DataServiceHelper.cleanup_unmount_temp_folder.
+            assert_called_once_with('unmount_cmd_src', '/tmp/', 'ins1_id'))
+        self.manager.migration_start.assert_called_once_with(
+            self.context, ['item'], self.share['id'], 'ins1_id', 'ins2_id',
+            {'unmount': 'unmount_cmd_src'}, {'unmount': 'unmount_cmd_dest'},
+            precopy=False, incremental=True)
+
+    def test__get_checkpoint_path_disabled(self):
+        self.flags(data_copy_checkpoint_interval=0)
+
+        self.assertIsNone(self.manager._get_checkpoint_path('fake_id'))
+
     @ddt.data(None, Exception('fake'), exception.ShareDataCopyCancelled(
         src_instance='ins1',
         dest_instance='ins2'))
@@ -116,12 +185,38 @@ class DataManagerTestCase(test.TestCase):
 
         self.manager._copy_share_data.assert_called_once_with(
             self.context, 'fake_copy', self.share, 'ins1_id', 'ins2_id',
-            'info_src', 'info_dest')
+            'info_src', 'info_dest', precopy=False)
 
         if exc:
             share_rpc.ShareAPI.migration_complete.assert_called_once_with(
                 self.context, self.share.instance, 'ins2_id')
 
+    def test_migration_start_precopy(self):
+
+        # mocks
+        self.mock_object(db, 'share_get', mock.Mock(return_value=self.share))
+        self.mock_object(db, 'share_instance_get', mock.Mock(
+            return_value=self.share.instance))
+        self.mock_object(data_utils, 'Copy',
+                         mock.Mock(return_value='fake_copy'))
+        self.mock_object(self.manager, '_copy_share_data')
+        self.mock_object(share_rpc.ShareAPI, 'migration_complete')
+        self.mock_object(share_rpc.ShareAPI, 'migration_precopy_completed')
+
+        # run
+        self.manager.migration_start(
+            self.context, [], self.share['id'], 'ins1_id', 'ins2_id',
+            'info_src', 'info_dest', precopy=True)
+
+        # asserts
+        self.manager._copy_share_data.assert_called_once_with(
+            self.context, 'fake_copy', self.share, 'ins1_id', 'ins2_id',
+            'info_src', 'info_dest', precopy=True)
+        (share_rpc.ShareAPI.migration_precopy_completed.
+            assert_called_once_with(self.context, self.share.instance,
+                                    'ins2_id'))
+        self.assertFalse(share_rpc.ShareAPI.migration_complete.called)
+
     @ddt.data({'cancelled': False, 'exc': None},
               {'cancelled': False, 'exc': Exception('fake')},
               {'cancelled': True, 'exc': None})
@@ -83,13 +83,15 @@ class DataRpcAPITestCase(test.TestCase):
     def test_migration_start(self):
         self._test_data_api('migration_start',
                             rpc_method='cast',
-                            version='1.0',
+                            version='1.1',
                             share_id=self.fake_share['id'],
                             ignore_list=[],
                             share_instance_id='fake_ins_id',
                             dest_share_instance_id='dest_fake_ins_id',
                             connection_info_src={},
-                            connection_info_dest={})
+                            connection_info_dest={},
+                            precopy=False,
+                            incremental=True)
 
     def test_data_copy_cancel(self):
         self._test_data_api('data_copy_cancel',
@@ -13,11 +13,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import errno
+import hashlib
 import os
 import time
 
+import fixtures
 import mock
+from oslo_serialization import jsonutils
+import six
 
+import manila
 from manila.data import utils as data_utils
 from manila import exception
 from manila import test
@@ -41,7 +47,10 @@ class CopyClassTestCase(test.TestCase):
     def test_get_progress(self):
         expected = {'total_progress': 1,
                     'current_file_path': '/fake/path',
-                    'current_file_progress': 100}
+                    'current_file_progress': 100,
+                    'files_copied': 0,
+                    'bytes_per_second': 0,
+                    'workers': 1}
 
         # mocks
         self.mock_object(utils, 'execute',
@@ -57,6 +66,28 @@ class CopyClassTestCase(test.TestCase):
         utils.execute.assert_called_once_with("stat", "-c", "%s", "/fake/path",
                                               run_as_root=True)
 
+    def test_get_progress_throughput_in_process(self):
+        self._copy.in_process = True
+        self._copy.workers = 4
+        self._copy.files_copied = 2
+        self._copy.start_time = 10
+        self.mock_object(time, 'time', mock.Mock(return_value=20))
+        self.mock_object(os, 'lstat', mock.Mock(
+            return_value=mock.Mock(st_size=50)))
+        self.mock_object(utils, 'execute')
+
+        self._copy.initialized = True
+        out = self._copy.get_progress()
+
+        self.assertEqual({'total_progress': 1,
+                          'current_file_path': '/fake/path',
+                          'current_file_progress': 50,
+                          'files_copied': 2,
+                          'bytes_per_second': 10,
+                          'workers': 4}, out)
+        os.lstat.assert_called_once_with('/fake/path')
+        self.assertFalse(utils.execute.called)
+
     def test_get_progress_not_initialized(self):
         expected = {'total_progress': 0}
 
@@ -93,7 +124,10 @@ class CopyClassTestCase(test.TestCase):
     def test_get_progress_exception(self):
         expected = {'total_progress': 1,
                     'current_file_path': '/fake/path',
-                    'current_file_progress': 0}
+                    'current_file_progress': 0,
+                    'files_copied': 0,
+                    'bytes_per_second': 0,
+                    'workers': 1}
 
         # mocks
         self.mock_object(
@@ -122,111 +156,156 @@ class CopyClassTestCase(test.TestCase):
         # reset
         self._copy.cancelled = False
 
-    def test_get_total_size(self):
-        self._copy.total_size = 0
-
-        values = [("folder1/\nitem/\nfile1\nitem", ""),
-                  ("", ""),
-                  ("10000", "")]
+    def _fake_manifest(self, files=(), dirs=()):
+        manifest = mock.Mock()
+        manifest.files.return_value = [
+            _entry(path, size=size) for path, size in files]
+        manifest.directories.return_value = [
+            _entry(path, item_type='d') for path in dirs]
+        manifest.directories_bottom_up.return_value = [
+            _entry(path, item_type='d') for path in reversed(dirs)]
+        return manifest
+
+    def test_manifest(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        manifest = data_utils.Manifest(os.path.join(tmp_dir, 'manifest'))
+        with open(manifest.path, 'wb') as manifest_file:
+            for rel_path, mode, size in (('folder1', 0o40755, 4096),
+                                         ('folder1/file 1', 0o100644, 10),
+                                         ('folder1/folder2', 0o40700, 4096),
+                                         ('link', 0o120777, 5)):
+                data_utils.Manifest.write(
+                    manifest_file,
+                    mock.Mock(st_mode=mode, st_size=size, st_uid=1,
+                              st_gid=2, st_atime=3.5, st_mtime=4.5),
+                    rel_path)
+
+        manifest.load()
+
+        self.assertEqual(15, manifest.total_size)
+        self.assertEqual(2, manifest.file_count)
+        self.assertEqual(
+            [_entry('folder1/file 1', mode=0o644),
+             _entry('link', item_type='l', size=5, mode=0o777)],
+            list(manifest.files()))
+        self.assertEqual(
+            ['folder1', 'folder1/folder2'],
+            [entry.path for entry in manifest.directories()])
+        self.assertEqual(
+            [_entry('folder1/folder2', item_type='d', size=4096, mode=0o700),
+             _entry('folder1', item_type='d', size=4096, mode=0o755)],
+            list(manifest.directories_bottom_up()))
+
+        manifest.close()
+
+        self.assertFalse(os.path.exists(manifest.path))
+
+    def test_build_manifest(self):
+        self.mock_object(utils, 'execute', mock.Mock(return_value=('', '')))
+        self._copy.ignore_list = ['item', 'it*m']
+
+        manifest = self._copy.build_manifest()
+
+        self.assertEqual(0, manifest.total_size)
+        utils.execute.assert_called_once_with(
+            "find", "-H", self._copy.src, "-mindepth", "1",
+            "(", "-name", "item", "-o", "-name", "it\\*m", ")", "-prune",
+            "-o", "-fprintf", manifest.path, data_utils.Manifest.FORMAT,
+            run_as_root=True)
+        manifest.close()
+
+    def test_build_manifest_in_process(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        for folder in ('folder1/folder2', 'item/folder3'):
+            os.makedirs(os.path.join(tmp_dir, folder))
+        for item in ('file1', 'folder1/folder2/file2', 'folder1/item',
+                     'item/folder3/file3'):
+            with open(os.path.join(tmp_dir, item), 'w') as f:
+                f.write('fake')
+        self._copy.src = tmp_dir
+        self._copy.in_process = True
+        self.mock_object(utils, 'execute')
+
+        manifest = self._copy.build_manifest()
+
+        self.assertEqual(8, manifest.total_size)
+        self.assertEqual(
+            ['file1', 'folder1/folder2/file2'],
+            sorted(entry.path for entry in manifest.files()))
+        self.assertEqual(
+            ['folder1', 'folder1/folder2'],
+            [entry.path for entry in manifest.directories()])
+        self.assertFalse(utils.execute.called)
+        manifest.close()
+
+    def test_build_manifest_error(self):
+        self.mock_object(utils, 'execute', mock.Mock(
+            side_effect=utils.processutils.ProcessExecutionError()))
+        self.mock_object(data_utils.Manifest, 'close')
 
-        def get_output(*args, **kwargs):
-            return values.pop(0)
+        self.assertRaises(utils.processutils.ProcessExecutionError,
+                          self._copy.build_manifest)
 
-        # mocks
-        self.mock_object(utils, 'execute', mock.Mock(
-            side_effect=get_output))
+        data_utils.Manifest.close.assert_called_once_with()
 
-        # run
-        self._copy.get_total_size(self._copy.src)
+    def test_copy_dirs(self):
+        self.mock_object(data_utils, 'MKDIR_BATCH_SIZE', 2)
+        self.mock_object(utils, 'execute')
+        manifest = self._fake_manifest(
+            dirs=['folder1', 'folder1/folder2', 'folder3'])
 
-        # asserts
-        self.assertEqual(10000, self._copy.total_size)
+        self._copy.copy_dirs(manifest)
 
         utils.execute.assert_has_calls([
-            mock.call("ls", "-pA1", "--group-directories-first",
-                      self._copy.src, run_as_root=True),
-            mock.call("ls", "-pA1", "--group-directories-first",
-                      os.path.join(self._copy.src, "folder1/"),
+            mock.call("mkdir", "-p",
+                      os.path.join(self._copy.dest, "folder1"),
+                      os.path.join(self._copy.dest, "folder1/folder2"),
+                      run_as_root=True),
+            mock.call("mkdir", "-p",
+                      os.path.join(self._copy.dest, "folder3"),
                       run_as_root=True),
-            mock.call("stat", "-c", "%s",
-                      os.path.join(self._copy.src, "file1"), run_as_root=True)
         ])
+        self.assertEqual(2, utils.execute.call_count)
 
-    def test_get_total_size_cancelled_1(self):
-        self._copy.total_size = 0
-        self._copy.cancelled = True
-
-        # run
-        self._copy.get_total_size(self._copy.src)
+    def test_copy_dirs_in_process(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        os.mkdir(os.path.join(tmp_dir, 'folder1'))
+        self._copy.dest = tmp_dir
+        self._copy.in_process = True
+        manifest = self._fake_manifest(dirs=['folder1', 'folder1/folder2'])
 
-        # asserts
-        self.assertEqual(0, self._copy.total_size)
+        self._copy.copy_dirs(manifest)
 
-        # reset
-        self._copy.total_size = 10000
-        self._copy.cancelled = False
+        self.assertTrue(os.path.isdir(os.path.join(tmp_dir, 'folder1',
+                                                   'folder2')))
 
-    def test_get_total_size_cancelled_2(self):
-        self._copy.total_size = 0
-
-        def ls_output(*args, **kwargs):
-            self._copy.cancelled = True
-            return "folder1/", ""
-
-        # mocks
-        self.mock_object(utils, 'execute', mock.Mock(
-            side_effect=ls_output))
-
-        # run
-        self._copy.get_total_size(self._copy.src)
+    def test_copy_dirs_cancelled(self):
+        self._copy.cancelled = True
+        self.mock_object(utils, 'execute')
 
-        # asserts
-        self.assertEqual(0, self._copy.total_size)
-        utils.execute.assert_called_once_with(
-            "ls", "-pA1", "--group-directories-first", self._copy.src,
-            run_as_root=True)
+        self._copy.copy_dirs(self._fake_manifest(dirs=['folder1']))
 
-        # reset
-        self._copy.total_size = 10000
-        self._copy.cancelled = False
+        self.assertFalse(utils.execute.called)
 
     def test_copy_data(self):
 
-        values = [("folder1/\nitem/\nfile1\nitem", ""),
-                  "",
-                  ("", ""),
-                  ("10000", ""),
-                  "",
-                  ""]
-
-        def get_output(*args, **kwargs):
-            return values.pop(0)
-
         # mocks
         self.mock_object(data_utils, '_validate_item',
                          mock.Mock(side_effect=[exception.ShareDataCopyFailed(
                              reason='fake'), None]))
-        self.mock_object(utils, 'execute', mock.Mock(
-            side_effect=get_output))
+        self.mock_object(utils, 'execute')
         self.mock_object(self._copy, 'get_progress')
         self.mock_object(time, 'sleep')
 
         # run
-        self._copy.copy_data(self._copy.src)
+        self._copy.copy_data(self._fake_manifest(files=[('file1', 10000)]))
 
         # asserts
         self._copy.get_progress.assert_called_once_with()
+        self.assertEqual(10100, self._copy.current_size)
+        self.assertEqual(1, self._copy.files_copied)
 
         utils.execute.assert_has_calls([
-            mock.call("ls", "-pA1", "--group-directories-first",
-                      self._copy.src, run_as_root=True),
-            mock.call("mkdir", "-p", os.path.join(self._copy.dest, "folder1/"),
-                      run_as_root=True),
-            mock.call("ls", "-pA1", "--group-directories-first",
-                      os.path.join(self._copy.src, "folder1/"),
-                      run_as_root=True),
-            mock.call("stat", "-c", "%s",
-                      os.path.join(self._copy.src, "file1"), run_as_root=True),
             mock.call("cp", "-P", "--preserve=all",
                       os.path.join(self._copy.src, "file1"),
                       os.path.join(self._copy.dest, "file1"),
@@ -236,130 +315,249 @@ class CopyClassTestCase(test.TestCase):
                       os.path.join(self._copy.dest, "file1"), run_as_root=True)
         ])
 
-    def test__validate_item(self):
+    def test_copy_data_workers(self):
+        self._copy.workers = 2
+        self._copy.current_size = 0
+        self.mock_object(utils, 'execute')
+        self.mock_object(data_utils, '_validate_item')
+        self.mock_object(self._copy, 'get_progress')
 
-        self.mock_object(utils, 'execute', mock.Mock(
-            side_effect=[("abcxyz", ""), ("defrst", "")]))
+        self._copy.copy_data(self._fake_manifest(
+            files=[('file1', 10), ('file2', 10), ('file3', 10)]))
 
-        self.assertRaises(exception.ShareDataCopyFailed,
-                          data_utils._validate_item, 'src', 'dest')
+        self.assertEqual(30, self._copy.current_size)
+        self.assertEqual(3, self._copy.files_copied)
+        self.assertEqual(3, data_utils._validate_item.call_count)
+        self.assertIsNone(self._copy._pool)
 
-        utils.execute.assert_has_calls([
-            mock.call("sha256sum", "src", run_as_root=True),
-            mock.call("sha256sum", "dest", run_as_root=True),
-        ])
+    def test_copy_data_workers_error(self):
+        self._copy.workers = 2
+        self._copy.current_size = 0
+        self.mock_object(self._copy, '_copy_and_validate', mock.Mock(
+            side_effect=exception.ShareDataCopyFailed(reason='fake')))
+        self.mock_object(self._copy, 'get_progress')
 
-    def test_copy_data_cancelled_1(self):
+        self.assertRaises(
+            exception.ShareDataCopyFailed, self._copy.copy_data,
+            self._fake_manifest(
+                files=[('file1', 10), ('file2', 10), ('file3', 10)]))
 
-        self._copy.cancelled = True
+        self.assertEqual(0, self._copy.files_copied)
+        self.assertFalse(self._copy.get_progress.called)
+        self.assertIsNone(self._copy._copy_error)
 
-        # run
-        self._copy.copy_data(self._copy.src)
+    def test__copy_item(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        src_item = os.path.join(tmp_dir, 'src')
+        dest_item = os.path.join(tmp_dir, 'dest')
+        with open(src_item, 'wb') as src_file:
+            src_file.write(b'fake_data' * 1000)
+        os.chmod(src_item, 0o640)
+        os.utime(src_item, (1000, 2000))
 
-        # reset
-        self._copy.cancelled = False
+        data_utils._copy_item(src_item, dest_item)
 
-    def test_copy_data_cancelled_2(self):
+        with open(dest_item, 'rb') as dest_file:
+            self.assertEqual(b'fake_data' * 1000, dest_file.read())
+        dest_stat = os.stat(dest_item)
+        self.assertEqual(0o640, dest_stat.st_mode & 0o777)
+        self.assertEqual(2000, int(dest_stat.st_mtime))
 
-        def ls_output(*args, **kwargs):
-            self._copy.cancelled = True
-            return "folder1/", ""
+    def test__copy_item_written_during_copy(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        src_item = os.path.join(tmp_dir, 'src')
+        dest_item = os.path.join(tmp_dir, 'dest')
+        with open(src_item, 'wb') as src_file:
+            src_file.write(b'fake_data')
+        os.utime(src_item, (1000, 2000))
 
-        # mocks
-        self.mock_object(utils, 'execute', mock.Mock(
-            side_effect=ls_output))
+        def _write_during_copy(src_fd, dest_fd):
+            os.write(dest_fd, os.read(src_fd, 100))
+            os.utime(src_item, (1000, 3000))
 
-        # run
-        self._copy.copy_data(self._copy.src)
+        self.mock_object(data_utils, '_copy_file_contents',
+                         mock.Mock(side_effect=_write_during_copy))
 
-        # asserts
-        utils.execute.assert_called_once_with(
-            "ls", "-pA1", "--group-directories-first", self._copy.src,
-            run_as_root=True)
+        data_utils._copy_item(src_item, dest_item)
 
-        # reset
-        self._copy.cancelled = False
+        self.assertEqual(2000, os.stat(dest_item).st_mtime)
 
-    def test_copy_stats(self):
+    def test__copy_item_symlink(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        src_item = os.path.join(tmp_dir, 'src')
+        dest_item = os.path.join(tmp_dir, 'dest')
+        os.symlink('fake_target', src_item)
 
-        values = [("folder1/\nitem/\nfile1\nitem", ""),
-                  ("", ""),
-                  "",
-                  "",
-                  "",
-                  "",
-                  "",
-                  ""]
+        data_utils._copy_item(src_item, dest_item)
 
-        def get_output(*args, **kwargs):
-            return values.pop(0)
+        self.assertEqual('fake_target', os.readlink(dest_item))
+
+    def test__copy_file_contents_fallback(self):
+        self.mock_object(data_utils, '_copy_file_range', mock.Mock(
+            side_effect=OSError(errno.EXDEV, 'fake')))
+        self.mock_object(data_utils, '_sendfile', mock.Mock(
+            side_effect=OSError(errno.ENOSYS, 'fake')))
+        self.mock_object(data_utils, '_read_write', mock.Mock(
+            side_effect=[5, 0]))
+        self.mock_object(os, 'copy_file_range', create=True)
+        self.mock_object(os, 'sendfile', create=True)
+
+        data_utils._copy_file_contents('src_fd', 'dest_fd')
+
+        data_utils._read_write.assert_has_calls([
+            mock.call('src_fd', 'dest_fd', 0),
+            mock.call('src_fd', 'dest_fd', 5)])
+
+    def test__read_write_short_write(self):
+        self.mock_object(os, 'read', mock.Mock(return_value=b'fake_data'))
+        self.mock_object(os, 'write', mock.Mock(side_effect=[4, 5]))
+
+        self.assertEqual(9, data_utils._read_write('src_fd', 'dest_fd', 0))
+
+        self.assertEqual(2, os.write.call_count)
+        self.assertEqual(b'_data', bytes(os.write.call_args[0][1]))
+
+    def test__copy_file_contents_error(self):
+        self.mock_object(data_utils, '_copy_file_range', mock.Mock(
+            side_effect=[5, OSError(errno.EXDEV, 'fake')]))
+        self.mock_object(os, 'copy_file_range', create=True)
+
+        self.assertRaises(OSError, data_utils._copy_file_contents,
+                          'src_fd', 'dest_fd')
+
+    def test__validate_item(self):
 
-        # mocks
         self.mock_object(utils, 'execute', mock.Mock(
-            side_effect=get_output))
+            return_value=("abcxyz  src\ndefrst  dest\n", "")))
 
-        # run
-        self._copy.copy_stats(self._copy.src)
+        self.assertRaises(exception.ShareDataCopyFailed,
+                          data_utils._validate_item, 'src', 'dest', 'md5')
 
-        # asserts
-        utils.execute.assert_has_calls([
-            mock.call("ls", "-pA1", "--group-directories-first",
-                      self._copy.src, run_as_root=True),
-            mock.call("ls", "-pA1", "--group-directories-first",
-                      os.path.join(self._copy.src, "folder1/"),
-                      run_as_root=True),
-            mock.call(
-                "chmod",
-                "--reference=%s" % os.path.join(self._copy.src, "folder1/"),
-                os.path.join(self._copy.dest, "folder1/"),
-                run_as_root=True),
-            mock.call(
-                "touch",
-                "--reference=%s" % os.path.join(self._copy.src, "folder1/"),
-                os.path.join(self._copy.dest, "folder1/"),
-                run_as_root=True),
-            mock.call(
-                "chown",
-                "--reference=%s" % os.path.join(self._copy.src, "folder1/"),
-                os.path.join(self._copy.dest, "folder1/"),
-                run_as_root=True),
-        ])
+        utils.execute.assert_called_once_with(
+            "md5sum", "src", "dest", run_as_root=True)
+
+    def test_hash_commands_allowed_by_rootwrap(self):
+        filters_path = os.path.join(
+            os.path.dirname(os.path.abspath(manila.__file__)), os.pardir,
+            'etc', 'manila', 'rootwrap.d', 'share.filters')
+        parser = six.moves.configparser.RawConfigParser()
+        parser.read(filters_path)
+        allowed = [value.split(',')[1].strip()
+                   for name, value in parser.items('Filters')]
+
+        for command in data_utils.HASH_COMMANDS.values():
+            self.assertIn(command, allowed)
+
+    def test__copy_item_hash(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        src_item = os.path.join(tmp_dir, 'src')
+        dest_item = os.path.join(tmp_dir, 'dest')
+        with open(src_item, 'wb') as src_file:
+            src_file.write(b'fake_data' * 1000)
+        self.mock_object(data_utils, 'COPY_CHUNK_SIZE', 1000)
+        self.mock_object(data_utils, '_copy_file_contents')
+
+        digest = data_utils._copy_item(src_item, dest_item, 'sha1')
+
+        self.assertEqual(hashlib.sha1(b'fake_data' * 1000).hexdigest(),
+                         digest)
+        with open(dest_item, 'rb') as dest_file:
+            self.assertEqual(b'fake_data' * 1000, dest_file.read())
+        self.assertFalse(data_utils._copy_file_contents.called)
+        data_utils._validate_dest_item(dest_item, digest, 'sha1')
+
+    def test__validate_dest_item_corrupted(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        dest_item = os.path.join(tmp_dir, 'dest')
+        with open(dest_item, 'wb') as dest_file:
+            dest_file.write(b'corrupted')
+
+        self.assertRaises(exception.ShareDataCopyFailed,
+                          data_utils._validate_dest_item, dest_item,
+                          hashlib.md5(b'fake_data').hexdigest(), 'md5')
+
+    def test__copy_and_validate_in_process(self):
+        self._copy.in_process = True
+        self._copy.hash_algorithm = 'md5'
+        self.mock_object(data_utils, '_copy_item',
+                         mock.Mock(return_value='fake_digest'))
+        self.mock_object(data_utils, '_validate_dest_item')
+        self.mock_object(data_utils, '_validate_item')
 
-    def test_copy_stats_cancelled_1(self):
+        self._copy._copy_and_validate('src', 'dest')
 
+        data_utils._copy_item.assert_called_once_with('src', 'dest', 'md5')
+        data_utils._validate_dest_item.assert_called_once_with(
+            'dest', 'fake_digest', 'md5')
+        self.assertFalse(data_utils._validate_item.called)
+
+    def test_copy_data_cancelled(self):
         self._copy.cancelled = True
+        self.mock_object(self._copy, '_copy_and_validate')
 
         # run
-        self._copy.copy_stats(self._copy.src)
-
-        # reset
-        self._copy.cancelled = False
+        self._copy.copy_data(self._fake_manifest(files=[('file1', 10)]))
 
-    def test_copy_stats_cancelled_2(self):
+        # asserts
+        self.assertFalse(self._copy._copy_and_validate.called)
 
-        def ls_output(*args, **kwargs):
-            self._copy.cancelled = True
-            return "folder1/", ""
+    def test_copy_stats(self):
 
         # mocks
-        self.mock_object(utils, 'execute', mock.Mock(
-            side_effect=ls_output))
+        self.mock_object(utils, 'execute')
 
         # run
-        self._copy.copy_stats(self._copy.src)
+        self._copy.copy_stats(self._fake_manifest(
+            dirs=['folder1', 'folder1/folder2']))
 
         # asserts
-        utils.execute.assert_called_once_with(
-            "ls", "-pA1", "--group-directories-first", self._copy.src,
-            run_as_root=True)
+        calls = []
+        for folder in ('folder1/folder2', 'folder1'):
+            src_item = os.path.join(self._copy.src, folder)
+            dest_item = os.path.join(self._copy.dest, folder)
+            calls.extend([
+                mock.call("chmod", "--reference=%s" % src_item, dest_item,
+                          run_as_root=True),
+                mock.call("touch", "--reference=%s" % src_item, dest_item,
+                          run_as_root=True),
+                mock.call("chown", "--reference=%s" % src_item, dest_item,
+                          run_as_root=True),
+            ])
+        self.assertEqual(calls, utils.execute.call_args_list)
+
+    def test_copy_stats_in_process(self):
+        self._copy.in_process = True
+        self.mock_object(utils, 'execute')
+        self.mock_object(os, 'chown')
+        self.mock_object(os, 'chmod')
+        self.mock_object(os, 'utime')
+        dest_item = os.path.join(self._copy.dest, 'folder1')
+
+        self._copy.copy_stats(self._fake_manifest(dirs=['folder1']))
+
+        os.chown.assert_called_once_with(dest_item, 1, 2)
+        os.chmod.assert_called_once_with(dest_item, 0o644)
+        os.utime.assert_called_once_with(dest_item, (3.5, 4.5))
+        self.assertFalse(utils.execute.called)
+
+    def test_copy_stats_cancelled(self):
+        self._copy.cancelled = True
+        self.mock_object(utils, 'execute')
 
-        # reset
-        self._copy.cancelled = False
+        # run
+        self._copy.copy_stats(self._fake_manifest(dirs=['folder1']))
+
+        # asserts
+        self.assertFalse(utils.execute.called)
 
     def test_run(self):
+        manifest = self._fake_manifest()
+        manifest.total_size = 200
 
         # mocks
-        self.mock_object(self._copy, 'get_total_size')
+        self.mock_object(self._copy, 'build_manifest',
+                         mock.Mock(return_value=manifest))
+        self.mock_object(self._copy, 'copy_dirs')
         self.mock_object(self._copy, 'copy_data')
         self.mock_object(self._copy, 'copy_stats')
         self.mock_object(self._copy, 'get_progress')
@@ -369,7 +567,251 @@ class CopyClassTestCase(test.TestCase):
 
         # asserts
         self.assertTrue(data_utils.LOG.info.called)
-        self._copy.get_total_size.assert_called_once_with(self._copy.src)
-        self._copy.copy_data.assert_called_once_with(self._copy.src)
-        self._copy.copy_stats.assert_called_once_with(self._copy.src)
+        self.assertEqual(200, self._copy.total_size)
+        self.assertTrue(self._copy.completed)
+        self._copy.build_manifest.assert_called_once_with(sort=False)
+        self._copy.copy_dirs.assert_called_once_with(manifest)
+        self._copy.copy_data.assert_called_once_with(manifest, start=0)
+        self._copy.copy_stats.assert_called_once_with(manifest)
         self._copy.get_progress.assert_called_once_with()
+        manifest.close.assert_called_once_with(remove=True)
+
+    def test_run_incremental(self):
+        manifest = self._fake_manifest()
+        delta = self._fake_manifest()
+        delta.total_size = 20
+        self._copy.incremental = True
+
+        # mocks
+        self.mock_object(self._copy, 'build_manifest',
+                         mock.Mock(return_value=manifest))
+        self.mock_object(self._copy, 'build_delta',
+                         mock.Mock(return_value=delta))
+        self.mock_object(self._copy, 'copy_dirs')
+        self.mock_object(self._copy, 'copy_data')
+        self.mock_object(self._copy, 'copy_stats')
+        self.mock_object(self._copy, 'get_progress')
+
+        # run
+        self._copy.run()
+
+        # asserts
+        self.assertEqual(20, self._copy.total_size)
+        self._copy.build_manifest.assert_called_once_with(sort=True)
+        self._copy.build_delta.assert_called_once_with(manifest)
+        self._copy.copy_dirs.assert_called_once_with(manifest)
+        self._copy.copy_data.assert_called_once_with(delta, start=0)
+        self._copy.copy_stats.assert_called_once_with(manifest)
+        manifest.close.assert_called_once_with(remove=True)
+        delta.close.assert_called_once_with(remove=True)
+
+    def _write_checkpoint(self, tmp_dir, **values):
+        checkpoint = {
+            'src': self._copy.src,
+            'dest': self._copy.dest,
+            'manifest': os.path.join(tmp_dir, 'manifest'),
+            'files_manifest': os.path.join(tmp_dir, 'manifest'),
+            'files_done': 2,
+            'bytes_done': 20,
+            'job': {'share_id': 'fake_id'},
+        }
+        checkpoint.update(values)
+        with open(checkpoint['manifest'], 'wb') as manifest_file:
+            for path in ('file1', 'file2', 'file3'):
+                data_utils.Manifest.write_entry(manifest_file, _entry(path))
+        checkpoint_path = os.path.join(tmp_dir, 'checkpoint.json')
+        with open(checkpoint_path, 'w') as checkpoint_file:
+            checkpoint_file.write(jsonutils.dumps(checkpoint))
+        return checkpoint_path
+
+    def test_run_resume_checkpoint(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        self._copy.current_size = 0
+        self._copy.checkpoint_path = self._write_checkpoint(tmp_dir)
+        self.mock_object(self._copy, 'build_manifest')
+        self.mock_object(self._copy, 'copy_dirs')
+        self.mock_object(self._copy, 'copy_data')
+        self.mock_object(self._copy, 'copy_stats')
+        self.mock_object(self._copy, 'get_progress')
+
+        self._copy.run()
+
+        self.assertFalse(self._copy.build_manifest.called)
+        self._copy.copy_data.assert_called_once_with(mock.ANY, start=2)
+        self.assertEqual(30, self._copy.total_size)
+        self.assertEqual(20, self._copy.current_size)
+        self.assertEqual(2, self._copy.files_copied)
+        self.assertEqual([], os.listdir(tmp_dir))
+
+    def test_run_discard_checkpoint(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        checkpoint_path = self._write_checkpoint(tmp_dir, dest='/other')
+        self._copy.checkpoint_path = checkpoint_path
+        self._copy.current_size = 0
+        manifest = self._fake_manifest()
+        manifest.path = 'fake_manifest'
+        self.mock_object(self._copy, 'build_manifest',
+                         mock.Mock(return_value=manifest))
+        self.mock_object(self._copy, 'copy_data', mock.Mock(
+            side_effect=exception.ShareDataCopyFailed(reason='fake')))
+
+        self.assertRaises(exception.ShareDataCopyFailed, self._copy.run)
+
+        self._copy.build_manifest.assert_called_once_with(sort=False)
+        manifest.close.assert_called_once_with(remove=True)
+        self.assertEqual(0, self._copy.current_size)
+        self.assertEqual([], os.listdir(tmp_dir))
+
+    def test_run_interrupted_keeps_checkpoint(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        self._copy.checkpoint_path = os.path.join(tmp_dir, 'checkpoint.json')
+        manifest = self._fake_manifest()
+        manifest.path = 'fake_manifest'
+        self.mock_object(self._copy, 'build_manifest',
+                         mock.Mock(return_value=manifest))
+        self.mock_object(self._copy, 'copy_dirs')
+        self.mock_object(self._copy, 'copy_data',
+                         mock.Mock(side_effect=KeyboardInterrupt))
+
+        self.assertRaises(KeyboardInterrupt, self._copy.run)
+
+        manifest.close.assert_called_once_with(remove=False)
+        checkpoint = data_utils.load_checkpoint(self._copy.checkpoint_path)
+        self.assertEqual('fake_manifest', checkpoint['manifest'])
+        self.assertEqual(0, checkpoint['files_done'])
+
+    def test_copy_data_checkpoint(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        self._copy.checkpoint_path = os.path.join(tmp_dir, 'checkpoint.json')
+        self._copy.checkpoint_interval = 0
+        self._copy._manifest_paths = ('fake_manifest', 'fake_manifest')
+        self._copy._files_done = 1
+        self._copy._bytes_done = 10
+        self.mock_object(self._copy, '_copy_and_validate')
+        self.mock_object(self._copy, 'get_progress')
+
+        self._copy.copy_data(self._fake_manifest(
+            files=[('file1', 10), ('file2', 20), ('file3', 30)]), start=1)
+
+        self.assertEqual(2, self._copy._copy_and_validate.call_count)
+        checkpoint = data_utils.load_checkpoint(self._copy.checkpoint_path)
+        self.assertEqual(3, checkpoint['files_done'])
+        self.assertEqual(60, checkpoint['bytes_done'])
+
+    def test__file_done_out_of_order(self):
+        self._copy._file_done(1, 20)
+
+        self.assertEqual(0, self._copy._files_done)
+        self.assertEqual(0, self._copy._bytes_done)
+
+        self._copy._file_done(0, 10)
+
+        self.assertEqual(2, self._copy._files_done)
+        self.assertEqual(30, self._copy._bytes_done)
+        self.assertEqual({}, self._copy._files_pending)
+
+    def test_load_checkpoint_missing(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+
+        self.assertIsNone(data_utils.load_checkpoint(
+            os.path.join(tmp_dir, 'checkpoint.json')))
+
+    def test_build_delta(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        src = os.path.join(tmp_dir, 'src')
+        dest = os.path.join(tmp_dir, 'dest')
+        for root in (src, dest):
+            os.makedirs(os.path.join(root, 'folder1'))
+            for item in ('file1', 'file2', 'folder1/file3', 'file5'):
+                with open(os.path.join(root, item), 'w') as f:
+                    f.write('fake')
+                os.utime(os.path.join(root, item), (1000, 2000))
+        with open(os.path.join(src, 'file2'), 'w') as f:
+            f.write('changed')
+        # Rewritten in place within the same second.
+        os.utime(os.path.join(src, 'file5'), (1000, 2000.5))
+        os.makedirs(os.path.join(dest, 'folder2', 'folder3'))
+        os.remove(os.path.join(src, 'folder1', 'file3'))
+        os.mkdir(os.path.join(src, 'folder1', 'file3'))
+        with open(os.path.join(src, 'file4'), 'w') as f:
+            f.write('new')
+        self._copy.src = src
+        self._copy.dest = dest
+        self._copy.in_process = True
+        self.mock_object(data_utils.Manifest, 'sort', _sort_manifest)
+
+        manifest = self._copy.build_manifest(sort=True)
+        delta = self._copy.build_delta(manifest)
+
+        self.assertEqual(['file2', 'file4', 'file5'],
+                         sorted(entry.path for entry in delta.files()))
+        self.assertEqual(14, delta.total_size)
+        self.assertFalse(os.path.exists(os.path.join(dest, 'folder2')))
+        self.assertFalse(os.path.exists(os.path.join(dest, 'folder1',
+                                                     'file3')))
+        self.assertTrue(os.path.exists(os.path.join(dest, 'file1')))
+        manifest.close()
+        delta.close()
+
+    def test__merge_manifests(self):
+        manifest = mock.Mock()
+        manifest.entries.return_value = iter(
+            [_entry('a'), _entry('a/b'), _entry('c')])
+        other = mock.Mock()
+        other.entries.return_value = iter(
+            [_entry('a'), _entry('a-b'), _entry('d')])
+
+        result = list(data_utils._merge_manifests(manifest, other))
+
+        self.assertEqual(
+            [(_entry('a'), _entry('a')),
+             (None, _entry('a-b')),
+             (_entry('a/b'), None),
+             (_entry('c'), None),
+             (None, _entry('d'))],
+            result)
+
+    def test_manifest_sort(self):
+        self.mock_object(utils, 'execute')
+        manifest = data_utils.Manifest('/fake/manifest')
+
+        manifest.sort()
+
+        utils.execute.assert_called_once_with(
+            "sort", "-z", "-t", " ", "-k", "8", "-o", "/fake/manifest",
+            "/fake/manifest", env_variables={'LC_ALL': 'C'})
+
+    def test__update_item(self):
+        tmp_dir = self.useFixture(fixtures.TempDir()).path
+        src_item = os.path.join(tmp_dir, 'src')
+        dest_item = os.path.join(tmp_dir, 'dest')
+        with open(src_item, 'wb') as src_file:
+            src_file.write(b'a' * 10 + b'b' * 10 + b'c' * 5)
+        with open(dest_item, 'wb') as dest_file:
+            dest_file.write(b'a' * 10 + b'x' * 10 + b'c' * 10)
+        self.mock_object(data_utils, 'COPY_CHUNK_SIZE', 10)
+        self.mock_object(data_utils, '_copy_item')
+
+        digest = data_utils._update_item(src_item, dest_item, 'sha256')
+
+        with open(dest_item, 'rb') as dest_file:
+            self.assertEqual(b'a' * 10 + b'b' * 10 + b'c' * 5,
+                             dest_file.read())
+        self.assertEqual(
+            hashlib.sha256(b'a' * 10 + b'b' * 10 + b'c' * 5).hexdigest(),
+            digest)
+        self.assertFalse(data_utils._copy_item.called)
+
+
+def _entry(path, item_type='f', size=10, mode=0o644):
+    return data_utils.ManifestEntry(
+        type=item_type, size=size, mode=mode, uid=1, gid=2, atime=3.5,
+        mtime=4.5, path=path)
+
+
+def _sort_manifest(manifest):
+    with open(manifest.path, 'rb') as manifest_file:
+        records = manifest_file.read().split(b'\0')[:-1]
+    records.sort(key=lambda record: record.split(b' ', 7)[7])
+    with open(manifest.path, 'wb') as manifest_file:
+        manifest_file.write(b''.join(record + b'\0' for record in records))
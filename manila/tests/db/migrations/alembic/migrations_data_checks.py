@@ -2562,3 +2562,39 @@ class BackenInfoTableChecks(BaseMigrationChecks):
     def check_downgrade(self, engine):
         self.test_case.assertRaises(sa_exc.NoSuchTableError, utils.load_table,
                                     self.new_table_name, engine)
+
+
+@map_to_migration('cb94f965a893')
+class ShareFilterIndexesChecks(BaseMigrationChecks):
+    indexes = (
+        ('shares', ['deleted', 'display_name']),
+        ('shares', ['snapshot_id']),
+        ('share_instances', ['deleted', 'status']),
+        ('share_instances', ['deleted', 'host']),
+    )
+
+    def setup_upgrade_data(self, engine):
+        pass
+
+    def _get_index(self, engine, table_name, members):
+        table = utils.load_table(table_name, engine)
+        for idx in table.indexes:
+            if sorted(idx.columns.keys()) == members:
+                return idx
+
+    def check_upgrade(self, engine, data):
+        for table_name, members in self.indexes:
+            self.test_case.assertTrue(
+                self._get_index(engine, table_name, members))
+
+    def check_downgrade(self, engine):
+        for table_name, members in self.indexes:
+            self.test_case.assertFalse(
+                self._get_index(engine, table_name, members))
+
+
+@map_to_migration('b207e61c3dcf')
+class ShareTaskStateIndexChecks(ShareFilterIndexesChecks):
+    indexes = (
+        ('shares', ['deleted', 'task_state']),
+    )
@@ -20,6 +20,7 @@
 import copy
 import datetime
 import ddt
+import functools
 import mock
 import random
 
@@ -54,6 +55,16 @@ security_service_dict = {
 }
 
 
+def _get_all_pages(get_all, limit, **kwargs):
+    """Returns IDs of all items retrieved page by page using markers."""
+    ids = []
+    page = get_all(limit=limit, **kwargs)
+    while page:
+        ids.extend(item['id'] for item in page)
+        page = get_all(limit=limit, marker=page[-1]['id'], **kwargs)
+    return ids
+
+
 class BaseDatabaseAPITestCase(test.TestCase):
     def _check_fields(self, expected, actual):
         for key in expected:
@@ -147,6 +158,78 @@ class ShareAccessDatabaseAPITestCase(test.TestCase):
                          instance_access_mapping['state'])
         self.assertEqual('watson4heisman', access['access_key'])
 
+    def test_share_instance_access_update_all(self):
+        share = db_utils.create_share()
+        access_1 = db_utils.create_access(share_id=share['id'])
+        access_2 = db_utils.create_access(
+            share_id=share['id'], state=constants.ACCESS_STATE_APPLYING)
+        access_3 = db_utils.create_access(share_id=share['id'])
+        conditionally_change = {
+            constants.ACCESS_STATE_QUEUED_TO_APPLY:
+                constants.ACCESS_STATE_APPLYING,
+            constants.ACCESS_STATE_APPLYING: constants.ACCESS_STATE_ACTIVE,
+        }
+
+        rules = db_api.share_instance_access_update_all(
+            self.ctxt, share.instance['id'], [access_1['id'], access_2['id']],
+            updates={'access_key': 'watson4heisman'},
+            conditionally_change=conditionally_change)
+
+        states = {r['access_id']: r['state'] for r in rules}
+        self.assertEqual({access_1['id']: constants.ACCESS_STATE_APPLYING,
+                          access_2['id']: constants.ACCESS_STATE_ACTIVE},
+                         states)
+        for rule in rules:
+            self.assertEqual('watson4heisman', rule['access_key'])
+        untouched = db_api.share_instance_access_get(
+            self.ctxt, access_3['id'], share.instance['id'])
+        self.assertEqual(constants.ACCESS_STATE_QUEUED_TO_APPLY,
+                         untouched['state'])
+        self.assertIsNone(untouched['access_key'])
+
+    def test_share_instance_access_update_all_forced_state(self):
+        share = db_utils.create_share()
+        access_1 = db_utils.create_access(share_id=share['id'])
+        access_2 = db_utils.create_access(
+            share_id=share['id'], state=constants.ACCESS_STATE_APPLYING)
+
+        rules = db_api.share_instance_access_update_all(
+            self.ctxt, share.instance['id'], [access_1['id'], access_2['id']],
+            updates={'state': constants.ACCESS_STATE_QUEUED_TO_DENY},
+            conditionally_change={
+                constants.ACCESS_STATE_APPLYING: constants.STATUS_ERROR})
+
+        states = {r['access_id']: r['state'] for r in rules}
+        self.assertEqual(
+            {access_1['id']: constants.ACCESS_STATE_QUEUED_TO_DENY,
+             access_2['id']: constants.STATUS_ERROR}, states)
+
+    def test_share_instance_access_update_all_in_chunks(self):
+        share = db_utils.create_share()
+        access_ids = [db_utils.create_access(share_id=share['id'])['id']
+                      for i in range(3)]
+        self.mock_object(db_api, '_IN_FILTER_CHUNK_SIZE', 2)
+        get_all_for_instance = self.mock_object(
+            db_api, 'share_access_get_all_for_instance',
+            mock.Mock(side_effect=db_api.share_access_get_all_for_instance))
+
+        rules = db_api.share_instance_access_update_all(
+            self.ctxt, share.instance['id'], access_ids,
+            updates={'state': constants.STATUS_ERROR})
+
+        self.assertEqual(
+            {access_id: constants.STATUS_ERROR for access_id in access_ids},
+            {r['access_id']: r['state'] for r in rules})
+        self.assertEqual(
+            [tuple(access_ids[:2]), tuple(access_ids[2:])],
+            [c[1]['filters']['access_id']
+             for c in get_all_for_instance.call_args_list])
+
+    def test_share_instance_access_update_all_no_access_ids(self):
+        self.assertEqual([], db_api.share_instance_access_update_all(
+            self.ctxt, 'fake_instance_id', [],
+            updates={'state': constants.STATUS_ERROR}))
+
     @ddt.data(True, False)
     def test_share_access_get_all_for_instance_with_share_access_data(
             self, with_share_access_data):
@@ -272,6 +355,20 @@ class ShareDatabaseAPITestCase(test.TestCase):
         super(ShareDatabaseAPITestCase, self).setUp()
         self.ctxt = context.get_admin_context()
 
+    def test_share_get_request_cached(self):
+        share = db_utils.create_share(display_name='foo')
+        self.ctxt.db_cache = context.RequestCache()
+
+        first = db_api.share_get(self.ctxt, share['id'])
+        second = db_api.share_get(self.ctxt, share['id'])
+        db_api.share_update(self.ctxt, share['id'], {'display_name': 'bar'})
+        updated = db_api.share_get(self.ctxt, share['id'])
+
+        self.assertIs(first, second)
+        self.assertEqual('bar', updated['display_name'])
+        self.assertEqual(1, self.ctxt.db_cache.hits)
+        self.assertEqual(2, self.ctxt.db_cache.misses)
+
     def test_share_filter_by_host_with_pools(self):
         share_instances = [[
             db_api.share_create(self.ctxt, {'host': value}).instance
@@ -376,7 +473,8 @@ class ShareDatabaseAPITestCase(test.TestCase):
 
     @ddt.data(True, False)
     def test_share_instance_get_all_by_host(self, with_share_data):
-        db_utils.create_share()
+        db_utils.create_share(
+            task_state=constants.TASK_STATE_MIGRATION_IN_PROGRESS)
         instances = db_api.share_instances_get_all_by_host(
             self.ctxt, 'fake_host', with_share_data)
 
@@ -388,18 +486,61 @@ class ShareDatabaseAPITestCase(test.TestCase):
         if with_share_data:
             self.assertEqual('NFS', instance['share_proto'])
             self.assertEqual(0, instance['size'])
+            self.assertEqual(constants.TASK_STATE_MIGRATION_IN_PROGRESS,
+                             instance['task_state'])
         else:
             self.assertNotIn('share_proto', instance)
 
     def test_share_instance_get_all_by_host_not_found_exception(self):
         db_utils.create_share()
-        self.mock_object(db_api, 'share_get', mock.Mock(
-                         side_effect=exception.NotFound))
+        self.mock_object(db_api, '_share_get_all_by_ids',
+                         mock.Mock(return_value={}))
         instances = db_api.share_instances_get_all_by_host(
             self.ctxt, 'fake_host', True)
 
         self.assertEqual(0, len(instances))
 
+    def test_share_instance_get_all_by_host_loads_shares_in_bulk(self):
+        shares = [db_utils.create_share(size=size) for size in (1, 2, 3)]
+        self.mock_object(db_api, 'share_get')
+        self.mock_object(db_api, '_IN_FILTER_CHUNK_SIZE', 2)
+
+        instances = db_api.share_instances_get_all_by_host(
+            self.ctxt, 'fake_host', True)
+
+        self.assertFalse(db_api.share_get.called)
+        self.assertEqual(
+            {share['id']: share['size'] for share in shares},
+            {instance['share_id']: instance['size']
+             for instance in instances})
+
+    def test_share_instance_get_all_by_host_with_limit_and_marker(self):
+        instance_ids = sorted(
+            db_utils.create_share().instance['id'] for i in range(5))
+
+        first_page = db_api.share_instances_get_all_by_host(
+            self.ctxt, 'fake_host', limit=2)
+        next_page = db_api.share_instances_get_all_by_host(
+            self.ctxt, 'fake_host', limit=2, marker=first_page[-1]['id'])
+
+        self.assertEqual(instance_ids[:2], [i['id'] for i in first_page])
+        self.assertEqual(instance_ids[2:4], [i['id'] for i in next_page])
+
+    def test_share_instance_sizes_sum_by_host(self):
+        for host, size in (('foo#pool0', 1), ('foo#pool0', 2),
+                           ('foo#pool1', 4), ('bar#pool0', 8)):
+            db_utils.create_share(host=host, size=size)
+        deleted_share = db_utils.create_share(host='foo#pool1', size=16)
+        db_api.share_instance_delete(self.ctxt, deleted_share.instance['id'])
+
+        all_sizes = db_api.share_instance_sizes_sum_by_host(self.ctxt)
+        foo_sizes = db_api.share_instance_sizes_sum_by_host(
+            self.ctxt, host='foo')
+
+        self.assertEqual(
+            {'foo#pool0': 3, 'foo#pool1': 4, 'bar#pool0': 8}, all_sizes)
+        self.assertEqual({'foo#pool0': 3, 'foo#pool1': 4}, foo_sizes)
+
     def test_share_instance_get_all_by_share_group(self):
         group = db_utils.create_share_group()
         db_utils.create_share(share_group_id=group['id'])
@@ -447,6 +588,204 @@ class ShareDatabaseAPITestCase(test.TestCase):
         self.assertEqual(2, len(actual_result))
         self.assertEqual(shares[0]['id'], actual_result[1]['id'])
 
+    @ddt.data(('display_name', 'asc'), ('display_name', 'desc'),
+              ('host', 'asc'), ('host', 'desc'))
+    @ddt.unpack
+    def test_share_get_all_paginated(self, sort_key, sort_dir):
+        values = ('b', 'a', None, 'b', None, 'c')
+        shares = [db_utils.create_share(**{sort_key: value})
+                  for value in values]
+        for share in shares:
+            db_utils.create_share_instance(share_id=share['id'],
+                                           host=share['host'])
+        set_values = sorted(
+            (value, share['id']) for value, share in zip(values, shares)
+            if value is not None)
+        null_values = sorted(
+            share['id'] for value, share in zip(values, shares)
+            if value is None)
+        if sort_dir == 'desc':
+            set_values.reverse()
+            null_values.reverse()
+        expected = [share_id for value, share_id in set_values] + null_values
+
+        all_shares = db_api.share_get_all(
+            self.ctxt, sort_key=sort_key, sort_dir=sort_dir, limit=100)
+        paginated_ids = _get_all_pages(
+            functools.partial(db_api.share_get_all, self.ctxt),
+            limit=2, sort_key=sort_key, sort_dir=sort_dir)
+
+        self.assertEqual(expected, [share['id'] for share in all_shares])
+        self.assertEqual(expected, paginated_ids)
+
+    @ddt.data('asc', 'desc')
+    def test_share_get_all_paginated_by_instances(self, sort_dir):
+        shares = [db_utils.create_share(host=host) for host in ('a', 'b')]
+        for share, host in zip(shares, ('d', 'c')):
+            db_utils.create_share_instance(share_id=share['id'], host=host)
+
+        paginated_ids = _get_all_pages(
+            functools.partial(db_api.share_get_all, self.ctxt),
+            limit=1, sort_key='host', sort_dir=sort_dir)
+
+        # Sorted by the lowest host ascending, and the highest descending.
+        self.assertEqual([share['id'] for share in shares], paginated_ids)
+
+    def test_share_get_all_by_project_with_limit_and_offset(self):
+        shares = [db_utils.create_share(display_name=name)
+                  for name in ('a', 'b', 'c')]
+        db_utils.create_share(display_name='d', project_id='other_project')
+
+        result = db_api.share_get_all_by_project(
+            self.ctxt, 'fake', sort_key='display_name', sort_dir='asc',
+            limit=1, offset=1)
+
+        self.assertEqual([shares[1]['id']], [share['id'] for share in result])
+
+    @ddt.data(({'status': constants.STATUS_ERROR}, [1]),
+              ({'host': 'host2'}, [1, 2]),
+              ({'display_name': 'foo'}, [0]),
+              ({'display_name~': 'o_b'}, [2]),
+              ({'display_name~': 'o%'}, []),
+              ({'display_description~': 'desc'}, [0, 2]),
+              ({'display_name~': 'o', 'status': constants.STATUS_CREATING},
+               [0, 2]),
+              ({'display_name': ['foo', 'foo_bar']}, [0, 2]))
+    @ddt.unpack
+    def test_share_get_all_filtered(self, filters, expected_indexes):
+        shares = [
+            db_utils.create_share(display_name='foo', host='host1',
+                                  display_description='desc1'),
+            db_utils.create_share(display_name='bar', host='host2',
+                                  status=constants.STATUS_ERROR),
+            db_utils.create_share(display_name='foo_bar', host='host2',
+                                  display_description='desc2'),
+        ]
+
+        result = db_api.share_get_all(
+            self.ctxt, filters=filters, sort_key='created_at',
+            sort_dir='asc')
+
+        self.assertEqual(
+            sorted(shares[i]['id'] for i in expected_indexes),
+            sorted(share['id'] for share in result))
+
+    @ddt.data({'host': 'old_host'},
+              {'status': constants.STATUS_ERROR},
+              {'host': 'old_host', 'status': constants.STATUS_ERROR})
+    def test_share_get_all_filtered_ignores_deleted_instances(self, filters):
+        share = db_utils.create_share(host='new_host')
+        old_instance = db_utils.create_share_instance(
+            share_id=share['id'], host='old_host',
+            status=constants.STATUS_ERROR)
+        # NOTE: Keep the status, so that only the deletion hides it.
+        session = db_api.get_session()
+        with session.begin():
+            db_api.share_instance_get(
+                self.ctxt, old_instance['id'],
+                session=session).soft_delete(session)
+
+        result = db_api.share_get_all(self.ctxt, filters=filters)
+
+        self.assertEqual([], result)
+        self.assertEqual(
+            [share['id']],
+            [s['id'] for s in db_api.share_get_all(
+                self.ctxt, filters={'host': 'new_host'})])
+
+    @ddt.data(({'status': constants.STATUS_AVAILABLE}, True),
+              ({'status': constants.STATUS_ERROR}, False),
+              ({'host': 'host1'}, True),
+              ({'host': 'host2'}, False),
+              ({'host': ['host2', 'host1']}, True),
+              ({'status': constants.STATUS_AVAILABLE, 'host': 'host2'},
+               False))
+    @ddt.unpack
+    def test_share_get_all_filtered_by_primary_instance(self, filters,
+                                                        expected):
+        share = db_utils.create_share(
+            host='host1', status=constants.STATUS_AVAILABLE,
+            replica_state=constants.REPLICA_STATE_ACTIVE)
+        db_utils.create_share_replica(
+            share_id=share['id'], host='host2',
+            status=constants.STATUS_ERROR,
+            replica_state=constants.REPLICA_STATE_OUT_OF_SYNC)
+
+        result = db_api.share_get_all(self.ctxt, filters=filters)
+
+        self.assertEqual([share['id']] if expected else [],
+                         [s['id'] for s in result])
+
+    @ddt.data(constants.STATUS_AVAILABLE, constants.STATUS_MIGRATING)
+    def test_share_get_all_filtered_by_primary_instance_status(self, status):
+        share = db_utils.create_share(status=constants.STATUS_MIGRATING)
+        db_utils.create_share_instance(
+            share_id=share['id'], status=constants.STATUS_MIGRATING_TO)
+
+        result = db_api.share_get_all(
+            self.ctxt, filters={'status': status})
+
+        self.assertEqual(
+            [share['id']] if status == share['status'] else [],
+            [s['id'] for s in result])
+
+    @ddt.data((constants.STATUS_ACTIVE, [0, 3]),
+              (constants.SHARE_INSTANCE_RULES_SYNCING, [1]),
+              (constants.SHARE_INSTANCE_RULES_ERROR, [2]),
+              ('fake_status', []))
+    @ddt.unpack
+    def test_share_get_all_filtered_by_access_rules_status(
+            self, access_rules_status, expected_indexes):
+        instances_statuses = (
+            (constants.STATUS_ACTIVE, constants.STATUS_ACTIVE),
+            (constants.STATUS_ACTIVE, constants.SHARE_INSTANCE_RULES_SYNCING),
+            (constants.SHARE_INSTANCE_RULES_SYNCING,
+             constants.SHARE_INSTANCE_RULES_ERROR),
+        )
+        shares = []
+        for statuses in instances_statuses:
+            share = db_utils.create_share(
+                status=constants.STATUS_AVAILABLE,
+                access_rules_status=statuses[0])
+            db_utils.create_share_instance(
+                share_id=share['id'], status=constants.STATUS_AVAILABLE,
+                access_rules_status=statuses[1])
+            shares.append(share)
+        # Only the access rules of available instances count.
+        shares.append(db_utils.create_share(
+            status=constants.STATUS_ERROR,
+            access_rules_status=constants.SHARE_INSTANCE_RULES_ERROR))
+
+        result = db_api.share_get_all(
+            self.ctxt, filters={'access_rules_status': access_rules_status})
+
+        self.assertEqual(
+            sorted(shares[i]['id'] for i in expected_indexes),
+            sorted(share['id'] for share in result))
+        for share in result:
+            self.assertEqual(access_rules_status,
+                             share['access_rules_status'])
+
+    def test_share_get_all_filtered_marker_not_matching(self):
+        shares = [db_utils.create_share(display_name=name,
+                                        status=constants.STATUS_AVAILABLE)
+                  for name in ('a', 'b', 'c')]
+        db_api.share_instance_update(
+            self.ctxt, shares[0].instance['id'],
+            {'status': constants.STATUS_ERROR})
+
+        result = db_api.share_get_all(
+            self.ctxt, filters={'status': constants.STATUS_AVAILABLE},
+            sort_key='display_name', sort_dir='asc', limit=1,
+            marker=shares[0]['id'])
+
+        self.assertEqual([shares[1]['id']], [share['id'] for share in result])
+
+    def test_share_get_all_marker_not_found(self):
+        self.assertRaises(exception.InvalidInput, db_api.share_get_all,
+                          self.ctxt, sort_key='created_at', sort_dir='desc',
+                          marker='fake_marker')
+
     @ddt.data('id', 'path')
     def test_share_get_all_by_export_location(self, type):
         share = db_utils.create_share()
@@ -811,6 +1150,17 @@ class ShareGroupDatabaseAPITestCase(test.TestCase):
         self.assertEqual(expected_share_group['id'], share_group['id'])
         self.assertEqual(expected_share_group['name'], share_group['name'])
 
+    def test_share_group_get_all_paginated(self):
+        share_groups = [db_utils.create_share_group(name=name)
+                        for name in ('a', 'c', 'b')]
+
+        paginated_ids = _get_all_pages(
+            functools.partial(db_api.share_group_get_all, self.ctxt),
+            limit=2, detailed=False, sort_key='name', sort_dir='desc')
+
+        self.assertEqual(
+            [share_groups[i]['id'] for i in (1, 2, 0)], paginated_ids)
+
     def test_share_group_get_all_with_detail(self):
         expected_share_group = db_utils.create_share_group()
 
@@ -1229,6 +1579,31 @@ class ShareSnapshotDatabaseAPITestCase(test.TestCase):
 
         self.assertSubDictMatch(values3, result.to_dict())
 
+    @ddt.data('asc', 'desc')
+    def test_share_snapshot_get_all_paginated(self, sort_dir):
+        expected = [self.snapshot_1['id'], self.snapshot_2['id']]
+        if sort_dir == 'desc':
+            expected.reverse()
+
+        paginated_ids = _get_all_pages(
+            functools.partial(db_api.share_snapshot_get_all, self.ctxt),
+            limit=1, sort_key='share_id', sort_dir=sort_dir)
+
+        self.assertEqual(expected, paginated_ids)
+
+    def test_share_snapshot_get_all_has_instances(self):
+        db_api.share_snapshot_create(
+            self.ctxt, {'id': 'fake_snapshot_id_3',
+                        'share_id': self.share_1['id']},
+            create_snapshot_instance=False)
+
+        snapshots = db_api.share_snapshot_get_all(
+            self.ctxt, filters={'has_instances': True}, limit=10)
+
+        self.assertEqual(
+            {self.snapshot_1['id'], self.snapshot_2['id']},
+            {snapshot['id'] for snapshot in snapshots})
+
     def test_get_instance(self):
         snapshot = db_utils.create_snapshot(with_share=True)
 
@@ -1436,6 +1811,21 @@ class ShareSnapshotDatabaseAPITestCase(test.TestCase):
 
         self.assertSubDictMatch(values, out[0].to_dict())
 
+    def test_share_snapshot_access_get_all_for_snapshot_instances(self):
+        access = db_utils.create_snapshot_access(
+            share_snapshot_id=self.snapshot_1['id'])
+
+        out = db_api.share_snapshot_access_get_all_for_snapshot_instances(
+            self.ctxt, [self.snapshot_instances[0].id, 'fake_instance_id'])
+        filtered_out = (
+            db_api.share_snapshot_access_get_all_for_snapshot_instances(
+                self.ctxt, [self.snapshot_instances[0].id],
+                filters={'state': constants.ACCESS_STATE_ACTIVE}))
+
+        self.assertEqual(1, len(out))
+        self.assertEqual(access['id'], out[0]['access_id'])
+        self.assertEqual([], filtered_out)
+
     def test_share_snapshot_instance_access_update_state(self):
         access = db_utils.create_snapshot_access(
             share_snapshot_id=self.snapshot_1['id'])
@@ -2036,6 +2426,29 @@ class ShareNetworkDatabaseAPITestCase(BaseDatabaseAPITestCase):
         for index, net in enumerate(share_networks):
             self._check_fields(expected=net, actual=result[index])
 
+    def test_get_all_paginated(self):
+        now = timeutils.utcnow()
+        share_networks = []
+        for index in range(3):
+            share_nw_dict = dict(self.share_nw_dict,
+                                 id='fake share nw id%s' % index,
+                                 created_at=now + datetime.timedelta(index))
+            share_networks.append(
+                db_api.share_network_create(self.fake_context, share_nw_dict))
+
+        paginated_ids = _get_all_pages(
+            functools.partial(db_api.share_network_get_all_by_project,
+                              self.fake_context,
+                              self.fake_context.project_id),
+            limit=2)
+        offset_result = db_api.share_network_get_all(
+            self.fake_context, limit=1, offset=2)
+
+        self.assertEqual([net['id'] for net in reversed(share_networks)],
+                         paginated_ids)
+        self.assertEqual([share_networks[0]['id']],
+                         [net['id'] for net in offset_result])
+
     def test_get_all_by_project(self):
         share_nw_dict2 = dict(self.share_nw_dict)
         share_nw_dict2['id'] = 'fake share nw id2'
@@ -2737,6 +3150,79 @@ class ReservationDatabaseAPITest(test.TestCase):
         self.assertEqual(reservation['id'], reservations[0]['id'])
         self.assertEqual(2, quota_usage['reserved'])
 
+    def _create_quota_usages(self, *resources):
+        for resource in resources:
+            db_api.quota_usage_create(self.context, 'fake_project',
+                                      'fake_user', resource, 5, 0,
+                                      until_refresh=None)
+
+    def test__lock_quota_usages(self):
+        self._create_quota_usages('snapshots', 'shares', 'gigabytes')
+        query = db_api.model_query(self.context, models.QuotaUsage,
+                                   session=db_api.get_session())
+
+        rows = db_api._lock_quota_usages(query, ['gigabytes', 'snapshots'])
+
+        self.assertEqual(['snapshots', 'gigabytes'],
+                         [row.resource for row in rows])
+
+    def test__lock_quota_usages_all_resources(self):
+        self._create_quota_usages('snapshots', 'shares', 'gigabytes')
+        query = db_api.model_query(self.context, models.QuotaUsage,
+                                   session=db_api.get_session())
+
+        rows = db_api._lock_quota_usages(query, None)
+
+        self.assertEqual(['snapshots', 'shares', 'gigabytes'],
+                         [row.resource for row in rows])
+
+    def _quota_reserve(self, deltas):
+        quotas = {resource: 10 for resource in deltas}
+        return db_api.quota_reserve(
+            self.context, quota.QUOTAS._resources, quotas, quotas, {},
+            deltas, timeutils.utcnow() + datetime.timedelta(days=1),
+            0, 0, project_id='fake_project', user_id='fake_user')
+
+    def test_quota_reserve_locks_reserved_resources(self):
+        self._create_quota_usages('snapshots', 'shares', 'gigabytes')
+        lock_quota_usages = db_api._lock_quota_usages
+        locked = []
+
+        def fake_lock_quota_usages(query, resources):
+            rows = lock_quota_usages(query, resources)
+            locked.append([row.resource for row in rows])
+            return rows
+
+        self.mock_object(db_api, '_lock_quota_usages',
+                         mock.Mock(side_effect=fake_lock_quota_usages))
+
+        reservations = self._quota_reserve({'shares': 1})
+
+        self.assertEqual(1, len(reservations))
+        for call in db_api._lock_quota_usages.call_args_list:
+            self.assertEqual(['shares'], call[0][1])
+        self.assertIn(['shares'], locked)
+
+    def test_quota_reserve_skips_refresh_of_unreserved_usages(self):
+        self._create_quota_usages('shares', 'gigabytes')
+        db_api.quota_usage_update(
+            self.context, 'fake_project', 'fake_user', 'shares', in_use=-1)
+        sync = mock.Mock(return_value={'shares': 3, 'gigabytes': 7})
+        self.mock_object(db_api, 'QUOTA_SYNC_FUNCTIONS',
+                         {'_sync_shares': sync})
+
+        self._quota_reserve({'shares': 1})
+
+        shares_usage = db_api.quota_usage_get(
+            self.context, 'fake_project', 'shares', user_id='fake_user')
+        gigabytes_usage = db_api.quota_usage_get(
+            self.context, 'fake_project', 'gigabytes', user_id='fake_user')
+        self.assertTrue(sync.called)
+        self.assertEqual(3, shares_usage['in_use'])
+        self.assertEqual(1, shares_usage['reserved'])
+        self.assertEqual(5, gigabytes_usage['in_use'])
+        self.assertEqual(0, gigabytes_usage['reserved'])
+
 
 @ddt.ddt
 class PurgeDeletedTest(test.TestCase):
@@ -2828,6 +3314,36 @@ class PurgeDeletedTest(test.TestCase):
                 rows = db_api.model_query(self.context, model).count()
                 self.assertEqual(num_left, rows)
 
+    def _create_soft_deleted_share_networks(self, count):
+        for unused in range(count):
+            db_utils.create_share_network(
+                id=uuidutils.generate_uuid(),
+                deleted_at=self._days_ago(1, 1))
+
+    @mock.patch('time.sleep')
+    def test_purge_records_in_batches(self, mock_sleep):
+        self._create_soft_deleted_share_networks(5)
+
+        purged = db_api.purge_deleted_records(
+            self.context, age_in_days=0, batch_size=2, sleep_interval=0.5)
+
+        self.assertEqual(5, purged['share_networks'])
+        self.assertEqual(0, purged['shares'])
+        self.assertEqual(
+            0, db_api.model_query(self.context, models.ShareNetwork).count())
+        self.assertEqual(
+            2, mock_sleep.call_args_list.count(mock.call(0.5)))
+
+    def test_purge_records_dry_run(self):
+        self._create_soft_deleted_share_networks(3)
+
+        purged = db_api.purge_deleted_records(
+            self.context, age_in_days=0, dry_run=True)
+
+        self.assertEqual(3, purged['share_networks'])
+        self.assertEqual(
+            3, db_api.model_query(self.context, models.ShareNetwork).count())
+
     def test_purge_records_with_illegal_args(self):
         self.assertRaises(TypeError, db_api.purge_deleted_records,
                           self.context)
@@ -2835,6 +3351,11 @@ class PurgeDeletedTest(test.TestCase):
                           db_api.purge_deleted_records,
                           self.context,
                           age_in_days=-1)
+        self.assertRaises(exception.InvalidParameterValue,
+                          db_api.purge_deleted_records,
+                          self.context,
+                          age_in_days=0,
+                          batch_size=0)
 
     def test_purge_records_with_constraint(self):
         if not self._sqlite_has_fk_constraint():
@@ -2989,6 +3510,19 @@ class MessagesDatabaseAPITestCase(test.TestCase):
         result_ids = [r.id for r in result]
         self.assertEqual(result_ids, ids)
 
+    def test_message_get_all_paginated(self):
+        ids = []
+        for i in ['003', '001', '002', '001']:
+            msg = db_utils.create_message(project_id=self.project_id,
+                                          action_id=i)
+            ids.append(msg.id)
+
+        paginated_ids = _get_all_pages(
+            functools.partial(db_api.message_get_all, self.ctxt),
+            limit=3, sort_key='action_id', sort_dir='asc')
+
+        self.assertEqual(sorted(ids[1::2]) + [ids[2], ids[0]], paginated_ids)
+
     def test_cleanup_expired_messages(self):
         adm_context = self.ctxt.elevated()
 
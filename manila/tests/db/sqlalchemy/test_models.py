@@ -146,6 +146,52 @@ class ShareTestCase(test.TestCase):
         self.assertEqual(
             constants.STATUS_ERROR, share2.instance['status'])
 
+    def test_share_instance_cached(self):
+        instance_list = [
+            db_utils.create_share_instance(status=constants.STATUS_AVAILABLE,
+                                           share_id='fake_id'),
+            db_utils.create_share_instance(status=constants.STATUS_ERROR,
+                                           share_id='fake_id')
+        ]
+        share = db_utils.create_share(instances=instance_list)
+
+        first = share.instance
+        cache = share.__dict__['_instance_cache']
+
+        self.assertIs(first, share.instance)
+        self.assertIs(cache, share.__dict__['_instance_cache'])
+        self.assertEqual(constants.STATUS_AVAILABLE, share.status)
+
+    def test_share_instance_cache_invalidated_on_status_change(self):
+        instance_list = [
+            db_utils.create_share_instance(status=constants.STATUS_AVAILABLE,
+                                           share_id='fake_id'),
+            db_utils.create_share_instance(status=constants.STATUS_ERROR,
+                                           share_id='fake_id')
+        ]
+        share = db_utils.create_share(instances=instance_list)
+        self.assertEqual(constants.STATUS_AVAILABLE, share.status)
+
+        share.instances[1]['status'] = constants.STATUS_REPLICATION_CHANGE
+
+        self.assertEqual(constants.STATUS_REPLICATION_CHANGE, share.status)
+        self.assertEqual(share.instances[1]['id'], share.instance['id'])
+
+    def test_share_instance_cache_invalidated_on_instances_reload(self):
+        instance_list = [
+            db_utils.create_share_instance(status=constants.STATUS_AVAILABLE,
+                                           share_id='fake_id'),
+            db_utils.create_share_instance(status=constants.STATUS_ERROR,
+                                           share_id='fake_id')
+        ]
+        share = db_utils.create_share(instances=instance_list)
+        self.assertEqual(constants.STATUS_AVAILABLE, share.status)
+
+        share.instances = [share.instances[1]]
+
+        self.assertEqual(constants.STATUS_ERROR, share.status)
+        self.assertIs(share.instances[0], share.instance)
+
     def test_access_rules_status_no_instances(self):
         share = db_utils.create_share(instances=[])
 
@@ -85,7 +85,16 @@ class MessageApiTest(test.TestCase):
         self.message_api.get_all(self.ctxt)
 
         self.message_api.db.message_get_all.assert_called_once_with(
-            self.ctxt, filters={}, sort_dir=None, sort_key=None)
+            self.ctxt, filters={}, sort_dir=None, sort_key=None, limit=None,
+            offset=None, marker=None)
+
+    def test_get_all_paginated(self):
+        self.message_api.get_all(
+            self.ctxt, limit=1, offset=2, marker='fake_marker')
+
+        self.message_api.db.message_get_all.assert_called_once_with(
+            self.ctxt, filters={}, sort_dir=None, sort_key=None, limit=1,
+            offset=2, marker='fake_marker')
 
     def test_delete(self):
         self.message_api.delete(self.ctxt, 'fake_id')
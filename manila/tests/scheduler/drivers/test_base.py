@@ -23,6 +23,7 @@ from oslo_utils import timeutils
 
 from manila import context
 from manila import db
+from manila import exception
 from manila.scheduler.drivers import base
 from manila import test
 from manila import utils
@@ -49,9 +50,10 @@ class SchedulerTestCase(test.TestCase):
         with mock.patch.object(self.driver.host_manager,
                                'update_service_capabilities', mock.Mock()):
             self.driver.update_service_capabilities(
-                service_name, host, capabilities)
+                service_name, host, capabilities, generation=2, delta=True)
             (self.driver.host_manager.update_service_capabilities.
-                assert_called_once_with(service_name, host, capabilities))
+                assert_called_once_with(service_name, host, capabilities,
+                                        generation=2, delta=True))
 
     def test_hosts_up(self):
         service1 = {'host': 'host1'}
@@ -87,6 +89,21 @@ class SchedulerDriverBaseTestCase(SchedulerTestCase):
                           self.context, self.topic, 'schedule_something',
                           *fake_args, **fake_kwargs)
 
+    def test_schedule_create_shares(self):
+        ex = exception.NoValidHost(reason='')
+        self.mock_object(self.driver, 'schedule_create_share',
+                         mock.Mock(side_effect=[None, ex]))
+        filter_properties = {'fake_key': 'fake_value'}
+
+        failures = self.driver.schedule_create_shares(
+            self.context, ['fake_spec1', 'fake_spec2'], filter_properties)
+
+        self.assertEqual([('fake_spec2', ex)], failures)
+        self.driver.schedule_create_share.assert_has_calls([
+            mock.call(self.context, 'fake_spec1', filter_properties),
+            mock.call(self.context, 'fake_spec2', filter_properties),
+        ])
+
 
 class SchedulerDriverModuleTestCase(test.TestCase):
     """Test case for scheduler driver module methods."""
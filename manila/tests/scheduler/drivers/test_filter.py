@@ -99,6 +99,80 @@ class FilterSchedulerTestCase(test_base.SchedulerTestCase):
                           fake_context, request_spec, {})
         self.assertTrue(self.was_admin)
 
+    @mock.patch('manila.db.service_get_all_by_topic')
+    def test_schedule_create_shares(self, _mock_service_get_all_by_topic):
+        sched = fakes.FakeFilterScheduler()
+        sched.host_manager = fakes.FakeHostManager()
+        fake_context = context.RequestContext('user', 'project',
+                                              is_admin=True)
+        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic)
+        self.mock_object(sched.host_manager, 'get_all_host_states_share',
+                         mock.Mock(wraps=sched.host_manager.
+                                   get_all_host_states_share))
+        self.mock_object(base, 'share_update_db')
+        self.mock_object(sched.share_rpcapi, 'create_share_instance')
+        request_specs = [{
+            'share_id': 'fake_id%s' % i,
+            'snapshot_id': None,
+            'share_type': {'name': 'foo'},
+            'share_properties': {'project_id': 1, 'size': 400},
+            'share_instance_properties': {},
+        } for i in range(3)]
+
+        failures = sched.schedule_create_shares(
+            fake_context, request_specs, {})
+
+        sched.host_manager.get_all_host_states_share.assert_called_once_with(
+            mock.ANY)
+        # Capacity consumed by the first share is taken into account when
+        # placing the following ones.
+        self.assertEqual(
+            ['host5#_pool0', 'host1#_pool0', 'host1#_pool0'],
+            [c[0][2] for c in base.share_update_db.call_args_list])
+        self.assertEqual(
+            3, sched.share_rpcapi.create_share_instance.call_count)
+        self.assertEqual([], failures)
+
+    def test_schedule_create_shares_no_valid_host(self):
+        sched = fakes.FakeFilterScheduler()
+        self.mock_object(sched.host_manager, 'get_all_host_states_share',
+                         mock.Mock(return_value=[]))
+        request_spec = {
+            'share_properties': {'project_id': 1, 'size': 1},
+            'share_instance_properties': {},
+            'share_type': {'name': 'NFS'},
+            'share_id': 'fake-id1',
+        }
+
+        failures = sched.schedule_create_shares(
+            self.context, [request_spec], {})
+
+        self.assertEqual(1, len(failures))
+        self.assertIs(request_spec, failures[0][0])
+        self.assertIsInstance(failures[0][1], exception.NoValidHost)
+
+    def test_schedule_create_shares_filter_properties(self):
+        sched = fakes.FakeFilterScheduler()
+        self.mock_object(sched.host_manager, 'get_all_host_states_share',
+                         mock.Mock(return_value=iter(['fake_host'])))
+        self.mock_object(sched, 'schedule_create_share')
+        filter_properties = {'scheduler_hints': {'foo': 'bar'}}
+
+        failures = sched.schedule_create_shares(
+            self.context, ['fake_spec1', 'fake_spec2'], filter_properties)
+
+        self.assertEqual([], failures)
+        sched.schedule_create_share.assert_has_calls([
+            mock.call(self.context, 'fake_spec1', filter_properties,
+                      hosts=['fake_host']),
+            mock.call(self.context, 'fake_spec2', filter_properties,
+                      hosts=['fake_host']),
+        ])
+        filter_properties_used = [
+            c[0][2] for c in sched.schedule_create_share.call_args_list]
+        self.assertIsNot(filter_properties, filter_properties_used[0])
+        self.assertIsNot(filter_properties_used[0], filter_properties_used[1])
+
     @ddt.data(
         {'name': 'foo'},
         {'name': 'foo', 'extra_specs': {}},
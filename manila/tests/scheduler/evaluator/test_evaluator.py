@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
+
 from manila import exception
 from manila.scheduler.evaluator import evaluator
 from manila import test
@@ -138,3 +140,36 @@ class EvaluatorTestCase(test.TestCase):
         self.assertRaises(exception.EvaluatorParseException,
                           evaluator.evaluate,
                           "7 / 0")
+
+    @mock.patch.dict(evaluator._parsed_expressions, clear=True)
+    def test_parsed_expression_is_reused(self):
+        evaluator._parse("1+1")
+        parser = evaluator._parser
+        self.mock_object(parser, 'parseString',
+                         mock.Mock(side_effect=parser.parseString))
+        expression = "stats.free_capacity_gb * 2"
+
+        self.assertEqual(
+            20, evaluator.evaluate(expression,
+                                   stats={'free_capacity_gb': 10}))
+        self.assertEqual(
+            30, evaluator.evaluate(expression,
+                                   stats={'free_capacity_gb': 15}))
+        parser.parseString.assert_called_once_with(expression, parseAll=True)
+
+    @mock.patch.dict(evaluator._parsed_expressions, clear=True)
+    def test_parsed_expressions_are_bounded(self):
+        self.mock_object(evaluator, '_MAX_PARSED_EXPRESSIONS', 2)
+
+        for i in range(3):
+            self.assertEqual(i + 1, evaluator.evaluate("%s + 1" % i))
+
+        self.assertEqual(['2 + 1'], list(evaluator._parsed_expressions))
+
+    @mock.patch.dict(evaluator._parsed_expressions, clear=True)
+    def test_bad_expression_is_not_cached(self):
+
+        self.assertRaises(exception.EvaluatorParseException,
+                          evaluator.evaluate,
+                          "1/*1")
+        self.assertEqual({}, evaluator._parsed_expressions)
@@ -0,0 +1,186 @@
+# Copyright (c) 2018 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the scheduler benchmark.
+"""
+
+import random
+
+import ddt
+import mock
+
+from manila import db
+from manila.scheduler import benchmark
+from manila import test
+
+
+@ddt.ddt
+class SchedulerBenchmarkTestCase(test.TestCase):
+
+    def _get_scheduler(self, num_hosts=3, num_pools=2, num_zones=1):
+        services, capabilities = benchmark.generate_fleet(
+            num_hosts, num_pools, num_zones=num_zones,
+            rand=random.Random(1))
+        return benchmark.SimulatedFilterScheduler(
+            benchmark.SimulatedHostManager(services, capabilities))
+
+    def test_generate_fleet(self):
+        services, capabilities = benchmark.generate_fleet(
+            4, 3, num_zones=2, rand=random.Random(1))
+
+        self.assertEqual(4, len(services))
+        self.assertEqual(['zone0', 'zone1', 'zone0', 'zone1'],
+                         [s['availability_zone_id'] for s in services])
+        self.assertEqual(set(s['host'] for s in services), set(capabilities))
+        for host_capabilities in capabilities.values():
+            self.assertEqual(3, len(host_capabilities['pools']))
+            for pool in host_capabilities['pools']:
+                self.assertEqual(pool['total_capacity_gb'],
+                                 pool['free_capacity_gb'] +
+                                 pool['provisioned_capacity_gb'])
+
+    @ddt.data(None, 3)
+    def test_generate_request_specs(self, num_zones):
+        request_specs = benchmark.generate_request_specs(
+            5, min_size=2, max_size=4, num_zones=num_zones,
+            rand=random.Random(1))
+
+        self.assertEqual(5, len(request_specs))
+        self.assertEqual(5, len(set(r['share_id'] for r in request_specs)))
+        for request_spec in request_specs:
+            self.assertIn(request_spec['share_properties']['size'], (2, 3, 4))
+            zone = request_spec['share_instance_properties'][
+                'availability_zone_id']
+            if num_zones:
+                self.assertIn(zone, ('zone0', 'zone1', 'zone2'))
+            else:
+                self.assertIsNone(zone)
+
+    @ddt.data(([], 50, None),
+              ([0.3], 50, 0.3),
+              ([0.4, 0.1, 0.3, 0.2], 50, 0.2),
+              ([0.4, 0.1, 0.3, 0.2], 99, 0.4))
+    @ddt.unpack
+    def test__percentile(self, samples, percent, expected):
+        self.assertEqual(expected, benchmark._percentile(samples, percent))
+
+    def test_run_benchmark(self):
+        self.flags(scheduler_default_filters=['AvailabilityZoneFilter',
+                                              'CapacityFilter'],
+                   scheduler_default_weighers=['CapacityWeigher'])
+        self.mock_object(db, 'service_get_all_by_topic')
+        scheduler = self._get_scheduler(num_zones=2)
+        request_specs = benchmark.generate_request_specs(
+            20, num_zones=2, rand=random.Random(1))
+
+        results = benchmark.run_benchmark(scheduler, request_specs)
+
+        self.assertEqual(20, results['requests'])
+        self.assertEqual(0, results['failed'])
+        self.assertEqual(20, results['latency']['calls'])
+        self.assertEqual(['AvailabilityZoneFilter', 'CapacityFilter'],
+                         sorted(results['filters']))
+        self.assertEqual(['CapacityWeigher'], sorted(results['weighers']))
+        for summary in results['filters'].values():
+            self.assertEqual(20, summary['calls'])
+        self.assertEqual(6, len(results['capacity']))
+        self.assertEqual(
+            20, sum(p['shares'] for p in results['capacity'].values()))
+        self.assertFalse(db.service_get_all_by_topic.called)
+
+    def test_run_benchmark_seeded_fleet(self):
+        self.mock_object(db, 'service_get_all_by_topic')
+        self.mock_object(db, 'share_instance_sizes_sum_by_host')
+        rand = random.Random(2)
+        services, capabilities = benchmark.generate_fleet(10, 10, rand=rand)
+        # A pool without shares reports no provisioned capacity.
+        pool = capabilities[services[0]['host']]['pools'][0]
+        pool['free_capacity_gb'] = pool['total_capacity_gb']
+        pool['allocated_capacity_gb'] = 0
+        pool['provisioned_capacity_gb'] = 0
+        request_specs = benchmark.generate_request_specs(50, rand=rand)
+        scheduler = benchmark.SimulatedFilterScheduler(
+            benchmark.SimulatedHostManager(services, capabilities))
+
+        results = benchmark.run_benchmark(scheduler, request_specs)
+
+        self.assertEqual(50, results['requests'])
+        self.assertEqual(50, results['latency']['calls'])
+        self.assertEqual(100, len(results['capacity']))
+        self.assertEqual(
+            50 - results['failed'],
+            sum(p['shares'] for p in results['capacity'].values()))
+        self.assertFalse(db.service_get_all_by_topic.called)
+        self.assertFalse(db.share_instance_sizes_sum_by_host.called)
+
+    def test_run_benchmark_no_valid_host(self):
+        self.flags(scheduler_default_filters=['CapacityFilter'],
+                   scheduler_default_weighers=['CapacityWeigher'])
+        scheduler = self._get_scheduler()
+        request_specs = benchmark.generate_request_specs(
+            2, min_size=100000, max_size=100000, rand=random.Random(1))
+
+        results = benchmark.run_benchmark(scheduler, request_specs)
+
+        self.assertEqual(2, results['failed'])
+        self.assertEqual({}, results['weighers'])
+        self.assertEqual(
+            0, sum(p['shares'] for p in results['capacity'].values()))
+
+    def test_format_results(self):
+        results = {
+            'requests': 2,
+            'failed': 1,
+            'elapsed': 0.5,
+            'requests_per_second': 4.0,
+            'latency': {'calls': 2, 'p50': 0.001, 'p99': 0.002},
+            'filters': {'CapacityFilter': {
+                'calls': 2, 'p50': 0.001, 'p99': 0.001}},
+            'weighers': {},
+            'capacity': {'host1@backend1#pool0': {
+                'shares': 1, 'total_capacity_gb': 10,
+                'free_capacity_gb': 5, 'provisioned_capacity_gb': 5}},
+        }
+
+        lines = benchmark.format_results(results)
+
+        self.assertEqual(
+            'Requests: 2, failed: 1, elapsed: 0.500 s, requests/s: 4.0',
+            lines[0])
+        self.assertEqual('Latency p50: 1.000 ms, p99: 2.000 ms', lines[1])
+        self.assertIn('CapacityFilter', lines[3])
+        self.assertEqual('Weighers:', lines[4])
+        self.assertIn('shares:      1  provisioned: 5/10 GB  free: 5 GB',
+                      lines[6])
+
+    def test_main(self):
+        self.mock_object(
+            benchmark, 'CONF',
+            mock.Mock(hosts=2, pools=3, availability_zones=2, requests=4,
+                      min_share_size=1, max_share_size=2, seed=1))
+        self.mock_object(benchmark, 'run_benchmark',
+                         mock.Mock(return_value='fake_results'))
+        self.mock_object(benchmark, 'format_results',
+                         mock.Mock(return_value=['line']))
+
+        benchmark.main()
+
+        benchmark.CONF.register_cli_opts.assert_called_once_with(
+            benchmark.benchmark_opts)
+        scheduler, request_specs = benchmark.run_benchmark.call_args[0]
+        self.assertIsInstance(scheduler, benchmark.SimulatedFilterScheduler)
+        self.assertEqual(2, len(scheduler.host_manager.simulated_services))
+        self.assertEqual(4, len(request_specs))
+        benchmark.format_results.assert_called_once_with('fake_results')
@@ -19,6 +19,7 @@ Tests For HostManager
 """
 
 import copy
+import datetime
 import ddt
 import mock
 from oslo_config import cfg
@@ -30,6 +31,7 @@ from manila import db
 from manila import exception
 from manila.scheduler.filters import base_host
 from manila.scheduler import host_manager
+from manila.share import rpcapi as share_rpcapi
 from manila import test
 from manila.tests.scheduler import fakes
 from manila import utils
@@ -144,6 +146,7 @@ class HostManagerTestCase(test.TestCase):
         self.assertDictMatch(service_states, expected)
 
     def test_get_all_host_states_share(self):
+        self.flags(scheduler_service_cache_ttl=0)
         fake_context = context.RequestContext('user', 'project')
         topic = CONF.share_topic
         tmp_pools = copy.deepcopy(fakes.SHARE_SERVICES_WITH_POOLS)
@@ -450,6 +453,7 @@ class HostManagerTestCase(test.TestCase):
                 self.assertIn(pool, res)
 
     def test_get_pools_host_down(self):
+        self.flags(scheduler_service_cache_ttl=0)
         fake_context = context.RequestContext('user', 'project')
         mock_service_is_up = self.mock_object(utils, 'service_is_up')
         self.mock_object(
@@ -630,6 +634,330 @@ class HostManagerTestCase(test.TestCase):
         }
         self.assertFalse(self.host_manager._passes_filters(data, filter))
 
+    def _get_fake_pools_for_sync(self):
+        capability = {'total_capacity_gb': 1024, 'free_capacity_gb': 512,
+                      'reserved_percentage': 0, 'timestamp': None}
+        estimated = host_manager.PoolState('host1', capability, 'pool0')
+        estimated.update_from_share_capability(capability)
+        reported = host_manager.PoolState('host1', capability, 'pool1')
+        reported.update_from_share_capability(
+            dict(capability, provisioned_capacity_gb=300))
+        host_state = host_manager.HostState('host1')
+        host_state.pools = {'pool0': estimated, 'pool1': reported}
+        self.host_manager.host_state_map = {'host1': host_state}
+        return estimated, reported
+
+    def test__sync_provisioned_capacity(self):
+        fake_context = context.RequestContext('user', 'project', is_admin=True)
+        estimated, reported = self._get_fake_pools_for_sync()
+        self.mock_object(
+            db, 'share_instance_sizes_sum_by_host',
+            mock.Mock(return_value={'host1#pool0': 42, 'host1#pool1': 7}))
+
+        self.host_manager._sync_provisioned_capacity(fake_context)
+
+        db.share_instance_sizes_sum_by_host.assert_called_once_with(
+            fake_context)
+        self.assertEqual(42, estimated.provisioned_capacity_gb)
+        self.assertTrue(estimated.provisioned_capacity_synced)
+        self.assertEqual(300, reported.provisioned_capacity_gb)
+        self.assertIsNotNone(self.host_manager.provisioned_capacity_synced_at)
+
+    def test__sync_provisioned_capacity_not_due(self):
+        fake_context = context.RequestContext('user', 'project', is_admin=True)
+        estimated, reported = self._get_fake_pools_for_sync()
+        estimated.sync_provisioned_capacity(42)
+        self.host_manager.provisioned_capacity_synced_at = timeutils.utcnow()
+        self.mock_object(db, 'share_instance_sizes_sum_by_host')
+
+        estimated.consume_from_share({'size': 8})
+        self.host_manager._sync_provisioned_capacity(fake_context)
+
+        self.assertFalse(db.share_instance_sizes_sum_by_host.called)
+        self.assertEqual(50, estimated.provisioned_capacity_gb)
+
+    def test__sync_provisioned_capacity_expired(self):
+        self.flags(scheduler_provisioned_capacity_sync_interval=60)
+        fake_context = context.RequestContext('user', 'project', is_admin=True)
+        estimated, reported = self._get_fake_pools_for_sync()
+        estimated.sync_provisioned_capacity(42)
+        self.host_manager.provisioned_capacity_synced_at = (
+            timeutils.utcnow() - datetime.timedelta(seconds=61))
+        self.mock_object(
+            db, 'share_instance_sizes_sum_by_host',
+            mock.Mock(return_value={}))
+
+        self.host_manager._sync_provisioned_capacity(fake_context)
+
+        db.share_instance_sizes_sum_by_host.assert_called_once_with(
+            fake_context)
+        self.assertEqual(0, estimated.provisioned_capacity_gb)
+
+    def test__sync_provisioned_capacity_no_estimated_pools(self):
+        fake_context = context.RequestContext('user', 'project', is_admin=True)
+        estimated, reported = self._get_fake_pools_for_sync()
+        del self.host_manager.host_state_map['host1'].pools['pool0']
+        self.mock_object(db, 'share_instance_sizes_sum_by_host')
+
+        self.host_manager._sync_provisioned_capacity(fake_context)
+
+        self.assertFalse(db.share_instance_sizes_sum_by_host.called)
+
+    def _get_fake_pools_for_index(self):
+        pools = []
+        for i, (az, dhss, replication_type) in enumerate((
+                ('az1', False, None),
+                ('az1', True, 'dr'),
+                ('az2', False, ['dr', 'readable']))):
+            pool = host_manager.PoolState(
+                'host%s@backend' % i,
+                {'driver_handles_share_servers': dhss,
+                 'snapshot_support': True,
+                 'replication_type': replication_type,
+                 'share_backend_name': 'backend'},
+                'pool')
+            pool.update_capabilities(
+                pool.capabilities, service={'availability_zone_id': az})
+            pools.append(pool)
+        self.host_manager._update_pool_index(pools)
+        return pools
+
+    def _get_filter_properties_for_index(self, extra_specs, az=None):
+        return {
+            'request_spec': {'resource_properties': {
+                'availability_zone_id': az}},
+            'resource_type': {'extra_specs': extra_specs},
+        }
+
+    @ddt.data(
+        ({'driver_handles_share_servers': '<is> False'}, None, [0, 2]),
+        ({'capabilities:replication_type': 'readable'}, None, [2]),
+        ({'replication_type': '<or> dr <or> readable'}, None, [1, 2]),
+        ({'driver_handles_share_servers': '<is> False'}, 'az1', [0]),
+        ({'snapshot_support': '<is> True',
+          'share_backend_name': 'backend'}, 'az2', [2]),
+        ({'other_capability': 'anything'}, None, [0, 1, 2]),
+    )
+    @ddt.unpack
+    def test_get_filtered_hosts_with_capability_index(
+            self, extra_specs, az, expected):
+        pools = self._get_fake_pools_for_index()
+        filter_properties = self._get_filter_properties_for_index(
+            extra_specs, az=az)
+        self.mock_object(
+            self.host_manager.filter_handler, 'get_filtered_objects',
+            mock.Mock(side_effect=lambda c, hosts, p: (hosts, 'Fake')))
+        self.flags(scheduler_default_filters=['AvailabilityZoneFilter',
+                                              'CapabilitiesFilter'])
+
+        result, last_filter = self.host_manager.get_filtered_hosts(
+            pools + self.fake_hosts, filter_properties)
+
+        self.assertEqual([pools[i] for i in expected] + self.fake_hosts,
+                         result)
+        self.assertEqual('Fake', last_filter)
+
+    def test_get_filtered_hosts_with_capability_index_no_hosts(self):
+        pools = self._get_fake_pools_for_index()
+        filter_properties = self._get_filter_properties_for_index(
+            {'driver_handles_share_servers': '<is> True'}, az='az2')
+        self.mock_object(self.host_manager.filter_handler,
+                         'get_filtered_objects')
+        self.flags(scheduler_default_filters=['CapabilitiesFilter',
+                                              'AvailabilityZoneFilter'])
+
+        result, last_filter = self.host_manager.get_filtered_hosts(
+            pools, filter_properties)
+
+        self.assertEqual([], result)
+        self.assertEqual('AvailabilityZoneFilter', last_filter)
+        self.assertFalse(
+            self.host_manager.filter_handler.get_filtered_objects.called)
+
+    def test__update_pool_index(self):
+        pools = self._get_fake_pools_for_index()
+        self.assertEqual(
+            {'host0@backend#pool', 'host2@backend#pool'},
+            self.host_manager.pool_index['driver_handles_share_servers'][
+                False])
+        self.assertEqual(
+            {'host2@backend#pool'},
+            self.host_manager.pool_index['replication_type'][
+                ('dr', 'readable')])
+        self.mock_object(self.host_manager, '_remove_from_pool_index',
+                         mock.Mock(
+                             wraps=self.host_manager._remove_from_pool_index))
+
+        pools[0].update_capabilities(
+            dict(pools[0].capabilities, free_capacity_gb=10),
+            service=pools[0].service)
+        pools[1].update_capabilities(
+            dict(pools[1].capabilities, driver_handles_share_servers=False),
+            service=pools[1].service)
+        self.host_manager._update_pool_index(pools[:2])
+
+        self.assertEqual(
+            [mock.call('host1@backend#pool'), mock.call('host2@backend#pool')],
+            self.host_manager._remove_from_pool_index.call_args_list)
+        self.assertEqual(
+            {'host0@backend#pool', 'host1@backend#pool'},
+            self.host_manager.pool_index['driver_handles_share_servers'][
+                False])
+        self.assertNotIn(
+            True, self.host_manager.pool_index['driver_handles_share_servers'])
+        self.assertNotIn(
+            ('dr', 'readable'),
+            self.host_manager.pool_index['replication_type'])
+        self.assertEqual({'host0@backend#pool', 'host1@backend#pool'},
+                         set(self.host_manager.pool_index_entries))
+
+    def _get_fake_delta(self, free_capacity_gb=5):
+        return {
+            'updated': {},
+            'removed': [],
+            'pools': {
+                'updated': {'pool1': {'free_capacity_gb': free_capacity_gb}},
+                'removed': {},
+                'deleted': [],
+            },
+        }
+
+    def test_update_service_capabilities_delta(self):
+        capabilities = {
+            'share_backend_name': 'fake',
+            'pools': [{'pool_name': 'pool1', 'free_capacity_gb': 10},
+                      {'pool_name': 'pool2', 'free_capacity_gb': 20}],
+        }
+        self.mock_object(share_rpcapi.ShareAPI,
+                         'publish_service_capabilities')
+        self.host_manager.update_service_capabilities(
+            'share', 'host1', capabilities, generation=1)
+        self.assertIsNone(self.host_manager.service_changed_pools['host1'])
+        self.host_manager.service_changed_pools.pop('host1')
+
+        self.host_manager.update_service_capabilities(
+            'share', 'host1', self._get_fake_delta(), generation=2,
+            delta=True)
+
+        service_state = self.host_manager.service_states['host1']
+        self.assertEqual(
+            [{'pool_name': 'pool1', 'free_capacity_gb': 5},
+             {'pool_name': 'pool2', 'free_capacity_gb': 20}],
+            service_state['pools'])
+        self.assertIn('timestamp', service_state)
+        self.assertEqual(2, self.host_manager.service_generations['host1'])
+        self.assertEqual(
+            {'pool1'}, self.host_manager.service_changed_pools['host1'])
+        self.assertFalse(
+            share_rpcapi.ShareAPI.publish_service_capabilities.called)
+
+    @ddt.data(None, 1, 3)
+    def test_update_service_capabilities_delta_missed(self, generation):
+        self.mock_object(share_rpcapi.ShareAPI,
+                         'publish_service_capabilities')
+        if generation:
+            self.host_manager.update_service_capabilities(
+                'share', 'host1', {'pools': []}, generation=generation)
+        old_service_state = self.host_manager.service_states.get('host1')
+
+        self.host_manager.update_service_capabilities(
+            'share', 'host1', self._get_fake_delta(), generation=5,
+            delta=True)
+
+        (share_rpcapi.ShareAPI.publish_service_capabilities.
+            assert_called_once_with(mock.ANY, host='host1'))
+        self.assertNotIn('host1', self.host_manager.service_generations)
+        self.assertEqual(old_service_state,
+                         self.host_manager.service_states.get('host1'))
+
+    def test__update_host_state_map_changed_pools(self):
+        fake_context = context.RequestContext('user', 'project')
+        service = {'host': 'host1', 'disabled': False}
+        self.mock_object(db, 'service_get_all_by_topic',
+                         mock.Mock(return_value=[service]))
+        self.mock_object(utils, 'service_is_up', mock.Mock(return_value=True))
+        self.mock_object(host_manager.HostState,
+                         'update_from_share_capability')
+        self.host_manager.service_states['host1'] = {'timestamp': None}
+
+        self.host_manager._update_host_state_map(fake_context)
+        self.host_manager.service_changed_pools['host1'] = {'pool1'}
+        self.host_manager._update_host_state_map(fake_context)
+        self.host_manager._update_host_state_map(fake_context)
+
+        update = host_manager.HostState.update_from_share_capability
+        self.assertEqual(
+            [None, {'pool1'}],
+            [c[1]['changed_pools'] for c in update.call_args_list])
+
+    def test__get_share_services_cached(self):
+        fake_context = context.RequestContext('user', 'project')
+        services = [{'host': 'host1', 'disabled': False},
+                    {'host': 'host2', 'disabled': True}]
+        self.mock_object(db, 'service_get_all_by_topic',
+                         mock.Mock(return_value=services))
+        self.mock_object(utils, 'service_is_up', mock.Mock(return_value=True))
+
+        result1 = self.host_manager._get_share_services(fake_context)
+        result2 = self.host_manager._get_share_services(fake_context)
+
+        expected = {'host1': services[0]}
+        self.assertEqual((expected, True), result1)
+        self.assertEqual((expected, False), result2)
+        db.service_get_all_by_topic.assert_called_once_with(
+            fake_context, CONF.share_topic)
+        self.assertEqual({'hits': 1, 'misses': 1},
+                         self.host_manager.get_host_state_cache_stats())
+
+    @ddt.data(0, 10)
+    def test__get_share_services_expired(self, ttl):
+        self.flags(scheduler_service_cache_ttl=ttl)
+        fake_context = context.RequestContext('user', 'project')
+        self.mock_object(db, 'service_get_all_by_topic',
+                         mock.Mock(return_value=[]))
+        self.mock_object(timeutils, 'is_older_than',
+                         mock.Mock(return_value=True))
+
+        self.host_manager._get_share_services(fake_context)
+        result = self.host_manager._get_share_services(fake_context)
+
+        self.assertEqual(({}, True), result)
+        self.assertEqual(2, db.service_get_all_by_topic.call_count)
+        self.assertEqual({'hits': 0, 'misses': 2},
+                         self.host_manager.get_host_state_cache_stats())
+
+    def test__get_share_services_new_host_reported(self):
+        fake_context = context.RequestContext('user', 'project')
+        self.mock_object(db, 'service_get_all_by_topic',
+                         mock.Mock(return_value=[]))
+
+        self.host_manager._get_share_services(fake_context)
+        self.host_manager.update_service_capabilities(
+            'share', 'host1', {'pools': []})
+        self.host_manager._get_share_services(fake_context)
+
+        self.assertEqual(2, db.service_get_all_by_topic.call_count)
+
+    def test__update_host_state_map_cached(self):
+        fake_context = context.RequestContext('user', 'project')
+        self.mock_object(
+            db, 'service_get_all_by_topic',
+            mock.Mock(return_value=fakes.SHARE_SERVICES_WITH_POOLS[:2]))
+        self.mock_object(utils, 'service_is_up', mock.Mock(return_value=True))
+        self.mock_object(host_manager.HostState,
+                         'update_from_share_capability')
+
+        self.host_manager._update_host_state_map(fake_context)
+        self.host_manager.service_changed_pools['host2@BBB'] = {'pool1'}
+        self.host_manager._update_host_state_map(fake_context)
+
+        update = host_manager.HostState.update_from_share_capability
+        self.assertEqual(3, update.call_count)
+        self.assertEqual(['host1@AAA', 'host2@BBB'],
+                         sorted(self.host_manager.host_state_map))
+        db.service_get_all_by_topic.assert_called_once_with(
+            fake_context, CONF.share_topic)
+
 
 class HostStateTestCase(test.TestCase):
     """Test case for HostState class."""
@@ -767,6 +1095,39 @@ class HostStateTestCase(test.TestCase):
         self.assertEqual(10000, fake_host.pools['pool3'].total_capacity_gb)
         self.assertEqual(10000, fake_host.pools['pool3'].free_capacity_gb)
 
+    def test_update_from_share_capability_changed_pools(self):
+        fake_host = host_manager.HostState('host1')
+        capability = {
+            'share_backend_name': 'Backend1',
+            'timestamp': None,
+            'pools': [
+                {'pool_name': 'pool1', 'total_capacity_gb': 500,
+                 'free_capacity_gb': 230, 'reserved_percentage': 0},
+                {'pool_name': 'pool2', 'total_capacity_gb': 1024,
+                 'free_capacity_gb': 1024, 'reserved_percentage': 0},
+                {'pool_name': 'pool3', 'total_capacity_gb': 10,
+                 'free_capacity_gb': 10, 'reserved_percentage': 0},
+            ],
+        }
+        fake_host.update_from_share_capability(capability)
+        pool1_capabilities = fake_host.pools['pool1'].capabilities
+        fake_host.pools['pool3'].consume_from_share({'size': 5})
+        self.assertNotIn('timestamp', capability['pools'][0])
+
+        capability['pools'][0]['free_capacity_gb'] = 200
+        capability['pools'][1]['free_capacity_gb'] = 1000
+        capability['timestamp'] = timeutils.utcnow()
+        fake_host.update_from_share_capability(
+            capability, changed_pools={'pool2'})
+
+        # Unchanged pools that were not consumed from are left alone
+        self.assertEqual(230, fake_host.pools['pool1'].free_capacity_gb)
+        self.assertIs(pool1_capabilities,
+                      fake_host.pools['pool1'].capabilities)
+        self.assertEqual(1000, fake_host.pools['pool2'].free_capacity_gb)
+        # Consumed pools are updated from the report, as they always were
+        self.assertEqual(10, fake_host.pools['pool3'].free_capacity_gb)
+
     def test_update_from_share_unknown_capability(self):
         share_capability = {
             'total_capacity_gb': 'unknown',
@@ -807,6 +1168,7 @@ class HostStateTestCase(test.TestCase):
         fake_host.consume_from_share(fake_share)
         self.assertEqual(fake_host.free_capacity_gb,
                          free_capacity - share_size)
+        self.assertEqual(share_size, fake_host.provisioned_capacity_gb)
 
     def test_consume_from_share_unknown_capability(self):
         share_capability = {
@@ -950,13 +1312,19 @@ class PoolStateTestCase(test.TestCase):
                     },
                 ]
         },
+        {
+            'share_capability':
+                {'total_capacity_gb': 1024, 'free_capacity_gb': 512,
+                 'allocated_capacity_gb': 0, 'provisioned_capacity_gb': 0,
+                 'reserved_percentage': 0, 'timestamp': None, 'cap1': 'val1',
+                 'cap2': 'val2'},
+            'instances': []
+        },
     )
     @ddt.unpack
     def test_update_from_share_capability(self, share_capability, instances):
         fake_context = context.RequestContext('user', 'project', is_admin=True)
-        self.mock_object(
-            db, 'share_instances_get_all_by_host',
-            mock.Mock(return_value=instances))
+        self.mock_object(db, 'share_instance_sizes_sum_by_host')
         fake_pool = host_manager.PoolState('host1', None, 'pool0')
         self.assertIsNone(fake_pool.free_capacity_gb)
 
@@ -968,15 +1336,12 @@ class PoolStateTestCase(test.TestCase):
         self.assertEqual(1024, fake_pool.total_capacity_gb)
         self.assertEqual(512, fake_pool.free_capacity_gb)
         self.assertDictMatch(share_capability, fake_pool.capabilities)
+        self.assertFalse(db.share_instance_sizes_sum_by_host.called)
+        self.assertFalse(fake_pool.provisioned_capacity_synced)
 
         if 'provisioned_capacity_gb' not in share_capability:
-            db.share_instances_get_all_by_host.assert_called_once_with(
-                fake_context, fake_pool.host, with_share_data=True)
-
-            if len(instances) > 0:
-                self.assertEqual(4, fake_pool.provisioned_capacity_gb)
-            else:
-                self.assertEqual(0, fake_pool.provisioned_capacity_gb)
+            self.assertTrue(fake_pool.provisioned_capacity_estimated)
+            self.assertEqual(0, fake_pool.provisioned_capacity_gb)
 
             if 'allocated_capacity_gb' in share_capability:
                 self.assertEqual(share_capability['allocated_capacity_gb'],
@@ -985,15 +1350,13 @@ class PoolStateTestCase(test.TestCase):
                 self.assertEqual(0, fake_pool.allocated_capacity_gb)
         elif 'provisioned_capacity_gb' in share_capability and (
                 'allocated_capacity_gb' not in share_capability):
-            self.assertFalse(db.share_instances_get_all_by_host.called)
-
+            self.assertFalse(fake_pool.provisioned_capacity_estimated)
             self.assertEqual(0, fake_pool.allocated_capacity_gb)
             self.assertEqual(share_capability['provisioned_capacity_gb'],
                              fake_pool.provisioned_capacity_gb)
         elif 'provisioned_capacity_gb' in share_capability and (
                 'allocated_capacity_gb' in share_capability):
-            self.assertFalse(db.share_instances_get_all_by_host.called)
-
+            self.assertFalse(fake_pool.provisioned_capacity_estimated)
             self.assertEqual(share_capability['allocated_capacity_gb'],
                              fake_pool.allocated_capacity_gb)
             self.assertEqual(share_capability['provisioned_capacity_gb'],
@@ -125,15 +125,17 @@ class SchedulerManagerTestCase(test.TestCase):
             self.manager.update_service_capabilities(
                 self.context, service_name=service_name, host=host)
             (self.manager.driver.update_service_capabilities.
-                assert_called_once_with(service_name, host, {}))
+                assert_called_once_with(service_name, host, {},
+                                        generation=None, delta=False))
         with mock.patch.object(self.manager.driver,
                                'update_service_capabilities', mock.Mock()):
             capabilities = {'fake_capability': 'fake_value'}
             self.manager.update_service_capabilities(
                 self.context, service_name=service_name, host=host,
-                capabilities=capabilities)
+                capabilities=capabilities, generation=2, delta=True)
             (self.manager.driver.update_service_capabilities.
-                assert_called_once_with(service_name, host, capabilities))
+                assert_called_once_with(service_name, host, capabilities,
+                                        generation=2, delta=True))
 
     @mock.patch.object(db, 'share_update', mock.Mock())
     @mock.patch('manila.message.api.API.create')
@@ -193,6 +195,33 @@ class SchedulerManagerTestCase(test.TestCase):
                 assert_called_once_with(self.context, request_spec, {}))
             manager.LOG.error.assert_called_once_with(mock.ANY, mock.ANY)
 
+    @mock.patch.object(db, 'share_update', mock.Mock())
+    @mock.patch('manila.message.api.API.create')
+    def test_create_share_instances(self, _mock_message_create):
+        request_specs = [{'share_id': 'fake_id%s' % i} for i in range(3)]
+        no_valid_host = exception.NoValidHost(reason='')
+        failures = [(request_specs[1], no_valid_host),
+                    (request_specs[2], exception.QuotaError())]
+        self.mock_object(self.manager.driver, 'schedule_create_shares',
+                         mock.Mock(return_value=failures))
+        self.mock_object(manager.LOG, 'error')
+
+        self.manager.create_share_instances(
+            self.context, request_specs=request_specs, filter_properties={})
+
+        self.manager.driver.schedule_create_shares.assert_called_once_with(
+            self.context, request_specs, {})
+        db.share_update.assert_has_calls([
+            mock.call(self.context, 'fake_id1', {'status': 'error'}),
+            mock.call(self.context, 'fake_id2', {'status': 'error'}),
+        ])
+        self.assertEqual(2, db.share_update.call_count)
+        _mock_message_create.assert_called_once_with(
+            self.context,
+            message_field.Action.ALLOCATE_HOST,
+            self.context.project_id, resource_type='SHARE',
+            exception=no_valid_host, resource_id='fake_id1')
+
     @mock.patch.object(quota.QUOTAS, 'expire')
     def test__expire_reservations(self, mock_expire):
         self.manager._expire_reservations(self.context)
@@ -77,6 +77,17 @@ class SchedulerRpcAPITestCase(test.TestCase):
                                  capabilities='fake_capabilities',
                                  fanout=True)
 
+    def test_update_service_capabilities_with_generation(self):
+        self._test_scheduler_api('update_service_capabilities',
+                                 rpc_method='cast',
+                                 service_name='fake_name',
+                                 host='fake_host',
+                                 capabilities='fake_capabilities',
+                                 generation=2,
+                                 delta=True,
+                                 fanout=True,
+                                 version='1.9')
+
     def test_create_share_instance(self):
         self._test_scheduler_api('create_share_instance',
                                  rpc_method='cast',
@@ -84,6 +95,13 @@ class SchedulerRpcAPITestCase(test.TestCase):
                                  filter_properties='filter_properties',
                                  version='1.2')
 
+    def test_create_share_instances(self):
+        self._test_scheduler_api('create_share_instances',
+                                 rpc_method='cast',
+                                 request_specs=['fake_request_spec'],
+                                 filter_properties='filter_properties',
+                                 version='1.10')
+
     def test_get_pools(self):
         self._test_scheduler_api('get_pools',
                                  rpc_method='call',
@@ -17,6 +17,8 @@
 Tests For utils.
 """
 
+import copy
+
 import ddt
 
 from manila.scheduler import utils
@@ -59,3 +61,82 @@ class UtilsTestCase(test.TestCase):
     def test_thin_provisioning(self, thin_capabilities, thin):
         thin_provisioning = utils.thin_provisioning(thin_capabilities)
         self.assertEqual(thin, thin_provisioning)
+
+    def _get_fake_capabilities(self, **pools):
+        capabilities = {'share_backend_name': 'fake', 'pools': []}
+        for pool_name, free_capacity_gb in sorted(pools.items()):
+            capabilities['pools'].append({
+                'pool_name': pool_name,
+                'free_capacity_gb': free_capacity_gb,
+            })
+        return capabilities
+
+    def test_get_capabilities_delta(self):
+        old = self._get_fake_capabilities(pool1=10, pool2=20, pool3=30)
+        old['pools'][1]['dedupe'] = True
+        new = self._get_fake_capabilities(pool1=10, pool2=15, pool4=40)
+        new['vendor_name'] = 'fake_vendor'
+
+        delta = utils.get_capabilities_delta(old, new)
+
+        expected = {
+            'updated': {'vendor_name': 'fake_vendor'},
+            'removed': [],
+            'pools': {
+                'updated': {
+                    'pool2': {'free_capacity_gb': 15},
+                    'pool4': {'pool_name': 'pool4', 'free_capacity_gb': 40},
+                },
+                'removed': {'pool2': ['dedupe']},
+                'deleted': ['pool3'],
+            },
+        }
+        self.assertEqual(expected, delta)
+
+    def test_get_capabilities_delta_without_pools(self):
+        old = {'free_capacity_gb': 10, 'qos': False}
+        new = {'free_capacity_gb': 5}
+
+        delta = utils.get_capabilities_delta(old, new)
+
+        self.assertEqual({'free_capacity_gb': 5}, delta['updated'])
+        self.assertEqual(['qos'], delta['removed'])
+
+    @ddt.data((None, {}), ({}, 'fake'))
+    @ddt.unpack
+    def test_get_capabilities_delta_not_comparable(self, old, new):
+        self.assertIsNone(utils.get_capabilities_delta(old, new))
+
+    def test_apply_capabilities_delta(self):
+        old = self._get_fake_capabilities(pool1=10, pool2=20, pool3=30)
+        old['pools'][1]['dedupe'] = True
+        new = self._get_fake_capabilities(pool1=10, pool2=15, pool4=40)
+        delta = utils.get_capabilities_delta(old, new)
+
+        result, changed_pools = utils.apply_capabilities_delta(old, delta)
+
+        self.assertEqual(new, result)
+        self.assertIs(old['pools'][0], result['pools'][0])
+        self.assertEqual({'pool2', 'pool4'}, changed_pools)
+        self.assertEqual(3, len(old['pools']))
+        self.assertTrue(old['pools'][1]['dedupe'])
+
+    def test_apply_capabilities_delta_backend_changed(self):
+        old = self._get_fake_capabilities(pool1=10)
+        new = self._get_fake_capabilities(pool1=10)
+        new['share_backend_name'] = 'new_fake'
+        delta = utils.get_capabilities_delta(old, new)
+
+        result, changed_pools = utils.apply_capabilities_delta(old, delta)
+
+        self.assertEqual(new, result)
+        self.assertIsNone(changed_pools)
+
+    def test_apply_capabilities_delta_no_changes(self):
+        old = self._get_fake_capabilities(pool1=10)
+        delta = utils.get_capabilities_delta(old, copy.deepcopy(old))
+
+        result, changed_pools = utils.apply_capabilities_delta(old, delta)
+
+        self.assertEqual(old, result)
+        self.assertEqual(set(), changed_pools)
@@ -2199,7 +2199,12 @@ class HuaweiShareDriverTestCase(test.TestCase):
         self.assertTrue(db.share_type_get.called)
         self.assertTrue(self.driver.plugin.
                         _get_access_id.called)
-        self.assertEqual(7, utils.execute.call_count)
+        # Mounting and unmounting both shares, and a single walk of the
+        # snapshot to copy it.
+        self.assertEqual(5, utils.execute.call_count)
+        utils.execute.assert_any_call(
+            'find', '-H', mock.ANY, '-mindepth', '1', '-fprintf', mock.ANY,
+            data_utils.Manifest.FORMAT, run_as_root=True)
         self.assertEqual("\\\\100.115.10.68\\share_fake_uuid", location)
 
     def test_create_share_from_snapshot_nonefs(self):
@@ -115,7 +115,7 @@ class ShareInstanceAccessDatabaseMixinTestCase(test.TestCase):
         share = db_utils.create_share(status=constants.STATUS_AVAILABLE)
         rule_1 = db_utils.create_access(share_id=share['id'])
         rule_2 = db_utils.create_access(share_id=share['id'])
-        self.mock_object(db, 'share_instance_access_update')
+        self.mock_object(db, 'share_instance_access_update_all')
 
         rules = self.access_helper.get_and_update_share_instance_access_rules(
             self.context, share_instance_id=share['instance']['id'])
@@ -124,7 +124,7 @@ class ShareInstanceAccessDatabaseMixinTestCase(test.TestCase):
         rule_ids = [r['access_id'] for r in rules]
         self.assertIn(rule_1['id'], rule_ids)
         self.assertIn(rule_2['id'], rule_ids)
-        self.assertFalse(db.share_instance_access_update.called)
+        self.assertFalse(db.share_instance_access_update_all.called)
 
     @ddt.data(
         ([constants.ACCESS_STATE_QUEUED_TO_APPLY], 2),
@@ -139,15 +139,11 @@ class ShareInstanceAccessDatabaseMixinTestCase(test.TestCase):
         share = db_utils.create_share(status=constants.STATUS_AVAILABLE)
         db_utils.create_access(share_id=share['id'], state=statuses[0])
         db_utils.create_access(share_id=share['id'], state=statuses[-1])
-        self.mock_object(db, 'share_instance_access_update', mock.Mock(
-            side_effect=db.share_instance_access_update))
+        self.mock_object(db, 'share_instance_access_update_all', mock.Mock(
+            side_effect=db.share_instance_access_update_all))
         updates = {
             'access_key': 'renfrow2stars'
         }
-        expected_updates = {
-            'access_key': 'renfrow2stars',
-            'state': constants.ACCESS_STATE_QUEUED_TO_DENY,
-        }
         conditionally_change = {
             constants.ACCESS_STATE_APPLYING:
                 constants.ACCESS_STATE_QUEUED_TO_DENY,
@@ -164,16 +160,17 @@ class ShareInstanceAccessDatabaseMixinTestCase(test.TestCase):
             r['state'] == constants.ACCESS_STATE_QUEUED_TO_DENY
         ]
         self.assertEqual(changes_allowed, len(state_changed_rules))
-        self.assertEqual(2, db.share_instance_access_update.call_count)
-        db.share_instance_access_update.assert_has_calls([
-            mock.call(self.context, mock.ANY, share['instance']['id'],
-                      expected_updates),
-        ] * changes_allowed)
+        self.assertEqual(2, len(rules))
+        for rule in rules:
+            self.assertEqual('renfrow2stars', rule['access_key'])
+        db.share_instance_access_update_all.assert_called_once_with(
+            self.context, share['instance']['id'], mock.ANY,
+            updates=updates, conditionally_change=conditionally_change)
 
     def test_get_and_update_access_rule_just_get(self):
         share = db_utils.create_share(status=constants.STATUS_AVAILABLE)
         expected_rule = db_utils.create_access(share_id=share['id'])
-        self.mock_object(db, 'share_instance_access_update')
+        self.mock_object(db, 'share_instance_access_update_all')
 
         actual_rule = (
             self.access_helper.get_and_update_share_instance_access_rule(
@@ -182,7 +179,7 @@ class ShareInstanceAccessDatabaseMixinTestCase(test.TestCase):
         )
 
         self.assertEqual(expected_rule['id'], actual_rule['access_id'])
-        self.assertFalse(db.share_instance_access_update.called)
+        self.assertFalse(db.share_instance_access_update_all.called)
 
     @ddt.data(constants.ACCESS_STATE_APPLYING,
               constants.ACCESS_STATE_DENYING,
@@ -194,8 +191,8 @@ class ShareInstanceAccessDatabaseMixinTestCase(test.TestCase):
         share = db_utils.create_share(status=constants.STATUS_AVAILABLE)
         rule = db_utils.create_access(share_id=share['id'],
                                       state=initial_state)
-        self.mock_object(db, 'share_instance_access_update', mock.Mock(
-            side_effect=db.share_instance_access_update))
+        self.mock_object(db, 'share_instance_access_update_all', mock.Mock(
+            side_effect=db.share_instance_access_update_all))
         updates = {
             'access_key': 'renfrow2stars'
         }
@@ -367,28 +367,95 @@ class ShareAPITestCase(test.TestCase):
     def test_get_all_admin_filter_by_status(self):
         ctx = context.RequestContext('fake_uid', 'fake_pid_2', is_admin=True)
         self.mock_object(db_api, 'share_get_all_by_project',
-                         mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[1:]))
+                         mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[2:3]))
         shares = self.api.get_all(ctx, {'status': constants.STATUS_AVAILABLE})
         share_api.policy.check_policy.assert_has_calls([
             mock.call(ctx, 'share', 'get_all'),
         ])
         db_api.share_get_all_by_project.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
-            project_id='fake_pid_2', filters={}, is_public=False
+            project_id='fake_pid_2',
+            filters={'status': constants.STATUS_AVAILABLE}, is_public=False
         )
-        self.assertEqual(_FAKE_LIST_OF_ALL_SHARES[2::4], shares)
+        self.assertEqual(_FAKE_LIST_OF_ALL_SHARES[2:3], shares)
+
+    @ddt.data({'display_name~': 'fo', 'host': 'fake_host'},
+              {'share_type_id': 'fake_st', 'share_network_id': 'fake_sn',
+               'snapshot_id': 'fake_snap', 'availability_zone': 'fake_az'})
+    def test_get_all_filtered_by_db(self, search_opts):
+        ctx = context.RequestContext('fake_uid', 'fake_pid_1', is_admin=True)
+        self.mock_object(db_api, 'share_get_all',
+                         mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[1:2]))
+
+        shares = self.api.get_all(
+            ctx, dict(search_opts, all_tenants=1), limit=1, marker='fake_id')
+
+        db_api.share_get_all.assert_called_once_with(
+            ctx, sort_dir='desc', sort_key='created_at', filters=search_opts,
+            limit=1, marker='fake_id')
+        self.assertEqual(_FAKE_LIST_OF_ALL_SHARES[1:2], shares)
+
+    def test_get_all_paginated_by_db(self):
+        ctx = context.RequestContext('fake_uid', 'fake_pid_1', is_admin=True)
+        self.mock_object(db_api, 'share_get_all',
+                         mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[1:2]))
+
+        shares = self.api.get_all(
+            ctx, {'all_tenants': 1}, limit=1, offset=1, marker='fake_id')
+
+        db_api.share_get_all.assert_called_once_with(
+            ctx, sort_dir='desc', sort_key='created_at', filters={}, limit=1,
+            offset=1, marker='fake_id')
+        self.assertEqual(_FAKE_LIST_OF_ALL_SHARES[1:2], shares)
+
+    def test_get_all_paginated_after_filtering(self):
+        ctx = context.RequestContext('fake_uid', 'fake_pid_1', is_admin=True)
+        fake_shares = [dict(share, id='fake_id_%s' % i)
+                       for i, share in enumerate(_FAKE_LIST_OF_ALL_SHARES)]
+        # NOTE: The marker share is looked up by the database, the shares
+        # following it are returned whether it matches the filters or not.
+        self.mock_object(db_api, 'share_get_all_by_project',
+                         mock.Mock(return_value=fake_shares[1:]))
+
+        shares = self.api.get_all(
+            ctx, {'name': 'foo1', 'status': constants.STATUS_AVAILABLE},
+            limit=1, marker='fake_id_0')
+
+        db_api.share_get_all_by_project.assert_called_once_with(
+            ctx, sort_dir='desc', sort_key='created_at',
+            project_id='fake_pid_1',
+            filters={'status': constants.STATUS_AVAILABLE}, is_public=False,
+            marker='fake_id_0'
+        )
+        self.assertEqual([fake_shares[2]], shares)
+
+    def test_get_all_paginated_after_filtering_with_offset(self):
+        ctx = context.RequestContext('fake_uid', 'fake_pid_1', is_admin=True)
+        fake_shares = [dict(share, id='fake_id_%s' % i)
+                       for i, share in enumerate(_FAKE_LIST_OF_ALL_SHARES)]
+        self.mock_object(db_api, 'share_get_all_by_project',
+                         mock.Mock(return_value=fake_shares))
+
+        shares = self.api.get_all(ctx, {'name': 'bar'}, limit=1, offset=1)
+
+        db_api.share_get_all_by_project.assert_called_once_with(
+            ctx, sort_dir='desc', sort_key='created_at',
+            project_id='fake_pid_1', filters={}, is_public=False)
+        self.assertEqual([fake_shares[3]], shares)
 
     def test_get_all_admin_filter_by_status_and_all_tenants(self):
         ctx = context.RequestContext('fake_uid', 'fake_pid_2', is_admin=True)
-        self.mock_object(db_api, 'share_get_all',
-                         mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES))
+        self.mock_object(
+            db_api, 'share_get_all',
+            mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[1::2]))
         shares = self.api.get_all(
             ctx, {'status': constants.STATUS_ERROR, 'all_tenants': 1})
         share_api.policy.check_policy.assert_has_calls([
             mock.call(ctx, 'share', 'get_all'),
         ])
         db_api.share_get_all.assert_called_once_with(
-            ctx, sort_dir='desc', sort_key='created_at', filters={})
+            ctx, sort_dir='desc', sort_key='created_at',
+            filters={'status': constants.STATUS_ERROR})
         self.assertEqual(_FAKE_LIST_OF_ALL_SHARES[1::2], shares)
 
     def test_get_all_non_admin_filter_by_all_tenants(self):
@@ -409,7 +476,9 @@ class ShareAPITestCase(test.TestCase):
     def test_get_all_non_admin_with_name_and_status_filters(self):
         ctx = context.RequestContext('fake_uid', 'fake_pid_2', is_admin=False)
         self.mock_object(db_api, 'share_get_all_by_project',
-                         mock.Mock(return_value=_FAKE_LIST_OF_ALL_SHARES[1:]))
+                         mock.Mock(side_effect=[
+                             _FAKE_LIST_OF_ALL_SHARES[1::2],
+                             _FAKE_LIST_OF_ALL_SHARES[2::4]]))
         shares = self.api.get_all(
             ctx, {'name': 'bar', 'status': constants.STATUS_ERROR})
         share_api.policy.check_policy.assert_has_calls([
@@ -417,13 +486,14 @@ class ShareAPITestCase(test.TestCase):
         ])
         db_api.share_get_all_by_project.assert_called_once_with(
             ctx, sort_dir='desc', sort_key='created_at',
-            project_id='fake_pid_2', filters={}, is_public=False
+            project_id='fake_pid_2',
+            filters={'status': constants.STATUS_ERROR}, is_public=False
         )
 
-        # two items expected, one filtered
+        # two items expected, none filtered
         self.assertEqual(_FAKE_LIST_OF_ALL_SHARES[1::2], shares)
 
-        # one item expected, two filtered
+        # one item expected, none filtered
         shares = self.api.get_all(
             ctx, {'name': 'foo1', 'status': constants.STATUS_AVAILABLE})
         self.assertEqual(_FAKE_LIST_OF_ALL_SHARES[2::4], shares)
@@ -433,9 +503,13 @@ class ShareAPITestCase(test.TestCase):
         ])
         db_api.share_get_all_by_project.assert_has_calls([
             mock.call(ctx, sort_dir='desc', sort_key='created_at',
-                      project_id='fake_pid_2', filters={}, is_public=False),
+                      project_id='fake_pid_2',
+                      filters={'status': constants.STATUS_ERROR},
+                      is_public=False),
             mock.call(ctx, sort_dir='desc', sort_key='created_at',
-                      project_id='fake_pid_2', filters={}, is_public=False),
+                      project_id='fake_pid_2',
+                      filters={'status': constants.STATUS_AVAILABLE},
+                      is_public=False),
         ])
 
     @ddt.data('True', 'true', '1', 'yes', 'y', 'on', 't', True)
@@ -1878,7 +1952,8 @@ class ShareAPITestCase(test.TestCase):
         share_api.policy.check_policy.assert_called_once_with(
             ctx, 'share_snapshot', 'get_all_snapshots')
         db_api.share_snapshot_get_all_by_project.assert_called_once_with(
-            ctx, 'fakepid', sort_dir='desc', sort_key='share_id', filters={})
+            ctx, 'fakepid', sort_dir='desc', sort_key='share_id',
+            filters={'has_instances': True})
 
     @mock.patch.object(db_api, 'share_snapshot_get_all', mock.Mock())
     def test_get_all_snapshots_admin_all_tenants(self):
@@ -1887,7 +1962,8 @@ class ShareAPITestCase(test.TestCase):
         share_api.policy.check_policy.assert_called_once_with(
             self.context, 'share_snapshot', 'get_all_snapshots')
         db_api.share_snapshot_get_all.assert_called_once_with(
-            self.context, sort_dir='desc', sort_key='share_id', filters={})
+            self.context, sort_dir='desc', sort_key='share_id',
+            filters={'has_instances': True})
 
     @mock.patch.object(db_api, 'share_snapshot_get_all_by_project',
                        mock.Mock())
@@ -1897,7 +1973,8 @@ class ShareAPITestCase(test.TestCase):
         share_api.policy.check_policy.assert_called_once_with(
             ctx, 'share_snapshot', 'get_all_snapshots')
         db_api.share_snapshot_get_all_by_project.assert_called_once_with(
-            ctx, 'fakepid', sort_dir='desc', sort_key='share_id', filters={})
+            ctx, 'fakepid', sort_dir='desc', sort_key='share_id',
+            filters={'has_instances': True})
 
     def test_get_all_snapshots_not_admin_search_opts(self):
         search_opts = {'size': 'fakesize'}
@@ -1913,7 +1990,53 @@ class ShareAPITestCase(test.TestCase):
             ctx, 'share_snapshot', 'get_all_snapshots')
         db_api.share_snapshot_get_all_by_project.assert_called_once_with(
             ctx, 'fakepid', sort_dir='desc', sort_key='share_id',
-            filters=search_opts)
+            filters=dict(search_opts, has_instances=True))
+
+    def test_get_all_snapshots_paginated_by_db(self):
+        ctx = context.RequestContext('fakeuid', 'fakepid', is_admin=False)
+        self.mock_object(db_api, 'share_snapshot_get_all_by_project',
+                         mock.Mock(return_value=[{'id': 'fake_id'}]))
+
+        result = self.api.get_all_snapshots(
+            ctx, limit=1, marker='fake_marker')
+
+        self.assertEqual([{'id': 'fake_id'}], result)
+        db_api.share_snapshot_get_all_by_project.assert_called_once_with(
+            ctx, 'fakepid', sort_dir='desc', sort_key='share_id',
+            filters={'has_instances': True}, limit=1,
+            marker='fake_marker')
+
+    def test_get_all_snapshots_paginated_after_filtering(self):
+        search_opts = {'size': 'fakesize'}
+        fake_objs = [dict(search_opts, id='fake_id_%s' % i) for i in range(3)]
+        fake_objs.insert(1, {'id': 'fake_id', 'size': 'other_size'})
+        ctx = context.RequestContext('fakeuid', 'fakepid', is_admin=False)
+        self.mock_object(db_api, 'share_snapshot_get_all_by_project',
+                         mock.Mock(return_value=fake_objs))
+
+        result = self.api.get_all_snapshots(
+            ctx, search_opts, limit=1, offset=1)
+
+        self.assertEqual([fake_objs[2]], result)
+        db_api.share_snapshot_get_all_by_project.assert_called_once_with(
+            ctx, 'fakepid', sort_dir='desc', sort_key='share_id',
+            filters=dict(search_opts, has_instances=True))
+
+    def test_get_all_snapshots_paginated_after_filtering_by_marker(self):
+        search_opts = {'size': 'fakesize'}
+        fake_objs = [dict(search_opts, id='fake_id_%s' % i) for i in range(3)]
+        ctx = context.RequestContext('fakeuid', 'fakepid', is_admin=False)
+        self.mock_object(db_api, 'share_snapshot_get_all_by_project',
+                         mock.Mock(return_value=fake_objs[1:]))
+
+        result = self.api.get_all_snapshots(
+            ctx, search_opts, limit=1, marker='fake_marker')
+
+        self.assertEqual([fake_objs[1]], result)
+        db_api.share_snapshot_get_all_by_project.assert_called_once_with(
+            ctx, 'fakepid', sort_dir='desc', sort_key='share_id',
+            filters=dict(search_opts, has_instances=True),
+            marker='fake_marker')
 
     @ddt.data(({'name': 'fo'}, 0), ({'description': 'd'}, 0),
               ({'name': 'foo', 'description': 'd'}, 0),
@@ -1943,7 +2066,7 @@ class ShareAPITestCase(test.TestCase):
             ctx, 'share_snapshot', 'get_all_snapshots')
         db_api.share_snapshot_get_all_by_project.assert_called_once_with(
             ctx, 'fakepid', sort_dir='desc', sort_key='share_id',
-            filters=search_opts)
+            filters=dict(search_opts, has_instances=True))
 
     def test_get_all_snapshots_with_sorting_valid(self):
         self.mock_object(
@@ -1955,7 +2078,8 @@ class ShareAPITestCase(test.TestCase):
         share_api.policy.check_policy.assert_called_once_with(
             ctx, 'share_snapshot', 'get_all_snapshots')
         db_api.share_snapshot_get_all_by_project.assert_called_once_with(
-            ctx, 'fake_pid_1', sort_dir='asc', sort_key='status', filters={})
+            ctx, 'fake_pid_1', sort_dir='asc', sort_key='status',
+            filters={'has_instances': True})
         self.assertEqual(_FAKE_LIST_OF_ALL_SNAPSHOTS[0], snapshots)
 
     def test_get_all_snapshots_sort_key_invalid(self):
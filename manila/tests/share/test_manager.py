@@ -174,6 +174,100 @@ class ShareManagerTestCase(test.TestCase):
                 context=self.context,
                 periodic_hook_data=hook_data_mock.return_value)
 
+    def test_periodic_task_stats(self):
+        self.mock_object(db, 'share_server_get_all_unused_deletable',
+                         mock.Mock(return_value=['server1', 'server2']))
+        self.mock_object(self.share_manager, 'delete_share_server')
+
+        for i in range(2):
+            self.share_manager.delete_free_share_servers(self.context)
+
+        stats = self.share_manager.get_periodic_task_stats()
+        self.assertEqual(['delete_free_share_servers'], list(stats))
+        task_stats = stats['delete_free_share_servers']
+        self.assertEqual(2, task_stats['runs'])
+        self.assertEqual(0, task_stats['failures'])
+        self.assertEqual(0, task_stats['skipped'])
+        self.assertEqual(2, task_stats['last_items'])
+        self.assertEqual(4, task_stats['items'])
+        self.assertFalse(task_stats['running'])
+        self.assertIsNotNone(task_stats['last_run_at'])
+
+    def test_periodic_task_stats_failure(self):
+        self.mock_object(self.share_manager.driver, 'get_share_stats',
+                         mock.Mock(side_effect=exception.ManilaException))
+
+        self.assertRaises(exception.ManilaException,
+                          self.share_manager._report_driver_status,
+                          self.context)
+
+        task_stats = self.share_manager.get_periodic_task_stats()[
+            '_report_driver_status']
+        self.assertEqual(1, task_stats['runs'])
+        self.assertEqual(1, task_stats['failures'])
+        self.assertIsNone(task_stats['last_items'])
+
+    def test_periodic_task_offloaded(self):
+        self.flags(periodic_task_offload=['delete_free_share_servers'])
+        mock_spawn = self.mock_object(
+            self.share_manager._periodic_task_pool, 'spawn_n')
+        mock_log = self.mock_object(manager.LOG, 'warning')
+
+        for i in range(2):
+            retval = self.share_manager.delete_free_share_servers(
+                self.context)
+            self.assertIsNone(retval)
+
+        mock_spawn.assert_called_once_with(
+            self.share_manager._run_offloaded_periodic_task, mock.ANY,
+            self.context)
+        self.assertEqual(1, mock_log.call_count)
+        task_stats = self.share_manager.get_periodic_task_stats()[
+            'delete_free_share_servers']
+        self.assertEqual(0, task_stats['runs'])
+        self.assertEqual(1, task_stats['skipped'])
+        self.assertTrue(task_stats['running'])
+
+    @ddt.data(0, 10)
+    def test__run_offloaded_periodic_task(self, jitter):
+        self.flags(periodic_task_jitter=jitter)
+        mock_sleep = self.mock_object(manager.eventlet, 'sleep')
+        self.mock_object(manager.random, 'uniform', mock.Mock(return_value=3))
+        mock_log = self.mock_object(manager.LOG, 'exception')
+        task = mock.Mock(side_effect=exception.ManilaException,
+                         __name__='fake_task')
+        self.share_manager._running_periodic_tasks.add('fake_task')
+
+        self.share_manager._run_offloaded_periodic_task(task, self.context)
+
+        task.assert_called_once_with(self.share_manager, self.context)
+        if jitter:
+            mock_sleep.assert_called_once_with(3)
+        else:
+            self.assertFalse(mock_sleep.called)
+        self.assertEqual(1, mock_log.call_count)
+        self.assertEqual(set(), self.share_manager._running_periodic_tasks)
+        task_stats = self.share_manager.get_periodic_task_stats()[
+            'fake_task']
+        self.assertEqual(1, task_stats['failures'])
+        self.assertFalse(task_stats['running'])
+
+    def test_periodic_task_stats_file(self):
+        self.flags(periodic_task_stats_file='/fake/stats.json')
+        mock_open = mock.mock_open()
+        self.mock_object(six.moves.builtins, 'open', mock_open)
+        mock_rename = self.mock_object(manager.os, 'rename')
+        task = mock.Mock(return_value=5, __name__='fake_task')
+
+        self.share_manager._call_periodic_task(task, self.context)
+
+        mock_open.assert_called_once_with('/fake/stats.json.tmp', 'w')
+        data = jsonutils.loads(mock_open().write.call_args[0][0])
+        self.assertEqual(self.share_manager.host, data['host'])
+        self.assertEqual(5, data['tasks']['fake_task']['items'])
+        mock_rename.assert_called_once_with(
+            '/fake/stats.json.tmp', '/fake/stats.json')
+
     def test_init_host_with_no_shares(self):
         self.mock_object(self.share_manager.db,
                          'share_instances_get_all_by_host',
@@ -184,7 +278,8 @@ class ShareManagerTestCase(test.TestCase):
         self.assertTrue(self.share_manager.driver.initialized)
         (self.share_manager.db.share_instances_get_all_by_host.
             assert_called_once_with(utils.IsAMatcher(context.RequestContext),
-                                    self.share_manager.host))
+                                    self.share_manager.host,
+                                    with_share_data=True))
         self.share_manager.driver.do_setup.assert_called_once_with(
             utils.IsAMatcher(context.RequestContext))
         (self.share_manager.driver.check_for_setup_error.
@@ -256,30 +351,35 @@ class ShareManagerTestCase(test.TestCase):
         self.assertFalse(self.share_manager.driver.initialized)
 
     def _setup_init_mocks(self, setup_access_rules=True):
-        instances = [
+        shares = [
             db_utils.create_share(id='fake_id_1',
                                   status=constants.STATUS_AVAILABLE,
-                                  display_name='fake_name_1').instance,
+                                  display_name='fake_name_1'),
             db_utils.create_share(id='fake_id_2',
                                   status=constants.STATUS_ERROR,
-                                  display_name='fake_name_2').instance,
+                                  display_name='fake_name_2'),
             db_utils.create_share(id='fake_id_3',
                                   status=constants.STATUS_AVAILABLE,
-                                  display_name='fake_name_3').instance,
+                                  display_name='fake_name_3'),
             db_utils.create_share(
                 id='fake_id_4',
                 status=constants.STATUS_MIGRATING,
                 task_state=constants.TASK_STATE_MIGRATION_IN_PROGRESS,
-                display_name='fake_name_4').instance,
+                display_name='fake_name_4'),
             db_utils.create_share(id='fake_id_5',
                                   status=constants.STATUS_AVAILABLE,
-                                  display_name='fake_name_5').instance,
+                                  display_name='fake_name_5'),
             db_utils.create_share(
                 id='fake_id_6',
                 status=constants.STATUS_MIGRATING,
                 task_state=constants.TASK_STATE_MIGRATION_DRIVER_IN_PROGRESS,
-                display_name='fake_name_6').instance,
+                display_name='fake_name_6'),
         ]
+        instances = []
+        for share in shares:
+            instance = share.instance
+            instance.set_share_data(share)
+            instances.append(instance)
 
         instances[4]['access_rules_status'] = (
             constants.SHARE_INSTANCE_RULES_SYNCING)
@@ -352,7 +452,8 @@ class ShareManagerTestCase(test.TestCase):
         # verification of call
         (self.share_manager.db.share_instances_get_all_by_host.
             assert_called_once_with(utils.IsAMatcher(context.RequestContext),
-                                    self.share_manager.host))
+                                    self.share_manager.host,
+                                    with_share_data=True))
         exports_update = self.share_manager.db.share_export_locations_update
         exports_update.assert_has_calls([
             mock.call(mock.ANY, instances[0]['id'], fake_export_locations),
@@ -382,9 +483,8 @@ class ShareManagerTestCase(test.TestCase):
         self.share_manager.driver.ensure_shares.assert_called_once_with(
             utils.IsAMatcher(context.RequestContext),
             [instances[0], instances[2], instances[4]])
-        (self.share_manager.publish_service_capabilities.
-            assert_called_once_with(
-                utils.IsAMatcher(context.RequestContext)))
+        self.share_manager.publish_service_capabilities.assert_has_calls([
+            mock.call(utils.IsAMatcher(context.RequestContext))] * 2)
         self.share_manager.access_helper.update_access_rules.assert_has_calls([
             mock.call(mock.ANY, instances[0]['id'], share_server=share_server),
             mock.call(mock.ANY, instances[2]['id'], share_server=share_server),
@@ -448,7 +548,8 @@ class ShareManagerTestCase(test.TestCase):
         # verification of call
         (self.share_manager.db.share_instances_get_all_by_host.
             assert_called_once_with(utils.IsAMatcher(context.RequestContext),
-                                    self.share_manager.host))
+                                    self.share_manager.host,
+                                    with_share_data=True))
         self.share_manager.driver.do_setup.assert_called_once_with(
             utils.IsAMatcher(context.RequestContext))
         self.share_manager.driver.check_for_setup_error.assert_called_with()
@@ -469,9 +570,8 @@ class ShareManagerTestCase(test.TestCase):
             mock.call(utils.IsAMatcher(context.RequestContext), instances[2],
                       share_server=share_server),
         ])
-        (self.share_manager.publish_service_capabilities.
-            assert_called_once_with(
-                utils.IsAMatcher(context.RequestContext)))
+        self.share_manager.publish_service_capabilities.assert_has_calls([
+            mock.call(utils.IsAMatcher(context.RequestContext))] * 2)
         manager.LOG.info.assert_any_call(
             mock.ANY,
             {'task': constants.TASK_STATE_MIGRATION_IN_PROGRESS,
@@ -507,7 +607,8 @@ class ShareManagerTestCase(test.TestCase):
         # verification of call
         (self.share_manager.db.share_instances_get_all_by_host.
          assert_called_once_with(utils.IsAMatcher(context.RequestContext),
-                                 self.share_manager.host))
+                                 self.share_manager.host,
+                                 with_share_data=True))
         self.share_manager.driver.do_setup.assert_called_once_with(
             utils.IsAMatcher(context.RequestContext))
         self.share_manager.driver.check_for_setup_error.assert_called_with()
@@ -586,7 +687,7 @@ class ShareManagerTestCase(test.TestCase):
         # verification of call
         (smanager.db.share_instances_get_all_by_host.
             assert_called_once_with(utils.IsAMatcher(context.RequestContext),
-                                    smanager.host))
+                                    smanager.host, with_share_data=True))
         smanager.driver.do_setup.assert_called_once_with(
             utils.IsAMatcher(context.RequestContext))
         smanager.driver.check_for_setup_error.assert_called_with()
@@ -597,9 +698,8 @@ class ShareManagerTestCase(test.TestCase):
         smanager.driver.ensure_shares.assert_called_once_with(
             utils.IsAMatcher(context.RequestContext),
             [instances[0], instances[2], instances[4]])
-        (self.share_manager.publish_service_capabilities.
-            assert_called_once_with(
-                utils.IsAMatcher(context.RequestContext)))
+        self.share_manager.publish_service_capabilities.assert_has_calls([
+            mock.call(utils.IsAMatcher(context.RequestContext))] * 2)
         manager.LOG.info.assert_any_call(
             mock.ANY,
             {'task': constants.TASK_STATE_MIGRATION_IN_PROGRESS,
@@ -617,6 +717,64 @@ class ShareManagerTestCase(test.TestCase):
             mock.call(mock.ANY, mock.ANY),
         ])
 
+    def test__get_snapshot_instances_with_pending_rules(self):
+        share_instances = [{'id': 'si_1'}, {'id': 'si_2'}, {'id': 'si_3'}]
+        snapshot_instances = [
+            {'id': 'snap_1', 'share_instance_id': 'si_1'},
+            {'id': 'snap_2', 'share_instance_id': 'si_1'},
+            {'id': 'snap_3', 'share_instance_id': 'si_2'},
+        ]
+        mock_get_snapshots = self.mock_object(
+            self.share_manager.db,
+            'share_snapshot_instance_get_all_with_filters',
+            mock.Mock(return_value=snapshot_instances))
+        mock_get_rules = self.mock_object(
+            self.share_manager.db,
+            'share_snapshot_access_get_all_for_snapshot_instances',
+            mock.Mock(return_value=[
+                {'share_snapshot_instance_id': 'snap_2'},
+                {'share_snapshot_instance_id': 'snap_3'},
+                {'share_snapshot_instance_id': 'snap_3'},
+            ]))
+
+        result = (
+            self.share_manager._get_snapshot_instances_with_pending_rules(
+                self.context, share_instances))
+
+        self.assertEqual({'si_1': ['snap_2'], 'si_2': ['snap_3']}, result)
+        mock_get_snapshots.assert_called_once_with(
+            self.context, {'share_instance_ids': ['si_1', 'si_2', 'si_3']})
+        mock_get_rules.assert_called_once_with(
+            self.context, ['snap_1', 'snap_2', 'snap_3'], filters=mock.ANY)
+
+    def test__ensure_share_instance_access(self):
+        share_instance = {'id': 'si_1', 'host': 'fake_host@fake#pool',
+                          'access_rules_status': constants.STATUS_ERROR}
+        self.mock_object(self.share_manager.db, 'share_instance_update')
+        self.mock_object(self.share_manager, '_get_share_server',
+                         mock.Mock(return_value='fake_server'))
+        mock_reset = self.mock_object(self.share_manager.access_helper,
+                                      'reset_applying_rules')
+        mock_update = self.mock_object(self.share_manager.access_helper,
+                                       'update_access_rules')
+        mock_snap_update = self.mock_object(
+            self.share_manager.snapshot_access_helper, 'update_access_rules')
+
+        self.share_manager._ensure_share_instance_access(
+            self.context, share_instance,
+            {'status': constants.STATUS_AVAILABLE}, ['snap_1', 'snap_2'])
+
+        self.share_manager.db.share_instance_update.assert_called_once_with(
+            self.context, 'si_1', {'status': constants.STATUS_AVAILABLE,
+                                   'host': 'fake_host@fake#pool'})
+        mock_reset.assert_called_once_with(self.context, 'si_1')
+        mock_update.assert_called_once_with(
+            self.context, 'si_1', share_server='fake_server')
+        mock_snap_update.assert_has_calls([
+            mock.call(self.context, 'snap_1', 'fake_server'),
+            mock.call(self.context, 'snap_2', 'fake_server'),
+        ])
+
     def test_create_share_instance_from_snapshot_with_server(self):
         """Test share can be created from snapshot if server exists."""
         network = db_utils.create_share_network()
@@ -3440,6 +3598,19 @@ class ShareManagerTestCase(test.TestCase):
                                   (['INFO', 'share.shrink.start'],
                                    ['INFO', 'share.shrink.end']))
 
+    def test_publish_service_capabilities(self):
+        self.share_manager.published_capabilities = {'field': 'old_val'}
+        self.mock_object(self.share_manager, '_report_driver_status')
+        self.mock_object(self.share_manager, '_publish_service_capabilities')
+
+        self.share_manager.publish_service_capabilities(self.context)
+
+        self.assertIsNone(self.share_manager.published_capabilities)
+        self.share_manager._report_driver_status.assert_called_once_with(
+            self.context)
+        (self.share_manager._publish_service_capabilities.
+            assert_called_once_with(self.context))
+
     def test_report_driver_status_driver_handles_ss_false(self):
         fake_stats = {'field': 'val'}
         fake_pool = {'name': 'pool1'}
@@ -4389,8 +4560,109 @@ class ShareManagerTestCase(test.TestCase):
                 self.context, new_instance)
             data_rpc.DataAPI.migration_start.assert_called_once_with(
                 self.context, share['id'], ['lost+found'], instance['id'],
-                new_instance['id'], src_connection_info, dest_connection_info)
+                new_instance['id'], src_connection_info, dest_connection_info,
+                precopy=False, incremental=False)
+            helper.cleanup_new_instance.assert_called_once_with(new_instance)
+
+    def test__migration_start_host_assisted_precopy(self):
+        instance = db_utils.create_share_instance(
+            share_id='fake_id',
+            status=constants.STATUS_AVAILABLE,
+            share_server_id='fake_server_id')
+        new_instance = db_utils.create_share_instance(
+            share_id='new_fake_id',
+            status=constants.STATUS_AVAILABLE)
+        share = db_utils.create_share(id='fake_id', instances=[instance])
+        server = 'share_server'
+        self.mock_object(
+            self.share_manager.driver.configuration, 'safe_get',
+            mock.Mock(side_effect=lambda opt: {
+                'migration_host_assisted_precopy': True,
+                'migration_ignore_files': ['lost+found']}[opt]))
+        helper = mock.Mock()
+        helper.create_instance_and_wait.return_value = new_instance
+        self.mock_object(migration_api, 'ShareMigrationHelper',
+                         mock.Mock(return_value=helper))
+        self.mock_object(self.share_manager.db, 'share_server_get',
+                         mock.Mock(return_value=server))
+        self.mock_object(self.share_manager.db, 'share_instance_update')
+        self.mock_object(self.share_manager, '_cast_access_rules_to_readonly')
+        self.mock_object(self.share_manager.driver, 'connection_get_info',
+                         mock.Mock(return_value='src_fake_info'))
+        self.mock_object(rpcapi.ShareAPI, 'connection_get_info',
+                         mock.Mock(return_value='dest_fake_info'))
+        self.mock_object(data_rpc.DataAPI, 'migration_start')
+
+        self.share_manager._migration_start_host_assisted(
+            self.context, share, instance, 'fake_host', 'fake_net_id',
+            'fake_az_id', 'fake_type_id')
+
+        self.assertFalse(
+            self.share_manager._cast_access_rules_to_readonly.called)
+        self.share_manager.db.share_instance_update.assert_called_once_with(
+            self.context, new_instance['id'],
+            {'status': constants.STATUS_MIGRATING_TO})
+        data_rpc.DataAPI.migration_start.assert_called_once_with(
+            self.context, share['id'], ['lost+found'], instance['id'],
+            new_instance['id'], 'src_fake_info', 'dest_fake_info',
+            precopy=True, incremental=False)
+        self.assertFalse(helper.cleanup_new_instance.called)
+
+    @ddt.data(None, Exception('fake'))
+    def test_migration_precopy_completed(self, exc):
+        instance = db_utils.create_share_instance(
+            share_id='fake_id',
+            status=constants.STATUS_MIGRATING,
+            share_server_id='fake_server_id')
+        new_instance = db_utils.create_share_instance(
+            share_id='fake_id',
+            status=constants.STATUS_MIGRATING_TO)
+        share = db_utils.create_share(id='fake_id', instances=[instance])
+        server = 'share_server'
+        helper = mock.Mock()
+        self.mock_object(migration_api, 'ShareMigrationHelper',
+                         mock.Mock(return_value=helper))
+        self.mock_object(self.share_manager.db, 'share_instance_get',
+                         mock.Mock(side_effect=[instance, new_instance]))
+        self.mock_object(self.share_manager.db, 'share_get',
+                         mock.Mock(return_value=share))
+        self.mock_object(self.share_manager.db, 'share_server_get',
+                         mock.Mock(return_value=server))
+        self.mock_object(self.share_manager.db, 'share_update')
+        self.mock_object(self.share_manager.db, 'share_instance_update')
+        self.mock_object(self.share_manager, '_cast_access_rules_to_readonly')
+        self.mock_object(self.share_manager, '_reset_read_only_access_rules')
+        self.mock_object(self.share_manager, '_migration_start_data_copy',
+                         mock.Mock(side_effect=exc))
+
+        if exc is None:
+            self.share_manager.migration_precopy_completed(
+                self.context, instance['id'], new_instance['id'])
+        else:
+            self.assertRaises(
+                exception.ShareMigrationFailed,
+                self.share_manager.migration_precopy_completed,
+                self.context, instance['id'], new_instance['id'])
+
+        (self.share_manager._cast_access_rules_to_readonly.
+            assert_called_once_with(self.context, instance, server))
+        (self.share_manager._migration_start_data_copy.
+            assert_called_once_with(self.context, share, instance,
+                                    new_instance, server, incremental=True))
+        if exc is None:
+            self.assertFalse(helper.cleanup_new_instance.called)
+            self.assertFalse(self.share_manager.db.share_update.called)
+        else:
             helper.cleanup_new_instance.assert_called_once_with(new_instance)
+            self.share_manager.db.share_update.assert_called_once_with(
+                self.context, share['id'],
+                {'task_state': constants.TASK_STATE_MIGRATION_ERROR})
+            (self.share_manager._reset_read_only_access_rules.
+                assert_called_once_with(self.context, share, instance['id']))
+            (self.share_manager.db.share_instance_update.
+                assert_called_once_with(
+                    self.context, instance['id'],
+                    {'status': constants.STATUS_AVAILABLE}))
 
     @ddt.data({'share_network_id': 'fake_net_id', 'exc': None,
                'has_snapshots': True},
@@ -6365,7 +6637,7 @@ class ShareManagerTestCase(test.TestCase):
         retval = self.share_manager.periodic_share_replica_snapshot_update(
             self.context)
 
-        self.assertIsNone(retval)
+        self.assertEqual(0, retval)
         self.assertEqual(1, mock_debug_log.call_count)
         self.assertEqual(0, mock_snapshot_update_call.call_count)
 
@@ -6393,7 +6665,7 @@ class ShareManagerTestCase(test.TestCase):
         retval = self.share_manager.periodic_share_replica_snapshot_update(
             self.context)
 
-        self.assertIsNone(retval)
+        self.assertEqual(0, retval)
         self.assertEqual(1, mock_debug_log.call_count)
         self.assertEqual(0, mock_snapshot_update_call.call_count)
 
@@ -6558,6 +6830,7 @@ class ShareManagerTestCase(test.TestCase):
         self.assertFalse(mock_db_delete_call.called)
 
     def test_update_access(self):
+        self.flags(access_update_coalesce_window=0)
         share_instance = fakes.fake_share_instance()
         self.mock_object(self.share_manager, '_get_share_server',
                          mock.Mock(return_value='fake_share_server'))
@@ -6574,27 +6847,112 @@ class ShareManagerTestCase(test.TestCase):
             self.context, share_instance['id'],
             share_server='fake_share_server')
 
+    def test_update_access_coalesced(self):
+        self.flags(access_update_coalesce_window=2)
+        mock_spawn = self.mock_object(
+            self.share_manager._access_update_pool, 'spawn_n')
+
+        for i in range(3):
+            self.share_manager.update_access(self.context, 'fake_si_1')
+        self.share_manager.update_access(self.context, 'fake_si_2')
+
+        self.assertEqual(2, mock_spawn.call_count)
+        mock_spawn.assert_has_calls([
+            mock.call(self.share_manager._coalesced_update_access,
+                      self.context, 'fake_si_1', 2),
+            mock.call(self.share_manager._coalesced_update_access,
+                      self.context, 'fake_si_2', 2),
+        ])
+        self.assertEqual({'fake_si_1': 3, 'fake_si_2': 1},
+                         self.share_manager._pending_access_updates)
+
+    def test__coalesced_update_access(self):
+        self.share_manager._pending_access_updates = {'fake_si_1': 3}
+        self.share_manager._access_update_requests = 3
+        mock_sleep = self.mock_object(manager.eventlet, 'sleep')
+        mock_update = self.mock_object(self.share_manager, '_update_access')
+
+        self.share_manager._coalesced_update_access(
+            self.context, 'fake_si_1', 2)
+
+        mock_sleep.assert_called_once_with(2)
+        mock_update.assert_called_once_with(self.context, 'fake_si_1')
+        self.assertEqual({}, self.share_manager._pending_access_updates)
+        self.assertEqual(
+            {'requests': 3, 'batches': 1, 'pending': 0,
+             'max_batch_size': 3, 'average_batch_size': 3.0},
+            self.share_manager.get_access_update_stats())
+
+    def test__coalesced_update_access_exception(self):
+        self.share_manager._pending_access_updates = {'fake_si_1': 1}
+        self.mock_object(manager.eventlet, 'sleep')
+        self.mock_object(self.share_manager, '_update_access',
+                         mock.Mock(side_effect=exception.ManilaException))
+        mock_log = self.mock_object(manager.LOG, 'exception')
+
+        self.share_manager._coalesced_update_access(
+            self.context, 'fake_si_1', 2)
+
+        self.assertEqual(1, mock_log.call_count)
+        self.assertEqual({}, self.share_manager._pending_access_updates)
+
     @mock.patch('manila.tests.fake_notifier.FakeNotifier._notify')
     def test_update_share_usage_size(self, mock_notify):
         instances = self._setup_init_mocks(setup_access_rules=False)
-        update_shares = [{'id': 'fake_id', 'used_size': '3',
+        update_shares = [{'id': instances[0]['id'], 'used_size': '3',
                           'gathered_at': 'fake'}]
+        instances[0].set_share_data(
+            db.share_get(self.context, instances[0]['share_id']))
         mock_notify.assert_not_called()
 
         manager = self.share_manager
         self.mock_object(manager, 'driver')
-        self.mock_object(manager.db, 'share_instances_get_all_by_host',
-                         mock.Mock(return_value=instances))
-        self.mock_object(manager.db, 'share_instance_get',
-                         mock.Mock(side_effect=instances))
+        mock_get_all = self.mock_object(
+            manager.db, 'share_instances_get_all_by_host',
+            mock.Mock(side_effect=[instances, []]))
         mock_driver_call = self.mock_object(
             manager.driver, 'update_share_usage_size',
             mock.Mock(return_value=update_shares))
         self.share_manager.update_share_usage_size(self.context)
         self.assert_notify_called(mock_notify,
                                   (['INFO', 'share.consumed.size'], ))
+        notified_usage = mock_notify.call_args[0][-1]
+        self.assertEqual(instances[0]['share_id'], notified_usage['share_id'])
+        self.assertEqual(instances[0]['size'], notified_usage['size'])
+        self.assertEqual('3', notified_usage['used_size'])
         mock_driver_call.assert_called_once_with(
             self.context, instances)
+        mock_get_all.assert_has_calls([
+            mock.call(self.context, host=manager.host, with_share_data=True,
+                      limit=500, marker=None),
+            mock.call(self.context, host=manager.host, with_share_data=True,
+                      limit=500, marker=instances[-1]['id']),
+        ])
+        self.assertEqual(1, manager._share_usage_size_chunks)
+
+    def test_update_share_usage_size_in_chunks(self):
+        self.flags(share_usage_size_chunk_size=2,
+                   share_usage_size_spread_chunks=True,
+                   share_usage_size_update_interval=300)
+        chunks = [[{'id': 'si_1'}, {'id': 'si_2'}],
+                  [{'id': 'si_3'}, {'id': 'si_4'}],
+                  [{'id': 'si_5'}], []]
+        smanager = self.share_manager
+        smanager._share_usage_size_chunks = 3
+        self.mock_object(smanager.db, 'share_instances_get_all_by_host',
+                         mock.Mock(side_effect=chunks))
+        mock_update_chunk = self.mock_object(
+            smanager, '_update_share_usage_size_chunk')
+        mock_sleep = self.mock_object(manager.eventlet, 'sleep')
+
+        smanager.update_share_usage_size(self.context)
+
+        mock_update_chunk.assert_has_calls(
+            [mock.call(self.context, chunk) for chunk in chunks[:3]])
+        self.assertEqual(3, mock_update_chunk.call_count)
+        mock_sleep.assert_has_calls([mock.call(100.0)] * 2)
+        self.assertEqual(2, mock_sleep.call_count)
+        self.assertEqual(3, smanager._share_usage_size_chunks)
 
     @mock.patch('manila.tests.fake_notifier.FakeNotifier._notify')
     def test_update_share_usage_size_fail(self, mock_notify):
@@ -6604,15 +6962,14 @@ class ShareManagerTestCase(test.TestCase):
         self.mock_object(self.share_manager, 'driver')
         self.mock_object(self.share_manager.db,
                          'share_instances_get_all_by_host',
-                         mock.Mock(return_value=instances))
-        self.mock_object(self.share_manager.db, 'share_instance_get',
-                         mock.Mock(side_effect=instances))
+                         mock.Mock(side_effect=[instances, []]))
         self.mock_object(
             self.share_manager.driver, 'update_share_usage_size',
             mock.Mock(side_effect=exception.ProcessExecutionError))
         mock_log_exception = self.mock_object(manager.LOG, 'exception')
         self.share_manager.update_share_usage_size(self.context)
         self.assertTrue(mock_log_exception.called)
+        mock_notify.assert_not_called()
 
 
 @ddt.ddt
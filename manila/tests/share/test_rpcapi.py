@@ -172,6 +172,12 @@ class ShareRpcAPITestCase(test.TestCase):
                              filter_properties=None,
                              request_spec=None)
 
+    def test_publish_service_capabilities(self):
+        self._test_share_api('publish_service_capabilities',
+                             rpc_method='cast',
+                             version='1.19',
+                             host='fake_host1')
+
     def test_delete_share_instance(self):
         self._test_share_api('delete_share_instance',
                              rpc_method='cast',
@@ -281,6 +287,13 @@ class ShareRpcAPITestCase(test.TestCase):
                              src_share_instance=self.fake_share['instance'],
                              dest_instance_id='ins2_id')
 
+    def test_migration_precopy_completed(self):
+        self._test_share_api('migration_precopy_completed',
+                             rpc_method='cast',
+                             version='1.20',
+                             src_share_instance=self.fake_share['instance'],
+                             dest_instance_id='ins2_id')
+
     def test_migration_get_progress(self):
         self._test_share_api('migration_get_progress',
                              rpc_method='call',
@@ -812,6 +812,25 @@ class ShareGroupsAPITestCase(test.TestCase):
 
         self.assertEqual(expected, actual)
 
+    def test_get_all_paginated(self):
+        expected = [fake_share_group(
+            'fakeid', user_id=self.context.user_id,
+            project_id=self.context.project_id,
+            status=constants.STATUS_CREATING)]
+        self.mock_object(
+            db_driver, 'share_group_get_all_by_project',
+            mock.Mock(return_value=expected))
+
+        actual = self.api.get_all(
+            self.context, detailed=False, limit=1, offset=2,
+            marker='fake_marker')
+
+        self.assertEqual(expected, actual)
+        db_driver.share_group_get_all_by_project.assert_called_once_with(
+            self.context, self.context.project_id, detailed=False,
+            filters={}, sort_key=None, sort_dir=None, limit=1, offset=2,
+            marker='fake_marker')
+
     def test_get_all_all_tenants_not_admin(self):
         cxt = context.RequestContext(
             user_id=None, project_id=None, is_admin=False)
@@ -839,7 +858,8 @@ class ShareGroupsAPITestCase(test.TestCase):
         self.assertEqual(expected, actual)
         db_driver.share_group_get_all.assert_called_once_with(
             self.context, detailed=True, filters={},
-            sort_dir=None, sort_key=None)
+            sort_dir=None, sort_key=None, limit=None, offset=None,
+            marker=None)
 
     def test_create_share_group_snapshot_minimal_request_no_members(self):
         share_group = fake_share_group(
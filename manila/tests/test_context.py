@@ -63,3 +63,28 @@ class ContextTestCase(test.TestCase):
                           ctxt,
                           'read_deleted',
                           True)
+
+    def test_request_cache(self):
+        cache = context.RequestCache()
+        loads = []
+
+        def load():
+            loads.append(1)
+            return 'fake_value'
+
+        self.assertEqual('fake_value', cache.get_or_load('key', load))
+        self.assertEqual('fake_value', cache.get_or_load('key', load))
+        cache.clear()
+        self.assertEqual('fake_value', cache.get_or_load('key', load))
+
+        self.assertEqual(2, len(loads))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(2, cache.misses)
+
+    def test_request_cache_shared_by_elevated_context(self):
+        ctxt = context.RequestContext('111', '222')
+        ctxt.db_cache = context.RequestCache()
+
+        admin_ctxt = ctxt.elevated()
+
+        self.assertIs(ctxt.db_cache, admin_ctxt.db_cache)
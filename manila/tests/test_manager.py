@@ -112,8 +112,45 @@ class SchedulerDependentManagerTestCase(test.TestCase):
 
         (self.sched_manager.scheduler_rpcapi.update_service_capabilities.
             assert_called_once_with(
-                self.context, self.service_name, self.host, last_capabilities))
+                self.context, self.service_name, self.host, last_capabilities,
+                generation=1))
         manager.LOG.debug.assert_called_once_with(mock.ANY)
+        self.assertEqual(last_capabilities,
+                         self.sched_manager.published_capabilities)
+
+    def test__publish_service_capabilities_delta(self):
+        self.sched_manager.last_capabilities = {
+            'share_backend_name': 'fake',
+            'pools': [{'pool_name': 'pool1', 'free_capacity_gb': 10},
+                      {'pool_name': 'pool2', 'free_capacity_gb': 20}],
+        }
+        self.mock_object(
+            self.sched_manager.scheduler_rpcapi, 'update_service_capabilities')
+        self.sched_manager._publish_service_capabilities(self.context)
+
+        self.sched_manager.last_capabilities = {
+            'share_backend_name': 'fake',
+            'pools': [{'pool_name': 'pool1', 'free_capacity_gb': 5},
+                      {'pool_name': 'pool2', 'free_capacity_gb': 20}],
+        }
+        self.sched_manager._publish_service_capabilities(self.context)
+
+        expected_delta = {
+            'updated': {},
+            'removed': [],
+            'pools': {
+                'updated': {'pool1': {'free_capacity_gb': 5}},
+                'removed': {},
+                'deleted': [],
+            },
+        }
+        (self.sched_manager.scheduler_rpcapi.update_service_capabilities.
+            assert_called_with(
+                self.context, self.service_name, self.host, expected_delta,
+                generation=2, delta=True))
+        self.assertEqual(2, self.sched_manager.capabilities_generation)
+        self.assertEqual(self.sched_manager.last_capabilities,
+                         self.sched_manager.published_capabilities)
 
     @ddt.data(None, '', [], {}, {'foo': 'bar'})
     def test_update_service_capabilities(self, capabilities):
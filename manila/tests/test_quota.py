@@ -154,6 +154,46 @@ class DbQuotaDriverTestCase(test.TestCase):
             self.assertEqual(
                 0, quota.db.quota_usage_get_all_by_project.call_count)
 
+    def test_get_project_quotas_limits_cached(self):
+        self.flags(quota_limits_cache_ttl=60)
+        self.mock_object(quota.db, 'quota_get_all_by_project',
+                         mock.Mock(return_value={'foo': 5}))
+        self.mock_object(quota.db, 'quota_class_get_all_by_name',
+                         mock.Mock(return_value={'bar': 7}))
+        self.mock_object(quota.db, 'quota_class_get_default',
+                         mock.Mock(return_value={'foo': 1, 'bar': 2}))
+        mock_now = self.mock_object(
+            quota.timeutils, 'utcnow_ts', mock.Mock(return_value=100))
+        expected = {'foo': {'limit': 5}, 'bar': {'limit': 7}}
+
+        for now in (100, 159, 160):
+            mock_now.return_value = now
+            result = self.driver.get_project_quotas(
+                self.ctxt, self.resources, self.project_id, usages=False)
+            self.assertEqual(expected, result)
+        self.driver.clear_limits_cache()
+        self.driver.get_project_quotas(
+            self.ctxt, self.resources, self.project_id, usages=False)
+
+        self.assertEqual(3, quota.db.quota_get_all_by_project.call_count)
+        self.assertEqual(3, quota.db.quota_class_get_all_by_name.call_count)
+        self.assertEqual(3, quota.db.quota_class_get_default.call_count)
+
+    def test_get_project_quotas_limits_of_other_project_not_cached(self):
+        self.flags(quota_limits_cache_ttl=60)
+        self.mock_object(quota.db, 'quota_get_all_by_project',
+                         mock.Mock(return_value={'foo': 5}))
+        self.mock_object(quota.db, 'quota_class_get_default',
+                         mock.Mock(return_value={}))
+
+        for i in range(2):
+            self.driver.get_project_quotas(
+                self.ctxt, self.resources, 'other_project_id',
+                usages=False)
+
+        self.assertEqual(2, quota.db.quota_get_all_by_project.call_count)
+        self.assertEqual(1, quota.db.quota_class_get_default.call_count)
+
     @ddt.data(
         (None, True, True),
         ('fake_quota_class', False, True),
@@ -705,6 +745,19 @@ class QuotaEngineTestCase(test.TestCase):
         self.assertIsNone(result)
         self.driver.expire.assert_called_once_with(self.ctxt)
 
+    def test_clear_limits_cache(self):
+        result = self.engine.clear_limits_cache()
+
+        self.assertIsNone(result)
+        self.driver.clear_limits_cache.assert_called_once_with()
+
+    def test_clear_limits_cache_driver_without_cache(self):
+        engine = quota.QuotaEngine(quota_driver_class=object())
+
+        result = engine.clear_limits_cache()
+
+        self.assertIsNone(result)
+
     def test_resources(self):
         self.engine.register_resources(self.resources)
         self.assertEqual(['bar', 'foo'], self.engine.resources)
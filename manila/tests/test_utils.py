@@ -688,6 +688,28 @@ class TestRetryDecorator(test.TestCase):
             mock_sleep.assert_has_calls(map(mock.call, [2, 4, 4, 4]))
 
 
+@ddt.ddt
+class PaginateListTestCase(test.TestCase):
+
+    items = [{'id': 'fake_id_%s' % i} for i in range(5)]
+
+    @ddt.data(({}, items),
+              ({'limit': 2}, items[:2]),
+              ({'offset': 3}, items[3:]),
+              ({'limit': 2, 'offset': 2}, items[2:4]),
+              ({'marker': 'fake_id_1'}, items[2:]),
+              ({'limit': 1, 'offset': 1, 'marker': 'fake_id_1'}, items[3:4]),
+              ({'marker': 'fake_id_4'}, []))
+    @ddt.unpack
+    def test_paginate_list(self, pagination, expected):
+        self.assertEqual(expected, utils.paginate_list(self.items,
+                                                       **pagination))
+
+    def test_paginate_list_marker_not_found(self):
+        self.assertRaises(exception.InvalidInput, utils.paginate_list,
+                          self.items, marker='fake_marker')
+
+
 @ddt.ddt
 class RequireDriverInitializedTestCase(test.TestCase):
 
@@ -561,6 +561,30 @@ def check_params_are_boolean(keys, params, default=False):
     return result
 
 
+def paginate_list(items, limit=None, offset=None, marker=None):
+    """Returns a page of an already sorted list of resources.
+
+    :param items: sorted list of resources having an 'id'
+    :param limit: maximum number of resources to return
+    :param offset: number of resources to skip
+    :param marker: ID of the last resource of the previous page, only the
+        resources following it are returned
+    :raises: exception.InvalidInput if the marker is not in the list
+    """
+    if marker is not None:
+        for index, item in enumerate(items):
+            if item['id'] == marker:
+                items = items[index + 1:]
+                break
+        else:
+            msg = _("Marker '%s' could not be found.") % marker
+            raise exception.InvalidInput(reason=msg)
+
+    offset = offset or 0
+    end = offset + limit if limit is not None else None
+    return items[offset:end]
+
+
 def require_driver_initialized(func):
     @functools.wraps(func)
     def wrapper(self, *args, **kwargs):